@@ -0,0 +1,346 @@
+'''
+Benchmark cases for the toolbox hot paths.
+
+Each case is a function taking a synthetic.Fixture, registered with the
+@benchmark decorator. An optional setup function runs (untimed) before every
+repetition and its return value is passed to the case as a second argument;
+use it for anything which the timed code consumes or modifies. Toolbox
+modules are loaded through Modeller().module(), so the emmebank stand-in must
+be installed before this module is imported (run_benchmarks.py does this).
+'''
+
+import gzip
+import os
+from collections import OrderedDict
+from itertools import combinations
+import numpy as np
+import inro.modeller as _m
+
+_MODELLER = _m.Modeller()
+
+CASES = OrderedDict()
+
+class Case(object):
+
+    def __init__(self, name, function, setup=None):
+        self.name = name
+        self.function = function
+        self.setup = setup
+
+    def prepare(self, fixture):
+        if self.setup is None:
+            return ()
+        return (self.setup(fixture),)
+
+    def run(self, fixture, prepared):
+        return self.function(fixture, *prepared)
+
+def benchmark(name, setup=None):
+    def decorator(function):
+        if name in CASES:
+            raise KeyError("Duplicate benchmark case '%s'" %name)
+        CASES[name] = Case(name, function, setup)
+        return function
+    return decorator
+
+def _module(namespace):
+    return _MODELLER.module(namespace)
+
+def _cached(fixture, key, factory):
+    if key not in fixture.cache:
+        fixture.cache[key] = factory()
+    return fixture.cache[key]
+
+#===========================================================================================
+#---NETWORK EDITING
+
+def _pathEndpoints(fixture, count):
+    rng = np.random.RandomState(fixture.seed + 10)
+    gridSize = fixture.info['gridSize']
+    grid = fixture.info['grid']
+    pairs = []
+    for i in range(count):
+        origin = grid[(rng.randint(0, gridSize), rng.randint(0, gridSize))]
+        destination = grid[(rng.randint(0, gridSize), rng.randint(0, gridSize))]
+        pairs.append((origin, destination))
+    return pairs
+
+@benchmark('network_editing.AStarLinks.calcPath')
+def aStarPaths(fixture):
+    _editing = _module('tmg.common.network_editing')
+    network = fixture.network
+    with _editing.AStarLinks(network) as searcher:
+        searcher.max_degrees = 40
+        for origin, destination in _pathEndpoints(fixture, 10):
+            searcher.calcPath(network.node(origin), network.node(destination))
+
+def _mergeSetup(fixture):
+    network = fixture.network._clone()
+    return network, fixture.info['shapeNodes'][:200]
+
+@benchmark('network_editing.mergeLinks', setup=_mergeSetup)
+def mergeShapeNodes(fixture, prepared):
+    _editing = _module('tmg.common.network_editing')
+    network, shapeNodes = prepared
+    for number in shapeNodes:
+        _editing.mergeLinks(network.node(number), deleteStop=True)
+
+@benchmark('network_editing.copyNetwork')
+def copyNetwork(fixture):
+    _editing = _module('tmg.common.network_editing')
+    _editing.copyNetwork(fixture.network)
+
+#===========================================================================================
+#---SPATIAL INDEX
+
+def _buildGridIndex(network):
+    _spindex = _module('tmg.common.spatial_index')
+    extents = _spindex.get_network_extents(network)
+    index = _spindex.GridIndex(extents, marginSize=1.0)
+    for node in network.regular_nodes():
+        index.insertPoint(node)
+    for link in network.links():
+        index.insertLink(link)
+    return index
+
+@benchmark('spatial_index.GridIndex.build')
+def gridIndexBuild(fixture):
+    _buildGridIndex(fixture.network)
+
+def _querySetup(fixture):
+    return _cached(fixture, 'gridIndex', lambda: _buildGridIndex(fixture.network))
+
+@benchmark('spatial_index.GridIndex.bulkBuild')
+def gridIndexBulkBuild(fixture):
+    _spindex = _module('tmg.common.spatial_index')
+    network = fixture.network
+    nodes = list(network.regular_nodes())
+    links = list(network.links())
+    nFeatures = len(nodes) + sum(len(link.vertices) + 1 for link in links)
+    index = _spindex.GridIndex.fromFeatureCount(_spindex.get_network_extents(network), nFeatures, 1.0)
+    index.insertNodes(nodes)
+    index.insertLinks(links)
+
+@benchmark('spatial_index.GridIndex.query', setup=_querySetup)
+def gridIndexQuery(fixture, index):
+    network = fixture.network
+    for zone in fixture.zones:
+        centroid = network.node(zone)
+        index.queryCircle(centroid.x, centroid.y, 500.0)
+        index.nearestToPoint(centroid.x, centroid.y)
+
+#===========================================================================================
+#---FILE I/O
+
+def _linkTableSetup(fixture):
+    def write():
+        filepath = os.path.join(fixture.workFolder, 'links_%s.csv' %fixture.scale)
+        from synthetic import writeLinkTable
+        writeLinkTable(fixture.network, filepath)
+        return filepath
+    return _cached(fixture, 'linkTable', write)
+
+@benchmark('utilities.CSVReader.readlines', setup=_linkTableSetup)
+def csvReadLines(fixture, filepath):
+    _util = _module('tmg.common.utilities')
+    total = 0.0
+    with _util.CSVReader(filepath) as reader:
+        for record in reader.readlines():
+            total += float(record['length'])
+    return total
+
+def _exportSetup(fixture):
+    data = fixture.emmebank.matrix('mf1').get_data()
+    data.raw_data # Convert to Emme's row arrays up front, as the API returns them
+    return data
+
+@benchmark('export_binary_matrix._save_matrix_data', setup=_exportSetup)
+def exportBinaryMatrix(fixture, data):
+    tool = _MODELLER.tool('tmg.input_output.export_binary_matrix')
+    filepath = os.path.join(fixture.workFolder, 'export.mdf')
+    with open(filepath, 'wb') as writer:
+        tool._save_matrix_data(writer, data)
+
+def _matrixFileSetup(fixture, compressed):
+    def write():
+        data = fixture.emmebank.matrix('mf1').get_data()
+        filepath = os.path.join(fixture.workFolder, 'import_%s.mdf' %fixture.scale)
+        data.save(filepath)
+        if compressed:
+            with open(filepath, 'rb') as reader, gzip.open(filepath + '.gz', 'wb') as writer:
+                writer.write(reader.read())
+            filepath += '.gz'
+        return filepath
+    return _cached(fixture, 'matrixFile%s' %compressed, write)
+
+@benchmark('import_binary_matrix._load_matrix_from_stream',
+           setup=lambda fixture: _matrixFileSetup(fixture, False))
+def importBinaryMatrix(fixture, filepath):
+    tool = _MODELLER.tool('tmg.input_output.import_binary_matrix')
+    with open(filepath, 'rb') as reader:
+        return tool._load_matrix_from_stream(reader)
+
+@benchmark('import_binary_matrix._load_matrix_from_stream[gz]',
+           setup=lambda fixture: _matrixFileSetup(fixture, True))
+def importBinaryMatrixGzip(fixture, filepath):
+    tool = _MODELLER.tool('tmg.input_output.import_binary_matrix')
+    with gzip.open(filepath, 'rb') as reader:
+        return tool._load_matrix_from_stream(reader)
+
+#===========================================================================================
+#---CONGESTED TRANSIT ASSIGNMENT
+
+def _prepareAssignmentNetwork(fixture):
+    '''
+    Adds the attributes the congested assignment creates on its network copy,
+    filled with the synthetic assignment results.
+    '''
+    network = fixture.network._clone()
+    for domain, name in [('TRANSIT_SEGMENT', 'current_voltr'), ('TRANSIT_SEGMENT', 'cost'),
+                         ('TRANSIT_SEGMENT', 'voltr'), ('TRANSIT_SEGMENT', 'board'),
+                         ('TRANSIT_SEGMENT', 'timtr'), ('TRANSIT_LINE', 'total_capacity'),
+                         ('NODE', 'inboa'), ('NODE', 'fiali'), ('LINK', 'volax')]:
+        network.create_attribute(domain, name)
+    rng = np.random.RandomState(fixture.seed + 20)
+    for line in network.transit_lines():
+        line.total_capacity = 60.0 * line.vehicle.total_capacity / line.headway
+        for segment in line.segments():
+            segment.current_voltr = segment.transit_volume * rng.uniform(0.8, 1.2)
+            segment.voltr = segment.current_voltr
+            segment.board = segment.transit_boardings
+            segment.cost = rng.uniform(0.0, 0.5)
+            segment.transit_time += segment.dwell_time
+            segment.timtr = segment.transit_time
+    return network
+
+def _assignmentTool(fixture):
+    def create():
+        tool = _MODELLER.tool('tmg.XTMF_internal.tmg_transit_assignment_tool')
+        tool.CongestionExponentString = "1:0.41:1.62,2:0.41:1.62,3:0.41:1.62"
+        tool.ttfDict = tool._ParseExponentString(False)
+        return tool
+    return _cached(fixture, 'assignmentTool', create)
+
+def _assignmentSetup(fixture):
+    tool = _assignmentTool(fixture)
+    tool.alphas = [1.0]
+    network = _cached(fixture, 'assignmentNetwork', lambda: _prepareAssignmentNetwork(fixture))
+    return tool, network
+
+@benchmark('tmg_transit_assignment_tool._FindStepSize', setup=_assignmentSetup)
+def findStepSize(fixture, prepared):
+    tool, network = prepared
+    assignedTotalDemand = float(fixture.demand.sum())
+    return tool._FindStepSize(network, 20.0, 25.0, assignedTotalDemand)
+
+@benchmark('tmg_transit_assignment_tool._UpdateVolumes', setup=_assignmentSetup)
+def updateVolumes(fixture, prepared):
+    tool, network = prepared
+    tool._UpdateVolumes(network, 0.5)
+
+#===========================================================================================
+#---NETWORK CONNECTIVITY
+
+def _connectivityTool(fixture):
+    def create():
+        tool = _MODELLER.tool('tmg.assignment.preprocessing.check_network_connectivity')
+        tool.Scenario = fixture.scenario
+        tool.AutoModeIds = ['c']
+        tool.TransitModeIds = ['b', 's', 'w', 't']
+        return tool
+    return _cached(fixture, 'connectivityTool', create)
+
+@benchmark('check_network_connectivity._CheckWithGraph')
+def checkConnectivityGraph(fixture):
+    return _connectivityTool(fixture)._CheckWithGraph()
+
+#===========================================================================================
+#---CENTROID CONNECTOR GENERATION
+
+def _prepareCandidateNetwork(fixture):
+    '''
+    Attaches up to MaxCandidates nearby regular nodes (and their distances) to
+    each zone, the way CCGEN's candidate search does.
+    '''
+    network = fixture.network._clone()
+    network.create_attribute('NODE', '_candidateNodes', None)
+    index = _cached(fixture, 'gridIndex', lambda: _buildGridIndex(fixture.network))
+    nZones = max(10, int(100 * fixture.scale))
+    zones = []
+    for number in fixture.zones[:nZones]:
+        zone = network.node(number)
+        candidates = {}
+        for node in index.queryCircle(zone.x, zone.y, 1200.0):
+            if node.__class__.__name__ != 'Node' or node.is_centroid: continue
+            distance = np.hypot(node.x - zone.x, node.y - zone.y)
+            candidates[network.node(node.number)] = distance
+        nearest = sorted(candidates.items(), key=lambda item: item[1])[:10]
+        zone._candidateNodes = dict(nearest)
+        zones.append(zone)
+    return zones
+
+def _scoringSetup(fixture):
+    def create():
+        tool = _MODELLER.tool('tmg.network_editing.centroid_connectors.CCGEN')
+        tool.MassAttribute = None
+        return tool
+    tool = _cached(fixture, 'ccgenTool', create)
+    zones = _cached(fixture, 'candidateZones', lambda: _prepareCandidateNetwork(fixture))
+    return tool, zones
+
+@benchmark('CCGEN.scoring', setup=_scoringSetup)
+def ccgenScoring(fixture, prepared):
+    tool, zones = prepared
+    best = []
+    for zone in zones:
+        distanceMatrix = tool._calculateDistanceMatrix(zone)
+        maxUtil = float('-inf')
+        for setSize in range(2, min(tool.MaxConnectors, len(zone._candidateNodes)) + 1):
+            for configuration in combinations(zone._candidateNodes, setSize):
+                components = tool._calculateUtility(zone, configuration, distanceMatrix)
+                maxUtil = max(maxUtil, sum(beta * value for beta, value in components.values()))
+        best.append(maxUtil)
+    return best
+
+#===========================================================================================
+#---FARE-BASED TRANSIT HYPERNETWORKS
+
+def _lineGroupSetup(fixture):
+    def create():
+        lines = list(fixture.network.transit_lines())
+        groups = np.array([1 + index % 4 if line.mode.id == 'b' else 5 for index, line in enumerate(lines)],
+                          dtype=np.int64)
+        return [line.id for line in lines], groups
+    return _cached(fixture, 'lineGroups', create)
+
+@benchmark('hypernetwork_size.projectSize', setup=_lineGroupSetup)
+def projectHypernetworkSize(fixture, prepared):
+    lineIds, lineGroups = prepared
+    size = _module('tmg.common.hypernetwork_size').projectSize(fixture.scenario, lineIds, lineGroups)
+    return size.nodes, size.links
+
+#===========================================================================================
+#---LINK SPECIFIC VOLUMES
+
+def _linkSpecificVolumesTool(fixture):
+    return _cached(fixture, 'linkSpecificVolumesTool',
+                   lambda: _MODELLER.tool('tmg.analysis.link_specific_volumes'))
+
+def _transitPackagesSetup(fixture):
+    return _cached(fixture, 'transitPackages',
+                   lambda: _linkSpecificVolumesTool(fixture)._ReadTransitScenario(fixture.scenario))
+
+@benchmark('link_specific_volumes._LoadTransitVolumes', setup=_transitPackagesSetup)
+def loadTransitVolumes(fixture, packages):
+    shapes, linkShapes, transitVolumes = _linkSpecificVolumesTool(fixture)._LoadTransitVolumes(packages)
+    #Twins must follow the same path, not only share their end points
+    hashShape = _module('tmg.common.colocation_index').hashShape
+    for link in fixture.network.links():
+        key = (link.i_node.number, link.j_node.number)
+        shape = hashShape(link.shape)
+        if hashShape(shapes[key]) != shape:
+            raise ValueError("Shape of link %s was not loaded with its vertices" %link)
+        for twin in linkShapes.getLinksWithShape(shapes[key]):
+            if hashShape(shapes[twin]) != shape:
+                raise ValueError("Link %s was twinned with %s, which has a different shape" %(link, twin))
+    return len(transitVolumes)
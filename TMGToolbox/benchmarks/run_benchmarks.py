@@ -0,0 +1,198 @@
+'''
+Runs the TMG Toolbox benchmarks against the in-process Emme stand-in.
+
+    python benchmarks/run_benchmarks.py [--scales 0.1,0.25,0.5,1.0] [--repeat 3]
+                                        [-k filter] [--save results.json]
+                                        [--baseline results.json] [--tolerance 0.25]
+
+For each case and scale, reports the best and median wall time over the
+repetitions and the peak memory allocated by one run (from tracemalloc). When
+more than one scale is run, the scaling exponent b of time ~ size^b is fitted
+over the scales. With --baseline, cases slower than the baseline by more than
+the tolerance are reported as regressions and the exit code is 1; cases which
+raise give exit code 2.
+'''
+
+from __future__ import print_function
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import traceback
+
+BENCHMARK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_FOLDER, 'standin'))
+sys.path.insert(0, BENCHMARK_FOLDER)
+
+import numpy as np
+import inro.modeller as _m
+
+_bank = _m.install() # Must happen before any toolbox module is loaded
+
+import synthetic
+import cases
+
+QUICK_SCALES = [0.02, 0.05]
+DEFAULT_SCALES = [0.1, 0.25, 0.5, 1.0]
+NOISE_FLOOR = 0.005 # seconds; differences below this are never regressions
+
+#===========================================================================================
+
+def timeCase(case, fixture, repeat):
+    times = []
+    for i in range(repeat):
+        prepared = case.prepare(fixture)
+        gc.collect()
+        start = time.perf_counter()
+        case.run(fixture, prepared)
+        times.append(time.perf_counter() - start)
+    return times
+
+def measureMemory(case, fixture):
+    prepared = case.prepare(fixture)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        case.run(fixture, prepared)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def fitExponent(sizes, times):
+    '''
+    Fits time = a * size^b on a log-log scale and returns b (None if fewer
+    than two usable points).
+    '''
+    points = [(s, t) for s, t in zip(sizes, times) if s > 0 and t > 0]
+    if len(points) < 2:
+        return None
+    x = np.log([s for s, t in points])
+    y = np.log([t for s, t in points])
+    return float(np.polyfit(x, y, 1)[0])
+
+def compare(results, baseline, tolerance):
+    '''
+    Returns a list of (name, scale, baseline time, new time) for cases which
+    got slower than the baseline by more than the tolerance.
+    '''
+    previous = dict(((r['case'], r['scale']), r) for r in baseline['results'] if r.get('best') is not None)
+    regressions = []
+    for result in results:
+        if result.get('best') is None: continue
+        old = previous.get((result['case'], result['scale']))
+        if old is None: continue
+        if result['best'] - old['best'] > max(NOISE_FLOOR, tolerance * old['best']):
+            regressions.append((result['case'], result['scale'], old['best'], result['best']))
+    return regressions
+
+def formatBytes(n):
+    if n is None: return "-"
+    for unit in ['B', 'KB', 'MB']:
+        if n < 1024.0:
+            return "%.1f %s" %(n, unit)
+        n /= 1024.0
+    return "%.1f GB" %n
+
+#===========================================================================================
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description="Benchmarks for TMG Toolbox hot paths")
+    parser.add_argument('--scales', default=None,
+                        help="Comma-separated network scales (1.0 = GTHA size). Default: %s"
+                             %",".join(str(s) for s in DEFAULT_SCALES))
+    parser.add_argument('--repeat', type=int, default=3, help="Timed repetitions per case and scale")
+    parser.add_argument('-k', dest='filter', default=None, help="Only run cases whose name contains this")
+    parser.add_argument('--list', action='store_true', help="List the cases and exit")
+    parser.add_argument('--quick', action='store_true', help="Small scales and one repetition (smoke test)")
+    parser.add_argument('--save', default=None, help="Write the results to this JSON file")
+    parser.add_argument('--baseline', default=None, help="Compare against results saved with --save")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed relative slowdown against the baseline")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="Skip peak memory measurement")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic network")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parseArgs(argv)
+    selected = [case for name, case in cases.CASES.items() if not args.filter or args.filter in name]
+    if args.list:
+        for case in selected:
+            print(case.name)
+        return 0
+    if not selected:
+        print("No cases match '%s'" %args.filter)
+        return 2
+
+    if args.scales:
+        scales = [float(s) for s in args.scales.split(',')]
+    else:
+        scales = QUICK_SCALES if args.quick else DEFAULT_SCALES
+    repeat = 1 if args.quick else max(1, args.repeat)
+
+    results = []
+    failures = 0
+    sizes = {}
+    for scale in scales:
+        start = time.perf_counter()
+        fixture = synthetic.buildFixture(_bank, scale, args.seed)
+        sizes[scale] = fixture.network.element_totals['links']
+        print("\nScale %s: %s (built in %.1fs)" %(scale, fixture.sizes(), time.perf_counter() - start))
+        print("  %-50s %10s %10s %10s" %("case", "best (s)", "median (s)", "peak mem"))
+        for case in selected:
+            result = {'case': case.name, 'scale': scale, 'links': sizes[scale]}
+            try:
+                times = timeCase(case, fixture, repeat)
+                result['times'] = times
+                result['best'] = min(times)
+                result['median'] = float(np.median(times))
+                result['peak_memory'] = measureMemory(case, fixture) if args.memory else None
+                print("  %-50s %10.4f %10.4f %10s" %(case.name, result['best'], result['median'],
+                                                    formatBytes(result['peak_memory'])))
+            except Exception as e:
+                failures += 1
+                result['best'] = None
+                result['error'] = traceback.format_exc()
+                print("  %-50s FAILED: %s" %(case.name, e))
+            results.append(result)
+
+    exponents = {}
+    if len(scales) > 1:
+        print("\nScaling exponents (time ~ links^b):")
+        for case in selected:
+            rows = [r for r in results if r['case'] == case.name and r.get('best') is not None]
+            b = fitExponent([r['links'] for r in rows], [r['best'] for r in rows])
+            exponents[case.name] = b
+            print("  %-50s %s" %(case.name, "-" if b is None else "%.2f" %b))
+
+    if args.save:
+        meta = {'python': platform.python_version(),
+                'platform': platform.platform(),
+                'numpy': np.__version__,
+                'seed': args.seed,
+                'repeat': repeat,
+                'created': time.strftime('%Y-%m-%d %H:%M:%S')}
+        with open(args.save, 'w') as writer:
+            json.dump({'meta': meta, 'results': results, 'exponents': exponents}, writer, indent=2)
+        print("\nSaved results to %s" %args.save)
+
+    exitCode = 2 if failures else 0
+    if args.baseline:
+        with open(args.baseline) as reader:
+            baseline = json.load(reader)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions (more than %d%% slower than baseline):" %(args.tolerance * 100))
+            for name, scale, old, new in regressions:
+                print("  %-50s scale %-6s %.4fs -> %.4fs" %(name, scale, old, new))
+            exitCode = exitCode or 1
+        else:
+            print("\nNo regressions against %s" %args.baseline)
+    return exitCode
+
+if __name__ == '__main__':
+    sys.exit(main())
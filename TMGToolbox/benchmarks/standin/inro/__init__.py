@@ -0,0 +1,4 @@
+'''
+Pure-Python stand-in for the subset of the Emme / Modeller API used by the
+TMG Toolbox benchmarks. See benchmarks/README.md.
+'''
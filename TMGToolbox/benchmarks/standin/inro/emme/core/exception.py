@@ -0,0 +1,21 @@
+'''
+Stand-in for inro.emme.core.exception
+'''
+
+class Error(Exception):
+    pass
+
+class ArgumentError(Error):
+    pass
+
+class CapacityError(Error):
+    pass
+
+class ExistenceError(Error):
+    pass
+
+class ModuleError(Error):
+    pass
+
+class ProtectionError(Error):
+    pass
@@ -0,0 +1,110 @@
+'''
+Stand-in for inro.emme.database.emmebank
+'''
+
+from collections import OrderedDict
+from .scenario import Scenario, ExtraAttribute
+from .matrix import Matrix, MATRIX_TYPES
+from ..core.exception import CapacityError, ExistenceError
+
+# Dimensions of a typical GTHA model emmebank
+DEFAULT_DIMENSIONS = {'scenarios': 100,
+                      'centroids': 5000,
+                      'regular_nodes': 150000,
+                      'links': 400000,
+                      'turn_entries': 100000,
+                      'transit_vehicles': 100,
+                      'transit_lines': 10000,
+                      'transit_segments': 500000,
+                      'extra_attribute_values': 100000000,
+                      'full_matrices': 999,
+                      'origin_matrices': 999,
+                      'destination_matrices': 999,
+                      'scalar_matrices': 999,
+                      'functions': 999,
+                      'operators': 5000,
+                      'sola_analyses': 240}
+
+class Emmebank(object):
+
+    def __init__(self, path="", dimensions=None, coord_unit_length=0.001):
+        self.path = path
+        self.title = "TMG benchmark emmebank"
+        self.coord_unit_length = coord_unit_length
+        self.unit_of_length = 'km'
+        self.dimensions = dict(DEFAULT_DIMENSIONS)
+        if dimensions:
+            self.dimensions.update(dimensions)
+        self._scenarios = OrderedDict()
+        self._matrices = OrderedDict()
+
+    #---SCENARIOS
+
+    def scenarios(self):
+        return list(self._scenarios.values())
+
+    def scenario(self, id):
+        return self._scenarios.get(int(id))
+
+    def create_scenario(self, id):
+        number = int(id)
+        if number in self._scenarios:
+            raise ExistenceError("Scenario %s already exists" %id)
+        if len(self._scenarios) >= self.dimensions['scenarios']:
+            raise CapacityError("Maximum number of scenarios reached")
+        scenario = Scenario(self, number)
+        self._scenarios[number] = scenario
+        return scenario
+
+    def copy_scenario(self, source_id, destination_id, copy_linkshapes=True,
+                      copy_strat_files=False, copy_path_files=False):
+        source = self.scenario(source_id)
+        if source is None:
+            raise ExistenceError("Scenario %s does not exist" %source_id)
+        copy = self.create_scenario(destination_id)
+        copy.title = source.title
+        copy._network = source._network._clone()
+        for id, attribute in source._extraAttributes.items():
+            copy._extraAttributes[id] = ExtraAttribute(copy, attribute.type, id, attribute.default_value)
+        return copy
+
+    def delete_scenario(self, id):
+        if self._scenarios.pop(int(id), None) is None:
+            raise ExistenceError("Scenario %s does not exist" %id)
+
+    #---MATRICES
+
+    def matrices(self):
+        return list(self._matrices.values())
+
+    def matrix(self, id):
+        return self._matrices.get(str(id))
+
+    def create_matrix(self, id, default_value=0.0):
+        id = str(id)
+        if id in self._matrices:
+            raise ExistenceError("Matrix %s already exists" %id)
+        matrix = Matrix(self, id, default_value)
+        self._matrices[id] = matrix
+        return matrix
+
+    def delete_matrix(self, id):
+        if self._matrices.pop(str(id), None) is None:
+            raise ExistenceError("Matrix %s does not exist" %id)
+
+    def available_matrix_identifier(self, matrix_type):
+        prefix = dict((type, prefix) for prefix, type in MATRIX_TYPES.items())[matrix_type]
+        limit = self.dimensions['%s_matrices' %matrix_type.lower()]
+        for number in range(1, limit + 1):
+            id = "%s%s" %(prefix, number)
+            if id not in self._matrices:
+                return id
+        raise CapacityError("No %s matrices available" %matrix_type.lower())
+
+    #---FUNCTIONS
+
+    def functions(self):
+        return []
+
+    def function(self, id):
+        return None
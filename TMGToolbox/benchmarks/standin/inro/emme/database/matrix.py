@@ -0,0 +1,70 @@
+'''
+Stand-in for inro.emme.database.matrix
+'''
+
+import numpy as _np
+from ..matrix import MatrixData
+from ..core.exception import ProtectionError
+
+MATRIX_TYPES = {'mf': 'FULL', 'mo': 'ORIGIN', 'md': 'DESTINATION', 'ms': 'SCALAR'}
+
+class Matrix(object):
+    '''
+    Matrix values are stored as a float32 NumPy array sized for the zone
+    system of the scenario they are read through.
+    '''
+
+    def __init__(self, emmebank, id, default_value=0.0):
+        self._emmebank = emmebank
+        self.id = id
+        self.prefix = id[:2]
+        self.number = int(id[2:])
+        self.type = MATRIX_TYPES[self.prefix]
+        self.name = ""
+        self.description = ""
+        self.read_only = False
+        self._default = default_value
+        self._values = None
+
+    def __str__(self):
+        return self.id
+
+    def _zones(self, scenario_id):
+        scenario = self._emmebank.scenario(scenario_id) if scenario_id is not None \
+            else self._emmebank.scenarios()[0]
+        return scenario.zone_numbers
+
+    def _shape(self, zones):
+        n = len(zones)
+        return {'FULL': (n, n), 'ORIGIN': (n,), 'DESTINATION': (n,), 'SCALAR': ()}[self.type]
+
+    def get_numpy_data(self, scenario_id=None):
+        shape = self._shape(self._zones(scenario_id))
+        if self._values is None or self._values.shape != shape:
+            self._values = _np.full(shape, self._default, dtype=_np.float32)
+        return self._values.copy()
+
+    def set_numpy_data(self, values, scenario_id=None):
+        if self.read_only:
+            raise ProtectionError("Matrix '%s' is read-only" %self.id)
+        shape = self._shape(self._zones(scenario_id))
+        values = _np.asarray(values, dtype=_np.float32)
+        if values.shape != shape:
+            raise ValueError("Array shape %s does not match matrix shape %s" %(values.shape, shape))
+        self._values = values.copy()
+
+    def get_data(self, scenario_id=None):
+        zones = self._zones(scenario_id)
+        nDims = len(self._shape(zones))
+        data = MatrixData([zones] * nDims, type='f')
+        data.from_numpy(self.get_numpy_data(scenario_id))
+        return data
+
+    def set_data(self, data, scenario_id=None):
+        self.set_numpy_data(data.to_numpy(), scenario_id)
+
+    def initialize(self, value=0.0):
+        if self.read_only:
+            raise ProtectionError("Matrix '%s' is read-only" %self.id)
+        self._default = value
+        self._values = None
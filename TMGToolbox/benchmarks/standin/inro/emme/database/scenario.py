@@ -0,0 +1,122 @@
+'''
+Stand-in for inro.emme.database.scenario
+'''
+
+from collections import OrderedDict
+from ..network import Network, STANDARD_ATTRIBUTES
+from ..core.exception import ExistenceError
+
+class ExtraAttribute(object):
+
+    def __init__(self, scenario, domain, id, default_value):
+        self._scenario = scenario
+        self.id = id
+        self.name = id
+        self.type = domain
+        self.default_value = default_value
+        self.description = ""
+
+    def __str__(self):
+        return self.id
+
+    def initialize(self, value=None):
+        if value is None:
+            value = self.default_value
+        network = self._scenario._network
+        for element in network._iterElements(self.type):
+            element.__dict__[self.id] = value
+
+class Scenario(object):
+    '''
+    A scenario owns a master Network. get_network returns a copy, and
+    publish_network replaces the master with a copy of the given network.
+    Attribute reads and writes go straight to the master network.
+    '''
+
+    def __init__(self, emmebank, number):
+        self._emmebank = emmebank
+        self.number = int(number)
+        self.id = str(number)
+        self.title = ""
+        self.modify_protected = False
+        self._network = Network()
+        self._extraAttributes = OrderedDict()
+
+    def __str__(self):
+        return self.id
+
+    @property
+    def emmebank(self):
+        return self._emmebank
+
+    @property
+    def zone_numbers(self):
+        return sorted(node.number for node in self._network._nodes.values() if node.is_centroid)
+
+    @property
+    def element_totals(self):
+        return self._network.element_totals
+
+    @property
+    def has_traffic_results(self):
+        return False
+
+    @property
+    def has_transit_results(self):
+        return False
+
+    #---NETWORK
+
+    def get_network(self):
+        return self._network._clone()
+
+    def get_partial_network(self, element_types, include_attributes=False):
+        '''
+        The stand-in always copies the full topology; element_types is ignored.
+        '''
+        return self._network._clone(include_attributes)
+
+    def publish_network(self, network, resolve_attributes=False):
+        copy = network._clone()
+        for domain, atts in copy._attributes.items():
+            standard = dict(STANDARD_ATTRIBUTES[domain])
+            for name in list(atts):
+                if name in standard: continue
+                if not name.startswith('@'):
+                    copy.delete_attribute(domain, name)
+                elif name not in self._extraAttributes:
+                    if not resolve_attributes:
+                        raise ExistenceError("Extra attribute '%s' does not exist in scenario %s" %(name, self.id))
+                    self._extraAttributes[name] = ExtraAttribute(self, domain, name, atts[name])
+        self._network = copy
+
+    def attributes(self, domain):
+        return self._network.attributes(domain)
+
+    def get_attribute_values(self, domain, attributes):
+        return self._network.get_attribute_values(domain, attributes)
+
+    def set_attribute_values(self, domain, attributes, data):
+        self._network.set_attribute_values(domain, attributes, data)
+
+    #---EXTRA ATTRIBUTES
+
+    def extra_attributes(self):
+        return list(self._extraAttributes.values())
+
+    def extra_attribute(self, id):
+        return self._extraAttributes.get(id)
+
+    def create_extra_attribute(self, domain, id, default_value=0.0):
+        if id in self._extraAttributes:
+            raise ExistenceError("Extra attribute '%s' already exists in scenario %s" %(id, self.id))
+        self._network.create_attribute(domain, id, default_value)
+        attribute = ExtraAttribute(self, domain, id, default_value)
+        self._extraAttributes[id] = attribute
+        return attribute
+
+    def delete_extra_attribute(self, id):
+        attribute = self._extraAttributes.pop(str(id), None)
+        if attribute is None:
+            raise ExistenceError("Extra attribute '%s' does not exist in scenario %s" %(id, self.id))
+        self._network.delete_attribute(attribute.type, attribute.id)
@@ -0,0 +1,116 @@
+'''
+Stand-in for inro.emme.matrix
+
+MatrixData holds its values either as a NumPy array or as Emme-style raw
+data (one array.array for 1D data, a list of array.array rows for 2D data),
+converting between the two on demand.
+'''
+
+import array as _array
+import numpy as _np
+
+MAGIC_NUMBER = 0xC4D4F1B2
+
+_TYPE_CODES = {'f': 1, 'd': 2, 'i': 3, 'I': 4}
+_DTYPES = {'f': _np.float32, 'd': _np.float64, 'i': _np.int32, 'I': _np.uint32}
+
+class MatrixData(object):
+
+    def __init__(self, indices, type='f'):
+        if type not in _TYPE_CODES:
+            raise ValueError("Unsupported matrix data type '%s'" %type)
+        self._indices = tuple(_array.array('i', index) for index in indices)
+        self._type = type
+        self._array = None
+        self._raw = None
+
+    @property
+    def indices(self):
+        return self._indices
+
+    @property
+    def type(self):
+        return self._type
+
+    @property
+    def num_dimensions(self):
+        return len(self._indices)
+
+    @property
+    def shape(self):
+        return tuple(len(index) for index in self._indices)
+
+    @property
+    def raw_data(self):
+        if self._raw is None:
+            values = self.to_numpy()
+            if self.num_dimensions == 1:
+                self._raw = _array.array(self._type, values.tobytes())
+            else:
+                self._raw = [_array.array(self._type, row.tobytes()) for row in values]
+            self._array = None
+        return self._raw
+
+    @raw_data.setter
+    def raw_data(self, data):
+        self._raw = data
+        self._array = None
+
+    def to_numpy(self):
+        if self._array is None:
+            dtype = _DTYPES[self._type]
+            if self._raw is None:
+                self._array = _np.zeros(self.shape, dtype=dtype)
+            elif self.num_dimensions == 1:
+                self._array = _np.frombuffer(self._raw, dtype=dtype).copy()
+            else:
+                self._array = _np.array([_np.frombuffer(row, dtype=dtype) for row in self._raw],
+                                        dtype=dtype).reshape(self.shape)
+            self._raw = None
+        return self._array
+
+    def from_numpy(self, values):
+        values = _np.asarray(values, dtype=_DTYPES[self._type])
+        if values.shape != self.shape:
+            raise ValueError("Array shape %s does not match matrix shape %s" %(values.shape, self.shape))
+        self._array = values.copy()
+        self._raw = None
+
+    def get(self, *keys):
+        positions = tuple(list(index).index(key) for index, key in zip(self._indices, keys))
+        return self.to_numpy()[positions]
+
+    def set(self, *args):
+        keys, value = args[:-1], args[-1]
+        positions = tuple(list(index).index(key) for index, key in zip(self._indices, keys))
+        self.to_numpy()[positions] = value
+
+    def save(self, filepath):
+        values = self.to_numpy()
+        with open(filepath, 'wb') as writer:
+            header = _array.array('I', [MAGIC_NUMBER, 1, _TYPE_CODES[self._type], self.num_dimensions])
+            header.extend(len(index) for index in self._indices)
+            header.tofile(writer)
+            for index in self._indices:
+                index.tofile(writer)
+            writer.write(values.tobytes())
+
+    @classmethod
+    def load(cls, filepath):
+        with open(filepath, 'rb') as reader:
+            header = _array.array('I')
+            header.fromfile(reader, 4)
+            magic, version, typeCode, nDims = header
+            if magic != MAGIC_NUMBER:
+                raise IOError("'%s' is not a binary matrix file" %filepath)
+            shape = _array.array('I')
+            shape.fromfile(reader, nDims)
+            indices = []
+            for size in shape:
+                index = _array.array('i')
+                index.fromfile(reader, size)
+                indices.append(index)
+            type = dict((code, char) for char, code in _TYPE_CODES.items())[typeCode]
+            data = cls(indices, type)
+            data._array = _np.fromfile(reader, dtype=_DTYPES[type]).reshape(data.shape)
+        return data
@@ -0,0 +1,703 @@
+'''
+Stand-in for inro.emme.network
+
+Implements the parts of the Emme Network object model (modes, transit
+vehicles, nodes, links, turns, transit lines and segments) which are used by
+the TMG Toolbox, in plain Python. It is only meant for running and timing
+toolbox code off an Emme workstation: behaviour follows the Emme API where
+the toolbox depends on it, and is simplified everywhere else.
+
+Attribute values are stored directly in each element's __dict__, so that
+reading an attribute costs about the same as reading a normal Python
+attribute. Setting an attribute which has not been defined for the domain
+raises an AttributeError, as it does in Emme.
+'''
+
+from collections import OrderedDict
+from .core.exception import ArgumentError, ExistenceError
+
+DOMAINS = ['MODE', 'TRANSIT_VEHICLE', 'NODE', 'LINK', 'TURN', 'TRANSIT_LINE', 'TRANSIT_SEGMENT']
+
+STANDARD_ATTRIBUTES = {
+    'MODE': [('description', ''), ('speed', 0.0)],
+    'TRANSIT_VEHICLE': [('description', ''), ('total_capacity', 0), ('seated_capacity', 0),
+                        ('auto_equivalent', 0.0)],
+    'NODE': [('x', 0.0), ('y', 0.0), ('data1', 0.0), ('data2', 0.0), ('data3', 0.0), ('label', ''),
+             ('initial_boardings', 0.0), ('final_alightings', 0.0)],
+    'LINK': [('length', 0.0), ('type', 1), ('num_lanes', 1.0), ('volume_delay_func', 1),
+             ('data1', 0.0), ('data2', 0.0), ('data3', 0.0), ('vertices', None),
+             ('auto_volume', 0.0), ('auto_time', 0.0), ('additional_volume', 0.0),
+             ('aux_transit_volume', 0.0)],
+    'TURN': [('penalty_func', 1), ('data1', 0.0), ('data2', 0.0), ('data3', 0.0),
+             ('auto_volume', 0.0), ('auto_time', 0.0)],
+    'TRANSIT_LINE': [('description', ''), ('layover_time', 0.0), ('speed', 0.0), ('headway', 0.0),
+                     ('data1', 0.0), ('data2', 0.0), ('data3', 0.0)],
+    'TRANSIT_SEGMENT': [('allow_boardings', True), ('allow_alightings', True), ('dwell_time', 0.01),
+                        ('factor_dwell_time_by_length', False), ('transit_time_func', 1),
+                        ('data1', 0.0), ('data2', 0.0), ('data3', 0.0), ('transit_time', 0.0),
+                        ('transit_volume', 0.0), ('transit_boardings', 0.0)]
+}
+
+MODE_TYPES = set(['AUTO', 'TRANSIT', 'AUX_TRANSIT', 'AUX_AUTO'])
+
+#===========================================================================================
+
+class _Element(object):
+    '''
+    Base class for network elements. Attribute values live in __dict__ next to
+    a few read-only topology fields (e.g. i_node); internal fields start with '_'.
+    '''
+
+    _domain = None
+
+    def __init__(self, network):
+        d = self.__dict__
+        d['_network'] = network
+        d['_atts'] = network._attributes[self._domain]
+        d.update(d['_atts'])
+
+    def __setattr__(self, name, value):
+        if name in self._atts:
+            self.__dict__[name] = value
+        elif name.startswith('_') or hasattr(type(self), name):
+            object.__setattr__(self, name, value)
+        else:
+            raise AttributeError("'%s' is not a %s attribute" %(name, self._domain))
+
+    def __getitem__(self, name):
+        if name not in self._atts:
+            raise KeyError("'%s' is not a %s attribute" %(name, self._domain))
+        return self.__dict__[name]
+
+    def __setitem__(self, name, value):
+        if name not in self._atts:
+            raise KeyError("'%s' is not a %s attribute" %(name, self._domain))
+        self.__dict__[name] = value
+
+    @property
+    def network(self):
+        return self._network
+
+    def __str__(self):
+        return str(self.id)
+
+    def __repr__(self):
+        return "%s(%s)" %(type(self).__name__, self)
+
+class Mode(_Element):
+    _domain = 'MODE'
+
+    def __init__(self, network, type, id):
+        _Element.__init__(self, network)
+        d = self.__dict__
+        d['id'] = id
+        d['type'] = type
+
+class TransitVehicle(_Element):
+    _domain = 'TRANSIT_VEHICLE'
+
+    def __init__(self, network, number, mode):
+        _Element.__init__(self, network)
+        d = self.__dict__
+        d['number'] = number
+        d['id'] = str(number)
+        d['_mode'] = mode
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @mode.setter
+    def mode(self, mode):
+        self.__dict__['_mode'] = self._network._getMode(mode)
+
+class Node(_Element):
+    _domain = 'NODE'
+
+    def __init__(self, network, number, is_centroid):
+        _Element.__init__(self, network)
+        d = self.__dict__
+        d['number'] = number
+        d['id'] = str(number)
+        d['is_centroid'] = bool(is_centroid)
+        d['is_intersection'] = False
+        d['_outgoing'] = OrderedDict()
+        d['_incoming'] = OrderedDict()
+        d['_hiddenSegments'] = []
+
+    def outgoing_links(self):
+        return iter(list(self._outgoing.values()))
+
+    def incoming_links(self):
+        return iter(list(self._incoming.values()))
+
+    def outgoing_segments(self, include_hidden=False):
+        segments = [segment for link in self._outgoing.values() for segment in link._segments]
+        if include_hidden:
+            segments += self._hiddenSegments
+        return iter(segments)
+
+    def incoming_segments(self):
+        return iter([segment for link in self._incoming.values() for segment in link._segments])
+
+class Link(_Element):
+    _domain = 'LINK'
+
+    def __init__(self, network, iNode, jNode, modes):
+        _Element.__init__(self, network)
+        d = self.__dict__
+        d['i_node'] = iNode
+        d['j_node'] = jNode
+        d['vertices'] = []
+        d['_modes'] = frozenset(modes)
+        d['_segments'] = []
+
+    @property
+    def id(self):
+        return "%s-%s" %(self.i_node.number, self.j_node.number)
+
+    @property
+    def modes(self):
+        return self._modes
+
+    @modes.setter
+    def modes(self, modes):
+        self.__dict__['_modes'] = frozenset(self._network._getModes(modes))
+
+    @property
+    def reverse_link(self):
+        return self.j_node._outgoing.get(self.i_node.number)
+
+    @property
+    def shape(self):
+        i = self.i_node
+        j = self.j_node
+        return [(i.x, i.y)] + list(self.vertices) + [(j.x, j.y)]
+
+    def segments(self):
+        return iter(list(self._segments))
+
+    def incoming_turns(self):
+        iNode = self.i_node
+        if not iNode.is_intersection:
+            return iter([])
+        turns = self._network._turns
+        j = iNode.number
+        k = self.j_node.number
+        return iter([turns[(i, j, k)] for i in iNode._incoming])
+
+    def outgoing_turns(self):
+        jNode = self.j_node
+        if not jNode.is_intersection:
+            return iter([])
+        turns = self._network._turns
+        i = self.i_node.number
+        j = jNode.number
+        return iter([turns[(i, j, k)] for k in jNode._outgoing])
+
+class Turn(_Element):
+    _domain = 'TURN'
+
+    def __init__(self, network, fromLink, toLink):
+        _Element.__init__(self, network)
+        d = self.__dict__
+        d['from_link'] = fromLink
+        d['to_link'] = toLink
+        d['i_node'] = fromLink.i_node
+        d['j_node'] = fromLink.j_node
+        d['k_node'] = toLink.j_node
+
+    @property
+    def id(self):
+        return "%s-%s-%s" %(self.i_node.number, self.j_node.number, self.k_node.number)
+
+class TransitLine(_Element):
+    _domain = 'TRANSIT_LINE'
+
+    def __init__(self, network, id, vehicle):
+        _Element.__init__(self, network)
+        d = self.__dict__
+        d['id'] = id
+        d['_vehicle'] = vehicle
+        d['_segments'] = []
+
+    @property
+    def vehicle(self):
+        return self._vehicle
+
+    @vehicle.setter
+    def vehicle(self, vehicle):
+        self.__dict__['_vehicle'] = self._network._getVehicle(vehicle)
+
+    @property
+    def mode(self):
+        return self._vehicle.mode
+
+    def segments(self, include_hidden=False):
+        if include_hidden:
+            return iter(list(self._segments))
+        return iter(self._segments[:-1])
+
+    def segment(self, number):
+        return self._segments[number]
+
+    def itinerary(self):
+        return iter([segment.i_node for segment in self._segments])
+
+class TransitSegment(_Element):
+    _domain = 'TRANSIT_SEGMENT'
+
+    def __init__(self, network, line, number, iNode, link):
+        _Element.__init__(self, network)
+        d = self.__dict__
+        d['line'] = line
+        d['number'] = number
+        d['i_node'] = iNode
+        d['link'] = link
+        d['j_node'] = link.j_node if link is not None else None
+
+    @property
+    def id(self):
+        return "%s-%s" %(self.line.id, self.number)
+
+    def prev_segment(self, include_hidden=True):
+        if self.number == 0:
+            return None
+        return self.line._segments[self.number - 1]
+
+    def next_segment(self, include_hidden=False):
+        segments = self.line._segments
+        last = len(segments) - 1 if include_hidden else len(segments) - 2
+        if self.number >= last:
+            return None
+        return segments[self.number + 1]
+
+#===========================================================================================
+
+class Network(object):
+    '''
+    In-memory network. Element ids follow Emme: nodes are looked up by number
+    (int or str), links by (i, j), turns by (i, j, k), lines by their id.
+    '''
+
+    def __init__(self):
+        self._attributes = dict((domain, OrderedDict(STANDARD_ATTRIBUTES[domain])) for domain in DOMAINS)
+        self._modes = OrderedDict()
+        self._vehicles = OrderedDict()
+        self._nodes = OrderedDict()
+        self._links = OrderedDict()
+        self._turns = OrderedDict()
+        self._lines = OrderedDict()
+
+    #---
+    #---ATTRIBUTES
+
+    def attributes(self, domain):
+        return list(self._attributes[domain].keys())
+
+    def create_attribute(self, domain, name, default_value=0.0):
+        atts = self._attributes[domain]
+        if name in atts:
+            raise ExistenceError("Attribute '%s' already exists for %s" %(name, domain))
+        atts[name] = default_value
+        for element in self._iterElements(domain):
+            element.__dict__[name] = default_value
+
+    def delete_attribute(self, domain, name):
+        atts = self._attributes[domain]
+        if name not in atts:
+            raise ExistenceError("Attribute '%s' does not exist for %s" %(name, domain))
+        if name in dict(STANDARD_ATTRIBUTES[domain]):
+            raise ArgumentError("Cannot delete standard attribute '%s'" %name)
+        del atts[name]
+        for element in self._iterElements(domain):
+            element.__dict__.pop(name, None)
+
+    def copy_attribute(self, domain, source, destination):
+        atts = self._attributes[domain]
+        if source not in atts:
+            raise ExistenceError("Attribute '%s' does not exist for %s" %(source, domain))
+        if destination not in atts:
+            self.create_attribute(domain, destination, atts[source])
+        for element in self._iterElements(domain):
+            d = element.__dict__
+            d[destination] = d[source]
+
+    def _checkAttributes(self, domain, attributes):
+        atts = self._attributes[domain]
+        for name in attributes:
+            if name not in atts:
+                raise ExistenceError("Attribute '%s' does not exist for %s" %(name, domain))
+
+    def _iterElements(self, domain):
+        if domain == 'MODE': return self._modes.values()
+        if domain == 'TRANSIT_VEHICLE': return self._vehicles.values()
+        if domain == 'NODE': return self._nodes.values()
+        if domain == 'LINK': return self._links.values()
+        if domain == 'TURN': return self._turns.values()
+        if domain == 'TRANSIT_LINE': return self._lines.values()
+        if domain == 'TRANSIT_SEGMENT':
+            return [segment for line in self._lines.values() for segment in line._segments]
+        raise ArgumentError("Unknown domain '%s'" %domain)
+
+    def _iterKeyedElements(self, domain):
+        '''
+        Yields (element, keys), where keys is the path into the index
+        object returned by get_attribute_values. Hidden segments are skipped.
+        '''
+        if domain == 'LINK':
+            for (i, j), link in self._links.items():
+                yield link, (i, j)
+        elif domain == 'TURN':
+            for (i, j, k), turn in self._turns.items():
+                yield turn, ((i, j), k)
+        elif domain == 'TRANSIT_SEGMENT':
+            for lineId, line in self._lines.items():
+                loops = {}
+                for segment in line._segments[:-1]:
+                    pair = (segment.i_node.number, segment.j_node.number)
+                    loop = loops.get(pair, 0) + 1
+                    loops[pair] = loop
+                    yield segment, (lineId, pair + (loop,))
+        elif domain == 'NODE':
+            for number, node in self._nodes.items():
+                yield node, (number,)
+        elif domain == 'TRANSIT_VEHICLE':
+            for number, vehicle in self._vehicles.items():
+                yield vehicle, (number,)
+        else:
+            for key, element in (self._modes if domain == 'MODE' else self._lines).items():
+                yield element, (key,)
+
+    def get_attribute_values(self, domain, attributes):
+        '''
+        Returns [indices, values1, values2, ...], where indices maps element keys
+        to positions in the value lists:
+            - NODE: {node: pos}
+            - LINK: {i: {j: pos}}
+            - TURN: {(i, j): {k: pos}}
+            - TRANSIT_LINE: {line: pos}
+            - TRANSIT_SEGMENT: {line: {(i, j, loop): pos}}
+            - MODE / TRANSIT_VEHICLE: {id: pos}
+        '''
+        self._checkAttributes(domain, attributes)
+        indices = {}
+        elements = []
+        for pos, (element, keys) in enumerate(self._iterKeyedElements(domain)):
+            index = indices
+            for key in keys[:-1]:
+                if key not in index:
+                    index[key] = {}
+                index = index[key]
+            index[keys[-1]] = pos
+            elements.append(element)
+        retval = [indices]
+        for name in attributes:
+            retval.append([element.__dict__[name] for element in elements])
+        return retval
+
+    def set_attribute_values(self, domain, attributes, data):
+        '''
+        Sets attribute values from data formatted as returned by get_attribute_values.
+        Elements which do not appear in the index are left unchanged.
+        '''
+        self._checkAttributes(domain, attributes)
+        indices = data[0]
+        tables = [table.tolist() if hasattr(table, 'tolist') else table for table in data[1:]]
+        if len(tables) != len(attributes):
+            raise ArgumentError("Expected %s value tables, got %s" %(len(attributes), len(tables)))
+        columns = list(zip(attributes, tables))
+        for element, keys in self._iterKeyedElements(domain):
+            index = indices
+            for key in keys:
+                index = index.get(key)
+                if index is None: break
+            if index is None: continue
+            d = element.__dict__
+            for name, table in columns:
+                d[name] = table[index]
+
+    @property
+    def element_totals(self):
+        nCentroids = sum(1 for node in self._nodes.values() if node.is_centroid)
+        return {'centroids': nCentroids,
+                'regular_nodes': len(self._nodes) - nCentroids,
+                'links': len(self._links),
+                'turns': len(self._turns),
+                'transit_lines': len(self._lines),
+                'transit_segments': sum(len(line._segments) for line in self._lines.values())}
+
+    #---
+    #---MODES & VEHICLES
+
+    def modes(self):
+        return iter(list(self._modes.values()))
+
+    def mode(self, id):
+        return self._modes.get(str(id))
+
+    def create_mode(self, type, id):
+        id = str(id)
+        if type not in MODE_TYPES:
+            raise ArgumentError("Unknown mode type '%s'" %type)
+        if id in self._modes:
+            raise ExistenceError("Mode '%s' already exists" %id)
+        mode = Mode(self, type, id)
+        self._modes[id] = mode
+        return mode
+
+    def _getMode(self, mode):
+        if isinstance(mode, Mode):
+            mode = mode.id
+        retval = self._modes.get(str(mode))
+        if retval is None:
+            raise ExistenceError("Mode '%s' does not exist" %mode)
+        return retval
+
+    def _getModes(self, modes):
+        return [self._getMode(mode) for mode in modes]
+
+    def transit_vehicles(self):
+        return iter(list(self._vehicles.values()))
+
+    def transit_vehicle(self, id):
+        return self._vehicles.get(int(id))
+
+    def create_transit_vehicle(self, id, mode_id):
+        number = int(id)
+        if number in self._vehicles:
+            raise ExistenceError("Transit vehicle '%s' already exists" %id)
+        mode = self._getMode(mode_id)
+        if mode.type != 'TRANSIT':
+            raise ArgumentError("Mode '%s' is not a transit mode" %mode.id)
+        vehicle = TransitVehicle(self, number, mode)
+        self._vehicles[number] = vehicle
+        return vehicle
+
+    def _getVehicle(self, vehicle):
+        if isinstance(vehicle, TransitVehicle):
+            vehicle = vehicle.number
+        retval = self._vehicles.get(int(vehicle))
+        if retval is None:
+            raise ExistenceError("Transit vehicle '%s' does not exist" %vehicle)
+        return retval
+
+    #---
+    #---NODES
+
+    def nodes(self):
+        return iter(list(self._nodes.values()))
+
+    def centroids(self):
+        return iter([node for node in self._nodes.values() if node.is_centroid])
+
+    def regular_nodes(self):
+        return iter([node for node in self._nodes.values() if not node.is_centroid])
+
+    def node(self, id):
+        return self._nodes.get(int(id))
+
+    def create_node(self, id, is_centroid):
+        number = int(id)
+        if number in self._nodes:
+            raise ExistenceError("Node %s already exists" %id)
+        node = Node(self, number, is_centroid)
+        self._nodes[number] = node
+        return node
+
+    def delete_node(self, id, cascade=False):
+        node = self._getNode(id)
+        links = list(node._outgoing.values()) + list(node._incoming.values())
+        if links and not cascade:
+            raise ArgumentError("Node %s has incident links" %id)
+        for link in links:
+            if (link.i_node.number, link.j_node.number) in self._links:
+                self.delete_link(link.i_node.number, link.j_node.number, cascade=True)
+        for line in set(segment.line for segment in node._hiddenSegments):
+            self.delete_transit_line(line.id)
+        del self._nodes[node.number]
+
+    def _getNode(self, id):
+        if isinstance(id, Node):
+            id = id.number
+        node = self._nodes.get(int(id))
+        if node is None:
+            raise ExistenceError("Node %s does not exist" %id)
+        return node
+
+    #---
+    #---LINKS & TURNS
+
+    def links(self):
+        return iter(list(self._links.values()))
+
+    def link(self, i_node_id, j_node_id):
+        return self._links.get((int(i_node_id), int(j_node_id)))
+
+    def create_link(self, i_node_id, j_node_id, modes):
+        iNode = self._getNode(i_node_id)
+        jNode = self._getNode(j_node_id)
+        if iNode is jNode:
+            raise ArgumentError("Cannot create a loop link at node %s" %iNode)
+        key = (iNode.number, jNode.number)
+        if key in self._links:
+            raise ExistenceError("Link %s-%s already exists" %key)
+        link = Link(self, iNode, jNode, self._getModes(modes))
+        self._links[key] = link
+        iNode._outgoing[jNode.number] = link
+        jNode._incoming[iNode.number] = link
+        if iNode.is_intersection:
+            for fromLink in iNode._incoming.values():
+                self._addTurn(fromLink, link)
+        if jNode.is_intersection:
+            for toLink in jNode._outgoing.values():
+                self._addTurn(link, toLink)
+        return link
+
+    def delete_link(self, i_node_id, j_node_id, cascade=False):
+        key = (int(i_node_id), int(j_node_id))
+        link = self._links.get(key)
+        if link is None:
+            raise ExistenceError("Link %s-%s does not exist" %key)
+        if link._segments:
+            if not cascade:
+                raise ArgumentError("Link %s-%s is used by transit lines" %key)
+            for line in set(segment.line for segment in link._segments):
+                self.delete_transit_line(line.id)
+        for turnKey in [turnKey for turnKey, turn in self._turns.items()
+                        if turn.from_link is link or turn.to_link is link]:
+            del self._turns[turnKey]
+        del self._links[key]
+        del link.i_node._outgoing[key[1]]
+        del link.j_node._incoming[key[0]]
+
+    def _addTurn(self, fromLink, toLink):
+        turn = Turn(self, fromLink, toLink)
+        self._turns[(fromLink.i_node.number, fromLink.j_node.number, toLink.j_node.number)] = turn
+        return turn
+
+    def intersections(self):
+        return iter([node for node in self._nodes.values() if node.is_intersection])
+
+    def create_intersection(self, id):
+        node = self._getNode(id)
+        if node.is_intersection:
+            raise ExistenceError("Node %s is already an intersection" %id)
+        node.__dict__['is_intersection'] = True
+        for fromLink in node._incoming.values():
+            for toLink in node._outgoing.values():
+                self._addTurn(fromLink, toLink)
+        return node
+
+    def delete_intersection(self, id):
+        node = self._getNode(id)
+        if not node.is_intersection:
+            raise ExistenceError("Node %s is not an intersection" %id)
+        node.__dict__['is_intersection'] = False
+        j = node.number
+        for turnKey in [turnKey for turnKey in self._turns if turnKey[1] == j]:
+            del self._turns[turnKey]
+
+    def turns(self):
+        return iter(list(self._turns.values()))
+
+    def turn(self, i_node_id, j_node_id, k_node_id):
+        return self._turns.get((int(i_node_id), int(j_node_id), int(k_node_id)))
+
+    #---
+    #---TRANSIT LINES
+
+    def transit_lines(self):
+        return iter(list(self._lines.values()))
+
+    def transit_line(self, id):
+        return self._lines.get(str(id))
+
+    def transit_segments(self, include_hidden=False):
+        for line in list(self._lines.values()):
+            for segment in line.segments(include_hidden):
+                yield segment
+
+    def create_transit_line(self, id, vehicle_id, itinerary):
+        id = str(id)
+        if id in self._lines:
+            raise ExistenceError("Transit line '%s' already exists" %id)
+        vehicle = self._getVehicle(vehicle_id)
+        nodes = [self._getNode(node) for node in itinerary]
+        if len(nodes) < 2:
+            raise ArgumentError("Itinerary of transit line '%s' needs at least two nodes" %id)
+
+        links = []
+        for iNode, jNode in zip(nodes[:-1], nodes[1:]):
+            link = self._links.get((iNode.number, jNode.number))
+            if link is None:
+                raise ExistenceError("Link %s-%s in itinerary of line '%s' does not exist" %(iNode, jNode, id))
+            if vehicle.mode not in link._modes:
+                raise ArgumentError("Link %s does not allow mode '%s' of line '%s'" %(link, vehicle.mode.id, id))
+            links.append(link)
+
+        line = TransitLine(self, id, vehicle)
+        segments = line._segments
+        for number, link in enumerate(links):
+            segment = TransitSegment(self, line, number, link.i_node, link)
+            segments.append(segment)
+            link._segments.append(segment)
+        hidden = TransitSegment(self, line, len(links), nodes[-1], None)
+        segments.append(hidden)
+        nodes[-1]._hiddenSegments.append(hidden)
+        self._lines[id] = line
+        return line
+
+    def delete_transit_line(self, id):
+        line = self._lines.pop(str(id), None)
+        if line is None:
+            raise ExistenceError("Transit line '%s' does not exist" %id)
+        for segment in line._segments[:-1]:
+            segment.link._segments.remove(segment)
+        hidden = line._segments[-1]
+        hidden.i_node._hiddenSegments.remove(hidden)
+
+    #---
+    #---COPYING
+
+    def _clone(self, include_attributes=True):
+        '''
+        Copies the network. If include_attributes is False, elements of the
+        copy get default attribute values (this is how partial networks are
+        served without attributes).
+        '''
+        other = Network()
+        for domain in DOMAINS:
+            other._attributes[domain].clear()
+            other._attributes[domain].update(self._attributes[domain])
+
+        def copyValues(source, target, domain):
+            if not include_attributes: return
+            td = target.__dict__
+            sd = source.__dict__
+            for name in self._attributes[domain]:
+                td[name] = sd[name]
+
+        for mode in self._modes.values():
+            copyValues(mode, other.create_mode(mode.type, mode.id), 'MODE')
+        for vehicle in self._vehicles.values():
+            copyValues(vehicle, other.create_transit_vehicle(vehicle.number, vehicle.mode.id), 'TRANSIT_VEHICLE')
+        for node in self._nodes.values():
+            copyValues(node, other.create_node(node.number, node.is_centroid), 'NODE')
+        for link in self._links.values():
+            newLink = other.create_link(link.i_node.number, link.j_node.number, [mode.id for mode in link._modes])
+            copyValues(link, newLink, 'LINK')
+            if include_attributes:
+                newLink.__dict__['vertices'] = list(link.vertices)
+        for node in self._nodes.values():
+            if node.is_intersection:
+                other.create_intersection(node.number)
+        for key, turn in self._turns.items():
+            copyValues(turn, other._turns[key], 'TURN')
+        for line in self._lines.values():
+            itinerary = [segment.i_node.number for segment in line._segments]
+            newLine = other.create_transit_line(line.id, line.vehicle.number, itinerary)
+            copyValues(line, newLine, 'TRANSIT_LINE')
+            for segment, newSegment in zip(line._segments, newLine._segments):
+                copyValues(segment, newSegment, 'TRANSIT_SEGMENT')
+        return other
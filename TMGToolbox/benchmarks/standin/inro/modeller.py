@@ -0,0 +1,255 @@
+'''
+Stand-in for inro.modeller
+
+Modeller().module('tmg.x.y') loads src/x/y.py from the toolbox source folder
+(or TMG_TOOLBOX_SRC), the way the Modeller toolbox namespace does. Modules and
+tools from other namespaces (e.g. the inro.emme.* tools) are replaced with
+placeholders which raise NotImplementedError when they are used, so that
+toolbox modules can be imported and their pure-Python parts run.
+
+The emmebank must be installed (see install()) before toolbox modules are
+loaded, as many of them read Modeller().emmebank at import time.
+'''
+
+import contextlib
+import importlib.util
+import os
+import sys
+import tempfile
+import types
+from .emme.database.emmebank import Emmebank
+
+TOOLBOX_NAMESPACE = 'tmg'
+
+SRC_FOLDER = os.environ.get('TMG_TOOLBOX_SRC',
+                            os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                          '..', '..', '..', 'src')))
+
+InstanceType = object
+TupleType = object
+ListType = list
+
+#===========================================================================================
+#---LOGBOOK
+
+class _Logbook(object):
+    '''
+    Counts logbook calls. Entries are only kept when 'enabled' is set, so
+    that logbook traffic does not distort memory measurements.
+    '''
+
+    def __init__(self):
+        self.enabled = False
+        self.entries = []
+        self.writes = 0
+        self.traces = 0
+        self._depth = 0
+
+    def reset(self):
+        self.entries = []
+        self.writes = 0
+        self.traces = 0
+
+LOGBOOK = _Logbook()
+
+def logbook_write(name, value=None, attributes=None, *args, **kwargs):
+    LOGBOOK.writes += 1
+    if LOGBOOK.enabled:
+        LOGBOOK.entries.append((LOGBOOK._depth, name))
+
+@contextlib.contextmanager
+def logbook_trace(name, value=None, attributes=None, save_arguments=False, *args, **kwargs):
+    LOGBOOK.traces += 1
+    if LOGBOOK.enabled:
+        LOGBOOK.entries.append((LOGBOOK._depth, name))
+    LOGBOOK._depth += 1
+    try:
+        yield
+    finally:
+        LOGBOOK._depth -= 1
+
+#===========================================================================================
+#---TOOLS & PAGES
+
+class _ToolBase(object):
+    __MODELLER_NAMESPACE__ = TOOLBOX_NAMESPACE
+
+    def __str__(self):
+        return self.__MODELLER_NAMESPACE__
+
+def Tool():
+    return _ToolBase
+
+def Attribute(type, *args, **kwargs):
+    return None
+
+def method(return_type=None, argument_types=None):
+    def decorator(function):
+        return function
+    return decorator
+
+class PageBuilder(object):
+
+    @staticmethod
+    def format_exception(exception, traceback=None, *args, **kwargs):
+        return "Error: %s" %exception
+
+    @staticmethod
+    def format_info(text, *args, **kwargs):
+        return text
+
+class _NullContext(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def table_cell(self, *args, **kwargs):
+        return _NullContext()
+
+    def new_row(self, *args, **kwargs):
+        pass
+
+class ToolPageBuilder(PageBuilder):
+    '''
+    Accepts every page-building call and renders an empty page.
+    '''
+
+    tool_proxy_tag = ""
+
+    def __init__(self, tool, runnable=True, title="", description="", branding_text="", help_path=None,
+                 footer_help_links=None, **kwargs):
+        self.tool = tool
+        self.runnable = runnable
+        self.title = title
+        self.description = description
+        self.branding_text = branding_text
+
+    def _ignore(self, *args, **kwargs):
+        return _NullContext()
+
+    add_html = add_text_element = add_text_box = add_checkbox = add_checkbox_group = _ignore
+    add_select = add_select_file = add_select_scenario = add_select_matrix = _ignore
+    add_select_attribute = add_select_extra_attribute = add_select_mode = add_select_tool = _ignore
+    add_select_function = add_select_node = add_select_link = add_select_transit_line = _ignore
+    add_select_new_matrix = add_select_output_matrix = add_select_attribute_or_value = _ignore
+    add_radio_group = add_header = add_table = tool_run_status = _ignore
+
+    def render(self):
+        return ""
+
+#===========================================================================================
+#---MODELLER
+
+class _UnavailableModule(types.ModuleType):
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        raise NotImplementedError("'%s.%s' is not available outside of Emme" %(self.__name__, name))
+
+class _UnavailableTool(object):
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def __call__(self, *args, **kwargs):
+        raise NotImplementedError("Tool '%s' is not available outside of Emme" %self.namespace)
+
+class _Project(object):
+
+    def __init__(self):
+        self.path = os.environ.get('TMG_BENCHMARK_PROJECT',
+                                   os.path.join(tempfile.gettempdir(), 'tmg_benchmark_project'))
+        self.spatial_reference_file = ""
+        self.arcgis_spatial_reference_file = ""
+
+class _Desktop(object):
+
+    version = "Emme 4.4.2 64-bit"
+    version_info = (4, 4, 2, 0)
+
+    def __init__(self):
+        self.project = _Project()
+
+    def project_file_name(self):
+        return os.path.join(self.project.path, 'benchmark.emp')
+
+    def refresh_needed(self, flag=True):
+        pass
+
+class _ModellerState(object):
+    emmebank = None
+    scenario = None
+    desktop = _Desktop()
+    placeholders = {}
+
+def install(emmebank=None, scenario=None):
+    '''
+    Sets the emmebank (and optionally the primary scenario) returned by Modeller().
+    Returns the emmebank.
+    '''
+    _ModellerState.emmebank = emmebank if emmebank is not None else Emmebank()
+    _ModellerState.scenario = scenario
+    return _ModellerState.emmebank
+
+class Modeller(object):
+
+    def __init__(self, *args, **kwargs):
+        if _ModellerState.emmebank is None:
+            install()
+
+    @property
+    def emmebank(self):
+        return _ModellerState.emmebank
+
+    @property
+    def scenario(self):
+        if _ModellerState.scenario is not None:
+            return _ModellerState.scenario
+        scenarios = _ModellerState.emmebank.scenarios()
+        return scenarios[0] if scenarios else None
+
+    @scenario.setter
+    def scenario(self, scenario):
+        _ModellerState.scenario = scenario
+
+    @property
+    def desktop(self):
+        return _ModellerState.desktop
+
+    def module(self, namespace):
+        if namespace in sys.modules:
+            return sys.modules[namespace]
+        if not namespace.startswith(TOOLBOX_NAMESPACE + '.'):
+            if namespace not in _ModellerState.placeholders:
+                _ModellerState.placeholders[namespace] = _UnavailableModule(namespace)
+            return _ModellerState.placeholders[namespace]
+
+        path = os.path.join(SRC_FOLDER, *namespace.split('.')[1:]) + '.py'
+        if not os.path.exists(path):
+            raise ImportError("No toolbox module '%s' (looked for %s)" %(namespace, path))
+        spec = importlib.util.spec_from_file_location(namespace, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[namespace] = module
+        try:
+            spec.loader.exec_module(module)
+        except:
+            del sys.modules[namespace]
+            raise
+        return module
+
+    def tool(self, namespace):
+        if not namespace.startswith(TOOLBOX_NAMESPACE + '.'):
+            return _UnavailableTool(namespace)
+        module = self.module(namespace)
+        classes = [obj for obj in vars(module).values()
+                   if isinstance(obj, type) and issubclass(obj, _ToolBase) and obj is not _ToolBase
+                   and obj.__module__ == namespace and obj.__name__ != 'Face']
+        if not classes:
+            raise ImportError("Module '%s' does not define a tool" %namespace)
+        tool = classes[0]()
+        tool.__MODELLER_NAMESPACE__ = namespace
+        return tool
@@ -0,0 +1,334 @@
+'''
+Synthetic GTHA-scale networks and matrices for the benchmarks.
+
+At scale 1.0 the generated network is roughly the size of the GTHA model
+network: ~16,000 regular nodes on a jittered grid (plus degree-2 shape
+nodes), ~70,000 directional links, 2,500 zones with centroid connectors,
+600 transit lines with ~40,000 segments and a 2,500 x 2,500 demand matrix.
+Smaller scales shrink every dimension proportionally, so the benchmarks can
+report how each hot path scales with network size.
+
+Everything is drawn from a seeded NumPy RandomState, so a given (scale, seed)
+always produces the same network.
+'''
+
+import math
+import os
+import tempfile
+import numpy as np
+from inro.emme.network import Network
+
+# Dimensions at scale 1.0
+GTHA_GRID_SIZE = 125
+GTHA_ZONES = 2500
+GTHA_TRANSIT_LINES = 600
+
+GRID_SPACING = 400.0 # metres
+ORIGIN_X = 580000.0
+ORIGIN_Y = 4810000.0
+COORD_UNIT_LENGTH = 0.001 # coordinates in metres, lengths in km
+
+FIRST_REGULAR_NODE = 10000
+FIRST_SHAPE_NODE = 500000
+
+SHAPE_NODE_FRACTION = 0.04
+VERTEX_FRACTION = 0.25
+INTERSECTION_FRACTION = 0.03
+PROHIBITED_TURN_FRACTION = 0.1
+
+# Vehicle number : (mode, total capacity)
+VEHICLES = {1: ('b', 70), 2: ('s', 130)}
+
+#===========================================================================================
+
+def _distance(x0, y0, x1, y1):
+    return math.sqrt((x1 - x0) * (x1 - x0) + (y1 - y0) * (y1 - y0))
+
+def _createModesAndVehicles(network):
+    network.create_mode('AUTO', 'c')
+    network.create_mode('TRANSIT', 'b')
+    network.create_mode('TRANSIT', 's')
+    network.create_mode('AUX_TRANSIT', 'w')
+    network.create_mode('AUX_TRANSIT', 't')
+    for number, (mode, capacity) in VEHICLES.items():
+        vehicle = network.create_transit_vehicle(number, mode)
+        vehicle.total_capacity = capacity
+        vehicle.seated_capacity = capacity // 2
+
+def _setLinkAttributes(link, rng, length):
+    link.length = length
+    link.data2 = float(rng.choice([40.0, 50.0, 60.0, 80.0]))
+    link.num_lanes = float(rng.randint(1, 4))
+    link.volume_delay_func = int(rng.randint(1, 4))
+    link.type = int(rng.randint(1, 6))
+    link.aux_transit_volume = float(rng.uniform(0.0, 200.0))
+
+def _createLinkPair(network, rng, iNode, jNode, modes, vertices=()):
+    '''
+    Creates a link and its (parallel) reverse.
+    '''
+    points = [(iNode.x, iNode.y)] + list(vertices) + [(jNode.x, jNode.y)]
+    length = sum(_distance(x0, y0, x1, y1) for (x0, y0), (x1, y1) in zip(points[:-1], points[1:]))
+    length *= COORD_UNIT_LENGTH
+
+    forward = network.create_link(iNode.number, jNode.number, modes)
+    _setLinkAttributes(forward, rng, length)
+    forward.vertices = list(vertices)
+    reverse = network.create_link(jNode.number, iNode.number, modes)
+    _setLinkAttributes(reverse, rng, length)
+    reverse.vertices = list(reversed(vertices))
+    return forward, reverse
+
+def _makeVertices(rng, iNode, jNode):
+    nVertices = rng.randint(1, 4)
+    dx = jNode.x - iNode.x
+    dy = jNode.y - iNode.y
+    norm = math.sqrt(dx * dx + dy * dy) or 1.0
+    vertices = []
+    for k in range(nVertices):
+        t = float(k + 1) / (nVertices + 1)
+        offset = rng.uniform(-20.0, 20.0)
+        vertices.append((iNode.x + t * dx - offset * dy / norm, iNode.y + t * dy + offset * dx / norm))
+    return vertices
+
+def buildNetwork(scale=1.0, seed=0):
+    '''
+    Builds a synthetic network.
+
+    Returns: (network, info) where info is a dictionary with the grid size,
+        the zone numbers, the numbers of the shape nodes and the grid node
+        numbers by (row, col).
+    '''
+    rng = np.random.RandomState(seed)
+    gridSize = max(10, int(round(GTHA_GRID_SIZE * math.sqrt(scale))))
+    nZones = max(10, int(round(GTHA_ZONES * scale)))
+    nLines = max(5, int(round(GTHA_TRANSIT_LINES * scale)))
+
+    network = Network()
+    _createModesAndVehicles(network)
+
+    #---Regular nodes on a jittered grid
+    grid = {}
+    for row in range(gridSize):
+        for col in range(gridSize):
+            node = network.create_node(FIRST_REGULAR_NODE + row * gridSize + col, False)
+            node.x = ORIGIN_X + col * GRID_SPACING + rng.uniform(-40.0, 40.0)
+            node.y = ORIGIN_Y + row * GRID_SPACING + rng.uniform(-40.0, 40.0)
+            grid[(row, col)] = node
+
+    #---Links between grid neighbours. Some edges are split by a degree-2 shape
+    #   node, some get vertices. edgePaths maps a grid edge to its node path.
+    edgePaths = {}
+    shapeNodes = []
+    nextShapeNode = FIRST_SHAPE_NODE
+    roadModes = 'cbsw'
+    for (row, col), iNode in grid.items():
+        for nRow, nCol in ((row, col + 1), (row + 1, col)):
+            jNode = grid.get((nRow, nCol))
+            if jNode is None: continue
+            if rng.uniform() < SHAPE_NODE_FRACTION:
+                mid = network.create_node(nextShapeNode, False)
+                nextShapeNode += 1
+                mid.x = (iNode.x + jNode.x) / 2.0
+                mid.y = (iNode.y + jNode.y) / 2.0
+                shapeNodes.append(mid.number)
+                firstHalf = _createLinkPair(network, rng, iNode, mid, roadModes)
+                secondHalf = _createLinkPair(network, rng, mid, jNode, roadModes)
+                for first, second in zip(firstHalf, secondHalf):
+                    # Shape nodes only break up the geometry of a single road
+                    second.data2 = first.data2
+                    second.num_lanes = first.num_lanes
+                    second.volume_delay_func = first.volume_delay_func
+                    second.type = first.type
+                path = [iNode.number, mid.number, jNode.number]
+            else:
+                vertices = _makeVertices(rng, iNode, jNode) if rng.uniform() < VERTEX_FRACTION else ()
+                _createLinkPair(network, rng, iNode, jNode, roadModes, vertices)
+                path = [iNode.number, jNode.number]
+            edgePaths[(iNode.number, jNode.number)] = path
+            edgePaths[(jNode.number, iNode.number)] = list(reversed(path))
+
+    #---Intersections with turn penalties
+    for node in grid.values():
+        if rng.uniform() < INTERSECTION_FRACTION:
+            network.create_intersection(node.number)
+            for link in node.incoming_links():
+                for turn in link.outgoing_turns():
+                    turn.penalty_func = 0 if rng.uniform() < PROHIBITED_TURN_FRACTION else 1
+
+    #---Zones, each connected to the nearest grid nodes
+    zones = list(range(1, nZones + 1))
+    extent = (gridSize - 1) * GRID_SPACING
+    for number in zones:
+        zone = network.create_node(number, True)
+        zone.x = ORIGIN_X + rng.uniform(0.0, extent)
+        zone.y = ORIGIN_Y + rng.uniform(0.0, extent)
+        col = int(round((zone.x - ORIGIN_X) / GRID_SPACING))
+        row = int(round((zone.y - ORIGIN_Y) / GRID_SPACING))
+        neighbours = [(row, col), (row + 1, col), (row, col + 1), (row - 1, col), (row, col - 1)]
+        nConnectors = rng.randint(2, 5)
+        connected = 0
+        for key in neighbours:
+            node = grid.get(key)
+            if node is None: continue
+            for link in _createLinkPair(network, rng, zone, node, 'cw'):
+                link.volume_delay_func = 90
+                link.data2 = 40.0
+                link.type = 0
+            connected += 1
+            if connected >= nConnectors: break
+
+    #---Transit lines, walking the grid without revisiting nodes
+    directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+    lineNumber = 0
+    while lineNumber < nLines:
+        row, col = rng.randint(0, gridSize), rng.randint(0, gridSize)
+        direction = directions[rng.randint(0, 4)]
+        targetLength = rng.randint(20, 81)
+        visited = set([(row, col)])
+        itinerary = [grid[(row, col)].number]
+        for step in range(targetLength):
+            if rng.uniform() < 0.15:
+                direction = directions[(directions.index(direction) + rng.choice([1, 3])) % 4]
+            options = [direction] + [d for d in directions if d != direction]
+            for d in options:
+                nextKey = (row + d[0], col + d[1])
+                if nextKey in grid and nextKey not in visited:
+                    direction = d
+                    break
+            else:
+                break
+            path = edgePaths[(grid[(row, col)].number, grid[nextKey].number)]
+            itinerary.extend(path[1:])
+            row, col = nextKey
+            visited.add(nextKey)
+        if len(itinerary) < 10: continue
+
+        vehicle = 2 if rng.uniform() < 0.1 else 1
+        line = network.create_transit_line("L%05d" %lineNumber, vehicle, itinerary)
+        line.headway = float(rng.choice([5.0, 7.5, 10.0, 15.0, 20.0, 30.0]))
+        line.speed = float(rng.uniform(18.0, 30.0))
+        ttf = int(rng.randint(1, 4))
+        for number, segment in enumerate(line.segments(True)):
+            segment.transit_time_func = ttf
+            isStop = number % 2 == 0
+            segment.allow_boardings = isStop
+            segment.allow_alightings = isStop
+            segment.dwell_time = 0.25 if isStop else 0.0
+        lineNumber += 1
+
+    info = {'gridSize': gridSize,
+            'zones': zones,
+            'shapeNodes': shapeNodes,
+            'grid': dict((key, node.number) for key, node in grid.items())}
+    return network, info
+
+def addTransitResults(network, seed=0):
+    '''
+    Fills in plausible transit assignment results (volumes, boardings and
+    travel times) so that post-assignment code has something to work on.
+    '''
+    rng = np.random.RandomState(seed + 1)
+    for line in network._lines.values():
+        capacity = 60.0 * line.vehicle.total_capacity / line.headway
+        volume = 0.0
+        for segment in line._segments[:-1]:
+            boardings = float(rng.uniform(0.0, 0.3 * capacity)) if segment.allow_boardings else 0.0
+            alightings = min(volume, float(rng.uniform(0.0, 0.3 * capacity))) if segment.allow_alightings else 0.0
+            volume = volume + boardings - alightings
+            segment.transit_boardings = boardings
+            segment.transit_volume = volume
+            speed = line.speed if line.speed > 0 else 20.0
+            segment.transit_time = segment.link.length / speed * 60.0 + segment.dwell_time
+    for node in network._nodes.values():
+        if node.is_centroid: continue
+        node.initial_boardings = float(rng.uniform(0.0, 50.0))
+        node.final_alightings = float(rng.uniform(0.0, 50.0))
+
+def buildDemandMatrix(network, zones, seed=0, totalTrips=None):
+    '''
+    Builds a gravity-model style float32 demand matrix for the given zones.
+    '''
+    rng = np.random.RandomState(seed + 2)
+    n = len(zones)
+    if totalTrips is None:
+        totalTrips = 1500.0 * n
+    xs = np.array([network.node(zone).x for zone in zones])
+    ys = np.array([network.node(zone).y for zone in zones])
+    distance = np.sqrt((xs[:, None] - xs[None, :]) ** 2 + (ys[:, None] - ys[None, :]) ** 2) * COORD_UNIT_LENGTH
+    productions = rng.lognormal(0.0, 0.75, n)
+    attractions = rng.lognormal(0.0, 0.75, n)
+    demand = productions[:, None] * attractions[None, :] * np.exp(-0.15 * distance)
+    demand *= totalTrips / demand.sum()
+    return demand.astype(np.float32)
+
+def writeLinkTable(network, filepath):
+    '''
+    Writes a link table in the CSV format produced by the toolbox's export tools.
+    '''
+    with open(filepath, 'w') as writer:
+        writer.write("i_node,j_node,length,modes,type,lanes,vdf,data1,data2,data3,@flag\n")
+        for link in network._links.values():
+            modes = "".join(sorted(mode.id for mode in link.modes))
+            writer.write("%s,%s,%.4f,%s,%s,%s,%s,%s,%s,%s,0\n" %(link.i_node.number, link.j_node.number,
+                         link.length, modes, link.type, link.num_lanes, link.volume_delay_func,
+                         link.data1, link.data2, link.data3))
+
+#===========================================================================================
+
+class Fixture(object):
+    '''
+    A populated emmebank at one scale. Benchmark cases may store derived data
+    in self.cache, which lives as long as the fixture.
+    '''
+
+    def __init__(self, emmebank, scale, seed, network, info, demand, workFolder):
+        self.emmebank = emmebank
+        self.scale = scale
+        self.seed = seed
+        self.network = network
+        self.info = info
+        self.demand = demand
+        self.workFolder = workFolder
+        self.cache = {}
+
+    @property
+    def scenario(self):
+        return self.emmebank.scenario(1)
+
+    @property
+    def zones(self):
+        return self.info['zones']
+
+    def sizes(self):
+        totals = self.network.element_totals
+        return "%(centroids)s zones, %(regular_nodes)s nodes, %(links)s links, " \
+               "%(transit_lines)s lines, %(transit_segments)s segments" %totals
+
+def buildFixture(emmebank, scale, seed=0, workFolder=None):
+    '''
+    Replaces the contents of the emmebank with a synthetic network (as
+    scenario 1) and demand matrix (as mf1) at the given scale.
+    '''
+    for scenario in emmebank.scenarios():
+        emmebank.delete_scenario(scenario.id)
+    for matrix in emmebank.matrices():
+        emmebank.delete_matrix(matrix.id)
+    emmebank.coord_unit_length = COORD_UNIT_LENGTH
+
+    network, info = buildNetwork(scale, seed)
+    addTransitResults(network, seed)
+    scenario = emmebank.create_scenario(1)
+    scenario.title = "Synthetic network (scale %s, seed %s)" %(scale, seed)
+    scenario._network = network # The fixture owns the network; cases must not modify it.
+
+    demand = buildDemandMatrix(network, info['zones'], seed)
+    matrix = emmebank.create_matrix('mf1')
+    matrix.name = 'demand'
+    matrix.set_numpy_data(demand)
+
+    if workFolder is None:
+        workFolder = tempfile.mkdtemp(prefix='tmg_benchmarks_')
+    elif not os.path.exists(workFolder):
+        os.makedirs(workFolder)
+    return Fixture(emmebank, scale, seed, network, info, demand, workFolder)
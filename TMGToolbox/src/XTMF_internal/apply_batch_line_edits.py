@@ -37,13 +37,27 @@ Apply Batch Line Edits
 '''
     0.0.1 Created on 2015-02-24 by mattaustin222
     0.0.2 Added the ability to process multiple alt files in sequence by JamesVaughan
+    0.1.0 Filters are compiled and evaluated against line attribute arrays (see
+        tmg.common.line_selection), and the factors of all input files are composed
+        per line and written back in one attribute update. Filters outside of the
+        supported selector syntax are flagged with one network calculation each.
+        Lines matched by several filters are reported in the logbook.
+    0.1.1 Filters outside of the supported syntax are evaluated in their turn, each in a
+        freshly reset flag attribute, so a line matched by several of them gets all of their
+        factors. Those which select on hdw or speed see the changes of the earlier rows.
     
 '''
 
 import inro.modeller as _m
+import re as _re
 import traceback as _traceback
+from collections import OrderedDict as _OrderedDict
+from os import path as _path
+import numpy as _np
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
+_partial = _MODELLER.module('tmg.common.partial_network')
+_lineSelection = _MODELLER.module('tmg.common.line_selection')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
 netCalc = _MODELLER.tool('inro.emme.network_calculation.network_calculator')
 # import six library for python2 to python3 conversion
@@ -55,7 +69,7 @@ _util.initalizeModellerTypes(_m)
 
 class ApplyBatchLineEdits(_m.Tool()):
     
-    version = '0.0.1'
+    version = '0.1.1'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
 
@@ -128,16 +142,23 @@ class ApplyBatchLineEdits(_m.Tool()):
         with _m.logbook_trace(name="{classname} v{version}".format(classname=(self.__class__.__name__), version=self.version),
                                      attributes=self._GetAtts()):
             #init the ProgressTracker now that we know how many files we need to load
-            self.TRACKER = _util.ProgressTracker(len(self.InputFiles))
+            self.TRACKER = _util.ProgressTracker(len(self.InputFiles) + 1)
+            changesToApply = []
             for altFile in self.InputFiles:
-                changesToApply = self._LoadFile(altFile)
+                fileChanges = self._LoadFile(altFile)
                 print("Instruction file loaded")
-                if changesToApply: 
-                    self._ApplyLineChanges(changesToApply)
-                    print("Headway and speed changes applied")
+                if fileChanges:
+                    fileName = _path.basename(altFile)
+                    changesToApply.extend((fileName, filter, factors) for filter, factors in six.iteritems(fileChanges)
+                                          if factors != (1.0, 1.0))
                 else:
                     print("No changes available in this scenario")
                 self.TRACKER.completeTask()
+            
+            if changesToApply:
+                self._ApplyLineChanges(changesToApply)
+                print("Headway and speed changes applied")
+            self.TRACKER.completeTask()
 
 
     ##########################################################################################################    
@@ -175,7 +196,7 @@ class ApplyBatchLineEdits(_m.Tool()):
                 print(msg)
                 return
 
-            instructionData = {}
+            instructionData = _OrderedDict()
             
             for num, line in enumerate(reader):
                 cells = line.strip().split(self.COMMA)
@@ -193,24 +214,117 @@ class ApplyBatchLineEdits(_m.Tool()):
         
         return instructionData
 
-    def _ApplyLineChanges(self, inputData):
-        for filter, factors in six.iteritems(inputData):
-            if factors[0] != 1:
-                spec = {
-                    "type": "NETWORK_CALCULATION",
-                    "expression": str(factors[0]) + "*hdw",
-                    "result": "hdw",
-                    "selections": {
-                        "transit_line": filter}}
-                netCalc(spec, self.Scenario)
-            if factors[1] != 1:
-                spec = {
-                    "type": "NETWORK_CALCULATION",
-                    "expression": str(factors[1]) + "*speed",
-                    "result": "speed",
-                    "selections": {
-                        "transit_line": filter}}
-                netCalc(spec, self.Scenario)
+    def _ApplyLineChanges(self, changes):
+        '''
+        Applies the (file name, filter, (headway factor, speed factor)) changes in order.
+        A line selected by several filters gets the product of their factors.
+        '''
+        selections = {}
+        fallbackFilters = []
+        for fileName, filter, factors in changes:
+            if filter in selections or filter in fallbackFilters: continue
+            try:
+                selections[filter] = _lineSelection.compileSelection(filter)
+            except _lineSelection.UnsupportedSelectionError as e:
+                _m.logbook_write("Filter '%s' will use the network calculator: %s" %(filter, e))
+                fallbackFilters.append(filter)
+        
+        if fallbackFilters:
+            with _util.tempExtraAttributeMANAGER(self.Scenario, 'TRANSIT_LINE', description= "Line Filter Flags") as flagAtt:
+                self._ApplyFactors(changes, selections, flagAtt.id)
+        else:
+            self._ApplyFactors(changes, selections, None)
+    
+    def _FlagFallbackFilter(self, filter, flagAttId, table):
+        '''
+        Evaluates a filter with the network calculator, and returns its mask over the
+        lines of the table.
+        '''
+        for expression, selection in [("0", "all"), ("1", filter)]:
+            spec = {
+                "type": "NETWORK_CALCULATION",
+                "expression": expression,
+                "result": flagAttId,
+                "selections": {
+                    "transit_line": selection}}
+            netCalc(spec, self.Scenario)
+        
+        editor = _partial.PartialNetworkEditor(self.Scenario, {'TRANSIT_LINE': [flagAttId]}, loadNetwork=False)
+        flags = editor.getValues('TRANSIT_LINE', flagAttId) != 0
+        keys = editor.keys('TRANSIT_LINE')
+        if keys != table.ids:
+            positions = dict((lineId, index) for index, lineId in enumerate(keys))
+            flags = flags[[positions[lineId] for lineId in table.ids]]
+        return flags
+    
+    def _ApplyFactors(self, changes, selections, flagAttId):
+        attributes = set(['headway', 'speed'])
+        needsModes = False
+        for selection in six.itervalues(selections):
+            attributes.update(selection.attributes)
+            needsModes = needsModes or selection.needsModes
+        attributes = sorted(attributes)
+        
+        editor = _partial.PartialNetworkEditor(self.Scenario, {'TRANSIT_LINE': attributes}, loadNetwork=needsModes)
+        #Headways and speeds are updated in place, so a filter on either sees the
+        #changes of the filters before it, as it would with sequential calculations
+        table = _lineSelection.LineTable.fromEditor(editor, attributes, loadModes=needsModes)
+        headways = table.values['headway']
+        speeds = table.values['speed']
+        
+        #Network calculator filters are evaluated in their turn. The ones which select on
+        #headway or speed see the scenario updated with the changes made so far.
+        fallbackMasks = {}
+        
+        matches = {}
+        for fileName, filter, (headwayFactor, speedFactor) in changes:
+            if filter in selections:
+                mask = selections[filter].evaluate(table)
+            elif filter in fallbackMasks:
+                mask = fallbackMasks[filter]
+            else:
+                dependsOnChanges = _re.search(r'\b(hdw|speed)\s*=', filter, _re.IGNORECASE) is not None
+                if dependsOnChanges:
+                    editor.setValues('TRANSIT_LINE', 'headway', headways)
+                    editor.setValues('TRANSIT_LINE', 'speed', speeds)
+                    editor.commit()
+                mask = self._FlagFallbackFilter(filter, flagAttId, table)
+                if not dependsOnChanges:
+                    fallbackMasks[filter] = mask
+            if headwayFactor != 1:
+                headways[mask] *= headwayFactor
+            if speedFactor != 1:
+                speeds[mask] *= speedFactor
+            for index in _np.flatnonzero(mask).tolist():
+                matches.setdefault(index, []).append((fileName, filter))
+        
+        editor.setValues('TRANSIT_LINE', 'headway', headways)
+        editor.setValues('TRANSIT_LINE', 'speed', speeds)
+        editor.commit()
+        
+        _m.logbook_write("Changed %s of %s transit lines with %s filters" %(len(matches), len(table), len(changes)))
+        self._ReportOverlaps(table, matches)
+    
+    def _ReportOverlaps(self, table, matches):
+        overlaps = [(table.ids[index], filters) for index, filters in six.iteritems(matches) if len(filters) > 1]
+        if not overlaps: return
+        overlaps.sort()
+        
+        msg = "%s transit lines were matched by more than one filter" %len(overlaps)
+        print(msg)
+        
+        t = "<table title='Lines matched by several filters'>\n"
+        t += "  <tr>\n"
+        t += "  <th>line</th>\n"
+        t += "  <th>filters</th>\n"
+        t += "  </tr>\n"
+        for lineId, filters in overlaps:
+            t += "  <tr>\n"
+            t += "  <td>{0}</td>\n".format(lineId)
+            t += "  <td>{0}</td>\n".format("<br>".join("%s: %s" %(fileName, filter) for fileName, filter in filters))
+            t += "  </tr>\n"
+        t += "</table>"
+        _m.logbook_write(msg, value=t)
 
     @_m.method(return_type=_m.TupleType)
     def percent_completed(self):
@@ -28,6 +28,10 @@ Return Boardings
 #---VERSION HISTORY
 '''
     0.0.1 Created on 2016-07-25 by nasterska
+    0.1.0 One temporary segment attribute is reused for all classes. Segment boardings
+        are summed by line and by line group as array reductions, and the files of all
+        classes are written from one table. A single-class assignment is written to a
+        file named after its demand matrix, instead of failing.
 '''
 
 import inro.modeller as _m
@@ -39,9 +43,11 @@ from json import loads as _parsedict
 from os.path import dirname
 from os.path import exists
 from multiprocessing import cpu_count
+import numpy as _np
 
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
+_partial = _MODELLER.module('tmg.common.partial_network')
 networkResultsTool = _MODELLER.tool('inro.emme.transit_assignment.extended.network_results')
 EMME_VERSION = _util.getEmmeVersion(tuple) 
 # import six library for python2 to python3 conversion
@@ -53,7 +59,7 @@ _util.initalizeModellerTypes(_m)
 
 class ReturnBoardings(_m.Tool()):
     
-    version = '0.0.1'
+    version = '0.1.0'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
     
@@ -110,41 +116,23 @@ class ReturnBoardings(_m.Tool()):
     def _Execute(self, scenario):
         
         print("Extracting Boarding Results")
-        self.classDemandMatrixId = _util.DetermineAnalyzedTransitDemandId(EMME_VERSION, scenario)
+        classDemandMatrixId = _util.DetermineAnalyzedTransitDemandId(EMME_VERSION, scenario)
+        if isinstance(classDemandMatrixId, dict):
+            classes = list(six.iteritems(classDemandMatrixId))
+        else:
+            classes = [(None, classDemandMatrixId)]
+        self.TRACKER = _util.ProgressTracker(len(classes) + 1)
+        
         lineAggregation = self._LoadLineAggregationFile()
 
-        lineBoardings = self._GetLineResults(scenario)
-
-        for PersonClass in lineBoardings:
-            netSet = set([key for key in PersonClass])
-            #if self.xtmf_CheckAggregationFlag:
-            #self._CheckAggregationFile(netSet, lineAggregation)
-        
-        self.TRACKER.completeTask()
+        lineIds, lineBoardings = self._GetLineResults(scenario, classes)
+        groupIds, groupBoardings = self._AggregateLines(lineIds, lineBoardings, lineAggregation)
         
-        self.TRACKER.startProcess(len(lineBoardings))
-        
-
-        allResults = []
-        for PersonClass in lineBoardings:
-            results = {}
-            for lineId, lineCount in six.iteritems(PersonClass):
-                if lineId == 'name':
-                    results[lineId] = lineCount
-                else:
-                    if not lineId in lineAggregation:
-                        continue #Skip unmapped lines
-                    lineGroupId = lineAggregation[lineId]
-            
-                    if lineGroupId in results:
-                        results[lineGroupId] += lineCount
-                    else:
-                        results[lineGroupId] = lineCount
-            self.TRACKER.completeSubtask()
-            allResults.append(results)
-            
         print("Extracted results from Emme")
-        self._OutputResults(allResults)       
+        classNames = [className if className is not None else str(demandMatrixId)
+                      for className, demandMatrixId in classes]
+        self._OutputResults(classNames, groupIds, groupBoardings)
+        self.TRACKER.completeTask()
     
     def _LoadLineAggregationFile(self):  
         mapping = {}
@@ -157,129 +145,80 @@ class ReturnBoardings(_m.Tool()):
                 mapping[key] = val
         return mapping
     
-    def _GetLineResults(self, scenario):
-
-        multiBoardings = []
-        classDemandMatrixId = _util.DetermineAnalyzedTransitDemandId(EMME_VERSION, scenario)
-        '''configPath = dirname(_MODELLER.desktop.project_file_name()) \
-                    + "/Database/STRATS_s%s/config" %scenario
-        
-        if not exists(configPath): 
-            print("path cannot be found")
-            return []
-        
-        with open(configPath) as reader:
-            config = _parsedict(reader.readline())
+    def _GetLineResults(self, scenario, classes):
+        '''
+        Runs the network results of each (class name, demand matrix) into the same
+        temporary segment attribute, and sums the segment boardings by line.
         
-        classDemandMatrix = {}
-        for info in config['strat_files']:
-            className = info['name']
-            print(className)
-            if(info['data'] is not None):
-                classDemandMatrix[className] = info['data']['demand']
+        Returns:
+            lineIds, boardings: the sorted array of line ids, and a (classes x lines)
+            array of boardings.
         '''
-        if type(classDemandMatrixId) == type(dict()):
-            for PersonClass in classDemandMatrixId:
-                with _util.tempExtraAttributeMANAGER(scenario, 'TRANSIT_SEGMENT') as ClassBoardings:
-                    spec=     {
-                        "on_links": None,
-                        "on_segments": {
-                            "total_boardings": ClassBoardings.id,
-                            },
-                        "aggregated_from_segments": None,
-                        "analyzed_demand": classDemandMatrixId[PersonClass],
-                        "constraint": None,
-                        "type": "EXTENDED_TRANSIT_NETWORK_RESULTS"
-                    }
-                    if EMME_VERSION >= (4,3,2):
-                        self.TRACKER.runTool(networkResultsTool, scenario = scenario, specification = spec, class_name = PersonClass, num_processors = self.NumberOfProcessors)
-                    else:
-                        self.TRACKER.runTool(networkResultsTool, scenario = scenario, specification = spec, class_name = PersonClass)
-                    
-                    results = _util.fastLoadSummedSegmentAttributes(scenario, [ClassBoardings.id])
-            
-                    retVal = {}
-                    for lineId, attributes in six.iteritems(results):
-                        id = str(lineId)
-                        retVal[id] = attributes[ClassBoardings.id]
-          
-                retVal['name'] = PersonClass
-
-                multiBoardings.append(retVal)
-        else:
-            with _util.tempExtraAttributeMANAGER(scenario, 'TRANSIT_SEGMENT') as ClassBoardings:
-                spec=     {
+        lineIds = None
+        boardings = _np.zeros((len(classes), 0))
+        with _util.tempExtraAttributeMANAGER(scenario, 'TRANSIT_SEGMENT', description= "Class Boardings") as classBoardings:
+            for row, (className, demandMatrixId) in enumerate(classes):
+                spec = {
                     "on_links": None,
                     "on_segments": {
-                        "total_boardings": ClassBoardings.id,
+                        "total_boardings": classBoardings.id,
                         },
                     "aggregated_from_segments": None,
-                    "analyzed_demand": classDemandMatrixId,
+                    "analyzed_demand": demandMatrixId,
                     "constraint": None,
                     "type": "EXTENDED_TRANSIT_NETWORK_RESULTS"
                 }
+                kwargs = {}
+                if className is not None:
+                    kwargs['class_name'] = className
                 if EMME_VERSION >= (4,3,2):
-                    self.TRACKER.runTool(networkResultsTool, scenario = scenario, specification = spec, num_processors = self.NumberOfProcessors)
-                else:
-                    self.TRACKER.runTool(networkResultsTool, scenario = scenario, specification = spec)
-                results = _util.fastLoadSummedSegmentAttributes(scenario, [ClassBoardings.id])
-            
-                retVal = {}
-                for lineId, attributes in six.iteritems(results):
-                    id = str(lineId)
-                    retVal[id] = attributes[ClassBoardings.id]
-          
-            #retVal['name'] = PersonClass
-
-            multiBoardings.append(retVal)
-            '''
-        for PersonClass in classDemandMatrix:
-            with _util.tempExtraAttributeMANAGER(scenario, 'TRANSIT_SEGMENT') as ClassBoardings:
-
-                spec=     {
-                    "on_links": None,
-                    "on_segments": {
-                        "total_boardings": ClassBoardings.id,
-                        },
-                    "aggregated_from_segments": None,
-                    "analyzed_demand":classDemandMatrix[PersonClass],
-                    "constraint": None,
-                    "type": "EXTENDED_TRANSIT_NETWORK_RESULTS"
-                }
-
-                self.TRACKER.runTool(networkResultsTool, scenario = scenario, specification = spec, class_name = PersonClass)
-                    
-                results = _util.fastLoadSummedSegmentAttributes(scenario, [ClassBoardings.id])
-            
-                retVal = {}
-                for lineId, attributes in results.iteritems():
-                    id = str(lineId)
-                    retVal[id] = attributes[ClassBoardings.id]
-          
-            retVal['name'] = PersonClass
-
-            multiBoardings.append(retVal)'''
-
-        return multiBoardings
-            
+                    kwargs['num_processors'] = self.NumberOfProcessors
+                self.TRACKER.runTool(networkResultsTool, scenario = scenario, specification = spec, **kwargs)
+                
+                indices, table = scenario.get_attribute_values('TRANSIT_SEGMENT', [classBoardings.id])
+                if lineIds is None:
+                    #The segments are the same for every class, so they are grouped once
+                    keys, positions = _partial.flattenIndex('TRANSIT_SEGMENT', indices)
+                    lineIds, segmentLines = _np.unique([str(key[0]) for key in keys], return_inverse=True)
+                    segmentLines = segmentLines.reshape(-1)
+                    boardings = _np.zeros((len(classes), len(lineIds)))
+                boardings[row] = _np.bincount(segmentLines, weights=_np.asarray(table).take(positions),
+                                              minlength=len(lineIds))
+        return lineIds, boardings
+    
+    def _AggregateLines(self, lineIds, lineBoardings, lineAggregation):
+        '''
+        Sums the line boardings of all classes by line group. Unmapped lines are skipped.
+        
+        Returns:
+            groupIds, boardings: the sorted array of line groups with at least one line
+            in the network, and a (classes x groups) array of boardings.
+        '''
+        if lineIds is None:
+            return [], _np.zeros((lineBoardings.shape[0], 0))
+        groups = [lineAggregation.get(lineId) for lineId in lineIds.tolist()]
+        mapped = _np.array([group is not None for group in groups], dtype=bool)
+        groupIds, lineGroups = _np.unique([group for group in groups if group is not None], return_inverse=True)
+        
+        boardings = _np.zeros((len(groupIds), lineBoardings.shape[0]))
+        _np.add.at(boardings, lineGroups.reshape(-1), lineBoardings[:, mapped].T)
+        return groupIds.tolist(), boardings.T
+    
     ##########################################################################################################
-    def _OutputResults(self, valueDict):
+    def _OutputResults(self, classNames, groupIds, groupBoardings):
 
-        fileName = ""
         removeSpecialString = "[^A-Za-z0-9]+"
 
         #check if output directory exists
         if not os.path.exists(self.xtmf_OutputDirectory):
                 os.makedirs(self.xtmf_OutputDirectory)
 
-        for personClass in valueDict:
-            fileName = self.xtmf_OutputDirectory + "\\" + re.sub(removeSpecialString, '', personClass["name"]) + ".csv"
+        for className, boardings in _util.itersync(classNames, groupBoardings.tolist()):
+            fileName = os.path.join(self.xtmf_OutputDirectory, re.sub(removeSpecialString, '', className) + ".csv")
             print(fileName)
-            del personClass["name"]
             with _util.open_csv_writer(fileName) as wr:
                 wr.writerow(['line', 'boardings'])
-                for line in sorted(personClass.items()):
-                    wr.writerow(line)
+                wr.writerows(_util.itersync(groupIds, boardings))
 
     @_m.method(return_type=_m.TupleType)
     def percent_completed(self):
@@ -34,10 +34,17 @@
     0.0.1 Created on 2014-03-13 by pkucirek
      
     0.0.2 Upgraded to use Strategy-based analysis to extract walk-all-way portion of tripsl.
+    
+    0.1.0 The two partition results are aligned as NumPy arrays instead of a dictionary of
+        cells, and the text is formatted in chunks. Rows are now ordered by origin and
+        destination number. Pairs missing from one of the results get 0.0 instead of
+        failing. Added the optional BINARY return format and the option to stream the
+        results to a file.
 '''
 
 import inro.modeller as _m
 import traceback as _traceback
+import numpy as _np
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
@@ -46,11 +53,78 @@ import six
 # initalize python3 types
 _util.initalizeModellerTypes(_m)
 
+RETURN_FORMATS = ['TEXT', 'BINARY']
+
+BINARY_MAGIC_NUMBER = 0x544D4752 # 'TMGR'
+BINARY_VERSION = 1
+
+TEXT_CHUNK_SIZE = 65536 # Rows formatted at a time
+
+def alignPartitionResults(avgBoardingResults, walkOnlyResults):
+    '''
+    Aligns two partition-aggregated MatrixData results on the union of their
+    group indices.
+    
+    Returns: origins, destinations, avgBoardings, walkAllWay as flat arrays with
+        one entry per (origin, destination) pair present in either result,
+        ordered by origin and then destination. Missing values are 0.0.
+    '''
+    results = [avgBoardingResults, walkOnlyResults]
+    rowIndex = _np.unique(_np.concatenate([_np.asarray(result.indices[0], dtype=_np.int32) for result in results]))
+    colIndex = _np.unique(_np.concatenate([_np.asarray(result.indices[1], dtype=_np.int32) for result in results]))
+    
+    present = _np.zeros((len(rowIndex), len(colIndex)), dtype=bool)
+    grids = []
+    for result in results:
+        rows = _np.searchsorted(rowIndex, _np.asarray(result.indices[0], dtype=_np.int32))
+        cols = _np.searchsorted(colIndex, _np.asarray(result.indices[1], dtype=_np.int32))
+        values = _np.zeros((len(rowIndex), len(colIndex)), dtype=_np.float32)
+        values[_np.ix_(rows, cols)] = result.to_numpy()
+        present[_np.ix_(rows, cols)] = True
+        grids.append(values)
+    
+    rowPositions, colPositions = _np.nonzero(present)
+    return (rowIndex[rowPositions], colIndex[colPositions],
+            grids[0][rowPositions, colPositions], grids[1][rowPositions, colPositions])
+
+def iterTextResults(origins, destinations, avgBoardings, walkAllWay, chunkSize=TEXT_CHUNK_SIZE):
+    '''
+    Yields the results as text, one chunk of up to chunkSize lines at a time.
+    Each line (including the last) ends with a newline.
+    '''
+    for start in range(0, len(origins), chunkSize):
+        end = start + chunkSize
+        rows = zip(origins[start:end].tolist(), destinations[start:end].tolist(),
+                   avgBoardings[start:end].tolist(), walkAllWay[start:end].tolist())
+        yield "".join(["%s %s %s %s\n" %row for row in rows])
+
+def packBinaryResults(origins, destinations, avgBoardings, walkAllWay):
+    '''
+    Packs the results in the compact binary format. All values are little-endian:
+        - int32 magic number (0x544D4752), int32 version (1), int32 number of rows (n)
+        - n int32 origins, n int32 destinations
+        - n float32 average boardings, n float32 walk-all-way demand
+    '''
+    header = _np.array([BINARY_MAGIC_NUMBER, BINARY_VERSION, len(origins)], dtype='<i4')
+    return b"".join([header.tobytes(),
+                     _np.asarray(origins, dtype='<i4').tobytes(),
+                     _np.asarray(destinations, dtype='<i4').tobytes(),
+                     _np.asarray(avgBoardings, dtype='<f4').tobytes(),
+                     _np.asarray(walkAllWay, dtype='<f4').tobytes()])
+
+def writeBinaryResults(writer, origins, destinations, avgBoardings, walkAllWay):
+    '''
+    Writes the results to an open binary file, in the format of packBinaryResults.
+    '''
+    _np.array([BINARY_MAGIC_NUMBER, BINARY_VERSION, len(origins)], dtype='<i4').tofile(writer)
+    for column, dtype in [(origins, '<i4'), (destinations, '<i4'), (avgBoardings, '<f4'), (walkAllWay, '<f4')]:
+        _np.asarray(column, dtype=dtype).tofile(writer)
+
 ##########################################################################################################
 
 class SupplementalTransitMatrices(_m.Tool()):
     
-    version = '0.0.2'
+    version = '0.1.0'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
     
@@ -80,7 +154,20 @@ class SupplementalTransitMatrices(_m.Tool()):
     
     ##########################################################################################################
     
-    def __call__(self, xtmf_ScenarioNumber, xtmf_PartitionId, xtmf_DemandMatrixId):
+    def __call__(self, xtmf_ScenarioNumber, xtmf_PartitionId, xtmf_DemandMatrixId, xtmf_ReturnFormat='TEXT',
+                 xtmf_OutputFile=None):
+        '''
+        Returns the average boardings and walk-all-way demand for each pair of
+        partition groups. xtmf_ReturnFormat selects the format:
+            - 'TEXT' (default): One "origin destination avgBoardings walkAllWay"
+                line per pair of groups.
+            - 'BINARY': The compact binary format (see packBinaryResults).
+        If xtmf_OutputFile is given, the results are written (streamed, for
+        TEXT) to that file instead, and the file path is returned.
+        '''
+        xtmf_ReturnFormat = str(xtmf_ReturnFormat).upper()
+        if xtmf_ReturnFormat not in RETURN_FORMATS:
+            raise Exception("Unknown return format '%s'. Valid formats are: %s" %(xtmf_ReturnFormat, ", ".join(RETURN_FORMATS)))
         
         database = _MODELLER.emmebank
         
@@ -101,7 +188,7 @@ class SupplementalTransitMatrices(_m.Tool()):
             raise Exception("Demand matrix '%s' does not exist" %xtmf_DemandMatrixId)
         
         try:
-            return self._Execute(scenario, partition, demandMatrix)
+            return self._Execute(scenario, partition, demandMatrix, xtmf_ReturnFormat, xtmf_OutputFile)
         except Exception as e:
             msg = str(e) + "\n" + _traceback.format_exc()
             raise Exception(msg)
@@ -109,7 +196,7 @@ class SupplementalTransitMatrices(_m.Tool()):
     ##########################################################################################################    
     
     
-    def _Execute(self, scenario, partition, demandMatrix):
+    def _Execute(self, scenario, partition, demandMatrix, returnFormat='TEXT', outputFile=None):
         
         modes = [id for id, type, description in _util.getScenarioModes(scenario, ['TRANSIT', 'AUX_TRANSIT'])]
         strategyAnalysisTool = _MODELLER.tool('inro.emme.transit_assignment.extended.strategy_based_analysis')
@@ -165,30 +252,20 @@ class SupplementalTransitMatrices(_m.Tool()):
             walkOnlyResults = partitionAggTool(walkAllWayMatrix, partition, partition, scenario=scenario)
             avgBoardingResults = partitionAverageTool(scenario.id, partition.id, avgBoardingsMatrix.id, demandMatrix.id)
             
-            results = {}
-            for i, row in enumerate(avgBoardingResults.raw_data):
-                origin = avgBoardingResults.indices[0][i]
-                for j, cell in enumerate(row):
-                    destination = avgBoardingResults.indices[1][j]
-                    key = (origin, destination)
-                    results[key] = [cell]
-            for i, row in enumerate(walkOnlyResults.raw_data):
-                origin = walkOnlyResults.indices[0][i]
-                for j, cell in enumerate(row):
-                    destination = walkOnlyResults.indices[1][j]
-                    key = (origin, destination)
-                    if not key in results:
-                        results[key] = [0.0, cell]
+            origins, destinations, avgBoardings, walkAllWay = alignPartitionResults(avgBoardingResults, walkOnlyResults)
+            
+            if outputFile:
+                with open(outputFile, 'wb') as writer:
+                    if returnFormat == 'BINARY':
+                        writeBinaryResults(writer, origins, destinations, avgBoardings, walkAllWay)
                     else:
-                        results[key].append(cell)
-            resultList = []
-            for key, val in six.iteritems(results):
-                origin, destination = key
-                col1 = val[0]
-                col2 = val[1]
-                resultList.append("%s %s %s %s" %(origin, destination, col1, col2))
-            resultList.sort()
-            return "\n".join(resultList)
+                        for chunk in iterTextResults(origins, destinations, avgBoardings, walkAllWay):
+                            writer.write(chunk.encode('ascii'))
+                return outputFile
+            
+            if returnFormat == 'BINARY':
+                return packBinaryResults(origins, destinations, avgBoardings, walkAllWay)
+            return "".join(iterTextResults(origins, destinations, avgBoardings, walkAllWay)).rstrip("\n")
             
     @_m.method(return_type=_m.TupleType)
     def percent_completed(self):
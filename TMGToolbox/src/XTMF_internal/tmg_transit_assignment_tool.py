@@ -1458,20 +1458,22 @@ class TransitAssignmentTool(_m.Tool()):
         return baseSpec
 
     def _ExtractOutputMatrices(self):
-        for i, demand in enumerate(self.DemandMatrixList):
-            if self.WalkTimeMatrixList[i] or self.WaitTimeMatrixList[i] or self.PenaltyMatrixList[i]:
-                self._ExtractTimesMatrices(i)
-            if self.InVehicleTimeMatrixList[i] is not None:
-                with _util.tempExtraAttributeMANAGER(self.Scenario, "TRANSIT_SEGMENT") as TempInVehicleTimesAttribute:
-                    if self.CalculateCongestedIvttFlag == True:
-                        self._ExtractInVehicleTimes(TempInVehicleTimesAttribute, True, i)
-                    else:
-                        self._ExtractInVehicleTimes(TempInVehicleTimesAttribute, False, i)
-            if self.xtmf_congestedAssignment == True:
-                if self.CongestionMatrixList[i] is not None:
-                    self._ExtractCongestionMatrix(self.CongestionMatrixList[i], i)
-            if self.FareMatrixList[i]:
-                self._ExtractCostMatrix(i)
+        # Classes share the same temporary attributes and matrices
+        with _util.tempResourcePoolMANAGER():
+            for i, demand in enumerate(self.DemandMatrixList):
+                if self.WalkTimeMatrixList[i] or self.WaitTimeMatrixList[i] or self.PenaltyMatrixList[i]:
+                    self._ExtractTimesMatrices(i)
+                if self.InVehicleTimeMatrixList[i] is not None:
+                    with _util.tempExtraAttributeMANAGER(self.Scenario, "TRANSIT_SEGMENT") as TempInVehicleTimesAttribute:
+                        if self.CalculateCongestedIvttFlag == True:
+                            self._ExtractInVehicleTimes(TempInVehicleTimesAttribute, True, i)
+                        else:
+                            self._ExtractInVehicleTimes(TempInVehicleTimesAttribute, False, i)
+                if self.xtmf_congestedAssignment == True:
+                    if self.CongestionMatrixList[i] is not None:
+                        self._ExtractCongestionMatrix(self.CongestionMatrixList[i], i)
+                if self.FareMatrixList[i]:
+                    self._ExtractCostMatrix(i)
 
     ################################# SUB TASK METHODS ###########################
 
@@ -1,5 +1,11 @@
 from os import path
+import gzip
+import io
+import itertools
 import traceback as tb
+import zipfile
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 
 import inro.modeller as m
 mm = m.Modeller()
@@ -9,6 +15,118 @@ import six
 # initalize python3 types
 util.initalizeModellerTypes(m)
 
+EXPORT_FORMATS = ['CSV', 'FEATHER', 'PARQUET', 'NPZ']
+FILE_EXTENSIONS = {'CSV': 'csv', 'FEATHER': 'feather', 'PARQUET': 'parquet', 'NPZ': 'npz'}
+COMPRESSION_OPTIONS = {
+    'CSV': ['gzip'],
+    'FEATHER': ['lz4', 'zstd'],
+    'PARQUET': ['snappy', 'gzip', 'brotli', 'zstd', 'lz4'],
+    'NPZ': ['deflate']
+}
+CHUNK_SIZE = 100000  # Rows written at a time
+ATTRIBUTE_BLOCK_SIZE = 16  # Attributes loaded at a time for NPZ files
+
+# Domain flag, loader and file name, in export order
+DOMAINS = [
+    ('NodeTableFlag', 'load_node_dataframe', 'nodes'),
+    ('LinkTableFlag', 'load_link_dataframe', 'links'),
+    ('TurnTableFlag', 'load_turn_dataframe', 'turns'),
+    ('LineTableFlag', 'load_transit_line_dataframe', 'transit_lines'),
+    ('SegmentTableFlag', 'load_transit_segment_dataframe', 'transit_segments')
+]
+DOMAIN_TYPES = {
+    'load_node_dataframe': 'NODE',
+    'load_link_dataframe': 'LINK',
+    'load_turn_dataframe': 'TURN',
+    'load_transit_line_dataframe': 'TRANSIT_LINE',
+    'load_transit_segment_dataframe': 'TRANSIT_SEGMENT'
+}
+
+
+def iter_chunks(df, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start: start + chunk_size]
+
+
+def write_csv(df, fp, compression=None, chunk_size=CHUNK_SIZE):
+    opener = gzip.open if compression == 'gzip' else open
+    with opener(fp, 'wb') as writer:
+        header = True
+        for chunk in iter_chunks(df, chunk_size):
+            writer.write(chunk.to_csv(header=header, index=True).encode('utf-8'))
+            header = False
+        if header:  # No rows
+            writer.write(df.to_csv(header=True, index=True).encode('utf-8'))
+
+
+def _arrow_table(chunk, schema=None):
+    import pyarrow as pa
+    return pa.Table.from_pandas(chunk.reset_index(), schema=schema, preserve_index=False)
+
+
+def write_parquet(df, fp, compression=None, chunk_size=CHUNK_SIZE):
+    import pyarrow.parquet as pq
+    schema = _arrow_table(df.iloc[:0]).schema
+    writer = pq.ParquetWriter(fp, schema, compression=compression or 'none')
+    try:
+        for chunk in iter_chunks(df, chunk_size):
+            writer.write_table(_arrow_table(chunk, schema))
+    finally:
+        writer.close()
+
+
+def write_feather(df, fp, compression=None, chunk_size=CHUNK_SIZE):
+    # Feather V2 is the Arrow IPC file format, so it can be written one record batch at a time
+    import pyarrow as pa
+    schema = _arrow_table(df.iloc[:0]).schema
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.OSFile(fp, 'wb') as sink:
+        writer = pa.ipc.new_file(sink, schema, options=options)
+        try:
+            for chunk in iter_chunks(df, chunk_size):
+                writer.write_table(_arrow_table(chunk, schema))
+        finally:
+            writer.close()
+
+
+def write_npz(df, fp, compression=None, chunk_size=CHUNK_SIZE):
+    write_npz_blocks([df], fp, compression)
+
+
+def write_npz_blocks(frames, fp, compression=None):
+    # One array per index level and column, written to the archive one at a time. Each frame holds a block of
+    # columns for the same rows, so at most two blocks are in memory at a time. Columns repeated in the next block
+    # (such as derived columns) are written with that block, to keep the order of a single-frame archive.
+    import numpy as np
+    zip_mode = zipfile.ZIP_DEFLATED if compression else zipfile.ZIP_STORED
+    written = set()
+
+    def write_arrays(archive, df, skip):
+        columns = [(name, df.index.get_level_values(name)) for name in df.index.names]
+        columns += [(name, df[name]) for name in df.columns if name not in skip]
+        for name, values in columns:
+            if name in written:
+                continue
+            written.add(name)
+            array = np.asarray(values)
+            if array.dtype == object:
+                array = array.astype(six.text_type)
+            buffer = io.BytesIO()
+            np.lib.format.write_array(buffer, array, allow_pickle=False)
+            archive.writestr(name + '.npy', buffer.getvalue())
+
+    with zipfile.ZipFile(fp, 'w', compression=zip_mode, allowZip64=True) as archive:
+        previous = None
+        for df in frames:
+            if previous is not None:
+                write_arrays(archive, previous, set(df.columns))
+            previous = df
+        if previous is not None:
+            write_arrays(archive, previous, ())
+
+
+WRITERS = {'CSV': write_csv, 'FEATHER': write_feather, 'PARQUET': write_parquet, 'NPZ': write_npz}
+
 class ExportNetworkTables(m.Tool()):
     tool_run_msg = ""
 
@@ -32,6 +150,11 @@ class ExportNetworkTables(m.Tool()):
     LineTableFlag = m.Attribute(bool)
     SegmentTableFlag = m.Attribute(bool)
 
+    ExportFormat = m.Attribute(str)
+    Compression = m.Attribute(str)
+    Columns = m.Attribute(str)
+    NumberOfThreads = m.Attribute(int)
+
     def __init__(self):
         self.tool_run_msg = ""
         self.tracker = util.ProgressTracker(5)
@@ -45,10 +168,15 @@ class ExportNetworkTables(m.Tool()):
         self.LineTableFlag = False
         self.SegmentTableFlag = False
 
+        self.ExportFormat = 'CSV'
+        self.Compression = ''
+        self.Columns = ''
+        self.NumberOfThreads = cpu_count()
+
     def page(self):
         pb = m.ToolPageBuilder(
             self, title="Export Network Tables",
-            description="Exports up to 5 CSV tables from the selected scenario. Table columns are limited to "
+            description="Exports up to 5 tables from the selected scenario. Table columns are limited to "
                         "'standard', 'extra' and 'result' categories as defined in the Network API (so link mode "
                         "codes are omitted).",
             branding_text="- TMG Toolbox"
@@ -76,6 +204,21 @@ class ExportNetworkTables(m.Tool()):
         pb.add_checkbox_group(group_data, title="Flags for network elements",
                               note="<div id='ux_all'>Export all elements?</div>")
 
+        pb.add_select('ExportFormat', keyvalues=[(fmt, fmt.lower()) for fmt in EXPORT_FORMATS], title="File format",
+                      note="Feather and Parquet files require the pyarrow library. NPZ files hold one NumPy array per "
+                           "column, and are read from the scenario a block of columns at a time.")
+
+        pb.add_text_box('Compression', title="Compression",
+                        note="Optional. CSV: gzip. Feather: lz4, zstd. Parquet: snappy, gzip, brotli, zstd, lz4. "
+                             "NPZ: deflate.")
+
+        pb.add_text_box('Columns', size=255, title="Columns",
+                        note="Optional comma-separated list of attributes to export. Each table gets the listed "
+                             "attributes of its element type. Leave blank to export all attributes.")
+
+        pb.add_text_box('NumberOfThreads', title="Number of threads",
+                        note="Tables are exported in parallel.")
+
         return pb.render()
     
     @m.method(return_type=six.u)
@@ -93,7 +236,7 @@ class ExportNetworkTables(m.Tool()):
             self.tool_run_msg = m.PageBuilder.format_exception(e, tb.format_exc(e))
 
     def __call__(self, scenario_id, target_folder, file_prefix, export_nodes, export_links, export_turns, export_lines,
-                 export_segments):
+                 export_segments, export_format='CSV', compression='', columns='', number_of_threads=None):
         try:
             print("Exporting Network Tables")
             self.SourceScenario = mm.emmebank.scenario(scenario_id)
@@ -121,6 +264,11 @@ class ExportNetworkTables(m.Tool()):
                 self.SegmentTableFlag = True
             else:
                 self.SegmentTableFlag = False
+            self.ExportFormat = export_format
+            self.Compression = compression
+            self.Columns = columns
+            if number_of_threads:
+                self.NumberOfThreads = int(number_of_threads)
             self._execute()
             print("Export Network Tables Complete")
         except Exception as e:
@@ -133,39 +281,74 @@ class ExportNetworkTables(m.Tool()):
 
         with m.logbook_trace(name=self.__class__.__name__, attributes=self.logbook_attributes):
             assert self.TargetFolder is not None, "Target folder is not set"
+            export_format = self.ExportFormat.upper() if self.ExportFormat else 'CSV'
+            assert export_format in EXPORT_FORMATS, "Unknown export format '%s'" % self.ExportFormat
+            compression = self.Compression.strip().lower() if self.Compression else None
+            assert not compression or compression in COMPRESSION_OPTIONS[export_format], \
+                "Compression '%s' is not supported for %s files" % (self.Compression, export_format.lower())
+            columns = [name.strip() for name in self.Columns.split(',') if name.strip()] if self.Columns else None
 
-            if self.NodeTableFlag:
-                df = pdu.load_node_dataframe(self.SourceScenario)
-                self._to_csv(df, 'nodes')
-            self.tracker.completeTask()
+            tasks = [(loader, self._get_file_name(file_name, export_format, compression))
+                     for flag, loader, file_name in DOMAINS if getattr(self, flag)]
+            for i in range(len(DOMAINS) - len(tasks)):
+                self.tracker.completeTask()
 
-            if self.LinkTableFlag:
-                df = pdu.load_link_dataframe(self.SourceScenario)
-                self._to_csv(df, 'links')
-            self.tracker.completeTask()
+            def export(task):
+                loader, fn = task
+                self._export_table(loader, fn, export_format, compression, columns)
+                self.tracker.completeTask()
 
-            if self.TurnTableFlag:
-                df = pdu.load_turn_dataframe(self.SourceScenario)
-                self._to_csv(df, 'turns')
-            self.tracker.completeTask()
+            n_threads = max(1, min(len(tasks), self.NumberOfThreads or 1))
+            if n_threads > 1:
+                pool = ThreadPool(n_threads)
+                try:
+                    pool.map(export, tasks)
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                for task in tasks:
+                    export(task)
 
-            if self.LineTableFlag:
-                df = pdu.load_transit_line_dataframe(self.SourceScenario)
-                self._to_csv(df, 'transit_lines')
-            self.tracker.completeTask()
+        self.tool_run_msg = m.PageBuilder.format_info("Done")
 
-            if self.SegmentTableFlag:
-                df = pdu.load_transit_segment_dataframe(self.SourceScenario)
-                self._to_csv(df, 'transit_segments')
-            self.tracker.completeTask()
+    def _get_file_name(self, file_name, export_format, compression):
+        extension = FILE_EXTENSIONS[export_format]
+        if export_format == 'CSV' and compression:
+            extension += '.gz'
+        if self.FilePrefix:
+            return "{}_{}.{}".format(self.FilePrefix, file_name, extension)
+        return "%s.%s" % (file_name, extension)
 
-        self.tool_run_msg = m.PageBuilder.format_info("Done")
+    def _export_table(self, loader, fn, export_format, compression, columns):
+        """Loads the table of one domain and writes it to file.
 
-    def _to_csv(self, df, file_name):
-        fn = "{}_{}.csv".format(self.FilePrefix, file_name) if self.FilePrefix else "%s.csv" % file_name
-        print(fn)
+        NPZ files are loaded and written ATTRIBUTE_BLOCK_SIZE attributes at a time. CSV, Feather and Parquet files
+        are written in row chunks, but each row needs all of its columns, so the whole table is loaded into memory
+        first. For very large networks, use the Columns option to limit the size of these tables.
+        """
+        available = self.SourceScenario.attributes(DOMAIN_TYPES[loader])
+        attributes = list(available) if columns is None else [name for name in columns if name in available]
+        load = getattr(pdu, loader)
         fp = path.join(self.TargetFolder, fn)
-        df.to_csv(fp, header=True, index=True)
+
+        if export_format == 'NPZ':
+            blocks = [attributes[start: start + ATTRIBUTE_BLOCK_SIZE]
+                      for start in range(0, len(attributes), ATTRIBUTE_BLOCK_SIZE)] or [[]]
+            frames = (load(self.SourceScenario, attributes=block) for block in blocks)
+            first = next(frames)
+            if first is None:  # No turns
+                return
+            frames = itertools.chain([first], frames)
+            del first  # Released once the first block is written
+            write_npz_blocks(frames, fp, compression)
+            return
+
+        df = load(self.SourceScenario, attributes=attributes)
+        if df is None:  # No turns
+            return
+
+        WRITERS[export_format](df, fp, compression)
 
     @property
     def logbook_attributes(self):
@@ -176,5 +359,8 @@ class ExportNetworkTables(m.Tool()):
             'export_links': self.LineTableFlag,
             'export_turns': self.TurnTableFlag,
             'export_lines': self.LineTableFlag,
-            'export_segments': self.SegmentTableFlag
+            'export_segments': self.SegmentTableFlag,
+            'export_format': self.ExportFormat,
+            'compression': self.Compression,
+            'columns': self.Columns
         }
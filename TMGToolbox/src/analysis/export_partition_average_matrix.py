@@ -39,11 +39,16 @@ Export Aggregate Average Matrix by Partition
 
     0.1.1 Updated to allow for multi-threaded matrix calcs in 4.2.1+
     
+    0.2.0 The text export is formatted in blocks of rows from the NumPy view of the
+        results and streamed to the file. Added the option to export the results as
+        a binary matrix file instead. The XTMF side can optionally write the file too.
+    
 '''
 
 import inro.modeller as _m
 import traceback as _traceback
 from multiprocessing import cpu_count
+import numpy as _np
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
@@ -59,7 +64,7 @@ _util.initalizeModellerTypes(_m)
 
 class ExportAggregateAverageMatrix(_m.Tool()):
     
-    version = '0.1.1'
+    version = '0.2.0'
     tool_run_msg = ""
     number_of_tasks = 6 # For progress reporting, enter the integer number of tasks here
     
@@ -71,6 +76,7 @@ class ExportAggregateAverageMatrix(_m.Tool()):
     xtmf_ScenarioNumber = _m.Attribute(int) # parameter used by XTMF only
     Scenario = _m.Attribute(_m.InstanceType) # common variable or parameter
     ExportFile = _m.Attribute(str)
+    BinaryExport = _m.Attribute(bool)
     Partition = _m.Attribute(_m.InstanceType)
     xtmf_PartitionId = _m.Attribute(str)
     MatrixIdToAggregate = _m.Attribute(str)
@@ -86,6 +92,7 @@ class ExportAggregateAverageMatrix(_m.Tool()):
         self.Scenario = _MODELLER.scenario #Default is primary scenario
         
         self.NumberOfProcessors = cpu_count()
+        self.BinaryExport = False
     
     def page(self):
         pb = _tmgTPB.TmgToolPageBuilder(self, title="Export Aggregate Average Matrix v%s" %self.version,
@@ -118,6 +125,11 @@ class ExportAggregateAverageMatrix(_m.Tool()):
                            window_type='save_file',
                            title="Matrix Export")
         
+        pb.add_checkbox(tool_attribute_name='BinaryExport',
+                        label="Export as binary matrix?",
+                        note="Writes the results in the binary matrix format (as read by \
+                            Import Binary Matrix) instead of 'O D Val' text.")
+        
         return pb.render()
     
     ##########################################################################################################
@@ -135,7 +147,8 @@ class ExportAggregateAverageMatrix(_m.Tool()):
         
         self.tool_run_msg = _m.PageBuilder.format_info("Tool complete.")
     
-    def __call__(self, xtmf_ScenarioNumber, xtmf_PartitionId, MatrixIdToAggregate, WeightingMatrixId):
+    def __call__(self, xtmf_ScenarioNumber, xtmf_PartitionId, MatrixIdToAggregate, WeightingMatrixId,
+                 ExportFile=None, BinaryExport=False):
         
         #raise NotImplementedError("XTMF side not yet implemented!")
         
@@ -150,9 +163,11 @@ class ExportAggregateAverageMatrix(_m.Tool()):
         
         self.MatrixIdToAggregate = MatrixIdToAggregate
         self.WeightingMatrixId = WeightingMatrixId
+        self.ExportFile = ExportFile
+        self.BinaryExport = BinaryExport
         
         try:
-            return self._Execute(False)
+            return self._Execute(bool(ExportFile))
         except Exception as e:
             msg = str(e) + "\n" + _traceback.format_exc()
             raise Exception(msg)
@@ -308,26 +323,38 @@ class ExportAggregateAverageMatrix(_m.Tool()):
             }
     
     def _WriteToFile(self, data, title):
+        if self.BinaryExport:
+            data.save(self.ExportFile)
+            return
+        
         with open(self.ExportFile, 'w') as writer:
             writer.write(title)
             writer.write("\nO D Val\n")
-            writer.write(self._MatrixDataToString(data))
+            for i, block in enumerate(self._IterMatrixDataText(data)):
+                if i > 0: writer.write("\n")
+                writer.write(block)
     
     @staticmethod
-    def _MatrixDataToString(data):
-        rows = []
-        
-        dim1 = data.indices[0]
-        dim2 = data.indices[1]
+    def _IterMatrixDataText(data, blockSize=65536):
+        '''
+        Yields the 'O D Val' lines of the matrix data, joined in blocks of about
+        blockSize cells (always whole rows).
+        '''
+        dim1 = _np.asarray(data.indices[0])
+        dim2 = _np.asarray(data.indices[1])
+        values = data.to_numpy()
         
-        for i, row in enumerate(data.raw_data):
-            index1 = dim1[i]
-            for j, cell in enumerate(row):
-                index2 = dim2[j]
-                s = "%s %s %s" %(index1, index2, cell)
-                rows.append(s)
-        
-        return "\n".join(rows)
+        rowsPerBlock = max(1, blockSize // max(1, len(dim2)))
+        for start in range(0, len(dim1), rowsPerBlock):
+            end = start + rowsPerBlock
+            block = values[start:end]
+            origins = _np.repeat(dim1[start:end], len(dim2)).tolist()
+            destinations = _np.tile(dim2, block.shape[0]).tolist()
+            yield "\n".join(["%s %s %s" %cell for cell in zip(origins, destinations, block.ravel().tolist())])
+    
+    @staticmethod
+    def _MatrixDataToString(data):
+        return "\n".join(ExportAggregateAverageMatrix._IterMatrixDataText(data))
     
     @_m.method(return_type=_m.TupleType)
     def percent_completed(self):
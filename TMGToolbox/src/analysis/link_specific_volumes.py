@@ -34,15 +34,33 @@ Export Specific Link Volumes
 '''
     0.0.1 Created on 2015-06-03 by tnikolov
     0.1.0 Added the option to export total transit volumes on the link
+    0.1.1 Hypernetwork twins of a link are found through a co-located node index
+        built once per scenario, instead of scanning every link for each filter.
+    0.2.0 Volumes for all link filters are summed from link and segment attribute
+        arrays read once per scenario, instead of one network calculation per filter.
+        Twins are found with a link shape index, and only the transit scenario's
+        link geometry is loaded. Scenarios are processed by a pool of worker threads.
+        Filters other than single-link selections still use the network calculator.
+    0.2.1 Link vertices are loaded with the transit scenario's link geometry, so
+        links which only share their end points are no longer treated as twins.
+    0.2.2 Scenarios are read one at a time on the calling thread, since the Modeller
+        database API is not documented as thread-safe. Only the summing of the read
+        arrays (and the hashing of link shapes) is done by the pool of workers.
     
 '''
 
 import inro.modeller as _m
 from re import split as _regex_split
+import re as _re
 import csv
+import numpy as _np
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool as _ThreadPool
 
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
+_colocation = _MODELLER.module('tmg.common.colocation_index')
+_partial = _MODELLER.module('tmg.common.partial_network')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
 networkCalculator = _MODELLER.tool('inro.emme.network_calculation.network_calculator')
 EMME_VERSION = _util.getEmmeVersion(tuple) 
@@ -51,6 +69,8 @@ import six
 # initalize python3 types
 _util.initalizeModellerTypes(_m)
 
+_LINK_TERM = _re.compile(r'^\s*link\s*=\s*(\d+)\s*,\s*(\d+)\s*$')
+
 ##########################################################################################################
 
 class LinkSpecificVolumes(_m.Tool()):
@@ -61,6 +81,7 @@ class LinkSpecificVolumes(_m.Tool()):
     filePath = _m.Attribute(str)
 
     TransitFlag = _m.Attribute(bool)
+    NumberOfProcessors = _m.Attribute(int)
 
     Scenarios = _m.Attribute(_m.ListType)
 
@@ -74,6 +95,7 @@ class LinkSpecificVolumes(_m.Tool()):
         self.Scenario = _MODELLER.scenario #Default is primary scenario   
         self.results = {};
         self.TransitFlag = False
+        self.NumberOfProcessors = cpu_count()
 
     def run(self):
         self.tool_run_msg = ""        
@@ -120,61 +142,151 @@ class LinkSpecificVolumes(_m.Tool()):
             if len(self.Scenarios) == 0: raise Exception("No scenarios selected.")      
 
             parsed_filter_list = self._ParseFilterString(self.FilterString)
+            filterLinks = [self._ParseLinkSelection(filter[1]) for filter in parsed_filter_list]
+
+            #The emmebank is only read from this thread. Workers sum the volumes from the arrays read.
+            packages = [self._ReadScenario(scenario) for scenario in self.Scenarios]
+            nWorkers = max(1, min(len(self.Scenarios), self.NumberOfProcessors))
+            if nWorkers > 1:
+                pool = _ThreadPool(nWorkers)
+                try:
+                    scenarioResults = pool.map(lambda package: self._CalcScenarioVolumes(package, parsed_filter_list, filterLinks),
+                                               packages)
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                scenarioResults = [self._CalcScenarioVolumes(package, parsed_filter_list, filterLinks)
+                                   for package in packages]
+            del packages
+
+            #Filters which are not simple link selections go through the network calculator
+            for scenario, results in _util.itersync(self.Scenarios, scenarioResults):
+                for filter, links in _util.itersync(parsed_filter_list, filterLinks):
+                    if links is not None: continue
+                    outputAuto = self._CalcVolumeWithCalculator(scenario, filter[1])
+                    if self.TransitFlag:
+                        results[filter[0]] = [outputAuto, "N/A"]
+                    else:
+                        results[filter[0]] = [outputAuto]
+                self.results[scenario.id] = results
+
+    def _ReadScenario(self, scenario):
+        '''
+        Reads the attribute arrays needed for a scenario's link volumes.
+        '''
+        autoPackage = scenario.get_attribute_values('LINK', ['auto_volume'])
+        if not self.TransitFlag:
+            return autoPackage, None
+        #transit scenario hard-coded as "the next" scenario
+        transitScenario = _MODELLER.emmebank.scenario(str(int(scenario.id) + 1))
+        return autoPackage, self._ReadTransitScenario(transitScenario)
+
+    def _ReadTransitScenario(self, transitScenario):
+        #Only the link geometry is needed to find the hypernetwork twins of a link
+        return (transitScenario.get_attribute_values('NODE', ['x', 'y']),
+                transitScenario.get_attribute_values('LINK', ['vertices']),
+                transitScenario.get_attribute_values('TRANSIT_SEGMENT', ['transit_volume']))
+
+    def _CalcScenarioVolumes(self, package, parsed_filter_list, filterLinks):
+        autoPackage, transitPackages = package
+        autoVolumes = self._GetLinkValues(autoPackage)
+        if self.TransitFlag:
+            shapes, linkShapes, transitVolumes = self._LoadTransitVolumes(transitPackages)
 
-            for scenario in self.Scenarios:
-                self.Scenario = _MODELLER.emmebank.scenario(scenario.id)
-                self.results[scenario.id] = {}
-                if self.TransitFlag:
-                    network = _MODELLER.emmebank.scenario(str(int(scenario.id) + 1)).get_network()
-            
-                for filter in parsed_filter_list:                                
-                
-                    spec1 = {
-                        "expression": "volau",                    
-                        "selections": {
-                            "link": filter[1]
-                            },
-                        "type": "NETWORK_CALCULATION"
-                    }
-                    try:
-                        report1 = networkCalculator(spec1, scenario=self.Scenario)
-                        outputAuto = report1['sum']
-                    except:
-                        outputAuto = "N/A"
+        results = {}
+        for filter, links in _util.itersync(parsed_filter_list, filterLinks):
+            if links is None: continue
 
-                    if self.TransitFlag:
-                        # consider adding an option to search for links with the same coordinates 
-                        # (i.e. the hypernetwork equivalent). Otherwise, this won't work
-                        # for streetcars, rail, etc.
-
-                        try:
-                            linkSelection = filter[1]
-                            baseLink = filter[1].strip('link=').split(",")
-                            baseLinkI = baseLink[0]
-                            baseLinkJ = baseLink[1]
-                            for link in network.links():
-                                if link.shape == network.link(baseLinkI, baseLinkJ).shape:
-                                    linkSelection += " or link=" + link.id.replace("-",",")
-
-                            spec2 = {
-                                "expression": "voltr",                    
-                                "selections": {
-                                    "link": linkSelection,
-                                    "transit_line": "all"
-                                    },
-                                "type": "NETWORK_CALCULATION"
-                            }
-
-                            #transit scenario hard-coded as "the next" scenario
-                        
-                            report2 = networkCalculator(spec2, scenario=_MODELLER.emmebank.scenario(str(int(scenario.id) + 1)))
-                            outputTransit = report2['sum']
-                        except:
-                            outputTransit = "N/A"
-                        self.results[scenario.id][filter[0]] = [outputAuto, outputTransit]
+            if all(link in autoVolumes for link in links):
+                outputAuto = sum(autoVolumes[link] for link in links)
+            else:
+                outputAuto = "N/A"
 
-                    else:
-                        self.results[scenario.id][filter[0]] = [outputAuto]
+            if self.TransitFlag:
+                outputTransit = self._SumTransitVolumes(links, shapes, linkShapes, transitVolumes)
+                results[filter[0]] = [outputAuto, outputTransit]
+            else:
+                results[filter[0]] = [outputAuto]
+        return results
+
+    def _GetLinkValues(self, package):
+        indices, table = package
+        keys, positions = _partial.flattenIndex('LINK', indices)
+        values = _np.asarray(table).take(positions)
+        return dict(_util.itersync(keys, values.tolist()))
+
+    def _LoadTransitVolumes(self, transitPackages):
+        '''
+        Returns the shape of each link (keyed by (i, j)), a LinkShapeIndex of
+        the links and the transit volumes summed by link, from the arrays read
+        by _ReadTransitScenario.
+        '''
+        nodePackage, vertexPackage, segmentPackage = transitPackages
+
+        nodeKeys, nodePositions = _partial.flattenIndex('NODE', nodePackage[0])
+        xs = _np.asarray(nodePackage[1]).take(nodePositions).tolist()
+        ys = _np.asarray(nodePackage[2]).take(nodePositions).tolist()
+        points = dict(_util.itersync(nodeKeys, list(zip(xs, ys))))
+
+        #Vertices are lists of points, so they are indexed as-is rather than as an array
+        linkKeys, linkPositions = _partial.flattenIndex('LINK', vertexPackage[0])
+        vertices = vertexPackage[1]
+        shapes = {}
+        linkShapes = _colocation.LinkShapeIndex()
+        for (i, j), position in _util.itersync(linkKeys, linkPositions.tolist()):
+            shape = [points[i]] + list(vertices[position]) + [points[j]]
+            shapes[(i, j)] = shape
+            linkShapes.insert((i, j), shape)
+
+        #Segment volumes, summed by link
+        segmentKeys, segmentPositions = _partial.flattenIndex('TRANSIT_SEGMENT', segmentPackage[0])
+        volumes = _np.asarray(segmentPackage[1]).take(segmentPositions).tolist()
+        transitVolumes = {}
+        for (lineId, i, j, loop), volume in _util.itersync(segmentKeys, volumes):
+            transitVolumes[(i, j)] = transitVolumes.get((i, j), 0.0) + volume
+        return shapes, linkShapes, transitVolumes
+
+    def _SumTransitVolumes(self, links, shapes, linkShapes, transitVolumes):
+        total = 0.0
+        counted = set()
+        for link in links:
+            shape = shapes.get(link)
+            if shape is None:
+                return "N/A"
+            #The link itself, and its hypernetwork twins
+            for key in linkShapes.getLinksWithShape(shape):
+                if key in counted: continue
+                counted.add(key)
+                total += transitVolumes.get(key, 0.0)
+        return total
+
+    def _CalcVolumeWithCalculator(self, scenario, selection):
+        spec = {
+            "expression": "volau",                    
+            "selections": {
+                "link": selection
+                },
+            "type": "NETWORK_CALCULATION"
+        }
+        try:
+            report = networkCalculator(spec, scenario=scenario)
+            return report['sum']
+        except:
+            return "N/A"
+
+    def _ParseLinkSelection(self, selection):
+        '''
+        Parses a selection made only of single links (e.g. "link=1,2 or link=3,4").
+        Returns the list of (i, j) tuples, or None for any other selection.
+        '''
+        links = []
+        for term in _regex_split(r'\s+or\s+', selection.strip()):
+            match = _LINK_TERM.match(term)
+            if match is None:
+                return None
+            links.append((int(match.group(1)), int(match.group(2))))
+        return links
 
     def _ParseFilterString(self, filterString):
         filterList = []
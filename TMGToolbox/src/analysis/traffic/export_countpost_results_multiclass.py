@@ -46,13 +46,19 @@ Export Countpost Results
     
     1.1.3 Added checks to make sure the alternative countpost attribute is not used form XTMF if
           there is a blank string.
+    
+    1.2.0 Countpost volumes are aggregated in a single pass over link attribute arrays, and the
+          sum-post file is read once instead of once per link. The traffic class attribute can
+          now be a comma-separated list, exporting one volume column per class.
 '''
 
 import inro.modeller as _m
 import traceback as _traceback
 import csv
+import numpy as _np
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
+_partial = _MODELLER.module('tmg.common.partial_network')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
 NullPointerException = _util.NullPointerException
 # import six library for python2 to python3 conversion
@@ -64,7 +70,7 @@ _util.initalizeModellerTypes(_m)
 
 class ExportCountpostResults(_m.Tool()):
     
-    version = '1.1.3'
+    version = '1.2.0'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
     
@@ -81,7 +87,6 @@ class ExportCountpostResults(_m.Tool()):
     TrafficClassAttributeId = _m.Attribute(str)
     SumPostFile = _m.Attribute(str)
     ExportFile = _m.Attribute(str)
-    version = '1.1.2'
     
     def __init__(self):
         #---Init internal variables
@@ -126,8 +131,8 @@ class ExportCountpostResults(_m.Tool()):
         pb.add_select(tool_attribute_name='TrafficClassAttributeId',
                       keyvalues=keyval2,
                       title="Volume Attribute to Use",
-                      note="<font color='green'><b>Optional:</b></font> Alternate countpost attribute \
-                      for multiple post per link")
+                      note="<font color='green'><b>Optional:</b></font> Link attribute holding the \
+                      volume of a traffic class. Defaults to the total auto volume.")
 
         pb.add_select_file(tool_attribute_name='SumPostFile',
                            window_type='file',
@@ -232,8 +237,9 @@ class ExportCountpostResults(_m.Tool()):
             raise NullPointerException("'%s' is not a valid link attribute" %CountpostAttributeId)
         if AlternateCountpostAttributeId != "" and not AlternateCountpostAttributeId in linkAtts:
             raise NullPointerException("'%s' is not a valid link attribute" %AlternateCountpostAttributeId)
-        if TrafficClassAttributeId != "" and str(TrafficClassAttributeId).strip().lower() != "none" and not TrafficClassAttributeId in linkAtts:
-            raise NullPointerException("'%s' is not a valid link attribute" %TrafficClassAttributeId)
+        for classAttributeId in self._ParseClassAttributes(TrafficClassAttributeId):
+            if not classAttributeId in linkAtts:
+                raise NullPointerException("'%s' is not a valid link attribute" %classAttributeId)
         if TrafficClassAttributeId == "" or str(TrafficClassAttributeId).strip().lower() == "none":
             self.TrafficClassAttributeId = None
         else:
@@ -259,31 +265,24 @@ class ExportCountpostResults(_m.Tool()):
         with _m.logbook_trace(name="{classname} v{version}".format(classname=(self.__class__.__name__), version=self.version),
                                      attributes=self._GetAtts()):
             self.TRACKER.reset()
-            if self.TrafficClassAttributeId != None:
-                linkResults = _util.fastLoadLinkAttributes(self.Scenario, [self.CountpostAttributeId,
-                                                                           self.TrafficClassAttributeId,
-                                                                       'auto_volume',
-                                                                       'additional_volume',
-                                                                       'auto_time'])
-            else:
-                linkResults = _util.fastLoadLinkAttributes(self.Scenario, [self.CountpostAttributeId,
-                                                                       'auto_volume',
-                                                                       'additional_volume',
-                                                                       'auto_time'])
             
-            alternateLinkResults = {}
-            if self.AlternateCountpostAttributeId and self.AlternateCountpostAttributeId != "":
-                alternateLinkResults = _util.fastLoadLinkAttributes(self.Scenario, 
-                                                                    [self.AlternateCountpostAttributeId])
+            classAttributes = self._ParseClassAttributes(self.TrafficClassAttributeId)
+            volumeAttributes = classAttributes if classAttributes else ['auto_volume']
             
-            #Remove entries not flagged with a countpost
-            self._CleanResults(linkResults, alternateLinkResults)
+            #Get the countpost and volume attributes of all links in one read
+            posts, volumes = self._LoadPostVolumes(volumeAttributes)
+            sumPosts = self._LoadSumPosts()
             
-            #Get the countpost data, sorted
-            lines = self._ProcessResults(linkResults, alternateLinkResults)
+            #Aggregate the volumes of each countpost
+            postIds, postVolumes = self._AggregatePosts(posts, volumes, sumPosts)
+            _m.logbook_write("Found %s countposts in network" %len(postIds))
             
             #Write countpost data to file
-            self._WriteReport(lines)
+            if len(classAttributes) > 1:
+                header = ["Countpost"] + classAttributes
+            else:
+                header = ["Countpost", "Auto Volume"]
+            self._WriteReport(header, postIds, postVolumes)
             
 
     ##########################################################################################################
@@ -301,102 +300,68 @@ class ExportCountpostResults(_m.Tool()):
             
         return atts
     
-    def _CleanResults(self, linkResults, alternateLinkResults):
-        idsToRemove = []
-        for linkId, attributes in six.iteritems(linkResults):
-            post1 = attributes[self.CountpostAttributeId]
-            post2 = 0
-            if linkId in alternateLinkResults:
-                post2 = alternateLinkResults[linkId][self.AlternateCountpostAttributeId] 
-            
-            if not post1 and not post2:
-                idsToRemove.append(linkId)
-        for key in idsToRemove:
-            linkResults.pop(key) 
+    @staticmethod
+    def _ParseClassAttributes(attributeIds):
+        if not attributeIds or str(attributeIds).strip().lower() in ("none", "-1"):
+            return []
+        return [attributeId.strip() for attributeId in str(attributeIds).split(',') if attributeId.strip()]
     
-    def _ProcessResults(self, linkResults, alternateLinkResults):
-        #lines = []
-        lines = {}
-        posts = 0
-        self.TRACKER.startProcess(len(linkResults))
-
-        for linkIdTuple, attributes in six.iteritems(linkResults):
-            linkId = "%s-%s" %linkIdTuple
-
-            post1 = attributes[self.CountpostAttributeId]
-            post2 = 0
-            if linkIdTuple in alternateLinkResults:
-                post2 = alternateLinkResults[linkIdTuple][self.AlternateCountpostAttributeId]
-            volau = attributes['auto_volume']
-            volad = attributes['additional_volume']
-            timau = attributes['auto_time']
-            if self.TrafficClassAttributeId is not None:
-                class_volume = attributes[self.TrafficClassAttributeId]
-            
-            data = [linkId, volau, volad, timau, class_volume]
-            
-            #if post1:
-            #    lines.append((post1, linkId, volau, volad, timau))
-            #if post2:
-            #    lines.append((post2, linkId, volau, volad, timau))
-            sumPosts = []
-            if self.SumPostFile is not None:
-                with open(self.SumPostFile) as sumPostFile:
-                    reader = csv.reader(sumPostFile)
-                    firstRow = six.next(reader)
-                    for row in reader:
-                        sumPosts.append(int(row[0]))
-            if post1:
-                if post1 in lines.keys():
-                    if post1 in sumPosts:
-                        if self.TrafficClassAttributeId is not None: 
-                            lines[post1] += class_volume
-                        else:
-                            lines[post1] += volau
-                    else:
-                        if self.TrafficClassAttributeId is not None: 
-                            max_vol = max(lines[post1], class_volume)
-                            lines[post1] = max_vol
-                        else:
-                            max_vol = max(lines[post1], volau)
-                            lines[post1] = max_vol
-
-                else:
-                    if self.TrafficClassAttributeId is not None:
-                        lines[post1] = class_volume
-                    else:
-                        lines[post1] = volau
-            if post2:
-                if post2 in lines.keys():
-                    if post2 in sumPosts:
-                        if self.TrafficClassAttributeId is not None: 
-                            lines[post2] += class_volume
-                        else:
-                            lines[post2] += volau
-                    else:
-                        if self.TrafficClassAttributeId is not None: 
-                            max_vol = max(lines[post2], class_volume)
-                            lines[post2] = max_vol
-                        else:
-                            max_vol = max(lines[post2], volau)
-                            lines[post2] = max_vol
-
-                else:
-                    if self.TrafficClassAttributeId is not None:
-                        lines[post2] = class_volume
-                    else:
-                        lines[post2] = volau
-
-            self.TRACKER.completeSubtask()
-        _m.logbook_write("Found %s countposts in network" %posts)
-        #lines.sort()
-        return lines
+    def _LoadPostVolumes(self, volumeAttributes):
+        '''
+        Returns an array of the countposts of each flagged link (one entry for each countpost
+        attribute on which the link is flagged) and a matching 2D array of its volumes, with
+        one column for each volume attribute.
+        '''
+        postAttributes = [self.CountpostAttributeId]
+        if self.AlternateCountpostAttributeId and self.AlternateCountpostAttributeId != "-1":
+            postAttributes.append(self.AlternateCountpostAttributeId)
+        
+        attributes = postAttributes + [att for att in volumeAttributes if att not in postAttributes]
+        editor = _partial.PartialNetworkEditor(self.Scenario, {'LINK': attributes}, loadNetwork=False)
+        volumes = _np.column_stack([editor.getValues('LINK', att) for att in volumeAttributes])
+        
+        posts = []
+        postVolumes = []
+        for att in postAttributes:
+            values = editor.getValues('LINK', att)
+            flagged = values != 0
+            posts.append(values[flagged])
+            postVolumes.append(volumes[flagged])
+        return _np.concatenate(posts), _np.concatenate(postVolumes)
+    
+    def _LoadSumPosts(self):
+        if self.SumPostFile is None:
+            return set()
+        sumPosts = set()
+        with open(self.SumPostFile) as sumPostFile:
+            reader = csv.reader(sumPostFile)
+            six.next(reader) #Skip the header
+            for row in reader:
+                if not row or not row[0].strip(): continue
+                sumPosts.add(int(row[0]))
+        return sumPosts
+    
+    def _AggregatePosts(self, posts, volumes, sumPosts):
+        '''
+        Totals the volumes of each countpost: summed over its links for the posts in the
+        sum-post list, otherwise the maximum over its links.
+        '''
+        postIds, positions = _np.unique(posts, return_inverse=True)
+        positions = positions.reshape(-1)
+        nPosts, nColumns = len(postIds), volumes.shape[1]
+        
+        sums = _np.zeros((nPosts, nColumns))
+        _np.add.at(sums, positions, volumes)
+        maxima = _np.full((nPosts, nColumns), -_np.inf)
+        _np.maximum.at(maxima, positions, volumes)
+        
+        isSumPost = _np.array([int(post) in sumPosts for post in postIds.tolist()], dtype=bool)
+        totals = _np.where(isSumPost[:, None], sums, maxima)
+        return postIds.astype(_np.int64), totals
     
-    def _WriteReport(self, lines):
+    def _WriteReport(self, header, postIds, postVolumes):
         with _util.open_csv_writer(self.ExportFile) as writer:
-            writer.writerow(["Countpost","Auto Volume"])
-            for post in sorted(six.iterkeys(lines)):
-                post = int(post)
-                volau = float(lines[post])
-                writer.writerow([post, volau])
-        _m.logbook_write("Wrote report to %s" %self.ExportFile)
\ No newline at end of file
+            writer.writerow(header)
+            for post, volumes in six.moves.zip(postIds.tolist(), postVolumes.tolist()):
+                writer.writerow([post] + volumes)
+        _m.logbook_write("Wrote report to %s" %self.ExportFile)
@@ -36,12 +36,18 @@
     1.0.0 Published on 2014-11-19
     
     1.1.0 Added functionality for XTMF
+    
+    1.2.0 Screenline totals are computed from link attribute arrays with a station incidence
+        matrix (see tmg.common.screenlines). Added runBatch, which exports several scenarios
+        and screenline files in one call, to a single long-format file.
 '''
 
 import inro.modeller as _m
 import traceback as _traceback
+from os import path as _path
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
+_screenlines = _MODELLER.module('tmg.common.screenlines')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
 # import six library for python2 to python3 conversion
 import six 
@@ -52,7 +58,7 @@ _util.initalizeModellerTypes(_m)
 
 class ExportScreenlineResults(_m.Tool()):
     
-    version = '1.1.0'
+    version = '1.2.0'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
     
@@ -287,6 +293,46 @@ class ExportScreenlineResults(_m.Tool()):
             raise Exception(msg)
         return
     
+    def runBatch(self, xtmf_ScenarioNumbers, CountpostFlagAttribute, AlternateFlagAttribute, ScreenlineFiles, ExportFile):
+        '''
+        Exports the screenline results of several scenarios and screenline files to a single
+        long-format file, with one row for each scenario, screenline file and screenline.
+        
+        Args:
+            - xtmf_ScenarioNumbers: Comma-separated list (or list) of scenario numbers
+            - CountpostFlagAttribute: LINK attribute containing countpost id numbers
+            - AlternateFlagAttribute: Optional alternate countpost attribute
+            - ScreenlineFiles: Semicolon-separated list (or list) of screenline definitions files
+            - ExportFile: The file to write
+        '''
+        scenarios = _screenlines.parseScenarioList(xtmf_ScenarioNumbers)
+        screenlineFiles = _screenlines.parseFileList(ScreenlineFiles)
+        
+        self.CountpostFlagAttribute = CountpostFlagAttribute
+        self.AlternateFlagAttribute = AlternateFlagAttribute
+        self.ExportFile = ExportFile
+        
+        with _m.logbook_trace(name="{classname} v{version} (batch)".format(classname=(self.__class__.__name__), version=self.version),
+                                     attributes={"Scenarios": ", ".join(str(sc.number) for sc in scenarios),
+                                                 "Screenline Files": "; ".join(screenlineFiles),
+                                                 "Version": self.version,
+                                                 "self": self.__MODELLER_NAMESPACE__}):
+            #Definitions are parsed once, for all scenarios
+            screenlineSets = [(_path.basename(filepath), _screenlines.ScreenlineSet.fromFile(filepath))
+                              for filepath in screenlineFiles]
+            
+            lines = ["Scenario,ScreenlineFile,Screenline,nStations,nMissing,AutoVolume,AdditionalVolume"]
+            for scenario in scenarios:
+                stationIds, stationTotals = self._LoadStationTotals(scenario)
+                for fileName, screenlineSet in screenlineSets:
+                    nMissing, totals = screenlineSet.aggregate(stationIds, stationTotals)
+                    for row in self._IterResultRows(screenlineSet, nMissing, totals):
+                        lines.append(",".join([str(scenario.number), fileName] + row))
+            
+            with open(self.ExportFile, 'w') as writer:
+                writer.write("\n".join(lines))
+            _m.logbook_write("Wrote %s screenline results to %s" %(len(lines) - 1, self.ExportFile))
+    
     ##########################################################################################################    
     
     #---
@@ -296,11 +342,12 @@ class ExportScreenlineResults(_m.Tool()):
         with _m.logbook_trace(name="{classname} v{version}".format(classname=(self.__class__.__name__), version=self.version),
                                      attributes=self._GetAtts()):
             
-            screenlines = self._LoadScreenlinesFile()
+            screenlineSet = _screenlines.ScreenlineSet.fromFile(self.ScreenlineFile)
             
-            counts = self._LoadResults()
+            stationIds, stationTotals = self._LoadStationTotals(self.Scenario)
+            nMissing, totals = screenlineSet.aggregate(stationIds, stationTotals)
             
-            self._ExportResults(screenlines, counts)
+            self._ExportResults(screenlineSet, nMissing, totals)
             
 
     ##########################################################################################################
@@ -315,78 +362,26 @@ class ExportScreenlineResults(_m.Tool()):
             
         return atts
     
-    def _LoadScreenlinesFile(self):        
-        screenlines = {}
-        with open(self.ScreenlineFile) as reader:
-            reader.readline()
-            for line in reader:
-                try:
-                    cells = line.strip().split(',')
-                    if len(cells) < 2: continue
-                    screenlineID = cells[0]
-                    countpostID = int(cells[1])
-                    if not screenlineID in screenlines:
-                        screenlines[screenlineID] = set([countpostID])
-                    else:
-                        screenlines[screenlineID].add(countpostID)
-                except:
-                    continue
-        return screenlines
+    def _GetPostAttributes(self):
+        atts = [self.CountpostFlagAttribute]
+        if self.AlternateFlagAttribute and self.AlternateFlagAttribute != "-1":
+            atts.append(self.AlternateFlagAttribute)
+        return atts
     
-    def _LoadResults(self):
-        atts = [self.CountpostFlagAttribute, 'auto_volume', 'additional_volume']
-        if self.AlternateFlagAttribute: atts.append(self.AlternateFlagAttribute)
-        
-        linkAttributes = _util.fastLoadLinkAttributes(self.Scenario, atts)
-        
-        counts = {}
-        for attributes in six.itervalues(linkAttributes):
-            volau = attributes['auto_volume']
-            volad = attributes['additional_volume']
-            
-            post1 = int(attributes[self.CountpostFlagAttribute])
-            post2 = 0
-            if self.AlternateFlagAttribute: post2 = int(attributes[self.AlternateFlagAttribute])
-            
-            if post1:
-                if not post1 in counts:
-                    counts[post1] = [volau, volad]
-                else:
-                    tup = counts[post1]
-                    tup[0] += volau
-                    tup[1] += volad
-            if post2:
-                if not post2 in counts:
-                    counts[post2] = [volau, volad]
-                else:
-                    tup = counts[post2]
-                    tup[0] += volau
-                    tup[1] += volad
-        return counts
+    def _LoadStationTotals(self, scenario):
+        postArrays, values = _screenlines.loadLinkPosts(scenario, self._GetPostAttributes(),
+                                                        ['auto_volume', 'additional_volume'])
+        return _screenlines.sumByCountpost(postArrays, values)
+    
+    def _IterResultRows(self, screenlineSet, nMissing, totals):
+        for screenlineID, nStations, missing, (volau, volad) in six.moves.zip(screenlineSet.ids,
+                                                                               screenlineSet.nStations.tolist(),
+                                                                               nMissing.tolist(), totals.tolist()):
+            yield [screenlineID, str(nStations), str(missing), str(volau), str(volad)]
     
-    def _ExportResults(self, screenlines, counts):
+    def _ExportResults(self, screenlineSet, nMissing, totals):
+        lines = ["Screenline,nStations,nMissing,AutoVolume,AdditionalVolume"]
+        for row in self._IterResultRows(screenlineSet, nMissing, totals):
+            lines.append(",".join(row))
         with open(self.ExportFile, 'w') as writer:
-            writer.write("Screenline,nStations,nMissing,AutoVolume,AdditionalVolume")
-            
-            orderedLines = [item for item in six.iteritems(screenlines)]
-            orderedLines.sort()
-            
-            for screenlineID, stations in orderedLines:
-                totalVolau = 0
-                totalVolad = 0
-                nStations = len(stations)
-                nMissing = 0
-                
-                for station in stations:
-                    if not station in counts:
-                        nMissing += 1
-                        continue
-                    volau, volad = counts[station]
-                    totalVolau += volau
-                    totalVolad += volad
-                
-                writer.write("\n" + ",".join([screenlineID, str(nStations), str(nMissing), \
-                                              str(totalVolau), str(totalVolad)]))
-                    
-                
-        
\ No newline at end of file
+            writer.write("\n".join(lines))
@@ -42,13 +42,17 @@ GET STATION ACCESS FILE
     
     
     1.0.0 Published to use the new spatial index module.
+    
+    1.1.0 Zones near stations are found with a single bulk radius search, and the
+        file is written in one pass. Added the option to sweep additional search
+        radii in the same run, each saved to its own file.
 '''
 
 import inro.modeller as _m
 import traceback as _traceback
 from contextlib import contextmanager
+from collections import OrderedDict
 from os import path as _path
-from math import sqrt
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
@@ -62,7 +66,7 @@ _util.initalizeModellerTypes(_m)
 
 class GetStationAccessFile(_m.Tool()):
     
-    version = '1.0.0'
+    version = '1.1.0'
     tool_run_msg = ""
     number_of_tasks = 6 # For progress reporting, enter the integer number of tasks here
     
@@ -74,6 +78,7 @@ class GetStationAccessFile(_m.Tool()):
     xtmf_ScenarioNumber = _m.Attribute(int) # parameter used by XTMF only
     Scenario = _m.Attribute(_m.InstanceType) # common variable or parameter
     SearchRadius = _m.Attribute(float)
+    AdditionalSearchRadii = _m.Attribute(str)
     GoStationSelectorExpression = _m.Attribute(str)
     ExportFile = _m.Attribute(str)
     
@@ -121,6 +126,13 @@ class GetStationAccessFile(_m.Tool()):
                            start_path=basepath,
                            title="Output File")
         
+        pb.add_text_box(tool_attribute_name='AdditionalSearchRadii',
+                        size=50, title="Additional Search Radii",
+                        note="<font color='green'><b>Optional:</b></font> \
+                            Comma-separated list of other radii to test in the same run. \
+                            <br>The results for each are saved next to the output file, \
+                            with the radius appended to its name (e.g. <em>access_1500.csv</em>).")
+        
         pb.add_text_box(tool_attribute_name='GoStationSelectorExpression',
                         size=100, multi_line=True,
                         title="GO Station Selector",
@@ -147,7 +159,8 @@ class GetStationAccessFile(_m.Tool()):
         
         self.tool_run_msg = _m.PageBuilder.format_info("Run complete.")
     
-    def __call__(self, xtmf_ScenarioNumber, SearchRadius, GoStationSelectorExpression, ExportFile):
+    def __call__(self, xtmf_ScenarioNumber, SearchRadius, GoStationSelectorExpression, ExportFile,
+                 AdditionalSearchRadii=""):
         
         #---1 Set up scenario
         self.Scenario = _m.Modeller().emmebank.scenario(xtmf_ScenarioNumber)
@@ -157,6 +170,7 @@ class GetStationAccessFile(_m.Tool()):
         self.SearchRadius = SearchRadius
         self.GoStationSelectorExpression = GoStationSelectorExpression
         self.ExportFile = ExportFile
+        self.AdditionalSearchRadii = AdditionalSearchRadii
         
         try:
             self._Execute()
@@ -171,6 +185,7 @@ class GetStationAccessFile(_m.Tool()):
                                      attributes=self._GetAtts()):
             
             #self.ExportFile = _path.splitext(self.ExportFile)[0] + ".csv"
+            radii = self._GetSearchRadii()
             
             with self._FlagAttributeMANAGER():
                 try:
@@ -184,52 +199,21 @@ class GetStationAccessFile(_m.Tool()):
                 else:
                     self.TRACKER.completeTask()
                 
-                _m.logbook_write("Building search grid")    
+                _m.logbook_write("Loading network")
                 network = self.Scenario.get_network()
                 self.TRACKER.completeTask()
                 
-                network.create_attribute('NODE', 'subStation', 0)
-                network.create_attribute('NODE', 'goStation', 0)
-                
                 with _m.logbook_trace("Getting station coordinates"):
                     self._FlagTransitStops(network)
                     subwayStations, goStations = self._GetNodeSet(network)
+                
+                with _m.logbook_trace("Performing search"):
+                    centroids = list(network.centroids())
+                    subwayDistances = self._GetNearestStationDistances(subwayStations, centroids, max(radii))
+                    goDistances = self._GetNearestStationDistances(goStations, centroids, max(radii))
                     
-                with _m.logbook_trace("Performing search") as log, open(self.ExportFile, 'w') as writer:
-                    
-                    #Prepare the search grid
-                    extents = _spindex.get_network_extents(network)
-                    spatialIndex = _spindex.GridIndex(extents, marginSize= 1.0)
-                    for zone in network.centroids():
-                        spatialIndex.insertPoint(zone)
-                    
-                    self.TRACKER.startProcess(len(subwayStations) + len(goStations))
-                    for station in subwayStations:
-                        nearbyNodes = spatialIndex.queryCircle(station.x, station.y, self.SearchRadius)
-                        for node in nearbyNodes:
-                            dist = sqrt((node.x - station.x)**2 + (node.y - station.y)**2)
-                            if dist > self.SearchRadius: continue
-                            
-                            node.subStation = 1
-                        self.TRACKER.completeSubtask()
-                    
-                    for station in goStations:
-                        nearbyNodes = spatialIndex.queryCircle(station.x, station.y, self.SearchRadius)
-                        for node in nearbyNodes:
-                            dist = sqrt((node.x - station.x)**2 + (node.y - station.y)**2)
-                            if dist > self.SearchRadius: continue
-                            
-                            node.goStation = 1
-                        self.TRACKER.completeSubtask()
-                    
-                    #Prepare the file
-                    writer.write("Zone,NearSubway,NearGO")
-                    for centroid in network.centroids():
-                        writer.write("\n%s,%s,%s" %(centroid.number, 
-                                                      centroid.subStation, 
-                                                      centroid.goStation))
-                        
-                        
+                    for radius, filepath in radii.items():
+                        self._WriteAccessFile(filepath, centroids, subwayDistances <= radius, goDistances <= radius)
                     self.TRACKER.completeTask()
 
     ##########################################################################################################
@@ -273,6 +257,48 @@ class GetStationAccessFile(_m.Tool()):
         
         return spec
     
+    def _GetSearchRadii(self):
+        '''
+        Returns an ordered dict of search radius -> export file. The main search radius
+        is saved to the export file, and any additional radii alongside it.
+        '''
+        radii = OrderedDict()
+        radii[float(self.SearchRadius)] = self.ExportFile
+        
+        if self.AdditionalSearchRadii:
+            basepath, ext = _path.splitext(self.ExportFile)
+            for cell in self.AdditionalSearchRadii.replace(';', ',').split(','):
+                cell = cell.strip()
+                if not cell: continue
+                try:
+                    radius = float(cell)
+                except ValueError:
+                    raise SyntaxError("Could not parse search radius '%s'" %cell)
+                if radius in radii: continue
+                radii[radius] = "%s_%s%s" %(basepath, cell, ext)
+        
+        for radius in radii:
+            if radius < 0:
+                raise ValueError("Search radius cannot be negative: %s" %radius)
+        return radii
+    
+    def _GetNearestStationDistances(self, stations, centroids, radius):
+        stations = list(stations)
+        return _spindex.nearestSourceDistances([station.x for station in stations],
+                                               [station.y for station in stations],
+                                               [centroid.x for centroid in centroids],
+                                               [centroid.y for centroid in centroids],
+                                               radius)
+    
+    def _WriteAccessFile(self, filepath, centroids, nearSubway, nearGo):
+        lines = ["Zone,NearSubway,NearGO"]
+        for centroid, subway, go in six.moves.zip(centroids, nearSubway.astype(int).tolist(),
+                                                   nearGo.astype(int).tolist()):
+            lines.append("%s,%s,%s" %(centroid.number, subway, go))
+        with open(filepath, 'w') as writer:
+            writer.write("\n".join(lines))
+        _m.logbook_write("Wrote station access file '%s'" %filepath)
+    
     def _GetCheckMode(self, network, modeId):
         mode = network.mode(modeId)
         if mode is None:
@@ -33,14 +33,20 @@ Export Transit Line Boardings
 '''
     0.0.1 Created on 2015-06-23 by mattaustin222
     
+    0.1.0 Co-located nodes are found with a coordinate hash index built once, instead
+        of scanning every node for each station. Boardings and alightings are summed
+        from segment arrays in a single pass over the transit lines.
+    
 '''
 
 import inro.modeller as _m
 
 import csv
 import traceback as _traceback
+import numpy as _np
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
+_colocation = _MODELLER.module('tmg.common.colocation_index')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
 EMME_VERSION = _util.getEmmeVersion(tuple) 
 # import six library for python2 to python3 conversion
@@ -52,7 +58,7 @@ _util.initalizeModellerTypes(_m)
 
 class ExtractStationBoardingsAlightings(_m.Tool()):
     
-    version = '0.0.1'
+    version = '0.1.0'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
     
@@ -226,26 +232,42 @@ class ExtractStationBoardingsAlightings(_m.Tool()):
         return nodeDict, badIds
 
     def _CalcBoardingAlighting(self, network, nodeIds):
+        #Segment attributes in itinerary order, including the hidden segment at
+        #the end of each line (which has no volume or boardings).
+        iNodes = []
+        boardings = []
+        volumes = []
+        lineStarts = []
+        for line in network.transit_lines():
+            lineStarts.append(len(iNodes))
+            for segment in line.segments(include_hidden=True):
+                iNodes.append(segment.i_node.number)
+                boardings.append(segment.transit_boardings)
+                volumes.append(segment.transit_volume)
+        boardings = _np.array(boardings, dtype=_np.float64)
+        volumes = _np.array(volumes, dtype=_np.float64)
+        previousVolumes = _np.roll(volumes, 1)
+        previousVolumes[lineStarts] = 0.0
+        alightings = previousVolumes + boardings - volumes
+        
+        #Sum by i-node
+        nodeNumbers, nodePositions = _np.unique(_np.array(iNodes, dtype=_np.int64), return_inverse=True)
+        nodeBoardings = _np.bincount(nodePositions, weights=boardings, minlength=len(nodeNumbers))
+        nodeAlightings = _np.bincount(nodePositions, weights=alightings, minlength=len(nodeNumbers))
+        nodeTotals = dict((number, (nodeBoardings[pos], nodeAlightings[pos]))
+                          for pos, number in enumerate(nodeNumbers.tolist()))
+        
+        #Sum by station, over all of the nodes which share the station's coordinates
+        colocatedNodes = _colocation.CoLocatedNodeIndex.fromNetwork(network)
         for id in nodeIds:
-            baseNode = network.node(id)
-            checkNodes = []
-            for node in network.nodes():
-                if node.x == baseNode.x:
-                    if node.y == baseNode.y:
-                        checkNodes.append(node)
             totalBoard = 0
             totalAlight = 0
             initialBoards = 0
             finalAlights = 0
-            for node in checkNodes:
-                for segment in node.outgoing_segments(include_hidden=True):
-                    board = segment.transit_boardings
-                    totalBoard += board
-                    
-                    voltr = segment.transit_volume
-                    index = segment.number - 1
-                    voltrLast = segment.line.segment(index).transit_volume
-                    totalAlight += (voltrLast + board - voltr)
+            for node in colocatedNodes.getCoLocatedNodes(network.node(id)):
+                board, alight = nodeTotals.get(node.number, (0.0, 0.0))
+                totalBoard += board
+                totalAlight += alight
                 initialBoards += node.initial_boardings
                 finalAlights += node.final_alightings
             nodeIds[id].append(round(totalBoard))
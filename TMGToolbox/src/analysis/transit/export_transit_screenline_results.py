@@ -38,14 +38,22 @@
     1.1.0 Added functionality for XTMF
 
     2.0.0 Forked from base Export Screenline Results tool
+    
+    2.1.0 Screenline totals are computed from link and segment attribute arrays with a station
+        incidence matrix (see tmg.common.screenlines); the network calculation is only needed
+        for line filters other than 'all'. Added runBatch, which exports several scenarios and
+        screenline files in one call, to a single long-format file.
 '''
 
 import inro.modeller as _m
 import traceback as _traceback
+from os import path as _path
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
+_screenlines = _MODELLER.module('tmg.common.screenlines')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
 netCalc = _MODELLER.tool('inro.emme.network_calculation.network_calculator')
+NullPointerException = _util.NullPointerException
 # import six library for python2 to python3 conversion
 import six 
 # initalize python3 types
@@ -55,7 +63,7 @@ _util.initalizeModellerTypes(_m)
 
 class ExportTransitScreenlineResults(_m.Tool()):
     
-    version = '2.0.0'
+    version = '2.1.0'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
     
@@ -323,6 +331,48 @@ class ExportTransitScreenlineResults(_m.Tool()):
             raise Exception(msg)
         return
     
+    def runBatch(self, xtmf_ScenarioNumbers, CountpostFlagAttribute, AlternateFlagAttribute, ScreenlineFiles, ExportFile,
+                 LineFilterExpression, RepresentativeHourFactor, PedestrianFlag):
+        '''
+        Exports the screenline results of several scenarios and screenline files to a single
+        long-format file, with one row for each scenario, screenline file and screenline.
+        
+        Args:
+            - xtmf_ScenarioNumbers: Comma-separated list (or list) of scenario numbers
+            - ScreenlineFiles: Semicolon-separated list (or list) of screenline definitions files
+            - Other arguments as for __call__
+        '''
+        scenarios = _screenlines.parseScenarioList(xtmf_ScenarioNumbers)
+        screenlineFiles = _screenlines.parseFileList(ScreenlineFiles)
+        
+        self.CountpostFlagAttribute = CountpostFlagAttribute
+        self.AlternateFlagAttribute = AlternateFlagAttribute
+        self.ExportFile = ExportFile
+        self.LineFilterExpression = LineFilterExpression
+        self.RepresentativeHourFactor = RepresentativeHourFactor
+        self.PedestrianFlag = PedestrianFlag
+        
+        with _m.logbook_trace(name="{classname} v{version} (batch)".format(classname=(self.__class__.__name__), version=self.version),
+                                     attributes={"Scenarios": ", ".join(str(sc.number) for sc in scenarios),
+                                                 "Screenline Files": "; ".join(screenlineFiles),
+                                                 "Version": self.version,
+                                                 "self": self.__MODELLER_NAMESPACE__}):
+            #Definitions are parsed once, for all scenarios
+            screenlineSets = [(_path.basename(filepath), _screenlines.ScreenlineSet.fromFile(filepath))
+                              for filepath in screenlineFiles]
+            
+            lines = [",".join(["Scenario", "ScreenlineFile"] + self._GetHeader())]
+            for scenario in scenarios:
+                stationIds, stationTotals = self._LoadStationTotals(scenario)
+                for fileName, screenlineSet in screenlineSets:
+                    nMissing, totals = screenlineSet.aggregate(stationIds, stationTotals)
+                    for row in self._IterResultRows(screenlineSet, nMissing, totals):
+                        lines.append(",".join([str(scenario.number), fileName] + row))
+            
+            with open(self.ExportFile, 'w') as writer:
+                writer.write("\n".join(lines))
+            _m.logbook_write("Wrote %s screenline results to %s" %(len(lines) - 1, self.ExportFile))
+    
     ##########################################################################################################    
     
     #---
@@ -332,16 +382,12 @@ class ExportTransitScreenlineResults(_m.Tool()):
         with _m.logbook_trace(name="{classname} v{version}".format(classname=(self.__class__.__name__), version=self.version),
                                      attributes=self._GetAtts()):
             
-            screenlines = self._LoadScreenlinesFile()
+            screenlineSet = _screenlines.ScreenlineSet.fromFile(self.ScreenlineFile)
             
-            with _util.tempExtraAttributeMANAGER(self.Scenario, 'LINK', description= "Link Volumes") \
-                as linkSumAtt:
-
-                self._ProcessLinkAtt(linkSumAtt.id)
-
-                counts = self._LoadResults(linkSumAtt.id)
+            stationIds, stationTotals = self._LoadStationTotals(self.Scenario)
+            nMissing, totals = screenlineSet.aggregate(stationIds, stationTotals)
             
-                self._ExportResults(screenlines, counts)
+            self._ExportResults(screenlineSet, nMissing, totals)
             
 
     ##########################################################################################################
@@ -356,100 +402,53 @@ class ExportTransitScreenlineResults(_m.Tool()):
             
         return atts
     
-    def _LoadScreenlinesFile(self):        
-        screenlines = {}
-        with open(self.ScreenlineFile) as reader:
-            reader.readline()
-            for line in reader:
-                try:
-                    cells = line.strip().split(',')
-                    if len(cells) < 2: continue
-                    screenlineID = cells[0]
-                    countpostID = int(cells[1])
-                    if not screenlineID in screenlines:
-                        screenlines[screenlineID] = set([countpostID])
-                    else:
-                        screenlines[screenlineID].add(countpostID)
-                except:
-                    continue
-        return screenlines
+    def _GetPostAttributes(self):
+        atts = [self.CountpostFlagAttribute]
+        if self.AlternateFlagAttribute and self.AlternateFlagAttribute != "-1":
+            atts.append(self.AlternateFlagAttribute)
+        return atts
     
-    def _ProcessLinkAtt(self, linkSumAttId):
+    def _LoadStationTotals(self, scenario):
         if self.PedestrianFlag:
-            spec = {
-                "result": linkSumAttId,
-                "expression": "volax",
-                "selections": {
-                    "link": "all"
-                },
-                "type": "NETWORK_CALCULATION"
-            }
+            postArrays, values = _screenlines.loadLinkPosts(scenario, self._GetPostAttributes(), ['aux_transit_volume'])
+        elif not self.LineFilterExpression or self.LineFilterExpression.strip().lower() == "all":
+            postArrays, values = _screenlines.loadLinkPosts(scenario, self._GetPostAttributes(), [],
+                                                            segmentAttributes=['transit_volume'])
         else:
-            spec = {
-                "result": linkSumAttId,
-                "expression": "voltr",
-                "aggregation": "+",
-                "selections": {
-                    "transit_line": self.LineFilterExpression,
-                    "link": "all"
-                    },
-                "type": "NETWORK_CALCULATION"
-            }
-        
-        netCalc(spec, scenario=self.Scenario)
+            #Line filters are Emme selector expressions, so the network calculator sums the selected lines
+            with _util.tempExtraAttributeMANAGER(scenario, 'LINK', description= "Link Volumes") as linkSumAtt:
+                self._ProcessLinkAtt(scenario, linkSumAtt.id)
+                postArrays, values = _screenlines.loadLinkPosts(scenario, self._GetPostAttributes(), [linkSumAtt.id])
+        return _screenlines.sumByCountpost(postArrays, values)
     
-    def _LoadResults(self, linkSumAttId):
-        linkAtts = [self.CountpostFlagAttribute, linkSumAttId]
-        if self.AlternateFlagAttribute: linkAtts.append(self.AlternateFlagAttribute)
-        
-        linkAttributes = _util.fastLoadLinkAttributes(self.Scenario, linkAtts)
+    def _ProcessLinkAtt(self, scenario, linkSumAttId):
+        spec = {
+            "result": linkSumAttId,
+            "expression": "voltr",
+            "aggregation": "+",
+            "selections": {
+                "transit_line": self.LineFilterExpression,
+                "link": "all"
+                },
+            "type": "NETWORK_CALCULATION"
+        }
         
-        counts = {}
-        for attributes in six.itervalues(linkAttributes):
-            voltrLink = attributes[linkSumAttId]
-                        
-            post1 = int(attributes[self.CountpostFlagAttribute])
-            post2 = 0
-            if self.AlternateFlagAttribute: post2 = int(attributes[self.AlternateFlagAttribute])
-            
-            if post1:
-                if not post1 in counts:
-                    counts[post1] = voltrLink
-                else:
-                    counts[post1] += voltrLink
-            if post2:
-                if not post2 in counts:
-                    counts[post2] = voltrLink
-                else:
-                    counts[post2] += voltrLink
-        return counts
+        netCalc(spec, scenario=scenario)
+    
+    def _GetHeader(self):
+        if self.PedestrianFlag:
+            return ["Screenline", "nStations", "nMissing", "PedVolume"]
+        return ["Screenline", "nStations", "nMissing", "TransitVolume"]
     
-    def _ExportResults(self, screenlines, counts):
+    def _IterResultRows(self, screenlineSet, nMissing, totals):
+        totals = totals[:, 0] / self.RepresentativeHourFactor
+        for screenlineID, nStations, missing, total in six.moves.zip(screenlineSet.ids, screenlineSet.nStations.tolist(),
+                                                                      nMissing.tolist(), totals.tolist()):
+            yield [screenlineID, str(nStations), str(missing), str(total)]
+    
+    def _ExportResults(self, screenlineSet, nMissing, totals):
+        lines = [",".join(self._GetHeader())]
+        for row in self._IterResultRows(screenlineSet, nMissing, totals):
+            lines.append(",".join(row))
         with open(self.ExportFile, 'w') as writer:
-            if self.PedestrianFlag:
-                writer.write("Screenline,nStations,nMissing,PedVolume")
-            else:
-                writer.write("Screenline,nStations,nMissing,TransitVolume")
-            
-            orderedLines = [item for item in six.iteritems(screenlines)]
-            orderedLines.sort()
-            
-            for screenlineID, stations in orderedLines:
-                totalVoltr = 0
-                nStations = len(stations)
-                nMissing = 0
-                
-                for station in stations:
-                    if not station in counts:
-                        nMissing += 1
-                        continue
-                    voltrLink = counts[station]
-                    totalVoltr += voltrLink
-
-                totalVoltr /= self.RepresentativeHourFactor
-                
-                writer.write("\n" + ",".join([screenlineID, str(nStations), str(nMissing), \
-                                              str(totalVoltr)]))
-                    
-                
-        
\ No newline at end of file
+            writer.write("\n".join(lines))
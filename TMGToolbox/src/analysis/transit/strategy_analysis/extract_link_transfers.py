@@ -35,6 +35,7 @@ Extract Link Transfers
 '''
 	0.0.1 Created on 2016-02-16 by Matt Austin: Initial build
 	0.0.2 Created on 2016-05-09 by Matt Austin: Added ability to restrict to a set of lines on each link
+	0.0.3 Hypernetwork links are found through a co-located node index, built once for all link pairs
 '''
 
 import inro.modeller as _m
@@ -44,6 +45,7 @@ from re import split as _regex_split
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _spindex = _MODELLER.module('tmg.common.spatial_index')
+_colocation = _MODELLER.module('tmg.common.colocation_index')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
 networkCalcTool = _MODELLER.tool('inro.emme.network_calculation.network_calculator')
 pathAnalysis = _m.Modeller().tool("inro.emme.transit_assignment.extended.path_based_analysis")
@@ -58,7 +60,7 @@ _util.initalizeModellerTypes(_m)
 
 class ExtractLinkTransfers(_m.Tool()):
 	
-	version = '0.0.2'
+	version = '0.0.3'
 	tool_run_msg = ""
 	number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
 	
@@ -218,28 +220,30 @@ class ExtractLinkTransfers(_m.Tool()):
 			else:
 				demandMatrixId = self.DemandMatrix.id			 
 			
+			colocatedNodes = None # Built once, the first time it is needed
 			for linkPair in linkLists:
 				fullLinkSet = linkPair[0:3]
 				link1List = [linkPair[1]] # maintain a list of links at and above link 1 for volume summing later (sums at/above link 1 and 2 will be identical)
 				if self.HypernetworkFlag: # search for links 'above' the initial link pair in the hypernetwork
 					print("Looking for links in the hypernetwork")
-					network = self.BaseScenario.get_network()					 
+					if colocatedNodes is None:
+						network = self.BaseScenario.get_network()
+						colocatedNodes = _colocation.CoLocatedNodeIndex.fromNetwork(network)
 					initialLink1 = self._ParseIndividualLink(linkPair[1])
 					initialLink2 = self._ParseIndividualLink(linkPair[2])
 					inode1 = initialLink1[0]
 					inode2 = initialLink2[0]
 					jnode1 = initialLink1[1]
 					jnode2 = initialLink2[1]
-					for link in network.links():
-						if link.shape == network.link(inode1, jnode1).shape:
-							linkString = self._LinkToString(link)
-							if linkString not in fullLinkSet:
-								fullLinkSet.append(linkString)
-								link1List.append(linkString)
-						if link.shape == network.link(inode2, jnode2).shape:
-							linkString = self._LinkToString(link)
-							if linkString not in fullLinkSet:
-								fullLinkSet.append(linkString)
+					for link in colocatedNodes.getTwinLinks(network.link(inode1, jnode1)):
+						linkString = self._LinkToString(link)
+						if linkString not in fullLinkSet:
+							fullLinkSet.append(linkString)
+							link1List.append(linkString)
+					for link in colocatedNodes.getTwinLinks(network.link(inode2, jnode2)):
+						linkString = self._LinkToString(link)
+						if linkString not in fullLinkSet:
+							fullLinkSet.append(linkString)
 
 				with _util.tempExtraAttributeMANAGER(self.BaseScenario, 'LINK', description= 'Link Flag') as linkMarkerAtt, _util.tempExtraAttributeMANAGER(self.BaseScenario, 'TRANSIT_LINE', description= 'Line Flag') as lineMarkerAtt, _util.tempExtraAttributeMANAGER(self.BaseScenario, 'TRANSIT_SEGMENT', description= 'Transit Volumes') as segVol:
 					
@@ -48,9 +48,6 @@ import inro.modeller as _m
 
 import traceback as _traceback
 from contextlib import contextmanager
-from os.path import exists
-from json import loads as _parsedict
-from os.path import dirname
 import tempfile as _tf
 import shutil as _shutil
 from multiprocessing import cpu_count
@@ -548,92 +545,33 @@ class OperatorTransferMatrix(_m.Tool()):
             
         return atts
     
+    def _GetStrategyMetadata(self):
+        if not self.Scenario.has_transit_results: return None
+        return _util.loadTransitStrategyMetadata(self.Scenario)
+    
     def _GetAssignmentType(self):
         if not self.Scenario.has_transit_results: return None
         
-        configPath = dirname(_MODELLER.desktop.project_file_name()) \
-                    + "/Database/STRATS_s%s/config" %self.Scenario
-        
-        if not exists(configPath): return self.Scenario.transit_assignment_type
-        
-        with open(configPath) as reader:
-            config = _parsedict(reader.read())
-        
-        data = config['data']
-        return data['type']
+        metadata = self._GetStrategyMetadata()
+        if metadata is None: return self.Scenario.transit_assignment_type
+        return metadata.assignmentType
         
     def _GetMulticlass(self):
         if not self.Scenario.has_transit_results: return None
         
-        configPath = dirname(_MODELLER.desktop.project_file_name()) \
-                    + "/Database/STRATS_s%s/config" %self.Scenario
-        
-        if not exists(configPath): return self.Scenario.transit_assignment_type
-        
-        with open(configPath) as reader:
-            config = _parsedict(reader.read())
-        
-        data = config['data']
-        if 'multi_class' in data:
-            return data['multi_class']
-        else:
-            return False
+        metadata = self._GetStrategyMetadata()
+        if metadata is None: return self.Scenario.transit_assignment_type
+        return metadata.isMulticlass
 
     def _LoadClassInfo(self):
-        
-        if not self.Scenario.has_transit_results: return []
-        
-        configPath = dirname(_MODELLER.desktop.project_file_name()) \
-                    + "/Database/STRATS_s%s/config" %self.Scenario
-        
-        if not exists(configPath): return []
-        
-        with open(configPath) as reader:
-            config = _parsedict(reader.read())
-        
-        classes = []
-        i = 0
-
-        for info in config['strat_files']:
-            className = info['name']
-            
-            if(info['data'] is not None):
-                if not 'alpha' in info['data']:
-                    if(config['data']['alphas'] is not None):
-                        alpha = config['data']['alphas'][i]
-                        i += 1
-                    else:
-                        alpha = 0.0
-                else: 
-                    alpha = info['data']['alpha']
-            classes.append((className, alpha))
-        
-        return classes
+        metadata = self._GetStrategyMetadata()
+        if metadata is None: return []
+        return list(metadata.classWeights)
 
     def _LoadClassNames(self):
-        
-        if not self.Scenario.has_transit_results: return []
-        
-        configPath = dirname(_MODELLER.desktop.project_file_name()) \
-                    + "/Database/STRATS_s%s/config" %self.Scenario
-        
-        if not exists(configPath): return []
-        
-        with open(configPath) as reader:
-            config = _parsedict(reader.read())
-        
-        classes = []
-        if self._GetAssignmentType() == 'MULTICLASS_TRANSIT_ASSIGNMENT':
-            for classz in config['strat_files']:
-                className = classz['name']
-                classes.append(className)
-        else:
-            info = config['data']
-            for classz in info['classes']:
-                className = classz['name']
-                classes.append(className)
-        
-        return classes
+        metadata = self._GetStrategyMetadata()
+        if metadata is None: return []
+        return list(metadata.classNames)
     
     def _ApplyPreBuiltCodes(self, option, attributeId):
         options = {1: LINE_GROUPS_NCS11,
@@ -36,16 +36,16 @@ Extract Transit Origin and Destination Vectors
     0.0.1 Created on 2015-06-19 by mattaustin222
     0.0.2 Upgraded to use two smaller path-based analyses and one strategy-based. Provides
         significant speed-up.
+    0.0.3 Station probabilities are computed from link attribute arrays over a configurable
+        station range, and applied directly to the rows / columns of the auto demand instead
+        of building full probability matrices.
     
 '''
 
 import inro.modeller as _m
-import inro.emme.matrix as _matrix
 import traceback as _traceback
 import numpy as np
 from multiprocessing import cpu_count
-from json import loads as _parsedict
-from os.path import dirname
 from copy import deepcopy
 
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
@@ -55,7 +55,6 @@ networkCalculation = _m.Modeller().tool("inro.emme.network_calculation.network_c
 pathAnalysis = _m.Modeller().tool("inro.emme.transit_assignment.extended.path_based_analysis")
 stratAnalysis = _m.Modeller().tool('inro.emme.transit_assignment.extended.strategy_based_analysis')
 matrixAgg = _m.Modeller().tool("inro.emme.matrix_calculation.matrix_aggregation")
-matrixCopy = _m.Modeller().tool("inro.emme.data.matrix.copy_matrix")
 matrixCalc = _m.Modeller().tool("inro.emme.matrix_calculation.matrix_calculator")
 EMME_VERSION = _util.getEmmeVersion(tuple)
 
@@ -68,7 +67,7 @@ _util.initalizeModellerTypes(_m)
 
 class ExtractTransitODVectors(_m.Tool()):
     
-    version = '0.0.2'
+    version = '0.0.3'
     tool_run_msg = ""
     number_of_tasks = 2 # For progress reporting, enter the integer number of tasks here
     
@@ -93,6 +92,7 @@ class ExtractTransitODVectors(_m.Tool()):
     xtmf_AutoODMatrixId = _m.Attribute(int)
     xtmf_AccessStationRange = _m.Attribute(str)
     xtmf_ZoneCentroidRange = _m.Attribute(str)
+    StationRange = _m.Attribute(str)
 
 
     NumberOfProcessors = _m.Attribute(int)
@@ -103,6 +103,7 @@ class ExtractTransitODVectors(_m.Tool()):
         
         #---Set the defaults of parameters used by Modeller
         self.Scenario = _MODELLER.scenario #Default is primary scenario
+        self.StationRange = "9700-9998"
 
         self.NumberOfProcessors = cpu_count()
     
@@ -150,13 +151,20 @@ class ExtractTransitODVectors(_m.Tool()):
                                 filter=['FULL'],
                                 allow_none=False,
                                 id=True)
+
+        pb.add_text_box(tool_attribute_name='StationRange',
+                        title="Station Centroid Range",
+                        note="Range of station (parking) centroids whose drive-access demand is \
+                            split by line group, e.g. '9700-9998'.",
+                        size=20)
         
         return pb.render()
 
     ##########################################################################################################
         
     def __call__(self, xtmf_ScenarioNumber, LineFilterExpression, xtmf_LineODMatrixNumber,
-                  xtmf_AggOriginMatrixNumber, xtmf_AggDestinationMatrixNumber, xtmf_AutoODMatrixId, xtmf_AccessStationRange, xtmf_ZoneCentroidRange):
+                  xtmf_AggOriginMatrixNumber, xtmf_AggDestinationMatrixNumber, xtmf_AutoODMatrixId, xtmf_AccessStationRange, xtmf_ZoneCentroidRange,
+                  xtmf_StationRange="9700-9998"):
 
         self.tool_run_msg = ""
         self.TRACKER.reset()
@@ -182,6 +190,7 @@ class ExtractTransitODVectors(_m.Tool()):
                                description= 'Destinations for selected lines', matrix_type= 'DESTINATION')
         self.AccessStationRange = xtmf_AccessStationRange
         self.ZoneCentroidRange = xtmf_ZoneCentroidRange
+        self.StationRange = xtmf_StationRange
         #self.AccessStationRangeSplit = xtmf_AccessStationRange.split('-')
         #self.ZoneCentroidRangeSplit = xtmf_ZoneCentroidRange.split('-')
 
@@ -227,38 +236,21 @@ class ExtractTransitODVectors(_m.Tool()):
                 self.ZoneCentroidRangeSplit = [int(self.ZoneCentroidRangeSplit[0]),int(self.ZoneCentroidRangeSplit[0])]
             if len(self.AccessStationRangeSplit) == 1:
                 self.AccessStationRangeSplit = [int(self.AccessStationRangeSplit[0]),int(self.AccessStationRangeSplit[0])]
+            self.StationRangeSplit = [int(x) for x in self.StationRange.split('-')]
+            if len(self.StationRangeSplit) == 1:
+                self.StationRangeSplit = [self.StationRangeSplit[0], self.StationRangeSplit[0]]
             with _util.tempExtraAttributeMANAGER(self.Scenario, 'TRANSIT_LINE', description= 'Line Flag') as lineFlag, \
                         _util.tempExtraAttributeMANAGER(self.Scenario, 'LINK', description= 'Flagged Line Aux Tr Volumes') as auxTransitVolumes, \
                         _util.tempExtraAttributeMANAGER(self.Scenario, 'TRANSIT_SEGMENT', description= 'Flagged Line Tr Volumes') as transitVolumes, \
                         _util.tempExtraAttributeMANAGER(self.Scenario, 'LINK', description= 'Flagged Line Aux Tr Volumes') as auxTransitVolumesSecondary, \
                         _util.tempExtraAttributeMANAGER(self.Scenario, 'TRANSIT_SEGMENT', description= 'Flagged Line Tr Volumes') as transitVolumesSecondary, \
-                        _util.tempMatrixMANAGER(description="Origin Probabilities", matrix_type='FULL') as origProbMatrix,\
-                        _util.tempMatrixMANAGER(description="Destinations Probabilities", matrix_type='FULL') as destProbMatrix, \
-                        _util.tempMatrixMANAGER(description="DAT Origin Aggregation", matrix_type='ORIGIN') as tempDatOrig, \
-                        _util.tempMatrixMANAGER(description="DAT Destination Aggregation", matrix_type='DESTINATION') as tempDatDest, \
-                        _util.tempMatrixMANAGER(description="Full Auto Origin Matrix", matrix_type='FULL') as autoOrigMatrix, \
-                        _util.tempMatrixMANAGER(description="Full Auto Destination Matrix", matrix_type='FULL') as autoDestMatrix, \
                         _util.tempMatrixMANAGER(description="Temp DAT Demand", matrix_type='FULL') as tempDatDemand, \
                         _util.tempMatrixMANAGER(description="Temp DAT Demand Secondary", matrix_type='FULL') as tempDatDemandSecondary: 
                 demandMatrixId = _util.DetermineAnalyzedTransitDemandId(EMME_VERSION, self.Scenario)
-                configPath = dirname(_MODELLER.desktop.project_file_name()) + "/Database/STRATS_s%s/config" %self.Scenario.id 
-                with open(configPath) as reader:
-                    config = _parsedict(reader.read())
-                    data = config['data']
-                    if 'multi_class' in data:
-                        if data['multi_class'] == True:
-                            multiclass = True
-                        else:
-                            multiclass = False
-                    else:
-                        multiclass = False
-                    strat = config['strat_files']
-                    if data['type'] == "MULTICLASS_TRANSIT_ASSIGNMENT":
-                        multiclass = True
-                        className = strat[0]["name"]
-                    elif multiclass == True:
-                        className = data["classes"][0]["name"]
-                    dataType = data['type']
+                strategyMetadata = _util.loadTransitStrategyMetadata(self.Scenario)
+                multiclass = strategyMetadata.isMulticlass
+                if multiclass:
+                    className = strategyMetadata.classNames[0]
                 with _m.logbook_trace("Flagging chosen lines"):
                     networkCalculation(self._BuildNetCalcSpec(lineFlag.id), scenario=self.Scenario)
 
@@ -297,41 +289,13 @@ class ExtractTransitODVectors(_m.Tool()):
                 with _m.logbook_trace("Aggregating transit matrices"):
                     matrixAgg(self.LineODMatrixId, self.AggOriginMatrixId, agg_op="+",scenario=self.Scenario)
                     matrixAgg(self.LineODMatrixId, self.AggDestinationMatrixId, agg_op="+",scenario=self.Scenario)
-                with _m.logbook_trace("Copying auto matrices"):
-                    matrixCopy(self.AutoODMatrixId, autoOrigMatrix.id, matrix_name="autoOrigFull", matrix_description="", 
-                                                scenario=self.Scenario)
-                    matrixCopy(self.AutoODMatrixId, autoDestMatrix.id, matrix_name="autoDestFull", matrix_description="", 
-                                                scenario=self.Scenario)
-                with _m.logbook_trace("Building probability matrices"):
-                    network = self.Scenario.get_network()
-                    nodes = range(9700,9999) #consider allowing user inputted range later on
-                    #Create a dictionary of origin/destination probabilities for the line group for all selected nodes 
-                    stationProbs = self._CalcODProbabilities(network, nodes, auxTransitVolumes.id, auxTransitVolumesSecondary.id)
-                    #Convert the dictionary in an origin and a destination probability matrix
-                    self._ApplyODProbabilities(stationProbs, origProbMatrix, 'ORIGIN')
-                    self._ApplyODProbabilities(stationProbs, destProbMatrix, 'DESTINATION')
-                    #Multiply the probability matrices by the auto demand matrix to yield origin and destination DAT demands for the selected nodes
-                    #if EMME_VERSION >= (4,2,1):
-                    #    matrixCalc(self._BuildSimpleMatrixCalcSpec(origProbMatrix.id, " * ", autoOrigMatrix.id, autoOrigMatrix.id), self.Scenario,
-                    #                         num_processors=self.NumberOfProcessors)
-                    #    matrixCalc(self._BuildSimpleMatrixCalcSpec(destProbMatrix.id, " * ", autoDestMatrix.id, autoDestMatrix.id), self.Scenario,
-                    #                         num_processors=self.NumberOfProcessors)
-                    #else:                    
-                    matrixCalc(self._BuildSimpleMatrixCalcSpec(origProbMatrix.id, " * ", autoOrigMatrix.id, autoOrigMatrix.id), self.Scenario)
-                    matrixCalc(self._BuildSimpleMatrixCalcSpec(destProbMatrix.id, " * ", autoDestMatrix.id, autoDestMatrix.id), self.Scenario)
-                with _m.logbook_trace("Aggregating DAT demand and producing final O & D matrices"):
-                    #Aggregate the adjusted DAT matrices
-                    matrixAgg(autoOrigMatrix.id, tempDatOrig.id, agg_op="+",scenario=self.Scenario)
-                    matrixAgg(autoDestMatrix.id, tempDatDest.id, agg_op="+", scenario=self.Scenario)
-                    #Find the total O & D matrices
-                    #if EMME_VERSION >= (4,2,1):
-                    #    matrixCalc(self._BuildSimpleMatrixCalcSpec(autoOrigMatrix.id, " + ", self.AggOriginMatrixId, self.AggOriginMatrixId), self.Scenario,
-                    #                         num_processors=self.NumberOfProcessors)
-                    #    matrixCalc(self._BuildSimpleMatrixCalcSpec(autoDestMatrix.id, " + ", self.AggDestinationMatrixId, self.AggDestinationMatrixId), self.Scenario,
-                    #                         num_processors=self.NumberOfProcessors)
-                    #else:
-                    matrixCalc(self._BuildSimpleMatrixCalcSpec(tempDatOrig.id, " + ", self.AggOriginMatrixId, self.AggOriginMatrixId), self.Scenario)
-                    matrixCalc(self._BuildSimpleMatrixCalcSpec(tempDatDest.id, " + ", self.AggDestinationMatrixId, self.AggDestinationMatrixId), self.Scenario)
+                with _m.logbook_trace("Building station probabilities"):
+                    #Origin/destination probabilities for the line group for all station centroids
+                    stations, origProbs, destProbs = self._CalcODProbabilities(self.StationRangeSplit, auxTransitVolumes.id, auxTransitVolumesSecondary.id)
+                with _m.logbook_trace("Applying station probabilities to auto demand and producing final O & D matrices"):
+                    #Scale the station columns / rows of the auto demand by the probabilities and add the
+                    #aggregated DAT demand to the total O & D vectors
+                    self._ApplyODProbabilities(stations, origProbs, destProbs)
 
             _MODELLER.desktop.refresh_needed(True) #Tell the desktop app that a data refresh is required
                     
@@ -476,56 +440,56 @@ class ExtractTransitODVectors(_m.Tool()):
 
         return spec
 
-    def _CalcODProbabilities(self, network, nodeSet, flaggedVolaxId, flaggedSecondaryVolaxId):
-        probDict = {}
-        for node in network.centroids():
-            if node.number in nodeSet:
-                flaggedInTotal = 0
-                inTotal = 0
-                for link in node.incoming_links():
-                    flaggedInTotal += link[flaggedVolaxId] + link[flaggedSecondaryVolaxId]
-                    inTotal += link.aux_transit_volume
-                flaggedOutTotal = 0
-                outTotal = 0
-                for link in node.outgoing_links():
-                    flaggedOutTotal += link[flaggedVolaxId] + link[flaggedSecondaryVolaxId]
-                    outTotal += link.aux_transit_volume
-                try:
-                    destProb = flaggedInTotal / inTotal
-                except:
-                    destProb = 0
-                try:
-                    origProb = flaggedOutTotal / outTotal
-                except:
-                    origProb = 0 #if no volume, set to 0
-                
-                probDict[node.number] = (origProb, destProb)
-        return probDict
-
-    def _ApplyODProbabilities(self, inputProbs, outputMatrix, probType):
-        zoneList = self.Scenario.zone_numbers
-        probMatrix = np.zeros((len(zoneList), len(zoneList)))
-        if probType == 'ORIGIN':
-            for key, probs in six.iteritems(inputProbs): #iterate through the probability dictionary
-                location = zoneList.index(key) #index the current station parking node in the zone list
-                probMatrix[:,location] = probs[0] #insert a column (with the line group probability) at the station parking node location in the matrix
-        elif probType == 'DESTINATION':
-            for key, probs in six.iteritems(inputProbs): #iterate through the probability dictionary
-                location = zoneList.index(key) #index the current station parking node in the zone list
-                probMatrix[location, :] = probs[1] #insert a row (with the line group probability) at the station parking node location in the matrix
-        else:
-            raise Exception("Need to specify either ORIGIN or DESTINATION")
-
-        #if EMME_VERSION >= (4,2):
-        #    print outputMatrix.id
-        #    outputMatrix.set_numpy_data(probMatrix, scenario_id=self.Scenario.id) # set the probability matrix data to the matrix we created earlier
-        if EMME_VERSION >= (4,1,2):
-            zoneSystem = [self.Scenario.zone_numbers] * 2
-            matrix_data = _matrix.MatrixData(zoneSystem, type='f') 
-            matrix_data.from_numpy(probMatrix) #pull the data from the probability Matrix
-            outputMatrix.set_data(matrix_data, self.Scenario.id) #and set it to the matrix we created earlier
-        else:
+    def _CalcODProbabilities(self, stationRange, flaggedVolaxId, flaggedSecondaryVolaxId):
+        iNodes, jNodes, atts = _util.fastLoadLinkAttributeArrays(self.Scenario,
+                                        [flaggedVolaxId, flaggedSecondaryVolaxId, 'aux_transit_volume'])
+        flaggedVolumes = atts[flaggedVolaxId] + atts[flaggedSecondaryVolaxId]
+        totalVolumes = atts['aux_transit_volume']
+
+        zones = np.array(self.Scenario.zone_numbers)
+        stations = zones[(zones >= stationRange[0]) & (zones <= stationRange[1])]
+        nStations = len(stations)
+        if nStations == 0:
+            return stations, np.zeros(0), np.zeros(0)
+
+        def sumByStation(nodes, values):
+            #group link values by the station at the given end of the link
+            positions = np.minimum(np.searchsorted(stations, nodes), nStations - 1)
+            mask = stations[positions] == nodes
+            return np.bincount(positions[mask], weights=values[mask], minlength=nStations)
+
+        flaggedOutTotal = sumByStation(iNodes, flaggedVolumes)
+        outTotal = sumByStation(iNodes, totalVolumes)
+        flaggedInTotal = sumByStation(jNodes, flaggedVolumes)
+        inTotal = sumByStation(jNodes, totalVolumes)
+
+        #if no volume, set to 0
+        origProbs = np.zeros(nStations)
+        np.divide(flaggedOutTotal, outTotal, out=origProbs, where=outTotal != 0)
+        destProbs = np.zeros(nStations)
+        np.divide(flaggedInTotal, inTotal, out=destProbs, where=inTotal != 0)
+        return stations, origProbs, destProbs
+
+    def _ApplyODProbabilities(self, stations, origProbs, destProbs):
+        if EMME_VERSION < (4,1,2):
             raise Exception("Please upgrade to at least Emme 4.1.2 to use this tool")
+
+        zones = np.array(self.Scenario.zone_numbers)
+        stationIndices = np.searchsorted(zones, stations) #zone_numbers is sorted, so this locates each station
+
+        bank = _MODELLER.emmebank
+        autoDemand = bank.matrix(self.AutoODMatrixId).get_numpy_data(scenario_id=self.Scenario.id)
+        #Origin side: scale the station columns by the origin probabilities and sum across each row
+        datOrigins = autoDemand[:, stationIndices].dot(origProbs)
+        #Destination side: scale the station rows by the destination probabilities and sum down each column
+        datDestinations = destProbs.dot(autoDemand[stationIndices, :])
+        del autoDemand
+
+        for matrixId, datVector in [(self.AggOriginMatrixId, datOrigins),
+                                    (self.AggDestinationMatrixId, datDestinations)]:
+            matrix = bank.matrix(matrixId)
+            totals = matrix.get_numpy_data(scenario_id=self.Scenario.id)
+            matrix.set_numpy_data(totals + datVector, scenario_id=self.Scenario.id)
                         
     @_m.method(return_type=_m.TupleType)
     def percent_completed(self):
@@ -33,6 +33,9 @@ Volume per Operator
 '''
     0.0.1 Created on 2015-05-04 by tnikolov
     0.0.2 Created on 2015-11-13 by mattaustin222
+    
+    1.1.0 Reuses one temporary line attribute and pair of matrices for all scenarios,
+        filters and classes.
 '''
 
 import inro.modeller as _m
@@ -97,7 +100,7 @@ class VolumePerOperator(_m.Tool()):
     scenario = _m.Attribute(str)
     LineFilter = _m.Attribute(str)
     ReportFile = _m.Attribute(str)
-    version = '1.0.0'
+    version = '1.1.0'
             
     def __init__(self):
         #---Init internal variables
@@ -216,56 +219,58 @@ class VolumePerOperator(_m.Tool()):
 
         parsed_filter_list = self._ParseFilterString(self.filtersToCompute)
         self.NumberOfProcessors = cpu_count()
-        for scenario in self.Scenarios:
-            self.Scenario = _MODELLER.emmebank.scenario(scenario.id)
-            self.results[scenario.id] = {}
+        # Filters and classes share the same temporary attribute and matrices
+        with _util.tempResourcePoolMANAGER():
+            for scenario in self.Scenarios:
+                self.Scenario = _MODELLER.emmebank.scenario(scenario.id)
+                self.results[scenario.id] = {}
             
-            for filter in parsed_filter_list:
-                demandMatrixId = _util.DetermineAnalyzedTransitDemandId(EMME_VERSION, self.Scenario)
-                if type(demandMatrixId) == type(dict()):
-                    self.multiclass = True
-                    self.results[scenario.id][filter[1]] = {}
-                    for key in demandMatrixId:
-                        with _util.tempExtraAttributeMANAGER(self.Scenario, 'TRANSIT_LINE', description= "Extra attribute") as operatorMarker, \
-                            _util.tempMatrixMANAGER('Intermediate operator counts', 'FULL') as tempIntermediateMatrix, \
-                            _util.tempMatrixMANAGER('Aggregated operator counts', 'SCALAR') as tempResultMatrix:
+                for filter in parsed_filter_list:
+                    demandMatrixId = _util.DetermineAnalyzedTransitDemandId(EMME_VERSION, self.Scenario)
+                    if type(demandMatrixId) == type(dict()):
+                        self.multiclass = True
+                        self.results[scenario.id][filter[1]] = {}
+                        for key in demandMatrixId:
+                            with _util.tempExtraAttributeMANAGER(self.Scenario, 'TRANSIT_LINE', description= "Extra attribute") as operatorMarker, \
+                                _util.tempMatrixMANAGER('Intermediate operator counts', 'FULL') as tempIntermediateMatrix, \
+                                _util.tempMatrixMANAGER('Aggregated operator counts', 'SCALAR') as tempResultMatrix:
+                                networkCalculator(self.assign_line_filter(filter[1], operatorMarker), scenario=self.Scenario)
+                                if EMME_VERSION >= (4, 3, 2):
+                                    report = stratAnalysis(self.count_ridership(operatorMarker, tempIntermediateMatrix, demandMatrixId[key]), scenario=self.Scenario, class_name=key, num_processors = self.NumberOfProcessors)
+                                else:
+                                    report = stratAnalysis(self.count_ridership(operatorMarker, tempIntermediateMatrix, demandMatrixId[key]), scenario=self.Scenario, class_name=key)
+                                tempMatrix = _MODELLER.emmebank.matrix(tempIntermediateMatrix.id)
+                                numpyData = tempMatrix.get_numpy_data(scenario_id = scenario.id)
+                                count = 0 
+                                for i in range(numpyData.shape[0]-1):
+                                    if numpyData[i,i] != 0:
+                                        numpyData[i,i] = 0
+                                        count += 1
+                                tempMatrix.set_numpy_data(numpyData, scenario_id = scenario.id)
+                                matrixCalculator(self._CalcRidership(tempIntermediateMatrix.id, demandMatrixId[key]), scenario=self.Scenario)
+                                matrixAggregation(tempIntermediateMatrix.id, tempResultMatrix.id, agg_op="+", scenario=self.Scenario)
+                                self.results[scenario.id][filter[1]][key] = tempResultMatrix.data
+                    else:
+                        self.multiclass = False
+                        with _util.tempExtraAttributeMANAGER(self.Scenario, 'TRANSIT_LINE', description= "Extra attribute") as operatorMarker,\
+                                _util.tempMatrixMANAGER('Intermediate operator counts', 'FULL') as tempIntermediateMatrix,\
+                                _util.tempMatrixMANAGER('Aggregated operator counts', 'SCALAR') as tempResultMatrix:
                             networkCalculator(self.assign_line_filter(filter[1], operatorMarker), scenario=self.Scenario)
                             if EMME_VERSION >= (4, 3, 2):
-                                report = stratAnalysis(self.count_ridership(operatorMarker, tempIntermediateMatrix, demandMatrixId[key]), scenario=self.Scenario, class_name=key, num_processors = self.NumberOfProcessors)
+                                report = stratAnalysis(self.count_ridership(operatorMarker, tempIntermediateMatrix, demandMatrixId), scenario=self.Scenario, num_processors = self.NumberOfProcessors)  
                             else:
-                                report = stratAnalysis(self.count_ridership(operatorMarker, tempIntermediateMatrix, demandMatrixId[key]), scenario=self.Scenario, class_name=key)
+                                report = stratAnalysis(self.count_ridership(operatorMarker, tempIntermediateMatrix, demandMatrixId), scenario=self.Scenario)
                             tempMatrix = _MODELLER.emmebank.matrix(tempIntermediateMatrix.id)
                             numpyData = tempMatrix.get_numpy_data(scenario_id = scenario.id)
                             count = 0 
-                            for i in range(numpyData.shape[0]-1):
+                            for i in range(numpyData.shape[0]):
                                 if numpyData[i,i] != 0:
                                     numpyData[i,i] = 0
                                     count += 1
-                            tempMatrix.set_numpy_data(numpyData, scenario_id = scenario.id)
-                            matrixCalculator(self._CalcRidership(tempIntermediateMatrix.id, demandMatrixId[key]), scenario=self.Scenario)
-                            matrixAggregation(tempIntermediateMatrix.id, tempResultMatrix.id, agg_op="+", scenario=self.Scenario)
-                            self.results[scenario.id][filter[1]][key] = tempResultMatrix.data
-                else:
-                    self.multiclass = False
-                    with _util.tempExtraAttributeMANAGER(self.Scenario, 'TRANSIT_LINE', description= "Extra attribute") as operatorMarker,\
-                            _util.tempMatrixMANAGER('Intermediate operator counts', 'FULL') as tempIntermediateMatrix,\
-                            _util.tempMatrixMANAGER('Aggregated operator counts', 'SCALAR') as tempResultMatrix:
-                        networkCalculator(self.assign_line_filter(filter[1], operatorMarker), scenario=self.Scenario)
-                        if EMME_VERSION >= (4, 3, 2):
-                            report = stratAnalysis(self.count_ridership(operatorMarker, tempIntermediateMatrix, demandMatrixId), scenario=self.Scenario, num_processors = self.NumberOfProcessors)  
-                        else:
-                            report = stratAnalysis(self.count_ridership(operatorMarker, tempIntermediateMatrix, demandMatrixId), scenario=self.Scenario)
-                        tempMatrix = _MODELLER.emmebank.matrix(tempIntermediateMatrix.id)
-                        numpyData = tempMatrix.get_numpy_data(scenario_id = scenario.id)
-                        count = 0 
-                        for i in range(numpyData.shape[0]):
-                            if numpyData[i,i] != 0:
-                                numpyData[i,i] = 0
-                                count += 1
-                        tempMatrix.set_numpy_data(numpyData, scenario_id = scenario.id)                         
-                        matrixCalculator(self._CalcRidership(tempIntermediateMatrix.id, demandMatrixId), scenario=self.Scenario)
-                        matrixAggregation(tempIntermediateMatrix.id, tempResultMatrix.id, agg_op="+", scenario=self.Scenario)         
-                        self.results[scenario.id][filter[1]] =  tempResultMatrix.data
+                            tempMatrix.set_numpy_data(numpyData, scenario_id = scenario.id)                         
+                            matrixCalculator(self._CalcRidership(tempIntermediateMatrix.id, demandMatrixId), scenario=self.Scenario)
+                            matrixAggregation(tempIntermediateMatrix.id, tempResultMatrix.id, agg_op="+", scenario=self.Scenario)         
+                            self.results[scenario.id][filter[1]] =  tempResultMatrix.data
 
     def assign_line_filter(self, lineFilter, marker):
         return {"result": marker.id,
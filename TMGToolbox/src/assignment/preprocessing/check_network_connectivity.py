@@ -37,18 +37,32 @@
     
     1.0.1 Added searchability to mode selectors.
     
+    1.1.0 Connectivity is checked by default on a directed graph of the links of each
+        mode (plus the itineraries of transit lines for transit modes), using strongly
+        connected components. No assignment, temporary scenario or matrix is needed,
+        and regular nodes which cannot reach or be reached from any zone are also
+        reported. Turn restrictions are not considered by the graph check. The
+        assignment-based check is still available as a cross-check.
+    
+    1.1.1 The graph check raises a NullPointerException for mode ids which do not
+        exist in the scenario, and writes its progress to the logbook.
+    
 '''
 
 import traceback as _traceback
 from contextlib import contextmanager
 from numpy import array
 from numpy import where
+import numpy as _np
 
 import inro.modeller as _m
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
+_partial = _MODELLER.module('tmg.common.partial_network')
+_graph = _MODELLER.module('tmg.common.network_graph')
 EMME_VERSION = _util.getEmmeVersion(float) 
+NullPointerException = _util.NullPointerException
 
 # import six library for python2 to python3 conversion
 import six 
@@ -60,7 +74,7 @@ _util.initalizeModellerTypes(_m)
 
 class CheckNetworkConnectivity(_m.Tool()):
     
-    version = '1.0.1'
+    version = '1.1.1'
     tool_run_msg = ""
     number_of_tasks = 3 # For progress reporting, enter the integer number of tasks here
     
@@ -74,6 +88,7 @@ class CheckNetworkConnectivity(_m.Tool()):
     TransitModeIds = _m.Attribute(_m.ListType)
     
     PreserveAssignmentFlag = _m.Attribute(bool)
+    UseAssignmentsFlag = _m.Attribute(bool)
     
     xtmf_ScenarioNumber = _m.Attribute(int) # parameter used by XTMF only
     xtmf_AutoModeString = _m.Attribute(str)
@@ -89,15 +104,18 @@ class CheckNetworkConnectivity(_m.Tool()):
         self.TransitModeIds = []
         
         self.PreserveAssignmentFlag = True
+        self.UseAssignmentsFlag = False
     
     def page(self):
         
         pb = _tmgTPB.TmgToolPageBuilder(self, title="Check Network Connectivity v%s" %self.version,
-                     description="Runs an auto and/or transit assignment to find nodes with \
-                         connectivity issues (for given modes). Identifies fountain nodes (that \
-                         go out), sink nodes (that only come in), and orphan nodes (that neither \
-                         come in nor go out). Islands are <b>not</b> identified. \
-                         <br><br><b>Temporary storage requirements:</b> One scenario (if needed), \
+                     description="Finds zones with connectivity issues (for given modes). \
+                         Identifies fountain zones (that only go out), sink zones (that only come \
+                         in), and orphan zones (that neither come in nor go out), as well as regular \
+                         nodes which cannot reach or be reached from any zone. The check is done on \
+                         the network graph of each mode; turn restrictions are not considered. \
+                         <br><br>Optionally, the check can instead run an auto and/or transit \
+                         assignment. <b>Temporary storage requirements:</b> One scenario (if needed), \
                          one matrix for transit times, and one matrix for <em>each auto mode \
                          selected</em>.",
                      branding_text="- TMG Toolbox")
@@ -127,9 +145,15 @@ class CheckNetworkConnectivity(_m.Tool()):
                       title= "Select Transit Modes", note= "Leave empty to disable checking for transit connectivity.",
                       searchable= True)
         
+        pb.add_checkbox(tool_attribute_name= 'UseAssignmentsFlag',
+                        label= "Check with assignments?",
+                        note= "Runs the original assignment-based check instead of the graph check. \
+                            Only AUX_TRANSIT modes can be checked this way.")
+        
         pb.add_checkbox(tool_attribute_name= 'PreserveAssignmentFlag',
                         label= "Preserve existing assignment results?",
-                        note= "Space for a temporary scenario is required if checked.")
+                        note= "Only used when checking with assignments. Space for a temporary \
+                            scenario is required if checked.")
         
                 #---JAVASCRIPT
         pb.add_html("""
@@ -166,11 +190,11 @@ class CheckNetworkConnectivity(_m.Tool()):
         self.TRACKER.reset()
         
         try:
-            nFountains, nSinks, nOrphans = self._Execute()
+            nFountains, nSinks, nOrphans, nDisconnected = self._Execute()
             
-            if (nFountains + nSinks + nOrphans) > 0:
-                tup = (nFountains, nSinks, nOrphans, self.Scenario)
-                msg = "Found %s fountain node(s), %s sink node(s), and %s orphan node(s) in scenario %s." %tup
+            if (nFountains + nSinks + nOrphans + nDisconnected) > 0:
+                tup = (nFountains, nSinks, nOrphans, nDisconnected, self.Scenario)
+                msg = "Found %s fountain node(s), %s sink node(s), %s orphan node(s) and %s disconnected regular node(s) in scenario %s." %tup
                 msg += " Check logbook for details."
             else:
                 msg = "No network connectivity issues were found."
@@ -191,37 +215,48 @@ class CheckNetworkConnectivity(_m.Tool()):
         with _m.logbook_trace(name="{classname} v{version}".format(classname=(self.__class__.__name__), version=self.version),
                                      attributes=self._GetAtts()):
             
-            with _util.tempMatrixMANAGER(matrix_type= 'SCALAR', description= "Zero demand matrix") \
-                    as demandMatrix:
-                with self._tempScenarioMANAGER():
-                    dataTuples = []
-                    
-                    if self.AutoModeIds:
-                        self._CheckAutoConnectivity(demandMatrix.id, dataTuples)
-                    
-                    if self.TransitModeIds:
-                        network = self.Scenario.get_network()
-                        for item in self.TransitModeIds:
-                            if network.mode(item).type != 'AUX_TRANSIT':
-                                raise Exception("Only AUX_TRANSIT types are be allowed. TransitModeId" , item, " is not allowed")
-                        self._CheckTransitConnectivity(demandMatrix.id, dataTuples)
-                    
-                    totalFountains = set()
-                    totalSinks = set()
-                    totalOrphans = set()
-                    for type, modes, fountains, sinks, orphans in dataTuples:
-                        for node in fountains: totalFountains.add(node)
-                        for node in sinks: totalSinks.add(node)
-                        for node in orphans: totalOrphans.add(node)
-                    
-                    nFountains = len(totalFountains)
-                    nSinks = len(totalSinks)
-                    nOrphans = len(totalOrphans)
-                    
-                    if (nFountains + nSinks + nOrphans) > 0:
-                        self._WriteReport(dataTuples)
-                        return nFountains, nSinks, nOrphans
-                    else: return 0,0,0
+            if self.UseAssignmentsFlag:
+                dataTuples = self._CheckWithAssignments()
+            else:
+                dataTuples = self._CheckWithGraph()
+            
+            totalFountains = set()
+            totalSinks = set()
+            totalOrphans = set()
+            totalDisconnected = set()
+            for type, modes, fountains, sinks, orphans, disconnected in dataTuples:
+                for node in fountains: totalFountains.add(node)
+                for node in sinks: totalSinks.add(node)
+                for node in orphans: totalOrphans.add(node)
+                for node in disconnected: totalDisconnected.add(node)
+            
+            nFountains = len(totalFountains)
+            nSinks = len(totalSinks)
+            nOrphans = len(totalOrphans)
+            nDisconnected = len(totalDisconnected)
+            
+            if (nFountains + nSinks + nOrphans + nDisconnected) > 0:
+                self._WriteReport(dataTuples)
+                return nFountains, nSinks, nOrphans, nDisconnected
+            else: return 0,0,0,0
+    
+    def _CheckWithAssignments(self):
+        with _util.tempMatrixMANAGER(matrix_type= 'SCALAR', description= "Zero demand matrix") \
+                as demandMatrix:
+            with self._tempScenarioMANAGER():
+                dataTuples = []
+                
+                if self.AutoModeIds:
+                    self._CheckAutoConnectivity(demandMatrix.id, dataTuples)
+                
+                if self.TransitModeIds:
+                    network = self.Scenario.get_network()
+                    for item in self.TransitModeIds:
+                        if network.mode(item).type != 'AUX_TRANSIT':
+                            raise Exception("Only AUX_TRANSIT types are be allowed. TransitModeId" , item, " is not allowed")
+                    self._CheckTransitConnectivity(demandMatrix.id, dataTuples)
+                
+                return dataTuples
                     
     ##########################################################################################################   
     
@@ -259,6 +294,128 @@ class CheckNetworkConnectivity(_m.Tool()):
             
         return atts 
     
+    #---GRAPH CHECK
+    
+    def _CheckWithGraph(self):
+        domains = {}
+        extraDomains = ['MODE', 'NODE', 'LINK']
+        if self.TransitModeIds:
+            domains['TRANSIT_SEGMENT'] = ['allow_boardings', 'allow_alightings']
+            extraDomains += ['TRANSIT_VEHICLE', 'TRANSIT_LINE']
+        editor = _partial.PartialNetworkEditor(self.Scenario, domains, extraDomains=extraDomains)
+        network = editor.network
+        self._CheckModeIds(network)
+        
+        #Centroids are not used as through nodes, so each zone has its own destination
+        #vertex (numbered after the nodes), which only has incoming edges
+        nodes = list(network.nodes())
+        nodeIndex = dict((node.number, index) for index, node in enumerate(nodes))
+        zones = sorted(node.number for node in network.centroids())
+        zoneVertices = _np.array([nodeIndex[zone] for zone in zones], dtype=_np.int64)
+        nNodes = len(nodes)
+        headVertices = dict((node.number, index) for index, node in enumerate(nodes))
+        for position, zone in enumerate(zones):
+            headVertices[zone] = nNodes + position
+        
+        modeIds = list(self.AutoModeIds) + list(self.TransitModeIds)
+        links, modeMasks = _graph.getLinkModeMasks(network, modeIds)
+        tails = _np.array([nodeIndex[link.i_node.number] for link in links], dtype=_np.int64)
+        heads = _np.array([headVertices[link.j_node.number] for link in links], dtype=_np.int64)
+        self.TRACKER.completeTask()
+        
+        dataTuples = []
+        for modeId in self.AutoModeIds:
+            mask = modeMasks[modeId]
+            graph = _graph.DirectedGraph(nNodes + len(zones), tails[mask], heads[mask])
+            fountains, sinks, orphans, disconnected = self._ClassifyNodes(graph, nodes, zones, zoneVertices)
+            dataTuples.append(("Auto", [modeId], fountains, sinks, orphans, disconnected))
+            _m.logbook_write("Processed auto mode %s" %modeId)
+        self.TRACKER.completeTask()
+        
+        if self.TransitModeIds:
+            mask = _np.zeros(len(links), dtype=bool)
+            for modeId in self.TransitModeIds:
+                if network.mode(modeId).type == 'AUX_TRANSIT':
+                    mask |= modeMasks[modeId]
+            lineTails, lineHeads, nVertices = self._GetItineraryEdges(network, nodeIndex, headVertices,
+                                                                      nNodes + len(zones))
+            graph = _graph.DirectedGraph(nVertices, _np.concatenate([tails[mask], lineTails]),
+                                         _np.concatenate([heads[mask], lineHeads]))
+            fountains, sinks, orphans, disconnected = self._ClassifyNodes(graph, nodes, zones, zoneVertices)
+            dataTuples.append(("Transit", self.TransitModeIds, fountains, sinks, orphans, disconnected))
+            _m.logbook_write("Processed transit connectivity.")
+        self.TRACKER.completeTask()
+        
+        return dataTuples
+    
+    def _CheckModeIds(self, network):
+        for modeId in list(self.AutoModeIds) + list(self.TransitModeIds):
+            if network.mode(modeId) is None:
+                raise NullPointerException("Mode '%s' does not exist in scenario %s" %(modeId, self.Scenario.id))
+    
+    def _GetItineraryEdges(self, network, nodeIndex, headVertices, firstVertex):
+        #Each stop of a line is a vertex, chained along the itinerary. Nodes connect to
+        #the stops where boarding is allowed, and stops connect back to their node where
+        #alighting is allowed.
+        transitModes = set(modeId for modeId in self.TransitModeIds if network.mode(modeId).type == 'TRANSIT')
+        tails, heads = [], []
+        nextVertex = firstVertex
+        for line in network.transit_lines():
+            if line.mode.id not in transitModes: continue
+            segments = list(line.segments(True))
+            for position, segment in enumerate(segments):
+                vertex = nextVertex + position
+                nodeNumber = segment.i_node.number
+                if position < len(segments) - 1:
+                    tails.append(vertex)
+                    heads.append(vertex + 1)
+                    if segment.allow_boardings:
+                        tails.append(nodeIndex[nodeNumber])
+                        heads.append(vertex)
+                if position > 0 and segment.allow_alightings:
+                    tails.append(vertex)
+                    heads.append(headVertices[nodeNumber])
+            nextVertex += len(segments)
+        return _np.array(tails, dtype=_np.int64), _np.array(heads, dtype=_np.int64), nextVertex
+    
+    def _ClassifyNodes(self, graph, nodes, zones, zoneVertices):
+        nNodes = len(nodes)
+        nZones = len(zones)
+        if nZones < 2: return [], [], [], []
+        zoneNumbers = _np.arange(nZones)
+        
+        destinationLabels = _np.full(graph.nVertices, -1, dtype=_np.int64)
+        destinationLabels[nNodes:nNodes + nZones] = zoneNumbers
+        reaches = graph.reachedLabels(destinationLabels)
+        
+        originLabels = _np.full(graph.nVertices, -1, dtype=_np.int64)
+        originLabels[zoneVertices] = zoneNumbers
+        reachedBy = graph.reverse().reachedLabels(originLabels)
+        
+        #Two labels are kept per vertex, so a zone reaches another zone if either is not itself
+        zoneReaches = reaches[zoneVertices]
+        reachesOther = ((zoneReaches >= 0) & (zoneReaches != zoneNumbers[:, None])).any(axis=1)
+        zoneReachedBy = reachedBy[nNodes:nNodes + nZones]
+        reachedByOther = ((zoneReachedBy >= 0) & (zoneReachedBy != zoneNumbers[:, None])).any(axis=1)
+        
+        fountains = [zones[i] for i in _np.flatnonzero(reachesOther & ~reachedByOther).tolist()]
+        sinks = [zones[i] for i in _np.flatnonzero(~reachesOther & reachedByOther).tolist()]
+        orphans = [zones[i] for i in _np.flatnonzero(~reachesOther & ~reachedByOther).tolist()]
+        
+        #Regular nodes on the mode's network which cannot reach, or cannot be reached from, any zone
+        used = _np.zeros(graph.nVertices, dtype=bool)
+        used[graph.tails] = True
+        used[graph.heads] = True
+        regular = _np.ones(graph.nVertices, dtype=bool)
+        regular[nNodes:] = False
+        regular[zoneVertices] = False
+        connected = (reaches[:, 0] >= 0) & (reachedBy[:, 0] >= 0)
+        disconnected = [nodes[i].number for i in _np.flatnonzero(used & regular & ~connected).tolist()]
+        
+        return fountains, sinks, orphans, disconnected
+    
+    #---ASSIGNMENT CHECK
+    
     def _CheckAutoConnectivity(self, demandMatrixId, dataTuples):
         with (_util.tempMatricesMANAGER(len(self.AutoModeIds), description="Time Matrices")) as timesMatrices:
             classInfo = []
@@ -275,7 +432,7 @@ class CheckNetworkConnectivity(_m.Tool()):
                 
                 
                 fountains, sinks, orphans = self._GetDisconnectedNodes(matrix)
-                dataTuples.append(("Auto", [modeId], fountains, sinks, orphans))
+                dataTuples.append(("Auto", [modeId], fountains, sinks, orphans, []))
                 
                 print("Processed auto mode %s" %modeId)
                 
@@ -335,7 +492,7 @@ class CheckNetworkConnectivity(_m.Tool()):
             matrix = _MODELLER.emmebank.matrix(timesMatrix.id)
             fountains, sinks, orphans = self._GetDisconnectedNodes(matrix)
             
-            dataTuples.append(("Transit", self.TransitModeIds, fountains, sinks, orphans))
+            dataTuples.append(("Transit", self.TransitModeIds, fountains, sinks, orphans, []))
             print("Processed transit connectivity.")
     
     def _RunTransitAssignment(self, demandMatrixId, timesMatrixId):
@@ -413,82 +570,38 @@ class CheckNetworkConnectivity(_m.Tool()):
     def _WriteReport(self, dataTuples):
         pb = _m.PageBuilder("Network Connectivity Report")
         
-        for type, modes, fountains, sinks, orphans in dataTuples:
-            self._AddReportSection(pb, type, modes, fountains, sinks, orphans)
+        for type, modes, fountains, sinks, orphans, disconnected in dataTuples:
+            self._AddReportSection(pb, type, modes, fountains, sinks, orphans, disconnected)
         
         _m.logbook_write("Network connectivity report", value= pb.render())
     
-    def _AddReportSection(self, pb, type, modes, fountains, sinks, orphans):
+    def _AddReportSection(self, pb, type, modes, fountains, sinks, orphans, disconnected):
         modes = [str(mode) for mode in modes]
         
-        #h = HTML()
-        
         plural = ''
         if len(modes) > 1: plural = "s"
         sectionTitle = "{0} results for mode{1} {2!s}".format(type, plural, modes)
         
-        #h.h3(sectionTitle)
-        
-        nFountains = len(fountains)
-        nSinks = len(sinks)
-        nOrphans = len(orphans)
-        
-        if nFountains > 0:
-            
-            plural = ''
-            if nFountains > 1: plural = 's'
-            title= "Found %s fountain node%s:" %(nFountains, plural)
-            
-            t = "<table>\n" #h.table()
-            t += "<tr>\n"
-            t += "<th>{0}</th>\n".format(title.strip())
-            #tr = t.tr()
-            #tr.th(title)
-            
-            for node in fountains:
-                t += "</tr>\n"
-                t += "<td>{0}</td>\n".format(str(node).strip())
-                #t.tr().td(str(node))
-            t = "<table>\n"
+        t = ""
+        for nodes, name in [(fountains, "fountain node"), (sinks, "sink node"), (orphans, "orphan node"),
+                            (disconnected, "disconnected regular node")]:
+            if not nodes: continue
             
-        if nSinks > 0:
             plural = ''
-            if nSinks > 1: plural = 's'
-            title= "Found %s sink node%s:" %(nSinks, plural)
+            if len(nodes) > 1: plural = 's'
+            title= "Found %s %s%s:" %(len(nodes), name, plural)
             
-            t = "<table>\n"
+            t += "<table>\n"
             t += "<tr>\n"
             t += "<th>{0}</th>\n".format(title.strip())
-            #t = h.table()
-            #tr = t.tr()
-            #tr.th(title)
-            
-            for node in sinks:
+            t += "</tr>\n"
+            for node in sorted(nodes):
                 t += "<tr>\n"
                 t += "<td>{0}</td>\n".format(str(node).strip())
-                #t.tr().td(str(node))
-            t = "<table>\n"
-
-        if nOrphans > 0:
-            plural = ''
-            if nOrphans > 1: plural = 's'
-            title= "Found %s orphan node%s:" %(nOrphans, plural)
-            
-            t = "<table>\n"
-            t += "<tr>\n"
-            t += "<th>{0}</th>\n".format(title.strip())
-
-            #t = h.table()
-            #tr = t.tr()
-            #tr.th(title)
-            
-            for node in orphans:
-                t += "<tr>\n"
-                t += "<td>{0}</td>\n".format(str(node).strip())
-                #t.tr().td(str(node))
-            t = "<table>\n"
+                t += "</tr>\n"
+            t += "</table>\n"
         
-        pb.wrap_html(sectionTitle, body= str(t)) #h
+        pb.wrap_html(sectionTitle, body= t)
             
     @_m.method(return_type=_m.TupleType)
     def percent_completed(self):
@@ -0,0 +1,226 @@
+'''
+    Copyright 2026 Travel Modelling Group, Department of Civil Engineering, University of Toronto
+
+    This file is part of the TMG Toolbox.
+
+    The TMG Toolbox is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    The TMG Toolbox is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with the TMG Toolbox.  If not, see <http://www.gnu.org/licenses/>.
+'''
+'''
+Hash indices of network elements which share coordinates.
+
+Hypernetworks replicate each station node (and the links between stations)
+once per fare zone or operator, with identical coordinates. Rather than
+scanning the whole network for every element of interest, the index is built
+once per network: node coordinates (or link shapes) are quantized and hashed,
+so finding all co-located nodes (or identical links) is a dictionary lookup.
+
+The index is for tools which read a hypernetwork after it has been built
+(Export Station Boardings and Alightings, Link Specific Volumes and Extract
+Link Transfers). The hypernetwork generators create the replicas themselves
+and keep track of them as they go, so they never search by coordinates.
+
+Example:
+    index = _colocation.CoLocatedNodeIndex.fromNetwork(network)
+    for node in index.getCoLocatedNodes(network.node(stationId)):
+        ...
+    
+    shapes = _colocation.LinkShapeIndex.fromNetwork(network)
+    twins = shapes.getTwinLinks(network.link(i, j))
+'''
+
+import inro.modeller as _m
+_MODELLER = _m.Modeller()
+
+# import six library for python2 to python3 conversion
+import six
+
+class Face(_m.Tool()):
+    def page(self):
+        pb = _m.ToolPageBuilder(self, runnable=False, title="Co-location Index",
+                                description="Hash indices of nodes (and links) which share \
+                                coordinates, e.g. in hypernetworks. For internal use only.",
+                                branding_text="- TMG Toolbox")
+
+        pb.add_text_element("To import, call inro.modeller.Modeller().module('%s')" %str(self))
+
+        return pb.render()
+
+#===========================================================================================
+
+# Coordinates closer than this (in coordinate units) are considered identical.
+DEFAULT_PRECISION = 1e-6
+
+def quantize(x, y, precision=DEFAULT_PRECISION):
+    '''
+    Returns the hash key of the point (x, y) for a given precision.
+    '''
+    return (int(round(x / precision)), int(round(y / precision)))
+
+def hashShape(shape, precision=DEFAULT_PRECISION):
+    '''
+    Returns the hash key of a sequence of (x, y) points (e.g. link.shape).
+    '''
+    return tuple(quantize(x, y, precision) for x, y in shape)
+
+class CoLocatedNodeIndex():
+    '''
+    Maps quantized (x, y) coordinates to the list of nodes at that location.
+
+    Items can be Emme Node objects (fromNetwork) or node numbers
+    (fromScenario, which does not need to load the network). Items are kept
+    in the order in which they were inserted.
+    '''
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        self._locations = {}
+
+    @staticmethod
+    def fromNetwork(network, precision=DEFAULT_PRECISION, nodes=None):
+        '''
+        Indexes the nodes of a Network object.
+
+        Args:
+            - network: The Emme Network to index.
+            - precision (=DEFAULT_PRECISION): Quantization step for the coordinates.
+            - nodes (=None): Optional iterable of nodes to index, instead of all nodes.
+        '''
+        index = CoLocatedNodeIndex(precision)
+        if nodes is None:
+            nodes = network.nodes()
+        for node in nodes:
+            index.insert(node, node.x, node.y)
+        return index
+
+    @staticmethod
+    def fromScenario(scenario, precision=DEFAULT_PRECISION):
+        '''
+        Indexes the node numbers of a scenario from its node coordinate arrays.
+        '''
+        indices, xtable, ytable = scenario.get_attribute_values('NODE', ['x', 'y'])
+        index = CoLocatedNodeIndex(precision)
+        for number, pos in sorted(six.iteritems(indices), key=lambda item: item[1]):
+            index.insert(number, xtable[pos], ytable[pos])
+        return index
+
+    def __len__(self):
+        return len(self._locations)
+
+    def insert(self, item, x, y):
+        key = quantize(x, y, self.precision)
+        if key in self._locations:
+            self._locations[key].append(item)
+        else:
+            self._locations[key] = [item]
+
+    def getNodesAt(self, x, y):
+        '''
+        Returns the list of indexed items at (x, y), which is empty if there
+        are none.
+        '''
+        return list(self._locations.get(quantize(x, y, self.precision), []))
+
+    def getCoLocatedNodes(self, node):
+        '''
+        Returns the list of indexed nodes at the location of the given node,
+        including the node itself (if it is indexed).
+        '''
+        return self.getNodesAt(node.x, node.y)
+
+    def iterLocations(self, minCount=1):
+        '''
+        Iterates over the lists of co-located items which have at least
+        minCount items.
+        '''
+        for items in six.itervalues(self._locations):
+            if len(items) >= minCount:
+                yield items
+
+    def getTwinLinks(self, link):
+        '''
+        Finds the links with exactly the same shape as the given link (e.g. its
+        replicas in a hypernetwork). Requires an index of Node objects.
+
+        Returns: A list of links, excluding the given link.
+        '''
+        shape = link.shape
+        jNodes = set(node.number for node in self.getCoLocatedNodes(link.j_node))
+        twins = []
+        for iNode in self.getCoLocatedNodes(link.i_node):
+            for candidate in iNode.outgoing_links():
+                if candidate.j_node.number not in jNodes: continue
+                if candidate.i_node.number == link.i_node.number and candidate.j_node.number == link.j_node.number:
+                    continue
+                if candidate.shape == shape:
+                    twins.append(candidate)
+        return twins
+
+#===========================================================================================
+
+class LinkShapeIndex():
+    '''
+    Maps the quantized shape of links (i-node, vertices and j-node) to the
+    list of links with that shape. Two links only share a key if they have
+    the same direction and the same vertices.
+    '''
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        self._shapes = {}
+
+    @staticmethod
+    def fromNetwork(network, precision=DEFAULT_PRECISION, links=None):
+        '''
+        Indexes the links of a Network object.
+
+        Args:
+            - network: The Emme Network to index.
+            - precision (=DEFAULT_PRECISION): Quantization step for the coordinates.
+            - links (=None): Optional iterable of links to index, instead of all links.
+        '''
+        index = LinkShapeIndex(precision)
+        if links is None:
+            links = network.links()
+        for link in links:
+            index.insert(link)
+        return index
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def insert(self, link, shape=None):
+        if shape is None:
+            shape = link.shape
+        key = hashShape(shape, self.precision)
+        if key in self._shapes:
+            self._shapes[key].append(link)
+        else:
+            self._shapes[key] = [link]
+
+    def getLinksWithShape(self, shape):
+        '''
+        Returns the list of indexed links with the given shape, which is empty
+        if there are none.
+        '''
+        return list(self._shapes.get(hashShape(shape, self.precision), []))
+
+    def getTwinLinks(self, link):
+        '''
+        Returns the list of indexed links with the same shape as the given
+        link, excluding the link itself.
+        '''
+        iNumber = link.i_node.number
+        jNumber = link.j_node.number
+        return [other for other in self.getLinksWithShape(link.shape)
+                if other.i_node.number != iNumber or other.j_node.number != jNumber]
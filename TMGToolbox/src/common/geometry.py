@@ -19,13 +19,20 @@
 
 from shapely import geometry as _geo
 from shapely.geometry import mapping, shape
+from shapely.prepared import prep as _prep
 import fiona
+import numpy as _np
 from shutil import copyfile
 from os import path as _path
 import warnings as _warn
 import inro.modeller as _m
 import six
 
+try:
+    from shapely import contains_xy as _contains_xy #Shapely 2.0+
+except ImportError:
+    _contains_xy = None
+
 _MODELLER = _m.Modeller()
 _util = _MODELLER.module('tmg.common.utilities')
 
@@ -195,6 +202,63 @@ def checkSegmentIntersection(coordA1, coordA2, coordB1, coordB2):
     return (s >= 0 and s <= 1 and t >= 0 and t <= 1)
 
 
+def pointsInPolygon(polygon, xs, ys):
+    '''
+    Tests which of a set of points lie within a polygon (or multipolygon), without
+    creating a geometry for each point.
+    
+    Points outside the polygon's bounding box are rejected first. The remaining
+    points are tested against the prepared polygon with Shapely's vectorized
+    contains_xy (Shapely 2.0+), or otherwise by an even-odd ray casting over the
+    polygon's rings, in which each edge only visits the points within its range
+    of y coordinates.
+    
+    Args:
+        - polygon: The shapely Polygon or MultiPolygon
+        - xs, ys: Arrays of the point coordinates
+    
+    Returns: A boolean array of the points inside the polygon.
+    '''
+    xs = _np.asarray(xs, dtype=_np.float64)
+    ys = _np.asarray(ys, dtype=_np.float64)
+    minx, miny, maxx, maxy = polygon.bounds
+    inside = (xs >= minx) & (xs <= maxx) & (ys >= miny) & (ys <= maxy)
+    candidates = _np.flatnonzero(inside)
+    if len(candidates) == 0:
+        return inside
+    
+    if _contains_xy is not None:
+        prepared = _prep(polygon)
+        inside[candidates] = _contains_xy(prepared.context, xs[candidates], ys[candidates])
+        return inside
+    
+    order = _np.argsort(ys[candidates], kind='mergesort')
+    candidates = candidates[order]
+    px = xs[candidates]
+    py = ys[candidates]
+    crossings = _np.zeros(len(candidates), dtype=bool)
+    
+    parts = getattr(polygon, 'geoms', [polygon])
+    rings = []
+    for part in parts:
+        rings.append(part.exterior)
+        rings.extend(part.interiors)
+    for ring in rings:
+        coordinates = _np.asarray(ring.coords, dtype=_np.float64)[:, :2]
+        x0, y0 = coordinates[:-1, 0], coordinates[:-1, 1]
+        x1, y1 = coordinates[1:, 0], coordinates[1:, 1]
+        #An edge crosses the ray from (px, py) if py is in [min(y0, y1), max(y0, y1))
+        starts = _np.searchsorted(py, _np.minimum(y0, y1), side='left')
+        stops = _np.searchsorted(py, _np.maximum(y0, y1), side='left')
+        for edge in _np.flatnonzero(stops > starts):
+            start, stop = starts[edge], stops[edge]
+            slope = (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+            crosses = px[start:stop] < x0[edge] + (py[start:stop] - y0[edge]) * slope
+            crossings[start:stop] ^= crosses
+    
+    inside[candidates] = crossings
+    return inside
+
 ##################################################################################################################
 #---Field class for storing data about DBF fields
 
@@ -0,0 +1,380 @@
+'''
+    Copyright 2026 Travel Modelling Group, Department of Civil Engineering, University of Toronto
+
+    This file is part of the TMG Toolbox.
+
+    The TMG Toolbox is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    The TMG Toolbox is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with the TMG Toolbox.  If not, see <http://www.gnu.org/licenses/>.
+'''
+'''
+Projected size of a fare-based transit hypernetwork (FBTN), computed from the
+base scenario's attribute arrays without building or editing a Network.
+
+The counts follow the transformation of the FBTN generators: every surface node
+gets one virtual node per stopping and passing line group (with access and
+transfer links between them), every station node gets one virtual node per
+extra stopping group and per passing group (copying its connectors), walk
+links next to stations are replicated between the stopping groups at both ends,
+and each line group gets its own copy of the links it runs on. Line groups are
+either read from a line attribute (as loaded by the generators) or evaluated
+directly from the schema's selections, so the projection is cheap enough to run
+as a pre-flight before any network is loaded.
+
+Example:
+    lineIds, lineGroups = _hyperSize.loadLineGroups(scenario, lineGroupAttId)
+    size = _hyperSize.projectSize(scenario, lineIds, lineGroups)
+    size.report(_MODELLER.emmebank)
+    size.checkDimensions(_MODELLER.emmebank)
+'''
+
+import numpy as _np
+
+import inro.modeller as _m
+_MODELLER = _m.Modeller()
+_util = _MODELLER.module('tmg.common.utilities')
+_partial = _MODELLER.module('tmg.common.partial_network')
+_graph = _MODELLER.module('tmg.common.network_graph')
+_lineSelection = _MODELLER.module('tmg.common.line_selection')
+
+# import six library for python2 to python3 conversion
+import six
+
+class Face(_m.Tool()):
+    def page(self):
+        pb = _m.ToolPageBuilder(self, runnable=False, title="Hypernetwork Size",
+                                description="Projects the number of nodes, links and segments \
+                                of a fare-based transit hypernetwork. For internal use only.",
+                                branding_text="- TMG Toolbox")
+
+        pb.add_text_element("To import, call inro.modeller.Modeller().module('%s')" %str(self))
+
+        return pb.render()
+
+#===========================================================================================
+
+# Network elements checked against the emmebank dimensions, with their display names
+DIMENSIONS = [('centroids', 'Centroids'),
+              ('regular_nodes', 'Regular nodes'),
+              ('links', 'Links'),
+              ('transit_lines', 'Transit lines'),
+              ('transit_segments', 'Transit segments')]
+
+class HypernetworkSizeError(Exception):
+    pass
+
+def loadLineGroups(scenario, lineGroupAttId):
+    '''
+    Reads the line group numbers stored in a transit line attribute.
+
+    Returns:
+        lineIds, lineGroups: the list of line ids and an aligned array of
+        line group numbers.
+    '''
+    editor = _partial.PartialNetworkEditor(scenario, {'TRANSIT_LINE': [lineGroupAttId]}, loadNetwork=False)
+    return editor.keys('TRANSIT_LINE'), editor.getValues('TRANSIT_LINE', lineGroupAttId).astype(_np.int64)
+
+def selectLineGroups(scenario, groupsElement):
+    '''
+    Evaluates the selections of the 'groups' element of a fare schema against the
+    scenario's lines. Groups are numbered from 1 in the order of the schema, and a
+    later group takes the lines also selected by an earlier one (as when each
+    selection is applied with the network calculator). Unselected lines are in
+    group 0.
+
+    Raises line_selection.UnsupportedSelectionError if any selection is outside of
+    the syntax supported by line_selection, in which case the caller should load
+    the groups with the network calculator instead.
+
+    Returns:
+        lineIds, lineGroups: the list of line ids and an aligned array of
+        line group numbers.
+    '''
+    groups = []
+    attributes = set()
+    needsModes = False
+    for groupNumber, groupElement in enumerate(groupsElement.findall('group'), 1):
+        for selectionElement in groupElement.findall('selection'):
+            selection = _lineSelection.compileSelection(selectionElement.text or '')
+            attributes |= selection.attributes
+            needsModes = needsModes or selection.needsModes
+            groups.append((groupNumber, selection))
+
+    table = _lineSelection.LineTable.fromScenario(scenario, sorted(attributes), loadModes=needsModes)
+    lineGroups = _np.zeros(len(table), dtype=_np.int64)
+    for groupNumber, selection in groups:
+        lineGroups[selection.evaluate(table)] = groupNumber
+    return table.ids, lineGroups
+
+def _iterSegmentStops(scenario, lineGroupMap):
+    '''
+    Yields (line group, i-node, j-node, isStop) for each segment of each line in
+    itinerary order, including the last (hidden) segment of each line with a
+    j-node of None. A hidden segment missing from the attribute index is taken
+    to be a stop.
+    '''
+    package = scenario.get_attribute_values('TRANSIT_SEGMENT', ['allow_boardings', 'allow_alightings'])
+    keys, positions = _partial.flattenIndex('TRANSIT_SEGMENT', package[0])
+    isStop = (_np.array(package[1]) != 0) | (_np.array(package[2]) != 0)
+
+    order = _np.argsort(positions, kind='mergesort')
+    stops = isStop[positions[order]].tolist()
+
+    previousLine = None
+    terminal = None
+    for key, stop in _util.itersync([keys[index] for index in order], stops):
+        lineId, i, j, loop = key
+        if lineId != previousLine:
+            if terminal is not None:
+                yield terminal
+            previousLine = lineId
+            group = lineGroupMap.get(lineId, 0)
+        if j is None or j == 0:
+            #The line's hidden segment is part of the index
+            terminal = None
+            yield group, i, None, stop
+        else:
+            terminal = (group, j, None, True)
+            yield group, i, j, stop
+    if terminal is not None:
+        yield terminal
+
+class HypernetworkSize():
+    '''
+    The projected element totals of a hypernetwork, and how they break down.
+
+    Attributes:
+        - base: Dictionary of element totals of the base scenario
+        - projected: Dictionary of projected element totals of the hypernetwork
+            (keyed as the emmebank dimensions)
+        - surfaceNodes, stationNodes: The number of base surface and station nodes
+        - virtualSurfaceNodes, virtualStationNodes: The number of virtual nodes
+            created for each
+        - surfaceLinks: The number of access and transfer links at surface nodes
+        - stationLinks: The number of copied connectors and transfer links at
+            station nodes
+        - connectorLinks: The number of walk links between the virtual nodes of
+            neighbouring surface and station nodes
+        - inVehicleLinks: The number of links copied for line groups
+    '''
+
+    def __init__(self, base):
+        self.base = dict(base)
+        self.projected = dict(base)
+        self.surfaceNodes = 0
+        self.stationNodes = 0
+        self.virtualSurfaceNodes = 0
+        self.virtualStationNodes = 0
+        self.surfaceLinks = 0
+        self.stationLinks = 0
+        self.connectorLinks = 0
+        self.inVehicleLinks = 0
+
+    def _total(self):
+        self.projected['regular_nodes'] = (self.base['regular_nodes'] + self.virtualSurfaceNodes
+                                           + self.virtualStationNodes)
+        self.projected['links'] = (self.base['links'] + self.surfaceLinks + self.stationLinks
+                                   + self.connectorLinks + self.inVehicleLinks)
+
+    @property
+    def nodes(self):
+        return self.projected['regular_nodes']
+
+    @property
+    def links(self):
+        return self.projected['links']
+
+    @property
+    def segments(self):
+        return self.projected['transit_segments']
+
+    def exceededDimensions(self, emmebank):
+        '''
+        Returns a list of (element, projected total, dimension) for each element
+        of the hypernetwork which does not fit in the emmebank.
+        '''
+        exceeded = []
+        for element, name in DIMENSIONS:
+            limit = emmebank.dimensions.get(element)
+            if limit is None: continue
+            if self.projected[element] > limit:
+                exceeded.append((element, self.projected[element], limit))
+        return exceeded
+
+    def report(self, emmebank):
+        '''
+        Writes the projected totals and the emmebank dimensions to the logbook.
+        '''
+        exceeded = set(element for element, total, limit in self.exceededDimensions(emmebank))
+
+        t = "<table title='Projected hypernetwork size'>\n"
+        t += "  <tr>\n"
+        t += "  <th>element</th>\n"
+        t += "  <th>base</th>\n"
+        t += "  <th>hypernetwork</th>\n"
+        t += "  <th>dimension</th>\n"
+        t += "  </tr>\n"
+        for element, name in DIMENSIONS:
+            limit = emmebank.dimensions.get(element, '')
+            t += "  <tr>\n"
+            t += "  <td>{0}</td>\n".format(name + (" (exceeded)" if element in exceeded else ""))
+            t += "  <td>{0}</td>\n".format(self.base[element])
+            t += "  <td>{0}</td>\n".format(self.projected[element])
+            t += "  <td>{0}</td>\n".format(limit)
+            t += "  </tr>\n"
+        t += "</table>\n"
+        t += "<p>{0} surface nodes get {1} virtual nodes and {2} access links; {3} station nodes get {4} \
+virtual nodes and {5} links. {6} connector links and {7} in-vehicle links are added between nodes.</p>".format(
+            self.surfaceNodes, self.virtualSurfaceNodes, self.surfaceLinks,
+            self.stationNodes, self.virtualStationNodes, self.stationLinks,
+            self.connectorLinks, self.inVehicleLinks)
+
+        msg = "Projected hypernetwork size: %s nodes, %s links and %s segments" %(self.nodes, self.links, self.segments)
+        print(msg)
+        _m.logbook_write(msg, value=t)
+
+    def checkDimensions(self, emmebank):
+        '''
+        Raises HypernetworkSizeError if the hypernetwork does not fit in the emmebank.
+        '''
+        exceeded = self.exceededDimensions(emmebank)
+        if not exceeded: return
+        details = ", ".join("%s %s > %s" %(element, total, limit) for element, total, limit in exceeded)
+        raise HypernetworkSizeError("The hypernetwork exceeds the emmebank dimensions (%s)" %details)
+
+def projectSize(scenario, lineIds, lineGroups, ignoreSameGroupsForStations=False):
+    '''
+    Projects the size of the hypernetwork generated from a scenario.
+
+    Args:
+        - scenario: The base Emme Scenario
+        - lineIds, lineGroups: The line group number of each transit line, as
+            returned by loadLineGroups or selectLineGroups
+        - ignoreSameGroupsForStations (=False): True if walk links are not
+            replicated between virtual nodes of the same line group (see the
+            generator's option of the same name)
+
+    Returns: A HypernetworkSize
+    '''
+    base = scenario.element_totals
+    size = HypernetworkSize(dict((element, base[element]) for element, name in DIMENSIONS))
+
+    network = scenario.get_partial_network(['MODE', 'NODE', 'LINK'], include_attributes=False)
+    nodes = list(network.nodes())
+    nodeIndex = dict((node.number, index) for index, node in enumerate(nodes))
+    nNodes = len(nodes)
+    isCentroid = _np.array([node.is_centroid for node in nodes], dtype=bool)
+
+    links, modeMasks = _graph.getLinkModeMasks(network)
+    linkIndex = dict(((link.i_node.number, link.j_node.number), index) for index, link in enumerate(links))
+    tails = _np.array([nodeIndex[link.i_node.number] for link in links], dtype=_np.int64)
+    heads = _np.array([nodeIndex[link.j_node.number] for link in links], dtype=_np.int64)
+    def linksOfType(modeType):
+        mask = _np.zeros(len(links), dtype=bool)
+        for mode in network.modes():
+            if mode.type == modeType:
+                mask |= modeMasks[mode.id]
+        return mask
+    permitsAuto = linksOfType('AUTO')
+    permitsWalk = linksOfType('AUX_TRANSIT')
+    isConnector = isCentroid[tails] | isCentroid[heads]
+
+    #Stopping and passing (node, group) pairs, in itinerary order
+    lineGroupMap = dict(six.moves.zip(lineIds, lineGroups.tolist()))
+    nGroups = int(lineGroups.max()) + 1 if len(lineGroups) else 1
+    stopCodes = []
+    passCodes = []
+    segmentLinks = []
+    segmentGroups = []
+    for group, i, j, stop in _iterSegmentStops(scenario, lineGroupMap):
+        code = nodeIndex[i] * nGroups + group
+        if stop:
+            stopCodes.append(code)
+        else:
+            passCodes.append(code)
+        if j is not None:
+            segmentLinks.append(linkIndex[(i, j)])
+            segmentGroups.append(group)
+    stopCodes = _np.array(stopCodes, dtype=_np.int64)
+    uniqueStops, firstStops = _np.unique(stopCodes, return_index=True)
+    passCodes = _np.setdiff1d(_np.array(passCodes, dtype=_np.int64), uniqueStops)
+
+    stopTable = _np.zeros((nNodes, nGroups), dtype=bool)
+    stopTable[uniqueStops // nGroups, uniqueStops % nGroups] = True
+    nStopping = stopTable.sum(axis=1)
+    nPassing = _np.bincount(passCodes // nGroups, minlength=nNodes)
+
+    #Node roles: surface nodes (1) are next to a non-connector auto link, and station nodes (2)
+    #are transit nodes which are not
+    nearAuto = _np.zeros(nNodes, dtype=bool)
+    autoLinks = permitsAuto & ~isConnector
+    nearAuto[tails[autoLinks]] = True
+    nearAuto[heads[autoLinks]] = True
+    hasTransit = (nStopping + nPassing) > 0
+    roles = _np.where(isCentroid, 0, _np.where(hasTransit & ~nearAuto, 2, 1))
+    isSurface = roles == 1
+    isStation = roles == 2
+
+    #Link roles: station connectors (1) and station transfers (2)
+    tailRoles = roles[tails]
+    headRoles = roles[heads]
+    walkLinks = permitsWalk & ~isConnector
+    linkRoles = _np.zeros(len(links), dtype=_np.int64)
+    linkRoles[walkLinks & (((tailRoles == 1) & (headRoles == 2)) | ((tailRoles == 2) & (headRoles == 1)))] = 1
+    linkRoles[walkLinks & (tailRoles == 2) & (headRoles == 2)] = 2
+
+    #The first stopping group of a station keeps the base node. This is the first group
+    #iterated from the generator's set of stopping groups, so the same set is rebuilt here.
+    firstGroups = _np.full(nNodes, -1, dtype=_np.int64)
+    stationGroups = {}
+    for code in uniqueStops[_np.argsort(firstStops, kind='mergesort')].tolist():
+        node = code // nGroups
+        if isStation[node]:
+            stationGroups.setdefault(node, set()).add(code % nGroups)
+    for node, groups in six.iteritems(stationGroups):
+        firstGroups[node] = next(iter(groups))
+
+    size.surfaceNodes = int(isSurface.sum())
+    size.stationNodes = int(isStation.sum())
+    size.virtualSurfaceNodes = int((nStopping + nPassing)[isSurface].sum())
+    extraStopping = _np.maximum(nStopping - 1, 0)
+    size.virtualStationNodes = int((extraStopping + nPassing)[isStation].sum())
+
+    size.surfaceLinks = int((nStopping * (nStopping + 1))[isSurface].sum())
+    copiedLinks = (_np.bincount(tails[linkRoles == 1], minlength=nNodes)
+                   + _np.bincount(heads[linkRoles == 1], minlength=nNodes)
+                   + _np.bincount(tails[isCentroid[heads]], minlength=nNodes)
+                   + _np.bincount(heads[isCentroid[tails]], minlength=nNodes))
+    size.stationLinks = int((extraStopping * copiedLinks + nStopping * extraStopping)[isStation].sum())
+
+    connectors = _np.flatnonzero(linkRoles > 0)
+    ci, cj = tails[connectors], heads[connectors]
+    pairs = nStopping[ci] * nStopping[cj]
+    baseLinkReused = (linkRoles[connectors] == 2) & (firstGroups[ci] >= 0) & (firstGroups[cj] >= 0)
+    if ignoreSameGroupsForStations:
+        pairs -= (stopTable[ci] & stopTable[cj]).sum(axis=1)
+        baseLinkReused &= firstGroups[ci] != firstGroups[cj]
+    size.connectorLinks = int(pairs.sum() - baseLinkReused.sum())
+
+    #In-vehicle links are unique to a (link, group), unless they re-use the base link (both ends
+    #kept for the group) or a connector link between the group's virtual stops
+    lineLinks = _np.unique(_np.array(segmentLinks, dtype=_np.int64) * nGroups
+                           + _np.array(segmentGroups, dtype=_np.int64))
+    li, lg = lineLinks // nGroups, lineLinks % nGroups
+    ti, hi = tails[li], heads[li]
+    exists = (firstGroups[ti] == lg) & (firstGroups[hi] == lg)
+    if not ignoreSameGroupsForStations:
+        exists |= (linkRoles[li] > 0) & stopTable[ti, lg] & stopTable[hi, lg]
+    size.inVehicleLinks = int(len(lineLinks) - exists.sum())
+
+    size._total()
+    return size
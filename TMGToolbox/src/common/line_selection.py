@@ -0,0 +1,294 @@
+'''
+    Copyright 2026 Travel Modelling Group, Department of Civil Engineering, University of Toronto
+
+    This file is part of the TMG Toolbox.
+
+    The TMG Toolbox is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    The TMG Toolbox is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with the TMG Toolbox.  If not, see <http://www.gnu.org/licenses/>.
+'''
+'''
+Evaluation of transit line selector expressions against line attribute arrays.
+
+Tools which apply many network calculator selections to transit lines (e.g.
+one per row of an input file) can compile the expressions once and evaluate
+them as boolean masks over the scenario's lines, instead of running the
+network calculator for each one. The supported subset of the Emme selection
+syntax is:
+
+    - all
+    - line=<pattern>: line id pattern, where '_' matches any character
+        (ids are compared padded to 6 characters, so 'T_____' matches 'T1')
+    - mode=<modes>: lines of any of the listed mode characters
+    - <attribute>=<value> or <attribute>=<min>,<max> (inclusive), for hdw,
+        speed, ut1, ut2, ut3 and extra attributes
+    - not, parentheses, and 'and' / 'or' (mixing both at the same level
+        requires parentheses)
+
+Anything else raises UnsupportedSelectionError, and the caller should fall
+back to the network calculator for that expression.
+
+Example:
+    selection = _lineSelection.compileSelection("mode=b and line=T_____")
+    table = _lineSelection.LineTable.fromScenario(scenario, selection.attributes,
+                                                 loadModes=selection.needsModes)
+    mask = selection.evaluate(table)
+'''
+
+import re as _re
+import numpy as _np
+
+import inro.modeller as _m
+_MODELLER = _m.Modeller()
+_util = _MODELLER.module('tmg.common.utilities')
+_partial = _MODELLER.module('tmg.common.partial_network')
+
+# import six library for python2 to python3 conversion
+import six
+
+class Face(_m.Tool()):
+    def page(self):
+        pb = _m.ToolPageBuilder(self, runnable=False, title="Line Selection",
+                                description="Evaluates transit line selector expressions \
+                                against line attribute arrays. For internal use only.",
+                                branding_text="- TMG Toolbox")
+
+        pb.add_text_element("To import, call inro.modeller.Modeller().module('%s')" %str(self))
+
+        return pb.render()
+
+#===========================================================================================
+
+# Network calculator names of the transit line attributes which can be selected on
+LINE_ATTRIBUTES = {'hdw': 'headway',
+                   'speed': 'speed',
+                   'ut1': 'data1',
+                   'ut2': 'data2',
+                   'ut3': 'data3'}
+
+LINE_ID_LENGTH = 6
+
+_TOKEN = _re.compile(r'\(|\)|[^\s()=]+\s*=\s*[^\s()]+|[^\s()]+')
+_NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+_RANGE = _re.compile(r'^(%s)(?:,(%s))?$' %(_NUMBER, _NUMBER))
+
+class UnsupportedSelectionError(Exception):
+    pass
+
+class LineTable():
+    '''
+    The transit lines of a scenario as arrays: line ids, mode ids and any
+    number of attribute columns, all aligned.
+    '''
+
+    def __init__(self, ids, modes=None, values={}):
+        '''
+        Args:
+            - ids: List of line ids
+            - modes (=None): List of line mode ids, if selections on modes are needed
+            - values (={}): Dictionary of attribute name : array. The arrays are
+                referenced, not copied, so a tool may update them in place between
+                evaluations.
+        '''
+        self.ids = list(ids)
+        self.modes = None if modes is None else _np.array(modes)
+        self.values = dict(values)
+        self._paddedIds = None
+
+    @classmethod
+    def fromScenario(cls, scenario, attributes, loadModes=False):
+        '''
+        Loads the given line attributes (and optionally the line modes) of a scenario.
+        '''
+        attributes = list(attributes)
+        editor = _partial.PartialNetworkEditor(scenario, {'TRANSIT_LINE': attributes or ['headway']},
+                                               loadNetwork=loadModes)
+        return cls.fromEditor(editor, attributes, loadModes)
+
+    @classmethod
+    def fromEditor(cls, editor, attributes, loadModes=False):
+        '''
+        Builds the table from the TRANSIT_LINE domain of a PartialNetworkEditor, which
+        must have loaded its network if loadModes is True.
+        '''
+        ids = editor.keys('TRANSIT_LINE')
+        modes = None
+        if loadModes:
+            network = editor.network
+            modes = [network.transit_line(lineId).mode.id for lineId in ids]
+        values = dict((att, editor.getValues('TRANSIT_LINE', att)) for att in attributes)
+        return cls(ids, modes, values)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def paddedIds(self):
+        if self._paddedIds is None:
+            self._paddedIds = [str(lineId).ljust(LINE_ID_LENGTH) for lineId in self.ids]
+        return self._paddedIds
+
+#-------------------------------------------------------------------------------------------
+
+class _All():
+    attributes = frozenset()
+    needsModes = False
+
+    def evaluate(self, table):
+        return _np.ones(len(table), dtype=bool)
+
+class _LinePattern():
+    attributes = frozenset()
+    needsModes = False
+
+    def __init__(self, pattern):
+        pattern = pattern.ljust(LINE_ID_LENGTH)
+        self.regex = _re.compile(''.join('.' if char == '_' else _re.escape(char) for char in pattern) + '$')
+
+    def evaluate(self, table):
+        match = self.regex.match
+        return _np.array([match(lineId) is not None for lineId in table.paddedIds()], dtype=bool)
+
+class _Modes():
+    attributes = frozenset()
+    needsModes = True
+
+    def __init__(self, modes):
+        self.modes = list(modes)
+
+    def evaluate(self, table):
+        if table.modes is None:
+            raise KeyError("Line modes were not loaded")
+        return _np.isin(table.modes, self.modes)
+
+class _AttributeRange():
+    needsModes = False
+
+    def __init__(self, attribute, lower, upper):
+        self.attribute = attribute
+        self.attributes = frozenset([attribute])
+        self.lower = lower
+        self.upper = upper
+
+    def evaluate(self, table):
+        values = table.values[self.attribute]
+        return (values >= self.lower) & (values <= self.upper)
+
+class _Not():
+    def __init__(self, operand):
+        self.operand = operand
+        self.attributes = operand.attributes
+        self.needsModes = operand.needsModes
+
+    def evaluate(self, table):
+        return ~self.operand.evaluate(table)
+
+class _Combination():
+    def __init__(self, operator, operands):
+        self.operator = operator
+        self.operands = operands
+        self.attributes = frozenset().union(*[operand.attributes for operand in operands])
+        self.needsModes = any(operand.needsModes for operand in operands)
+
+    def evaluate(self, table):
+        mask = self.operands[0].evaluate(table)
+        for operand in self.operands[1:]:
+            mask = self.operator(mask, operand.evaluate(table))
+        return mask
+
+class LineSelection():
+    '''
+    A compiled transit line selector expression.
+
+    Attributes:
+        - expression: The original expression
+        - attributes: Set of line attributes (Emme names, e.g. 'headway') the
+            selection needs in the LineTable
+        - needsModes: True if the selection needs the line modes
+    '''
+
+    def __init__(self, expression, root):
+        self.expression = expression
+        self._root = root
+        self.attributes = set(root.attributes)
+        self.needsModes = root.needsModes
+
+    def evaluate(self, table):
+        '''
+        Returns a boolean array, aligned with the table's lines, of the selected lines.
+        '''
+        return self._root.evaluate(table)
+
+def compileSelection(expression):
+    '''
+    Compiles a transit line selector expression.
+
+    Raises UnsupportedSelectionError if the expression uses syntax outside of the
+    supported subset.
+    '''
+    tokens = _TOKEN.findall(expression.strip())
+    if not tokens:
+        raise UnsupportedSelectionError("Empty selection")
+    root, position = _parseSequence(tokens, 0)
+    if position != len(tokens):
+        raise UnsupportedSelectionError("Unexpected '%s' in selection '%s'" %(tokens[position], expression))
+    return LineSelection(expression, root)
+
+def _parseSequence(tokens, position):
+    operand, position = _parseUnary(tokens, position)
+    operands = [operand]
+    operators = set()
+    while position < len(tokens) and tokens[position].lower() in ('and', 'or'):
+        operators.add(tokens[position].lower())
+        operand, position = _parseUnary(tokens, position + 1)
+        operands.append(operand)
+    if len(operators) > 1:
+        raise UnsupportedSelectionError("'and' and 'or' are mixed without parentheses")
+    if len(operands) == 1:
+        return operands[0], position
+    operator = _np.logical_and if 'and' in operators else _np.logical_or
+    return _Combination(operator, operands), position
+
+def _parseUnary(tokens, position):
+    if position >= len(tokens):
+        raise UnsupportedSelectionError("Incomplete selection")
+    token = tokens[position]
+    if token.lower() == 'not':
+        operand, position = _parseUnary(tokens, position + 1)
+        return _Not(operand), position
+    if token == '(':
+        operand, position = _parseSequence(tokens, position + 1)
+        if position >= len(tokens) or tokens[position] != ')':
+            raise UnsupportedSelectionError("Unbalanced parentheses")
+        return operand, position + 1
+    return _parseTerm(token), position + 1
+
+def _parseTerm(token):
+    if token.lower() == 'all':
+        return _All()
+    if '=' not in token:
+        raise UnsupportedSelectionError("Unsupported term '%s'" %token)
+    name, value = [part.strip() for part in token.split('=', 1)]
+    name = name.lower()
+    if name == 'line':
+        if '*' in value or ',' in value or len(value) > LINE_ID_LENGTH:
+            raise UnsupportedSelectionError("Unsupported line pattern '%s'" %value)
+        return _LinePattern(value)
+    if name == 'mode':
+        return _Modes(value)
+    if name in LINE_ATTRIBUTES or name.startswith('@'):
+        match = _RANGE.match(value)
+        if match is None:
+            raise UnsupportedSelectionError("Unsupported attribute value '%s'" %value)
+        lower = float(match.group(1))
+        upper = float(match.group(2)) if match.group(2) is not None else lower
+        return _AttributeRange(LINE_ATTRIBUTES.get(name, name), lower, upper)
+    raise UnsupportedSelectionError("Unsupported term '%s'" %token)
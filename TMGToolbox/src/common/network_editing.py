@@ -22,6 +22,7 @@ from inro.emme.network import Network
 import inro.modeller as _m
 import math as _math
 from warnings import warn as _warn
+from functools import cmp_to_key as _cmp_to_key
 import traceback as _traceback
 _MODELLER = _m.Modeller()
 _util = _MODELLER.module('tmg.common.utilities')
@@ -1174,7 +1175,7 @@ class AStarLinks():
                             toLink.j_node.estimate = self.__calcHeuristic(toLink.j_node)
                 link.j_node.isClosed = True #Only close nodes which are not intersections
             
-            pq.sort(cmp=self.__comparator, reverse=True)
+            pq.sort(key=_cmp_to_key(self.__comparator), reverse=True)
         return [] #Priority queue is empty, shortest-path not found     
     
     ##############################################################
@@ -0,0 +1,231 @@
+'''
+    Copyright 2026 Travel Modelling Group, Department of Civil Engineering, University of Toronto
+
+    This file is part of the TMG Toolbox.
+
+    The TMG Toolbox is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    The TMG Toolbox is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with the TMG Toolbox.  If not, see <http://www.gnu.org/licenses/>.
+'''
+'''
+Directed graphs over network elements, for reachability questions which do
+not need path costs (e.g. which zones can reach each other by a given mode).
+
+Vertices are integers 0..n-1 and edges are held as sorted tail / head arrays
+(compressed sparse rows). Strongly connected components are found with an
+iterative version of Tarjan's algorithm, so that reachability between labelled
+vertices (e.g. centroids) can be propagated once over the condensed graph
+instead of searching from every vertex.
+
+Example:
+    links, modeMasks = _graph.getLinkModeMasks(network, ['c', 'w'])
+    graph = _graph.DirectedGraph(nVertices, tails[modeMasks['c']], heads[modeMasks['c']])
+    reached = graph.reachedLabels(destinationLabels)
+'''
+
+import numpy as _np
+
+import inro.modeller as _m
+_MODELLER = _m.Modeller()
+_util = _MODELLER.module('tmg.common.utilities')
+
+# import six library for python2 to python3 conversion
+import six
+
+class Face(_m.Tool()):
+    def page(self):
+        pb = _m.ToolPageBuilder(self, runnable=False, title="Network Graph",
+                                description="Directed graphs, strongly connected components and \
+                                reachability over network elements. For internal use only.",
+                                branding_text="- TMG Toolbox")
+
+        pb.add_text_element("To import, call inro.modeller.Modeller().module('%s')" %str(self))
+
+        return pb.render()
+
+#===========================================================================================
+
+def getLinkModeMasks(network, modeIds=None):
+    '''
+    Reads the modes of all links of a network in one pass.
+
+    Args:
+        - network: The Emme Network (only LINK and MODE need to be loaded)
+        - modeIds (=None): List of mode ids to build masks for. Defaults to all
+            modes of the network.
+
+    Returns:
+        links, masks: the list of links, and a dictionary of mode id : boolean
+        array (aligned with links) of the links which allow that mode.
+    '''
+    if modeIds is None:
+        modeIds = [mode.id for mode in network.modes()]
+    modeIds = [str(modeId) for modeId in modeIds]
+    modeColumns = dict((modeId, column) for column, modeId in enumerate(modeIds))
+
+    links = []
+    rows = []
+    columns = []
+    for row, link in enumerate(network.links()):
+        links.append(link)
+        for mode in link.modes:
+            column = modeColumns.get(mode.id)
+            if column is not None:
+                rows.append(row)
+                columns.append(column)
+
+    table = _np.zeros((len(links), len(modeIds)), dtype=bool)
+    table[_np.array(rows, dtype=_np.int64), _np.array(columns, dtype=_np.int64)] = True
+    masks = dict((modeId, table[:, column]) for modeId, column in six.iteritems(modeColumns))
+    return links, masks
+
+class DirectedGraph():
+    '''
+    A directed graph over vertices 0..nVertices-1, stored as compressed sparse rows.
+    '''
+
+    def __init__(self, nVertices, tails, heads):
+        '''
+        Args:
+            - nVertices: The number of vertices
+            - tails, heads: Arrays of the tail and head vertex of each edge
+        '''
+        self.nVertices = int(nVertices)
+        tails = _np.asarray(tails, dtype=_np.int64)
+        heads = _np.asarray(heads, dtype=_np.int64)
+        order = _np.argsort(tails, kind='mergesort')
+        self.tails = tails[order]
+        self.heads = heads[order]
+        self.offsets = _np.zeros(self.nVertices + 1, dtype=_np.int64)
+        _np.cumsum(_np.bincount(self.tails, minlength=self.nVertices), out=self.offsets[1:])
+
+    def __len__(self):
+        return self.nVertices
+
+    def successors(self, vertex):
+        return self.heads[self.offsets[vertex]:self.offsets[vertex + 1]]
+
+    def reverse(self):
+        return DirectedGraph(self.nVertices, self.heads, self.tails)
+
+    def stronglyConnectedComponents(self):
+        '''
+        Returns:
+            nComponents, labels: the number of strongly connected components, and the
+            component of each vertex. Components are numbered in reverse topological
+            order: every edge between two components goes from a higher number to a
+            lower one (so component 0 has no outgoing edges).
+        '''
+        n = self.nVertices
+        offsets = self.offsets.tolist()
+        heads = self.heads.tolist()
+
+        index = [-1] * n
+        lowLink = [0] * n
+        onStack = [False] * n
+        labels = [-1] * n
+        stack = []
+        nComponents = 0
+        counter = 0
+
+        for root in six.moves.range(n):
+            if index[root] >= 0: continue
+            #Each frame is [vertex, position of the next edge to visit]
+            work = [[root, offsets[root]]]
+            index[root] = lowLink[root] = counter
+            counter += 1
+            stack.append(root)
+            onStack[root] = True
+
+            while work:
+                frame = work[-1]
+                vertex, position = frame
+                if position < offsets[vertex + 1]:
+                    frame[1] = position + 1
+                    head = heads[position]
+                    if index[head] < 0:
+                        index[head] = lowLink[head] = counter
+                        counter += 1
+                        stack.append(head)
+                        onStack[head] = True
+                        work.append([head, offsets[head]])
+                    elif onStack[head] and index[head] < lowLink[vertex]:
+                        lowLink[vertex] = index[head]
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if lowLink[vertex] < lowLink[parent]:
+                        lowLink[parent] = lowLink[vertex]
+                if lowLink[vertex] == index[vertex]:
+                    while True:
+                        member = stack.pop()
+                        onStack[member] = False
+                        labels[member] = nComponents
+                        if member == vertex: break
+                    nComponents += 1
+
+        return nComponents, _np.array(labels, dtype=_np.int64)
+
+    def reachedLabels(self, vertexLabels, limit=2):
+        '''
+        Finds, for every vertex, up to `limit` distinct labels of the labelled vertices
+        it can reach (itself included). Two labels are enough to tell whether a vertex
+        reaches any labelled vertex other than its own.
+
+        Args:
+            - vertexLabels: Array of a non-negative label for each labelled vertex,
+                and -1 for unlabelled vertices.
+            - limit (=2): The number of distinct labels to keep per vertex
+
+        Returns:
+            An (nVertices x limit) array of labels, padded with -1.
+        '''
+        vertexLabels = _np.asarray(vertexLabels, dtype=_np.int64)
+        nComponents, components = self.stronglyConnectedComponents()
+
+        #Labels of the members of each component
+        found = [[] for i in six.moves.range(nComponents)]
+        for vertex in _np.flatnonzero(vertexLabels >= 0).tolist():
+            labelSet = found[components[vertex]]
+            label = int(vertexLabels[vertex])
+            if len(labelSet) < limit and label not in labelSet:
+                labelSet.append(label)
+
+        #Edges between components, grouped by their tail component
+        tailComponents = components[self.tails]
+        headComponents = components[self.heads]
+        between = tailComponents != headComponents
+        tailComponents = tailComponents[between]
+        headComponents = headComponents[between]
+        order = _np.argsort(tailComponents, kind='mergesort')
+        headComponents = headComponents[order].tolist()
+        offsets = _np.zeros(nComponents + 1, dtype=_np.int64)
+        _np.cumsum(_np.bincount(tailComponents, minlength=nComponents), out=offsets[1:])
+        offsets = offsets.tolist()
+
+        #Components are in reverse topological order, so successors are always complete
+        for component in six.moves.range(nComponents):
+            labelSet = found[component]
+            if len(labelSet) >= limit: continue
+            for head in headComponents[offsets[component]:offsets[component + 1]]:
+                for label in found[head]:
+                    if label not in labelSet:
+                        labelSet.append(label)
+                        if len(labelSet) >= limit: break
+                if len(labelSet) >= limit: break
+
+        componentTable = _np.full((nComponents, limit), -1, dtype=_np.int64)
+        for component, labelSet in enumerate(found):
+            componentTable[component, :len(labelSet)] = labelSet
+        return componentTable[components]
@@ -0,0 +1,356 @@
+"""
+    Copyright 2026 Travel Modelling Group, Department of Civil Engineering, University of Toronto
+
+    This file is part of the TMG Toolbox.
+
+    The TMG Toolbox is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    The TMG Toolbox is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with the TMG Toolbox.  If not, see <http://www.gnu.org/licenses/>.
+"""
+"""
+Content-addressed storage for network package components.
+
+Scenarios exported from the same model usually share most of their components (base network, modes, vehicles,
+functions). In content-addressed mode, Export Network Package stores each component once in a shared package store,
+named by the SHA-256 hash of its contents, and the package itself only holds a manifest of component hashes (plus the
+version and info files). Import Network Package resolves the manifest against the store, and can skip network
+components which are unchanged since they were last imported into the target scenario, as long as the scenario itself
+was not modified since (see ImportRegistry).
+
+Store layout:
+    <store>/objects/<first two hex digits>/<sha256>.gz
+
+Manifest ('manifest.json' in the package):
+    {"format": 1, "store": <store path relative to the package>, "store_absolute": <absolute store path>,
+     "components": {<entry name>: {"sha256": <hash>, "size": <bytes>}}}
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from os import path
+
+import inro.modeller as m
+import numpy as np
+import six
+
+mm = m.Modeller()
+_partial = mm.module('tmg.common.partial_network')
+
+
+class Face(m.Tool()):
+    def page(self):
+        pb = m.ToolPageBuilder(self, runnable=False, title="Network Package Store",
+                               description="Content-addressed storage of network package components, shared by "
+                                           "Export and Import Network Package. For internal use only.",
+                               branding_text="- TMG Toolbox")
+
+        pb.add_text_element("To import, call inro.modeller.Modeller().module('%s')" % str(self))
+
+        return pb.render()
+
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_FORMAT = 1
+REGISTRY_NAME = 'nwp_imports.json'
+
+_BLOCK_SIZE = 1 << 20
+
+
+def hash_bytes(data):
+    if isinstance(data, six.text_type):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(filepath):
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as reader:
+        for block in iter(lambda: reader.read(_BLOCK_SIZE), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class ComponentStore(object):
+    """A folder of gzipped components, named by the hash of their (uncompressed) contents.
+
+    Components are written to a temporary file and renamed into place, so several exports can share a store.
+    """
+
+    def __init__(self, folder):
+        self.folder = path.abspath(folder)
+
+    def object_path(self, digest):
+        return path.join(self.folder, 'objects', digest[:2], digest + '.gz')
+
+    def has(self, digest):
+        return path.isfile(self.object_path(digest))
+
+    def put_bytes(self, data):
+        """Stores the data if it is not already in the store. Returns its hash and size."""
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+        digest = hash_bytes(data)
+        if not self.has(digest):
+            self._write(digest, io.BytesIO(data))
+        return digest, len(data)
+
+    def put_file(self, filepath):
+        """Stores the file's contents if they are not already in the store. Returns its hash and size."""
+        digest = hash_file(filepath)
+        if not self.has(digest):
+            with open(filepath, 'rb') as reader:
+                self._write(digest, reader)
+        return digest, path.getsize(filepath)
+
+    def open(self, digest):
+        """Opens a stored component for reading (uncompressed bytes)."""
+        if not self.has(digest):
+            raise IOError("Component %s was not found in the package store at '%s'" % (digest, self.folder))
+        return gzip.open(self.object_path(digest), 'rb')
+
+    def read(self, digest):
+        with self.open(digest) as reader:
+            return reader.read()
+
+    def _write(self, digest, reader):
+        target = self.object_path(digest)
+        folder = path.dirname(target)
+        if not path.isdir(folder):
+            try:
+                os.makedirs(folder)
+            except OSError:
+                if not path.isdir(folder):  # Created by a concurrent export otherwise
+                    raise
+        fd, temp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as writer:
+                shutil.copyfileobj(reader, writer, _BLOCK_SIZE)
+            if self.has(digest):
+                os.remove(temp_path)
+            else:
+                os.rename(temp_path, target)
+        except Exception:
+            if path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+class ManifestBuilder(object):
+    """Collects the component hashes of a package as they are stored (thread-safe)."""
+
+    def __init__(self, store):
+        self.store = store
+        self.components = {}
+        self._lock = threading.Lock()
+
+    def add_bytes(self, name, data):
+        digest, size = self.store.put_bytes(data)
+        self._add(name, digest, size)
+
+    def add_file(self, name, filepath):
+        digest, size = self.store.put_file(filepath)
+        self._add(name, digest, size)
+
+    def _add(self, name, digest, size):
+        with self._lock:
+            self.components[name] = {'sha256': digest, 'size': size}
+
+    def to_json(self, package_path):
+        package_folder = path.dirname(path.abspath(package_path))
+        try:
+            relative = path.relpath(self.store.folder, package_folder)
+        except ValueError:  # Different drives
+            relative = None
+        manifest = {
+            'format': MANIFEST_FORMAT,
+            'store': relative.replace(os.sep, '/') if relative is not None else None,
+            'store_absolute': self.store.folder,
+            'components': self.components
+        }
+        return json.dumps(manifest, indent=1, sort_keys=True)
+
+
+class ManifestPackage(object):
+    """Wraps an open content-addressed package so that its components can be read as if they were zip entries.
+
+    Supports the subset of the ZipFile interface used by Import Network Package: namelist(), open(), read() and
+    extract().
+    """
+
+    def __init__(self, zf, manifest, store):
+        self.zf = zf
+        self.manifest = manifest
+        self.store = store
+        self.components = manifest['components']
+
+    def namelist(self):
+        return list(self.zf.namelist()) + sorted(self.components)
+
+    def digest(self, name):
+        component = self.components.get(name)
+        return None if component is None else component['sha256']
+
+    def open(self, name, mode='r'):
+        if name in self.components:
+            return self.store.open(self.digest(name))
+        return self.zf.open(name, mode)
+
+    def read(self, name):
+        if name in self.components:
+            return self.store.read(self.digest(name))
+        return self.zf.read(name)
+
+    def extract(self, name, folder):
+        if name not in self.components:
+            return self.zf.extract(name, folder)
+        target = path.join(folder, name)
+        with self.open(name) as reader, open(target, 'wb') as writer:
+            shutil.copyfileobj(reader, writer, _BLOCK_SIZE)
+        return target
+
+
+def read_manifest(zf):
+    """Returns the manifest of a content-addressed package, or None for a regular package."""
+    if MANIFEST_NAME not in zf.namelist():
+        return None
+    manifest = json.loads(zf.read(MANIFEST_NAME).decode('utf-8'))
+    if manifest.get('format') != MANIFEST_FORMAT:
+        raise IOError("Unsupported network package manifest format '%s'" % manifest.get('format'))
+    return manifest
+
+
+def find_store(manifest, package_path, store_folder=None):
+    """Locates the package store of a manifest: the given folder, else the path relative to the package, else the
+    absolute path recorded at export."""
+    candidates = []
+    if store_folder:
+        candidates.append(store_folder)
+    if manifest.get('store') is not None:
+        candidates.append(path.join(path.dirname(path.abspath(package_path)), manifest['store']))
+    if manifest.get('store_absolute'):
+        candidates.append(manifest['store_absolute'])
+    for candidate in candidates:
+        if path.isdir(path.join(candidate, 'objects')):
+            return ComponentStore(candidate)
+    raise IOError("Could not find the package store for '%s'. Tried: %s" % (package_path, ', '.join(candidates)))
+
+
+def open_package(zf, package_path, store_folder=None):
+    """Returns the package itself for a regular package, or a ManifestPackage for a content-addressed one."""
+    manifest = read_manifest(zf)
+    if manifest is None:
+        return zf
+    return ManifestPackage(zf, manifest, find_store(manifest, package_path, store_folder))
+
+
+class ImportRegistry(object):
+    """Records which package components were imported into each scenario of an emmebank.
+
+    The record is kept in a JSON file next to the emmebank. Along with the component hashes, it holds the scenario's
+    element totals and a hash of all of its attribute values after the import (see scenario_signature), which are
+    checked before trusting the record. Any later edit to the scenario, such as an assignment writing its results,
+    changes the signature, so the next import rebuilds the scenario.
+    """
+
+    def __init__(self, emmebank):
+        self.emmebank = emmebank
+        self.filepath = path.join(path.dirname(path.abspath(emmebank.path)), REGISTRY_NAME)
+
+    def _load(self):
+        if not path.isfile(self.filepath):
+            return {}
+        try:
+            with open(self.filepath) as reader:
+                return json.load(reader)
+        except ValueError:
+            return {}  # Unreadable, so nothing can be trusted
+
+    def _save(self, records):
+        fd, temp_path = tempfile.mkstemp(dir=path.dirname(self.filepath), suffix='.tmp')
+        with os.fdopen(fd, 'w') as writer:
+            json.dump(records, writer, indent=1, sort_keys=True)
+        if path.exists(self.filepath):
+            os.remove(self.filepath)
+        os.rename(temp_path, self.filepath)
+
+    def get_components(self, scenario):
+        """Returns {entry name: hash} of the last import into the scenario, or None if it can't be trusted."""
+        return self.verify(scenario)[0]
+
+    def verify(self, scenario):
+        """Returns ({entry name: hash}, signature) for the last import into the scenario, where the signature is the
+        scenario's current one, or (None, None) if the record can't be trusted. The signature is only computed once the
+        cheaper checks pass."""
+        if scenario is None:
+            return None, None
+        record = self._load().get(str(scenario.number))
+        if record is None:
+            return None, None
+        if record.get('element_totals') != _element_totals(scenario):
+            return None, None
+        signature = scenario_signature(scenario)
+        if record.get('signature') != signature:
+            return None, None
+        return record['components'], signature
+
+    def record(self, scenario, components, signature=None):
+        """Records the components imported into the scenario. The scenario's signature is computed unless it is
+        given."""
+        if signature is None:
+            signature = scenario_signature(scenario)
+        records = self._load()
+        records[str(scenario.number)] = {'components': components, 'element_totals': _element_totals(scenario),
+                                         'signature': signature}
+        self._save(records)
+
+    def forget(self, scenario_number):
+        records = self._load()
+        if str(scenario_number) in records:
+            del records[str(scenario_number)]
+            self._save(records)
+
+
+def _element_totals(scenario):
+    return dict((str(key), int(value)) for key, value in six.iteritems(scenario.element_totals))
+
+
+def scenario_signature(scenario):
+    """Returns the SHA-256 hash of the element keys and of all attribute values (standard and extra attributes,
+    including results) of every network domain of a scenario."""
+    hasher = hashlib.sha256()
+    for domain in _partial.NETWORK_DOMAINS:
+        attributes = sorted(scenario.attributes(domain))
+        hasher.update(domain.encode('utf-8'))
+        if not attributes:
+            continue
+        package = scenario.get_attribute_values(domain, attributes)
+        keys, positions = _partial.flattenIndex(domain, package[0])
+        hasher.update(repr(keys).encode('utf-8'))
+        for name, table in zip(attributes, package[1:]):
+            hasher.update(name.encode('utf-8'))
+            try:
+                values = np.asarray(table)
+            except ValueError:
+                values = None  # Sequence values, e.g. link vertices
+            if values is None or values.dtype.kind == 'O':
+                hasher.update(repr([table[position] for position in positions.tolist()]).encode('utf-8'))
+            else:
+                values = values.take(positions)
+                hasher.update(values.dtype.str.encode('utf-8'))
+                hasher.update(values.tobytes())
+    return hasher.hexdigest()
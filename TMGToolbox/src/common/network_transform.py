@@ -0,0 +1,181 @@
+'''
+    Copyright 2026 Travel Modelling Group, Department of Civil Engineering, University of Toronto
+
+    This file is part of the TMG Toolbox.
+
+    The TMG Toolbox is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    The TMG Toolbox is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with the TMG Toolbox.  If not, see <http://www.gnu.org/licenses/>.
+'''
+'''
+Affine transformation of network coordinates.
+
+Node coordinates and link vertices are read as arrays, transformed with a
+single 3x3 affine matrix and written back with set_attribute_values, so
+that no Network object has to be built or published.
+'''
+
+import inro.modeller as _m
+import math
+import numpy as _np
+_MODELLER = _m.Modeller()
+_util = _MODELLER.module('tmg.common.utilities')
+_partial = _MODELLER.module('tmg.common.partial_network')
+
+# import six library for python2 to python3 conversion
+import six
+
+class Face(_m.Tool()):
+    def page(self):
+        pb = _m.ToolPageBuilder(self, runnable=False, title="Network Transform",
+                                description="Affine transformation of node coordinates and \
+                                link vertices. For internal use only.",
+                                branding_text="- TMG Toolbox")
+
+        pb.add_text_element("To import, call inro.modeller.Modeller().module('%s')" %str(self))
+
+        return pb.render()
+
+#===========================================================================================
+
+class AffineTransform():
+    '''
+    2D affine transformation, stored as a 3x3 matrix in homogeneous coordinates.
+    Transforms are composed with then(), e.g. rotation.then(translation)
+    rotates first and then translates.
+    '''
+
+    def __init__(self, matrix=None):
+        if matrix is None:
+            matrix = _np.identity(3)
+        self.matrix = _np.asarray(matrix, dtype=_np.float64)
+
+    @staticmethod
+    def translation(dx, dy):
+        return AffineTransform([[1.0, 0.0, dx],
+                                [0.0, 1.0, dy],
+                                [0.0, 0.0, 1.0]])
+
+    @staticmethod
+    def rotation(angle):
+        '''
+        Counter-clockwise rotation about the origin, in radians.
+        '''
+        cosTheta = math.cos(angle)
+        sinTheta = math.sin(angle)
+        return AffineTransform([[cosTheta, -sinTheta, 0.0],
+                                [sinTheta, cosTheta, 0.0],
+                                [0.0, 0.0, 1.0]])
+
+    @staticmethod
+    def fromReferenceVectors(referenceVector, anchorVector):
+        '''
+        Builds the transform which rotates the network about the origin so that the
+        reference vector is parallel to the anchor vector, and then translates it so
+        that the start of the reference vector lands on the start of the anchor vector.
+
+        Args:
+            - referenceVector: ((x0, y0), (x1, y1)) in the network's current coordinates
+            - anchorVector: ((x0, y0), (x1, y1)) of the same vector in the target coordinates
+        '''
+        angle = getVectorBearing(referenceVector) - getVectorBearing(anchorVector)
+        rotation = AffineTransform.rotation(angle)
+        x0, y0 = rotation.apply(referenceVector[0][0], referenceVector[0][1])
+        translation = AffineTransform.translation(anchorVector[0][0] - float(x0), anchorVector[0][1] - float(y0))
+        return rotation.then(translation)
+
+    def then(self, other):
+        '''
+        Returns a transform which applies this transform, followed by the other one.
+        '''
+        return AffineTransform(other.matrix.dot(self.matrix))
+
+    def apply(self, xs, ys):
+        '''
+        Applies the transform to coordinates (scalars or arrays). Returns (xs, ys).
+        '''
+        m = self.matrix
+        xs = _np.asarray(xs, dtype=_np.float64)
+        ys = _np.asarray(ys, dtype=_np.float64)
+        return (m[0, 0] * xs + m[0, 1] * ys + m[0, 2],
+                m[1, 0] * xs + m[1, 1] * ys + m[1, 2])
+
+    def getRotationAngle(self):
+        return math.atan2(self.matrix[1, 0], self.matrix[0, 0])
+
+    def getTranslation(self):
+        return (self.matrix[0, 2], self.matrix[1, 2])
+
+def getVectorBearing(vector):
+    '''
+    Bearing of a ((x0, y0), (x1, y1)) vector, measured clockwise from north, in radians.
+    '''
+    return math.atan2(vector[1][0] - vector[0][0], vector[1][1] - vector[0][1])
+
+def getLinkVector(scenario, iNode, jNode):
+    '''
+    Gets the ((xi, yi), (xj, yj)) vector of a link from node coordinate arrays,
+    without loading the network.
+    '''
+    linkIndices = scenario.get_attribute_values('LINK', ['length'])[0]
+    if iNode not in linkIndices or jNode not in linkIndices[iNode]:
+        raise Exception("Reference link '%s-%s' does not exist in the network!" %(iNode, jNode))
+
+    package = scenario.get_attribute_values('NODE', ['x', 'y'])
+    nodeIndices, xTable, yTable = package[0], package[1], package[2]
+    i = nodeIndices[iNode]
+    j = nodeIndices[jNode]
+    return ((xTable[i], yTable[i]), (xTable[j], yTable[j]))
+
+#===========================================================================================
+
+def transformScenario(scenario, transform):
+    '''
+    Applies an affine transform to all node coordinates and link vertices of a
+    scenario, using bulk attribute reads and writes.
+
+    Returns: (number of nodes, number of links with vertices) transformed
+    '''
+    editor = _partial.PartialNetworkEditor(scenario, {'NODE': ['x', 'y']}, loadNetwork=False)
+    xs, ys = transform.apply(editor.getValues('NODE', 'x'), editor.getValues('NODE', 'y'))
+    editor.setValues('NODE', 'x', xs)
+    editor.setValues('NODE', 'y', ys)
+    editor.commit()
+    nNodes = len(xs)
+
+    package = scenario.get_attribute_values('LINK', ['vertices'])
+    vertexTable = list(package[1])
+    positions = [pos for pos, vertices in enumerate(vertexTable) if vertices]
+    if positions:
+        counts = _np.array([len(vertexTable[pos]) for pos in positions])
+        flat = _np.array([vertex for pos in positions for vertex in vertexTable[pos]], dtype=_np.float64)
+        newXs, newYs = transform.apply(flat[:, 0], flat[:, 1])
+        newVertices = list(six.moves.zip(newXs.tolist(), newYs.tolist()))
+        offsets = _np.concatenate(([0], _np.cumsum(counts)))
+        for pos, start, end in six.moves.zip(positions, offsets[:-1], offsets[1:]):
+            vertexTable[pos] = newVertices[start:end]
+        scenario.set_attribute_values('LINK', ['vertices'], [package[0], vertexTable])
+
+    return nNodes, len(positions)
+
+def transformScenarios(scenarios, transform):
+    '''
+    Applies the same affine transform to several scenarios.
+
+    Returns: A dictionary of scenario id : (number of nodes, number of links with vertices)
+    '''
+    retval = {}
+    for scenario in scenarios:
+        with _m.logbook_trace("Transforming scenario %s" %scenario.id):
+            retval[scenario.id] = transformScenario(scenario, transform)
+            _m.logbook_write("Transformed %s nodes and %s links with vertices." %retval[scenario.id])
+    return retval
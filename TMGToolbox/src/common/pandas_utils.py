@@ -27,18 +27,30 @@ try:
 
     _USE_PD_TO_NUMPY = hasattr(pd.DataFrame, 'to_numpy')
 
-    def load_node_dataframe(scenario, pythonize_exatts=False):
+    def _select_attributes(scenario, domain, attributes):
+        available = scenario.attributes(domain)
+        if attributes is None:
+            return available
+        missing = [attr_name for attr_name in attributes if attr_name not in available]
+        if missing:
+            raise KeyError("%s attributes not found in scenario %s: %s" % (domain.lower(), scenario.number,
+                                                                            ', '.join(missing)))
+        return list(attributes)
+
+    def load_node_dataframe(scenario, pythonize_exatts=False, attributes=None):
         """Retrieves node attributes from a scenario. Data is returned in a Pandas DataFrame.
 
         Args:
             scenario (Scenario): An instance of an `Emme Scenario`.
             pythonize_exatts (bool, optional): Defaults to ``False``. Flag to make extra attribute names 'Pythonic'. For
                 example, if set to ``True``, then "@stn1" will become "x_stn1".
+            attributes (list, optional): Defaults to ``None``. The node attributes to load, in order. If not given,
+                all attributes are loaded.
 
         Returns:
             DataFrame: A `Pandas DataFrame` for the node attributes
         """
-        attr_list = scenario.attributes('NODE')
+        attr_list = _select_attributes(scenario, 'NODE', attributes)
         package = scenario.get_attribute_values('NODE', attr_list)
 
         node_indexer = pd.Series(package[0])
@@ -59,18 +71,20 @@ try:
 
         return df
 
-    def load_link_dataframe(scenario, pythonize_exatts=False):
+    def load_link_dataframe(scenario, pythonize_exatts=False, attributes=None):
         """Retrieves link attributes from a scenario. Data is returned in a Pandas DataFrame.
 
         Args:
             scenario (Scenario): An instance of an `Emme Scenario`.
             pythonize_exatts (bool, optional): Defaults to ``False``. Flag to make link attribute names 'Pythonic'. For
                 example, if set to ``True``, then "@stn1" will become "x_stn1".
+            attributes (list, optional): Defaults to ``None``. The link attributes to load, in order. If not given,
+                all attributes are loaded.
 
         Returns:
             DataFrame: A `Pandas DataFrame` for the link attributes
         """
-        attr_list = scenario.attributes('LINK')
+        attr_list = _select_attributes(scenario, 'LINK', attributes)
         if 'vertices' in attr_list:
             attr_list.remove('vertices')
 
@@ -97,18 +111,20 @@ try:
 
         return df
 
-    def load_turn_dataframe(scenario, pythonize_exatts=False):
+    def load_turn_dataframe(scenario, pythonize_exatts=False, attributes=None):
         """Retrieves turn attributes from a scenario. Data is returned in a Pandas DataFrame.
 
         Args:
             scenario (Scenario): An instance of an `Emme Scenario`.
             pythonize_exatts (bool, optional): Defaults to ``False``. Flag to make turn attribute names 'Pythonic'. For
                 example, if set to ``True``, then "@stn1" will become "x_stn1".
+            attributes (list, optional): Defaults to ``None``. The turn attributes to load, in order. If not given,
+                all attributes are loaded.
 
         Returns:
             DataFrame: A `Pandas DataFrame` for the turn attributes
         """
-        attr_list = scenario.attributes('TURN')
+        attr_list = _select_attributes(scenario, 'TURN', attributes)
         package = scenario.get_attribute_values('TURN', attr_list)
 
         index_data = package[0]
@@ -137,18 +153,20 @@ try:
 
         return df
 
-    def load_transit_line_dataframe(scenario, pythonize_exatts=False):
+    def load_transit_line_dataframe(scenario, pythonize_exatts=False, attributes=None):
         """Retrieves transit line attributes from a scenario. Data is returned in a Pandas DataFrame.
 
         Args:
             scenario (Scenario): An instance of an `Emme Scenario`.
             pythonize_exatts (bool, optional): Defaults to ``False``. Flag to make transit line attribute names
                 'Pythonic'. For example, if set to ``True``, then "@stn1" will become "x_stn1".
+            attributes (list, optional): Defaults to ``None``. The transit line attributes to load, in order. If not given,
+                all attributes are loaded.
 
         Returns:
             DataFrame: A `Pandas DataFrame` for the transit line attributes
         """
-        attr_list = scenario.attributes('TRANSIT_LINE')
+        attr_list = _select_attributes(scenario, 'TRANSIT_LINE', attributes)
         package = scenario.get_attribute_values('TRANSIT_LINE', attr_list)
 
         line_indexer = pd.Series(package[0])
@@ -225,18 +243,20 @@ try:
         else:
             raise TypeError("Expected a Series or DataFrame, got %s" % type(series_or_dataframe))
 
-    def load_transit_segment_dataframe(scenario, pythonize_exatts=False):
+    def load_transit_segment_dataframe(scenario, pythonize_exatts=False, attributes=None):
         """Retrieves transit segment attributes from a scenario. Data is returned in a Pandas DataFrame.
 
         Args:
             scenario (Scenario): An instance of an `Emme Scenario`.
             pythonize_exatts (bool, optional): Defaults to ``False``. Flag to make transit segment attribute names
                 'Pythonic'. For example, if set to ``True``, then "@stn1" will become "x_stn1".
+            attributes (list, optional): Defaults to ``None``. The transit segment attributes to load, in order. If not given,
+                all attributes are loaded.
 
         Returns:
             DataFrame: A `Pandas DataFrame` for the transit segment attributes
         """
-        attr_list = scenario.attributes('TRANSIT_SEGMENT')
+        attr_list = _select_attributes(scenario, 'TRANSIT_SEGMENT', attributes)
         package = scenario.get_attribute_values('TRANSIT_SEGMENT', attr_list)
 
         index_data = package[0]
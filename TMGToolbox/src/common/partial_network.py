@@ -0,0 +1,240 @@
+'''
+    Copyright 2026 Travel Modelling Group, Department of Civil Engineering, University of Toronto
+
+    This file is part of the TMG Toolbox.
+
+    The TMG Toolbox is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    The TMG Toolbox is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with the TMG Toolbox.  If not, see <http://www.gnu.org/licenses/>.
+'''
+'''
+Partial network loading for tools which only read or change a few attributes.
+
+Instead of Scenario.get_network() / publish_network(), a tool declares the
+domains and attributes it needs. Only those are loaded (through
+get_partial_network and get_attribute_values), and only the attributes which
+actually changed are written back with set_attribute_values.
+
+Example:
+    with _partial.editNetworkAttributes(scenario, {'LINK': ['length', 'data2'],
+                                                   'TRANSIT_LINE': ['speed'],
+                                                   'TRANSIT_SEGMENT': ['data1']}) as editor:
+        for line in editor.network.transit_lines():
+            ...
+'''
+
+import inro.modeller as _m
+import numpy as _np
+from contextlib import contextmanager
+_MODELLER = _m.Modeller()
+_util = _MODELLER.module('tmg.common.utilities')
+
+# import six library for python2 to python3 conversion
+import six
+
+class Face(_m.Tool()):
+    def page(self):
+        pb = _m.ToolPageBuilder(self, runnable=False, title="Partial Network",
+                                description="Loads and writes back only the network attributes \
+                                a tool declares. For internal use only.",
+                                branding_text="- TMG Toolbox")
+
+        pb.add_text_element("To import, call inro.modeller.Modeller().module('%s')" %str(self))
+
+        return pb.render()
+
+#===========================================================================================
+
+# Domains for which get_partial_network can load topology
+NETWORK_DOMAINS = ['MODE', 'TRANSIT_VEHICLE', 'NODE', 'LINK', 'TURN', 'TRANSIT_LINE', 'TRANSIT_SEGMENT']
+
+def flattenIndex(domain, indices):
+    '''
+    Flattens the (undocumented) index object returned by get_attribute_values
+    into a list of element keys and an array of data positions.
+
+    Keys are:
+        - NODE: node number
+        - LINK: (i, j)
+        - TURN: (i, j, k)
+        - TRANSIT_LINE: line id
+        - TRANSIT_SEGMENT: (line id, i, j, loop)
+        - MODE / TRANSIT_VEHICLE: id
+
+    Returns: (keys, positions)
+    '''
+    keys = []
+    positions = []
+    if domain == 'LINK':
+        for i, outgoing in six.iteritems(indices):
+            for j, pos in six.iteritems(outgoing):
+                keys.append((i, j))
+                positions.append(pos)
+    elif domain == 'TURN':
+        for (i, j), outgoing in six.iteritems(indices):
+            for k, pos in six.iteritems(outgoing):
+                keys.append((i, j, k))
+                positions.append(pos)
+    elif domain == 'TRANSIT_SEGMENT':
+        for lineId, segments in six.iteritems(indices):
+            for tupl, pos in six.iteritems(segments):
+                if len(tupl) == 3:
+                    i, j, loop = tupl
+                else:
+                    i, j = tupl
+                    loop = 1
+                keys.append((lineId, i, j, loop))
+                positions.append(pos)
+    else:
+        for key, pos in six.iteritems(indices):
+            keys.append(key)
+            positions.append(pos)
+    return keys, _np.array(positions, dtype=_np.int64)
+
+class PartialNetworkEditor():
+    '''
+    Loads the declared domains and attributes of a scenario and tracks which
+    attribute columns change, so that commit() only writes those back.
+
+    Attribute values can be edited either through the Network objects in
+    self.network (when loadNetwork is True), or directly as NumPy arrays
+    using getValues / setValues. Arrays are aligned with keys(domain).
+    '''
+
+    def __init__(self, scenario, attributes, loadNetwork=True, extraDomains=[]):
+        '''
+        Args:
+            - scenario: The Emme Scenario to load from
+            - attributes: Dictionary of domain : list of attribute names to load.
+                A domain may map to an empty list to only load its topology.
+            - loadNetwork (=True): Flag to build a partial Network object. Set to
+                False if the tool only works with attribute arrays.
+            - extraDomains (=[]): Additional domains to include in the partial
+                network's topology (e.g. 'TRANSIT_SEGMENT' to walk itineraries).
+        '''
+        self.scenario = scenario
+        self._attributes = dict((domain, list(atts)) for domain, atts in six.iteritems(attributes))
+
+        self.network = None
+        if loadNetwork:
+            elementTypes = [domain for domain in NETWORK_DOMAINS
+                            if domain in self._attributes or domain in extraDomains]
+            self.network = scenario.get_partial_network(elementTypes, include_attributes=False)
+
+        self._packages = {}
+        self._indexes = {}
+        self._original = {}
+        self._dirty = set()
+        for domain, atts in six.iteritems(self._attributes):
+            if not atts: continue
+            package = scenario.get_attribute_values(domain, atts)
+            if self.network is not None:
+                self.network.set_attribute_values(domain, atts, package)
+            self._packages[domain] = [package[0]] + [_np.array(table) for table in package[1:]]
+            for att, table in _util.itersync(atts, self._packages[domain][1:]):
+                self._original[(domain, att)] = table.copy()
+
+    def _getIndex(self, domain):
+        if domain not in self._indexes:
+            self._indexes[domain] = flattenIndex(domain, self._packages[domain][0])
+        return self._indexes[domain]
+
+    def _syncFromNetwork(self, domain):
+        if self.network is None: return
+        atts = self._attributes[domain]
+        package = self.network.get_attribute_values(domain, atts)
+        self._packages[domain] = [package[0]] + [_np.array(table) for table in package[1:]]
+        self._indexes.pop(domain, None)
+
+    def _checkDeclared(self, domain, attribute):
+        if attribute not in self._attributes.get(domain, []):
+            raise KeyError("Attribute '%s' of domain '%s' was not declared" %(attribute, domain))
+
+    def keys(self, domain):
+        '''
+        Returns the list of element keys of a domain, in the order of the
+        arrays returned by getValues.
+        '''
+        if domain not in self._packages:
+            raise KeyError("Domain '%s' has no declared attributes" %domain)
+        return self._getIndex(domain)[0]
+
+    def getValues(self, domain, attribute):
+        '''
+        Returns the current values of a declared attribute as a NumPy array,
+        aligned with keys(domain).
+        '''
+        self._checkDeclared(domain, attribute)
+        self._syncFromNetwork(domain)
+        keys, positions = self._getIndex(domain)
+        column = self._attributes[domain].index(attribute) + 1
+        return self._packages[domain][column].take(positions)
+
+    def setValues(self, domain, attribute, values):
+        '''
+        Sets the values of a declared attribute from an array aligned with
+        keys(domain). The attribute is marked as changed.
+        '''
+        self._checkDeclared(domain, attribute)
+        self._syncFromNetwork(domain)
+        keys, positions = self._getIndex(domain)
+        column = self._attributes[domain].index(attribute) + 1
+        self._packages[domain][column][positions] = values
+        self._dirty.add((domain, attribute))
+        if self.network is not None:
+            package = self._packages[domain]
+            self.network.set_attribute_values(domain, [attribute], [package[0], package[column]])
+
+    def changedAttributes(self):
+        '''
+        Returns a dictionary of domain : list of attributes whose values differ from
+        the values originally loaded (or which were explicitly set with setValues).
+        '''
+        retval = {}
+        for domain, atts in six.iteritems(self._attributes):
+            if not atts: continue
+            self._syncFromNetwork(domain)
+            for att, table in _util.itersync(atts, self._packages[domain][1:]):
+                key = (domain, att)
+                if key in self._dirty or not _np.array_equal(table, self._original[key]):
+                    retval.setdefault(domain, []).append(att)
+        return retval
+
+    def commit(self):
+        '''
+        Writes the changed attributes back to the scenario.
+
+        Returns: The dictionary of domain : list of attributes that were written.
+        '''
+        changed = self.changedAttributes()
+        for domain, atts in six.iteritems(changed):
+            package = self._packages[domain]
+            allAtts = self._attributes[domain]
+            data = [package[0]] + [package[allAtts.index(att) + 1] for att in atts]
+            self.scenario.set_attribute_values(domain, atts, data)
+            for att in atts:
+                self._original[(domain, att)] = package[allAtts.index(att) + 1].copy()
+            _m.logbook_write("Updated %s attributes %s in scenario %s" %(domain.lower(), ', '.join(atts), self.scenario.id))
+        self._dirty.clear()
+        return changed
+
+@contextmanager
+def editNetworkAttributes(scenario, attributes, loadNetwork=True, extraDomains=[]):
+    '''
+    Context manager for a PartialNetworkEditor. Changed attributes are written
+    back to the scenario when the block exits without an error.
+
+    See PartialNetworkEditor for a description of the arguments.
+    '''
+    editor = PartialNetworkEditor(scenario, attributes, loadNetwork, extraDomains)
+    yield editor
+    editor.commit()
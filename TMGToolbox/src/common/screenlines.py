@@ -0,0 +1,247 @@
+'''
+    Copyright 2026 Travel Modelling Group, Department of Civil Engineering, University of Toronto
+
+    This file is part of the TMG Toolbox.
+
+    The TMG Toolbox is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    The TMG Toolbox is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with the TMG Toolbox.  If not, see <http://www.gnu.org/licenses/>.
+'''
+'''
+Screenline definitions and their aggregation, shared by the traffic and
+transit screenline export tools.
+
+A screenline is a collection of count stations, and each count station
+(countpost) is encoded on one or more links in a link extra attribute (plus
+an optional alternate attribute, for links with two posts). Link values are
+first summed by countpost, then a screenline x station incidence matrix
+turns the station totals into screenline totals in one product. Definitions
+are parsed once, so the same ScreenlineSet can be applied to any number of
+scenarios.
+
+Example:
+    screenlines = _screenlines.ScreenlineSet.fromFile(filepath)
+    posts = _screenlines.loadLinkPosts(scenario, ['@stn1', '@stn2'], ['auto_volume'])
+    stationIds, stationTotals = _screenlines.sumByCountpost(*posts)
+    nMissing, totals = screenlines.aggregate(stationIds, stationTotals)
+'''
+
+import numpy as _np
+
+import inro.modeller as _m
+_MODELLER = _m.Modeller()
+_util = _MODELLER.module('tmg.common.utilities')
+_partial = _MODELLER.module('tmg.common.partial_network')
+
+# import six library for python2 to python3 conversion
+import six
+
+class Face(_m.Tool()):
+    def page(self):
+        pb = _m.ToolPageBuilder(self, runnable=False, title="Screenlines",
+                                description="Screenline definitions and their aggregation from \
+                                countpost link attributes. For internal use only.",
+                                branding_text="- TMG Toolbox")
+
+        pb.add_text_element("To import, call inro.modeller.Modeller().module('%s')" %str(self))
+
+        return pb.render()
+
+#===========================================================================================
+
+def loadScreenlineFile(filepath):
+    '''
+    Parses a screenline definitions file: a header line, followed by one line
+    for each screenline, station pair (in the first two columns). Lines which
+    cannot be parsed are skipped.
+
+    Returns:
+        A dictionary of screenline id : set of station (countpost) numbers
+    '''
+    screenlines = {}
+    with open(filepath) as reader:
+        reader.readline()
+        for line in reader:
+            try:
+                cells = line.strip().split(',')
+                if len(cells) < 2: continue
+                screenlineID = cells[0]
+                countpostID = int(cells[1])
+                if not screenlineID in screenlines:
+                    screenlines[screenlineID] = set([countpostID])
+                else:
+                    screenlines[screenlineID].add(countpostID)
+            except:
+                continue
+    return screenlines
+
+def parseScenarioList(scenarioNumbers):
+    '''
+    Returns the Emme Scenarios of a comma-separated list (or list) of scenario
+    numbers, raising an exception for any which is not in the emmebank.
+    '''
+    if isinstance(scenarioNumbers, six.string_types):
+        scenarioNumbers = [cell for cell in scenarioNumbers.split(',') if cell.strip()]
+    scenarios = []
+    for number in scenarioNumbers:
+        scenario = _MODELLER.emmebank.scenario(int(number))
+        if scenario is None:
+            raise Exception("Scenario %s was not found!" %number)
+        scenarios.append(scenario)
+    if not scenarios:
+        raise Exception("No scenarios selected.")
+    return scenarios
+
+def parseFileList(filepaths):
+    '''
+    Returns the files of a semicolon-separated list (or list) of file paths.
+    '''
+    if isinstance(filepaths, six.string_types):
+        filepaths = filepaths.split(';')
+    filepaths = [filepath.strip() for filepath in filepaths if filepath.strip()]
+    if not filepaths:
+        raise Exception("No screenline files selected.")
+    return filepaths
+
+def loadLinkPosts(scenario, postAttributes, valueAttributes, segmentAttributes=[]):
+    '''
+    Reads the countpost attributes and the value attributes of all links
+    of a scenario, as arrays, in a single attribute read.
+
+    Args:
+        - scenario: The Emme Scenario
+        - postAttributes: List of link attributes holding countpost numbers.
+            Empty or None entries are ignored.
+        - valueAttributes: List of link attributes to aggregate.
+        - segmentAttributes (=[]): List of transit segment attributes to
+            aggregate, summed over the segments of each link (e.g.
+            'transit_volume' for the total transit volume of all lines).
+
+    Returns:
+        postArrays, values: a list with one array of countpost numbers for
+        each post attribute, and a 2D array of values with one column for
+        each value attribute, then for each segment attribute (both aligned
+        with the scenario's links).
+    '''
+    postAttributes = [att for att in postAttributes if att]
+    attributes = list(postAttributes)
+    for att in valueAttributes:
+        if att not in attributes: attributes.append(att)
+    domains = {'LINK': attributes}
+    if segmentAttributes:
+        domains['TRANSIT_SEGMENT'] = list(segmentAttributes)
+    editor = _partial.PartialNetworkEditor(scenario, domains, loadNetwork=False)
+
+    postArrays = [editor.getValues('LINK', att).astype(_np.int64) for att in postAttributes]
+    columns = [editor.getValues('LINK', att) for att in valueAttributes]
+
+    if segmentAttributes:
+        linkPositions = dict((key, pos) for pos, key in enumerate(editor.keys('LINK')))
+        segmentLinks = _np.array([linkPositions[(i, j)] for lineId, i, j, loop in editor.keys('TRANSIT_SEGMENT')],
+                                 dtype=_np.int64)
+        nLinks = len(linkPositions)
+        for att in segmentAttributes:
+            columns.append(_np.bincount(segmentLinks, weights=editor.getValues('TRANSIT_SEGMENT', att),
+                                        minlength=nLinks))
+
+    values = _np.column_stack(columns)
+    return postArrays, values
+
+def sumByCountpost(postArrays, values):
+    '''
+    Sums the values of links by countpost. A link flagged with two posts
+    (e.g. in the countpost and the alternate countpost attributes) counts
+    towards both. Posts numbered 0 are ignored.
+
+    Args:
+        - postArrays: List of arrays of countpost numbers, one for each
+            countpost attribute, aligned with the rows of values.
+        - values: 1D or 2D array of link values.
+
+    Returns:
+        stationIds, totals: the sorted array of countposts found on any link,
+        and their summed values (with the same number of columns as values).
+    '''
+    values = _np.asarray(values, dtype=_np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+
+    posts = []
+    rows = []
+    for postArray in postArrays:
+        flagged = _np.flatnonzero(postArray)
+        posts.append(postArray[flagged])
+        rows.append(flagged)
+    posts = _np.concatenate(posts) if posts else _np.zeros(0, dtype=_np.int64)
+    rows = _np.concatenate(rows) if rows else _np.zeros(0, dtype=_np.int64)
+
+    stationIds, positions = _np.unique(posts, return_inverse=True)
+    positions = positions.reshape(-1)
+    totals = _np.zeros((len(stationIds), values.shape[1]))
+    _np.add.at(totals, positions, values[rows])
+    return stationIds, totals
+
+class ScreenlineSet():
+    '''
+    A set of screenlines (sorted by id) and their screenline x station
+    incidence matrix.
+    '''
+
+    def __init__(self, screenlines):
+        '''
+        Args:
+            - screenlines: A dictionary of screenline id : set of stations,
+                as returned by loadScreenlineFile
+        '''
+        self.ids = sorted(screenlines)
+        stations = set()
+        for members in six.itervalues(screenlines):
+            stations.update(members)
+        self.stations = _np.array(sorted(stations), dtype=_np.int64)
+
+        self.incidence = _np.zeros((len(self.ids), len(self.stations)))
+        for row, screenlineID in enumerate(self.ids):
+            columns = _np.searchsorted(self.stations, sorted(screenlines[screenlineID]))
+            self.incidence[row, columns] = 1.0
+        self.nStations = self.incidence.sum(axis=1).astype(_np.int64)
+
+    @classmethod
+    def fromFile(cls, filepath):
+        return cls(loadScreenlineFile(filepath))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def aggregate(self, stationIds, stationTotals):
+        '''
+        Totals the screenlines from the results of sumByCountpost.
+
+        Returns:
+            nMissing, totals: the number of stations of each screenline which
+            were not found on any link, and the screenline totals (one row
+            for each screenline, in the order of self.ids).
+        '''
+        stationTotals = _np.asarray(stationTotals, dtype=_np.float64)
+        if stationTotals.ndim == 1:
+            stationTotals = stationTotals[:, None]
+
+        aligned = _np.zeros((len(self.stations), stationTotals.shape[1]))
+        found = _np.zeros(len(self.stations), dtype=bool)
+        if len(stationIds) and len(self.stations):
+            positions = _np.searchsorted(stationIds, self.stations)
+            positions = _np.minimum(positions, len(stationIds) - 1)
+            found = stationIds[positions] == self.stations
+            aligned[found] = stationTotals[positions[found]]
+
+        nMissing = _np.dot(self.incidence, ~found).astype(_np.int64)
+        totals = _np.dot(self.incidence, aligned)
+        return nMissing, totals
@@ -30,6 +30,7 @@ TODO LIST:
 from numpy import array
 from numpy import min as nmin
 from numpy import max as nmax
+import numpy as _np
 from shapely import geometry as _geo
 import math
 
@@ -155,7 +156,39 @@ def get_network_extents(net):
     
     return nmin(xa) - 1.0, nmin(ya) - 1.0, nmax(xa) + 1.0, nmax(ya) + 1.0
 
-#------------------------------------------------------------------------------        
+def adaptiveGridSize(extents, nFeatures, featuresPerCell=4.0, maxSize=2000):
+    '''
+    Picks the number of columns and rows of a grid from the number of features
+    to be indexed, such that the cells are (roughly) square and hold about
+    featuresPerCell features each, assuming an even spread over the extents.
+
+    Args:
+        - extents: A tuple of minx, miny, maxx, maxy, OR a Rectangle object.
+        - nFeatures: The number of features (points or line segments) which
+            will be inserted.
+        - featuresPerCell (=4.0): The target density.
+        - maxSize (=2000): The upper bound on the number of columns and on
+            the number of rows.
+
+    Returns:
+        xSize, ySize tuple
+    '''
+    if hasattr(extents, '__iter__'):
+        minx, miny, maxx, maxy = extents
+        width, height = abs(maxx - minx), abs(maxy - miny)
+    else:
+        width, height = extents.rangeX.length(), extents.rangeY.length()
+
+    nCells = max(1.0, float(nFeatures) / featuresPerCell)
+    if width <= 0.0 or height <= 0.0:
+        return 1, 1
+    cellSide = math.sqrt(width * height / nCells)
+
+    xSize = min(maxSize, max(1, int(math.ceil(width / cellSide))))
+    ySize = min(maxSize, max(1, int(math.ceil(height / cellSide))))
+    return xSize, ySize
+
+#------------------------------------------------------------------------------
 
 class grid():
     def __init__(self, xSize, ySize):
@@ -201,6 +234,10 @@ class GridIndex():
     
     USAGE
     
+    Construction: The grid size can be given directly, or picked
+    from the number of features to be inserted with
+    GridIndex.fromFeatureCount(...).
+
     Insertion: Inserts an object into the grid index for later
     queries. Objects can only be inserted into locations which
     overlap the grid itself. Three low-level insertions are
@@ -208,8 +245,11 @@ class GridIndex():
         insertxy: Inserts an object at a single point
         insertpline: Inserts an object over a polyline
         insertbox: Inserts an object within a box.
-    Several convenience methods are also provided.
-    
+    Bulk versions for arrays of coordinates (insertPoints and
+    insertSegments) and several convenience methods are also
+    provided. Inserting the same object more than once adds to
+    the cells it occupies.
+
     Querying: Queries the grid index for objects. [More to come]
     
     Nearest: Only one nearest operation is supported. [More to come]
@@ -243,6 +283,8 @@ class GridIndex():
         
         xSize = int(xSize)
         ySize = int(ySize)
+        self.xSize = xSize
+        self.ySize = ySize
         self._deltaX = self.extents.rangeX.length() / xSize
         self._deltaY = self.extents.rangeY.length() / ySize
         self.minX = self.extents.rangeX.min
@@ -250,8 +292,9 @@ class GridIndex():
         self.minY = self.extents.rangeY.min
         self.maxY = self.extents.rangeY.max
         
-        self.maxCol = self._transform_x(self.maxX) - 1
-        self.maxRow = self._transform_y(self.maxY) - 1
+        #Not computed from maxX and maxY, which can round down and drop the last column or row
+        self.maxCol = xSize
+        self.maxRow = ySize
         
         self._grid = grid(xSize, ySize)
         self._addressbook = {}
@@ -264,7 +307,29 @@ class GridIndex():
         else:
             self.__dict__[name] = value
 
-    
+    @classmethod
+    def fromFeatureCount(cls, extents, nFeatures, marginSize=0.0, featuresPerCell=4.0):
+        '''
+        Creates a grid sized for the given number of features (see
+        adaptiveGridSize), instead of the fixed 100 x 100 default.
+
+        Args:
+            - extents: A tuple of minx, miny, maxx, maxy, OR
+                a Rectangle object.
+            - nFeatures: The number of features (points or line
+                segments) which will be inserted.
+            - marginSize (=0.0): A margin applied to the extents.
+            - featuresPerCell (=4.0): The target number of features
+                in each cell.
+        '''
+        if hasattr(extents, '__iter__'):
+            minx, miny, maxx, maxy = extents
+            extents = Rectangle(minx - marginSize, miny - marginSize,
+                                maxx + marginSize, maxy + marginSize)
+        xSize, ySize = adaptiveGridSize(extents, nFeatures, featuresPerCell)
+        return cls(extents, xSize, ySize)
+
+
     @staticmethod
     def __link2coords(link):
         inode = link.i_node
@@ -413,14 +478,16 @@ class GridIndex():
     def _index_circle2(self,center_x,center_y,radius):
         s_x = max(1, int((center_x - self.minX) / self._deltaX)+1)
         s_y = max(1, int((center_y - self.minY) / self._deltaY)+1)
-        s_r = max(1, int(radius / self._deltaX))
+        #Rounded up, so that a radius spanning several cells reaches all of them
+        s_rx = max(1, int(math.ceil(radius / self._deltaX)))
+        s_ry = max(1, int(math.ceil(radius / self._deltaY)))
 
         #s_x, s_y is grid coordinate of cx /cy
-        #sr is max index distance from s_x _sy
+        #s_rx, s_ry are the max index distances from s_x, s_y
 
         retval = set()
-        for x in nrange(s_x-s_r,s_x+s_r+1):
-            for y in nrange(s_y - s_r, s_y + s_r+1):
+        for x in nrange(s_x - s_rx, s_x + s_rx + 1):
+            for y in nrange(s_y - s_ry, s_y + s_ry + 1):
                 if x > 0 and y > 0 and x <= self.maxCol and y <= self.maxRow:
                     retval.add((x,y))
 
@@ -443,7 +510,7 @@ class GridIndex():
 
         col, row = self._index_point(x, y)
         self._grid[col, row].add(obj)
-        self._addressbook[obj] = [(col, row)]
+        self._addAddresses(obj, [(col, row)])
 
 
     def insertpline(self, obj, coordinates):
@@ -467,7 +534,7 @@ class GridIndex():
             addresses = self._index_line_segment(x0, y0, x1, y1)
             for col, row in addresses:
                 self._grid[col, row].add(obj)
-            self._addressbook[obj] = addresses
+            self._addAddresses(obj, addresses)
 
     def insertbox(self, obj, minx, miny, maxx, maxy):
         '''
@@ -489,7 +556,7 @@ class GridIndex():
         addresses = self._index_box(minx, miny, maxx, maxy)
         for col, row in addresses:
             self._grid[col, row].add(obj)
-        self._addressbook[obj] = addresses
+        self._addAddresses(obj, addresses)
 
     def insertPoint(self, pointOrNode):
         '''
@@ -505,6 +572,22 @@ class GridIndex():
 
         self.insertpline(linestring, linestring.coords)
 
+    def insertLineStrings(self, linestrings):
+        '''
+        Bulk-inserts a sequence of Shapely LineString objects, over their
+        segments.
+        '''
+
+        objs, x0s, y0s, x1s, y1s = [], [], [], [], []
+        for linestring in linestrings:
+            for (x0, y0), (x1, y1) in _util.iterpairs(linestring.coords):
+                objs.append(linestring)
+                x0s.append(x0)
+                y0s.append(y0)
+                x1s.append(x1)
+                y1s.append(y1)
+        self.insertSegments(objs, x0s, y0s, x1s, y1s)
+
     def insertLink(self, link):
         '''
         Inserts an Emme Link object
@@ -534,6 +617,113 @@ class GridIndex():
 
         self.insertbox(polygon, *polygon.bounds)
 
+    def _addAddresses(self, obj, addresses):
+        if obj in self._addressbook:
+            self._addressbook[obj].update(addresses)
+        else:
+            self._addressbook[obj] = set(addresses)
+
+    def _checkArrays(self, xs, ys):
+        outside = (xs < self.minX) | (xs >= self.maxX)
+        if outside.any():
+            self._check_x(xs[outside.argmax()])
+        outside = (ys < self.minY) | (ys >= self.maxY)
+        if outside.any():
+            self._check_y(ys[outside.argmax()])
+
+    def _transformArrays(self, xs, ys):
+        cols = ((xs - self.minX) / self._deltaX).astype(_np.int64) + 1
+        rows = ((ys - self.minY) / self._deltaY).astype(_np.int64) + 1
+        return cols, rows
+
+    def insertPoints(self, objs, xs, ys):
+        '''
+        Bulk insertion. Inserts many objects at single points, computing
+        their cells in one vectorized pass.
+
+        Args:
+            - objs: A sequence of hashable objects
+            - xs: A sequence (or array) of the objects' x-coordinates
+            - ys: A sequence (or array) of the objects' y-coordinates
+        '''
+
+        xs = _np.asarray(xs, dtype=_np.float64)
+        ys = _np.asarray(ys, dtype=_np.float64)
+        if len(objs) != len(xs) or len(objs) != len(ys):
+            raise ValueError("Got %s objects for %s x-coordinates and %s y-coordinates"
+                             %(len(objs), len(xs), len(ys)))
+        self._checkArrays(xs, ys)
+
+        cols, rows = self._transformArrays(xs, ys)
+        contents = self._grid._contents
+        for obj, col, row in six.moves.zip(objs, cols.tolist(), rows.tolist()):
+            contents[col - 1][row - 1].add(obj)
+            self._addAddresses(obj, [(col, row)])
+
+    def insertSegments(self, objs, x0s, y0s, x1s, y1s):
+        '''
+        Bulk insertion. Inserts many objects over straight line segments.
+        An object may appear several times (e.g. once for each segment of
+        a polyline), in which case it is indexed in the cells of all of its
+        segments. Segments which lie in a single cell (the common case
+        for a suitably-sized grid) are indexed in one vectorized pass.
+
+        Args:
+            - objs: A sequence of hashable objects
+            - x0s, y0s: Sequences (or arrays) of the segments' start coordinates
+            - x1s, y1s: Sequences (or arrays) of the segments' end coordinates
+        '''
+
+        x0s = _np.asarray(x0s, dtype=_np.float64)
+        y0s = _np.asarray(y0s, dtype=_np.float64)
+        x1s = _np.asarray(x1s, dtype=_np.float64)
+        y1s = _np.asarray(y1s, dtype=_np.float64)
+        for coordinates in (x0s, y0s, x1s, y1s):
+            if len(coordinates) != len(objs):
+                raise ValueError("Got %s objects for %s segment coordinates" %(len(objs), len(coordinates)))
+        self._checkArrays(x0s, y0s)
+        self._checkArrays(x1s, y1s)
+
+        cols0, rows0 = self._transformArrays(x0s, y0s)
+        cols1, rows1 = self._transformArrays(x1s, y1s)
+        singleCell = ((cols0 == cols1) & (rows0 == rows1)).tolist()
+
+        contents = self._grid._contents
+        for position, (obj, col, row) in enumerate(six.moves.zip(objs, cols0.tolist(), rows0.tolist())):
+            if singleCell[position]:
+                contents[col - 1][row - 1].add(obj)
+                self._addAddresses(obj, [(col, row)])
+            else:
+                addresses = self._index_line_segment(x0s[position], y0s[position],
+                                                     x1s[position], y1s[position])
+                for col, row in addresses:
+                    self._grid[col, row].add(obj)
+                self._addAddresses(obj, addresses)
+
+    def insertNodes(self, nodes):
+        '''
+        Bulk-inserts a sequence of Emme Node objects (or any objects
+        with x and y properties).
+        '''
+
+        nodes = list(nodes)
+        self.insertPoints(nodes, [node.x for node in nodes], [node.y for node in nodes])
+
+    def insertLinks(self, links):
+        '''
+        Bulk-inserts a sequence of Emme Link objects, over their vertices.
+        '''
+
+        objs, x0s, y0s, x1s, y1s = [], [], [], [], []
+        for link in links:
+            for (x0, y0), (x1, y1) in _util.iterpairs(self.__link2coords(link)):
+                objs.append(link)
+                x0s.append(x0)
+                y0s.append(y0)
+                x1s.append(x1)
+                y1s.append(y1)
+        self.insertSegments(objs, x0s, y0s, x1s, y1s)
+
     #------------------------------------------------------------------------------
     #---REMOVAL
 
@@ -830,11 +1020,28 @@ class GridIndex():
     #------------------------------------------------------------------------------
     #---NEAREST
 
+    @staticmethod
+    def _ring(col, row, i):
+        '''
+        Yields the (col, row) addresses of the cells i steps away from a cell,
+        whether or not they are in the grid.
+        '''
+        if i == 0:
+            yield col, row
+            return
+        for j in nrange(col - i, col + i + 1):
+            yield j, row - i
+            yield j, row + i
+        for k in nrange(row - i + 1, row + i):
+            yield col - i, k
+            yield col + i, k
+
     def nearestToPoint(self, x, y):
         '''
         A special query to find the nearest element to a given point.
-        The grid is queried in rings around the point, stopping once
-        the return set is non-empty, or the grid is fully searched.
+        The grid is queried in rings of cells around the point, stopping
+        once the return set is non-empty, or the rings no longer overlap
+        the grid (i.e. the grid is fully searched).
 
         Args:
             -x, y: the coordinates of interest. This point MUST overlap
@@ -848,15 +1055,11 @@ class GridIndex():
 
         originCol, originRow = self._index_point(x, y)
 
-        i = 1
-        checked = set()
+        i = 0
         candidates = set()
-        while ((originCol-i) > 0) and ((originRow-i) > 0) and ((originCol+i) <= self.maxCol) and ((originRow+i) <= self.maxRow):
-            for j in nrange(originCol-i, originCol+i+1):
-                for k in nrange(originRow-i, originRow+i+1):
-                    if (j,k) not in checked:
-                        candidates.update(self.querycell(j,k))
-                        checked.add((j,k))
+        while ((originCol-i) > 0) or ((originRow-i) > 0) or ((originCol+i) <= self.maxCol) or ((originRow+i) <= self.maxRow):
+            for j, k in self._ring(originCol, originRow, i):
+                candidates.update(self.querycell(j,k))
             if len(candidates) > 0:
                 nearest, minDistance = find_nearest(candidates, x, y)
                 cells =  self.queryCircle2(x,y,minDistance)
@@ -903,3 +1106,88 @@ def find_nearest(candidates, x, y ):
 
 
 
+
+def radiusSearch(sourceXs, sourceYs, targetXs, targetYs, radius):
+    '''
+    Bulk query for all of the target points within a given (Euclidean) distance
+    of each source point. Unlike GridIndex.queryCircle, the results are exact:
+    candidates are found by bucketing the targets into cells the size of the
+    radius, and every candidate's distance is checked, all in numpy.
+
+    Args:
+        - sourceXs, sourceYs: Sequences (or arrays) of the source coordinates
+        - targetXs, targetYs: Sequences (or arrays) of the target coordinates
+        - radius: The search radius, in coordinate units
+
+    Returns:
+        sources, targets, distances arrays, with one entry for each source /
+        target pair within the radius (sources and targets are positions in
+        the given sequences), ordered by source then by target.
+    '''
+
+    sourceXs = _np.asarray(sourceXs, dtype=_np.float64)
+    sourceYs = _np.asarray(sourceYs, dtype=_np.float64)
+    targetXs = _np.asarray(targetXs, dtype=_np.float64)
+    targetYs = _np.asarray(targetYs, dtype=_np.float64)
+    radius = float(radius)
+    if radius < 0.0:
+        raise ValueError("Search radius cannot be negative")
+
+    nSources, nTargets = len(sourceXs), len(targetXs)
+    if nSources == 0 or nTargets == 0:
+        return _np.zeros(0, dtype=_np.int64), _np.zeros(0, dtype=_np.int64), _np.zeros(0, dtype=_np.float64)
+
+    #Rows are shifted by 1, so that the neighbouring rows of every point have valid keys
+    cellSize = radius if radius > 0.0 else 1.0
+    minX = min(sourceXs.min(), targetXs.min())
+    minY = min(sourceYs.min(), targetYs.min())
+    sourceCols = _np.floor((sourceXs - minX) / cellSize).astype(_np.int64)
+    sourceRows = _np.floor((sourceYs - minY) / cellSize).astype(_np.int64) + 1
+    targetCols = _np.floor((targetXs - minX) / cellSize).astype(_np.int64)
+    targetRows = _np.floor((targetYs - minY) / cellSize).astype(_np.int64) + 1
+    nRows = max(sourceRows.max(), targetRows.max()) + 2
+
+    targetKeys = targetCols * nRows + targetRows
+    order = _np.argsort(targetKeys, kind='mergesort')
+    sortedKeys = targetKeys[order]
+
+    sources, targets = [], []
+    sourcePositions = _np.arange(nSources, dtype=_np.int64)
+    for deltaCol in (-1, 0, 1):
+        for deltaRow in (-1, 0, 1):
+            keys = (sourceCols + deltaCol) * nRows + (sourceRows + deltaRow)
+            starts = _np.searchsorted(sortedKeys, keys, side='left')
+            counts = _np.searchsorted(sortedKeys, keys, side='right') - starts
+            total = int(counts.sum())
+            if total == 0: continue
+
+            offsets = _np.arange(total, dtype=_np.int64) - _np.repeat(_np.cumsum(counts) - counts, counts)
+            sources.append(_np.repeat(sourcePositions, counts))
+            targets.append(order[_np.repeat(starts, counts) + offsets])
+
+    if not sources:
+        return _np.zeros(0, dtype=_np.int64), _np.zeros(0, dtype=_np.int64), _np.zeros(0, dtype=_np.float64)
+    sources = _np.concatenate(sources)
+    targets = _np.concatenate(targets)
+    distances = _np.hypot(targetXs[targets] - sourceXs[sources], targetYs[targets] - sourceYs[sources])
+
+    within = distances <= radius
+    sources, targets, distances = sources[within], targets[within], distances[within]
+    pairOrder = _np.lexsort((targets, sources))
+    return sources[pairOrder], targets[pairOrder], distances[pairOrder]
+
+def nearestSourceDistances(sourceXs, sourceYs, targetXs, targetYs, radius):
+    '''
+    For each target point, finds the distance to its nearest source point
+    (see radiusSearch). Targets with no source within the radius get a
+    distance of infinity, so that the targets within any smaller radius r
+    are simply those with distances <= r.
+
+    Returns:
+        An array of distances, one for each target.
+    '''
+
+    sources, targets, distances = radiusSearch(sourceXs, sourceYs, targetXs, targetYs, radius)
+    nearest = _np.full(len(targetXs), _np.inf)
+    _np.minimum.at(nearest, targets, distances)
+    return nearest
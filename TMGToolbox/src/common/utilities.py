@@ -31,13 +31,16 @@ import warnings as _warn
 import sys as _sys
 import traceback as _tb
 import subprocess as _sp
+import threading as _threading
 import six
 from six.moves import range
+import numpy as _np
 
 if six.PY2:
     from itertools import izip
 from json import loads as _parsedict
 from os.path import dirname
+import os as _os
 import csv
 
 _MODELLER = _m.Modeller()
@@ -298,6 +301,27 @@ def getAvailableScenarioNumber():
 TEMP_ATT_PREFIXES = {"NODE": "ti", "LINK": "tl", "TURN": "tp", "TRANSIT_LINE": "tt", "TRANSIT_SEGMENT": "ts"}
 
 
+def _createTempExtraAttribute(scenario, domain, default, description):
+    prefix = TEMP_ATT_PREFIXES[domain]
+
+    existingAttributeSet = set([att.name for att in scenario.extra_attributes() if att.type == domain])
+
+    index = 1
+    id = "@%s%s" % (prefix, index)
+    while id in existingAttributeSet:
+        index += 1
+        id = "@%s%s" % (prefix, index)
+        if index > 999:
+            raise Exception("Scenario %s already has 999 temporary extra attributes" % scenario)
+    tempAttribute = scenario.create_extra_attribute(domain, id, default)
+    msg = "Created temporary extra attribute %s in scenario %s" % (id, scenario)
+    if description:
+        tempAttribute.description = description
+        msg += ": %s" % description
+    _m.logbook_write(msg)
+    return tempAttribute
+
+
 @contextmanager
 def tempExtraAttributeMANAGER(scenario, domain, default=0.0, description=None, returnId=False):
     """
@@ -313,6 +337,9 @@ def tempExtraAttributeMANAGER(scenario, domain, default=0.0, description=None, r
         - Transit Segment: @ts123
         (where 123 is replaced by a number)
 
+    If a temporary resource pool is active (see tempResourcePoolMANAGER), the
+    attribute is leased from the pool instead, and returned to it afterwards.
+
     Args: (scenario, domain, default= 0.0, description= None)
         - scenario= The Emme scenario object in which to create the extra attribute
         - domain= One of 'NODE', 'LINK', 'TURN', 'TRANSIT_LINE', 'TRANSIT_SEGMENT'
@@ -326,23 +353,13 @@ def tempExtraAttributeMANAGER(scenario, domain, default=0.0, description=None, r
     domain = str(domain).upper()
     if not domain in TEMP_ATT_PREFIXES:
         raise TypeError("Domain '%s' is not a recognized extra attribute domain." % domain)
-    prefix = TEMP_ATT_PREFIXES[domain]
 
-    existingAttributeSet = set([att.name for att in scenario.extra_attributes() if att.type == domain])
-
-    index = 1
-    id = "@%s%s" % (prefix, index)
-    while id in existingAttributeSet:
-        index += 1
-        id = "@%s%s" % (prefix, index)
-        if index > 999:
-            raise Exception("Scenario %s already has 999 temporary extra attributes" % scenario)
-    tempAttribute = scenario.create_extra_attribute(domain, id, default)
-    msg = "Created temporary extra attribute %s in scenario %s" % (id, scenario)
-    if description:
-        tempAttribute.description = description
-        msg += ": %s" % description
-    _m.logbook_write(msg)
+    pool = getTempResourcePool()
+    if pool is not None:
+        tempAttribute = pool.leaseExtraAttribute(scenario, domain, default, description)
+    else:
+        tempAttribute = _createTempExtraAttribute(scenario, domain, default, description)
+    id = tempAttribute.id
 
     if returnId:
         retval = tempAttribute.id
@@ -352,17 +369,29 @@ def tempExtraAttributeMANAGER(scenario, domain, default=0.0, description=None, r
     try:
         yield retval
     finally:
-        scenario.delete_extra_attribute(id)
-        _m.logbook_write("Deleted extra attribute %s" % id)
+        if pool is not None:
+            pool.releaseExtraAttribute(scenario, domain, default, id)
+        else:
+            scenario.delete_extra_attribute(id)
+            _m.logbook_write("Deleted extra attribute %s" % id)
 
 
 # -------------------------------------------------------------------------------------------
 
 
+def _createTempMatrix(description, matrix_type, default):
+    mtx = initializeMatrix(default=default, description="Temporary %s" % description, matrix_type=matrix_type)
+    if mtx is None:
+        raise Exception("Could not create temporary matrix: %s" % description)
+    return mtx
+
+
 @contextmanager
 def tempMatrixMANAGER(description="[No description]", matrix_type="FULL", default=0.0):
     """
-    Creates a temporary matrix in a context manager.
+    Creates a temporary matrix in a context manager. If a temporary resource pool
+    is active (see tempResourcePoolMANAGER), the matrix is leased from the pool
+    instead.
 
     Args:
         - description (="[No description]"): The description of the temporary matrix.
@@ -371,25 +400,31 @@ def tempMatrixMANAGER(description="[No description]", matrix_type="FULL", defaul
         - default (=0.0): The matrix's default value.
     """
 
-    mtx = initializeMatrix(default=default, description="Temporary %s" % description, matrix_type=matrix_type)
-
-    if mtx is None:
-        raise Exception("Could not create temporary matrix: %s" % description)
+    pool = getTempResourcePool()
+    if pool is not None:
+        mtx = pool.leaseMatrix(description, matrix_type, default)
+    else:
+        mtx = _createTempMatrix(description, matrix_type, default)
 
     try:
         yield mtx
     finally:
-        _DATABANK.delete_matrix(mtx.id)
+        if pool is not None:
+            pool.releaseMatrix(matrix_type, mtx.id)
+        else:
+            _DATABANK.delete_matrix(mtx.id)
 
-        s = "Deleted matrix %s." % mtx.id
-        _m.logbook_write(s)
+            s = "Deleted matrix %s." % mtx.id
+            _m.logbook_write(s)
 
 
 @contextmanager
 def tempMatricesMANAGER(number_of_matrices, description="[No description]", matrix_type="FULL", default=0.0):
     """
     Creates a temporary matrix in a context manager.
-    Throws Exception if it was unable to create one of the matrices.
+    Throws Exception if it was unable to create one of the matrices. If a temporary
+    resource pool is active (see tempResourcePoolMANAGER), the matrices are leased
+    from the pool instead.
     Args:
         - number_of_matrices: The number of matrices to create
         - description (="[No description]"): The description of the temporary matrix.
@@ -397,21 +432,155 @@ def tempMatricesMANAGER(number_of_matrices, description="[No description]", matr
             'SCALAR', 'ORIGIN', 'DESTINATION', or 'FULL'.
         - default (=0.0): The matrix's default value.
     """
+    pool = getTempResourcePool()
     matrices = []
     try:
         for i in range(0, number_of_matrices):
-            matrix = initializeMatrix(default=default, description="Temporary %s" % description, matrix_type=matrix_type)
-            if matrix is None:
-                raise Exception("Could not create temporary matrix: %s" % description)
+            if pool is not None:
+                matrix = pool.leaseMatrix(description, matrix_type, default)
+            else:
+                matrix = _createTempMatrix(description, matrix_type, default)
             matrices.append(matrix)
         yield matrices
     finally:
         for matrix in matrices:
-            _DATABANK.delete_matrix(matrix.id)
-            _m.logbook_write("Deleted matrix %s." % matrix.id)
+            if pool is not None:
+                pool.releaseMatrix(matrix_type, matrix.id)
+            else:
+                _DATABANK.delete_matrix(matrix.id)
+                _m.logbook_write("Deleted matrix %s." % matrix.id)
     return
 
 
+# -------------------------------------------------------------------------------------------
+
+
+class TempResourcePool(object):
+    """
+    Keeps the temporary extra attributes and matrices of the managers above for
+    reuse, instead of creating and deleting them on every use. A released
+    attribute is leased again by the next request for the same scenario, domain
+    and default value (a matrix by the next request for the same matrix type),
+    after being re-initialized to the default value. Everything the pool created
+    is deleted when it is closed.
+    """
+
+    def __init__(self):
+        self._freeAttributes = {}  # (scenario number, domain, default) : [attribute ids]
+        self._attributes = []  # (scenario, attribute id) created by the pool
+        self._freeMatrices = {}  # matrix type : [matrix ids]
+        self._matrices = []
+        self.nLeases = 0
+        self._lock = _threading.Lock()
+
+    def leaseExtraAttribute(self, scenario, domain, default, description):
+        with self._lock:
+            self.nLeases += 1
+            free = self._freeAttributes.get((scenario.number, domain, default), [])
+            while free:
+                attribute = scenario.extra_attribute(free.pop())
+                if attribute is None:
+                    continue  # Deleted since, e.g. with a temporary scenario
+                attribute.initialize(default)
+                if description:
+                    attribute.description = description
+                return attribute
+            attribute = _createTempExtraAttribute(scenario, domain, default, description)
+            self._attributes.append((scenario, attribute.id))
+            return attribute
+
+    def releaseExtraAttribute(self, scenario, domain, default, id):
+        with self._lock:
+            self._freeAttributes.setdefault((scenario.number, domain, default), []).append(id)
+
+    def leaseMatrix(self, description, matrix_type, default):
+        with self._lock:
+            self.nLeases += 1
+            free = self._freeMatrices.get(matrix_type, [])
+            while free:
+                mtx = _DATABANK.matrix(free.pop())
+                if mtx is None:
+                    continue
+                mtx.initialize(default)
+                mtx.description = ("Temporary %s" % description)[:80]
+                return mtx
+            mtx = _createTempMatrix(description, matrix_type, default)
+            self._matrices.append(mtx.id)
+            return mtx
+
+    def releaseMatrix(self, matrix_type, id):
+        with self._lock:
+            self._freeMatrices.setdefault(matrix_type, []).append(id)
+
+    def close(self):
+        """
+        Deletes the extra attributes and matrices created by the pool.
+        """
+        nAttributes = 0
+        for scenario, id in self._attributes:
+            scenario = scenario.emmebank.scenario(scenario.number)  # None if it was deleted
+            if scenario is None or scenario.extra_attribute(id) is None:
+                continue
+            scenario.delete_extra_attribute(id)
+            nAttributes += 1
+        nMatrices = 0
+        for id in self._matrices:
+            if _DATABANK.matrix(id) is None:
+                continue
+            _DATABANK.delete_matrix(id)
+            nMatrices += 1
+        self._attributes = []
+        self._matrices = []
+        self._freeAttributes.clear()
+        self._freeMatrices.clear()
+        if nAttributes or nMatrices:
+            _m.logbook_write(
+                "Deleted %s temporary extra attributes and %s temporary matrices (%s uses)"
+                % (nAttributes, nMatrices, self.nLeases)
+            )
+
+
+_TEMP_POOLS = []
+
+
+def getTempResourcePool():
+    """
+    Returns: The active TempResourcePool, or None.
+    """
+    if _TEMP_POOLS:
+        return _TEMP_POOLS[-1]
+    return None
+
+
+@contextmanager
+def tempResourcePoolMANAGER():
+    """
+    Pools the temporary extra attributes and matrices created by
+    tempExtraAttributeMANAGER, tempMatrixMANAGER and tempMatricesMANAGER within
+    the block, so that tools which use them inside loops (e.g. once per class or
+    per iteration) reuse the same few temporaries. They are deleted at the end
+    of the block. Nested blocks share the outermost pool.
+
+    Example:
+        with _util.tempResourcePoolMANAGER():
+            for className in classNames:
+                with _util.tempExtraAttributeMANAGER(scenario, 'TRANSIT_SEGMENT') as att:
+                    ...
+
+    Yields: The TempResourcePool
+    """
+    if _TEMP_POOLS:
+        yield _TEMP_POOLS[-1]
+        return
+    pool = TempResourcePool()
+    _TEMP_POOLS.append(pool)
+    try:
+        yield pool
+    finally:
+        _TEMP_POOLS.pop()
+        pool.close()
+
+
 # -------------------------------------------------------------------------------------------
 
 # @deprecated: In Emme 4.1.2 the indices have been changed
@@ -579,6 +748,48 @@ def fastLoadLinkAttributes(scenario, list_of_attributes):
 # -------------------------------------------------------------------------------------------
 
 
+def fastLoadLinkAttributeArrays(scenario, list_of_attributes):
+    """
+    Performs a fast partial read of link attributes into NumPy arrays, using
+    scenario.get_attribute_values. Useful for tools which only need to
+    aggregate a few link attributes, without building a full Network object.
+
+    Args:
+        - scenario: The scenario to load from
+        - list_of_attributes: A list of LINK attribute names to load.
+
+    Returns:
+        A tuple (i_nodes, j_nodes, attributes) where i_nodes and j_nodes are
+        integer arrays of the link end-node numbers, and attributes is a
+        dictionary of attribute name : float array. All arrays are in the
+        same (link) order.
+    """
+
+    package = scenario.get_attribute_values("LINK", list_of_attributes)
+    indices = package[0]
+    attribute_tables = package[1:]
+
+    nLinks = sum(len(outgoing_links) for outgoing_links in six.itervalues(indices))
+    i_nodes = _np.empty(nLinks, dtype=_np.int64)
+    j_nodes = _np.empty(nLinks, dtype=_np.int64)
+    positions = _np.empty(nLinks, dtype=_np.int64)
+    k = 0
+    for i_node, outgoing_links in six.iteritems(indices):
+        for j_node, index in six.iteritems(outgoing_links):
+            i_nodes[k] = i_node
+            j_nodes[k] = j_node
+            positions[k] = index
+            k += 1
+
+    attributes = {}
+    for att_name, table in itersync(list_of_attributes, attribute_tables):
+        attributes[att_name] = _np.asarray(table, dtype=_np.float64).take(positions)
+    return i_nodes, j_nodes, attributes
+
+
+# -------------------------------------------------------------------------------------------
+
+
 def getEmmeVersion(returnType=str):
     """
     Gets the version of Emme that is currently running, as a string. For example,
@@ -1358,6 +1569,98 @@ class NullPointerException(Exception):
     pass
 
 
+# -------------------------------------------------------------------------------------------
+
+_STRATEGY_METADATA_CACHE = {}
+
+
+class TransitStrategyMetadata:
+    """
+    Typed view of the transit strategy config file (Database/STRATS_s<N>/config)
+    written by Emme after a transit assignment.
+
+    Attributes:
+        - assignmentType: The assignment type string, e.g. 'CONGESTED_TRANSIT_ASSIGNMENT'
+            or 'MULTICLASS_TRANSIT_ASSIGNMENT'.
+        - isMulticlass: True if the strategies were saved per class (either an extended
+            multiclass assignment or a multiclass congested assignment).
+        - classNames: List of class names, in assignment order. Empty for single-class runs.
+        - demandMatrices: Dictionary of class name : demand matrix id for multiclass runs,
+            otherwise None.
+        - classWeights: List of (class name, alpha) tuples taken from the strategy files.
+    """
+
+    def __init__(self, config):
+        data = config["data"]
+        strat = config["strat_files"]
+
+        self.assignmentType = data["type"]
+        self.isMulticlass = bool(data.get("multi_class", False))
+
+        self.classNames = []
+        self.demandMatrices = None
+        if self.assignmentType == "MULTICLASS_TRANSIT_ASSIGNMENT":
+            self.isMulticlass = True
+            self.classNames = [info["name"] for info in strat]
+            self.demandMatrices = dict((info["name"], info["data"]["demand"]) for info in strat if info["data"] is not None)
+        elif self.isMulticlass:
+            classes = data.get("classes", [])
+            self.classNames = [info["name"] for info in classes]
+            self.demandMatrices = dict((info["name"], info["demand"]) for info in classes)
+
+        self.classWeights = []
+        alphas = data.get("alphas", None)
+        alpha = 0.0
+        i = 0
+        for info in strat:
+            if info["data"] is not None:
+                if "alpha" in info["data"]:
+                    alpha = info["data"]["alpha"]
+                elif alphas is not None:
+                    alpha = alphas[i]
+                    i += 1
+                else:
+                    alpha = 0.0
+            self.classWeights.append((info["name"], alpha))
+
+
+def getStrategyConfigPath(scenario):
+    """
+    Returns the path to the transit strategy config file of a given scenario.
+    """
+    return dirname(_MODELLER.desktop.project_file_name()) + "/Database/STRATS_s%s/config" % scenario.id
+
+
+def loadTransitStrategyMetadata(scenario):
+    """
+    Loads the transit strategy metadata of a given scenario. The config file is only
+    parsed once for as long as its modification time and size remain unchanged, so this
+    can be called freely from page() methods and inside model iterations.
+
+    Args:
+        - scenario: The Emme Scenario object with transit results
+
+    Returns: A TransitStrategyMetadata object, or None if the scenario has
+        no strategy config file.
+    """
+    configPath = getStrategyConfigPath(scenario)
+    try:
+        stat = _os.stat(configPath)
+    except OSError:
+        _STRATEGY_METADATA_CACHE.pop(configPath, None)
+        return None
+    key = (stat.st_mtime, stat.st_size)
+
+    cached = _STRATEGY_METADATA_CACHE.get(configPath)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(configPath) as reader:
+        metadata = TransitStrategyMetadata(_parsedict(reader.read()))
+    _STRATEGY_METADATA_CACHE[configPath] = (key, metadata)
+    return metadata
+
+
 """
 Gets the demand matrix name (mfxx) that was used during the
 previous transit assignment for the given scenario.
@@ -1367,31 +1670,12 @@ EMME_VERSION is a tuple, scenario is the scenario object.
 
 
 def DetermineAnalyzedTransitDemandId(EMME_VERSION, scenario):
-    configPath = dirname(_MODELLER.desktop.project_file_name()) + "/Database/STRATS_s%s/config" % scenario
-    with open(configPath) as reader:
-        config = _parsedict(reader.read())
-
-        data = config["data"]
-        if "multi_class" in data:
-            if data["multi_class"] == True:
-                multiclass = "yes"
-            else:
-                multiclass = "no"
-        else:
-            multiclass = "no"
-        strat = config["strat_files"]
-        demandMatrices = {}
-        if data["type"] == "MULTICLASS_TRANSIT_ASSIGNMENT":  # multiclass extended transit assignment
-            for i in range(len(strat)):
-                demandMatrices[strat[i]["name"]] = strat[i]["data"]["demand"]
-            return demandMatrices
-        elif multiclass == "yes":  # multiclass congested assignment
-            for i in range(len(data["classes"])):
-                demandMatrices[data["classes"][i]["name"]] = data["classes"][i]["demand"]
-            return demandMatrices
-        else:  # non multiclass congested
-            strats = scenario.transit_strategies
-            return strats.data["demand"]
+    metadata = loadTransitStrategyMetadata(scenario)
+    if metadata is None:
+        raise IOError("No transit strategy config file found for scenario %s" % scenario.id)
+    if metadata.isMulticlass:
+        return dict(metadata.demandMatrices)
+    return scenario.transit_strategies.data["demand"]
 
 
 @contextmanager
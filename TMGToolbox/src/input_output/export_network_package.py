@@ -18,12 +18,14 @@
 """
 
 import json
+import os
 import shutil
 import tempfile
 import traceback
 import zipfile
 from contextlib import contextmanager
 from datetime import datetime
+from multiprocessing.pool import ThreadPool
 from os import path
 
 import inro.modeller as m
@@ -41,13 +43,88 @@ _export_turns = mm.tool('inro.emme.data.network.turn.export_turns')
 _export_attributes = mm.tool('inro.emme.data.extra_attribute.export_extra_attributes')
 _export_functions = mm.tool('inro.emme.data.function.export_functions')
 _pdu = mm.module('tmg.common.pandas_utils')
+_store = mm.module('tmg.common.network_package_store')
 
 # initalize python3 types
 _util.initalizeModellerTypes(m)
 
+COMPRESSION_MODES = ['DEFLATE', 'STORE']
+
+# Entries which are already compressed are always stored as-is
+_COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.zip', '.npz', '.nwp', '.parquet', '.feather')
+
+# Entries which stay in the package itself in content-addressed mode
+_PACKAGE_ENTRIES = ('version.txt', 'info.txt')
+
+
+class PackageWriter(object):
+    """Adds entries to a network package on a background thread.
+
+    Exporting a component (which mostly waits on Emme) overlaps with compressing and writing the previous one, so
+    packaging is bound by I/O rather than by compression. Entries are written in the order they are added. Use as a
+    context manager: all pending entries are written on exit.
+
+    If a network_package_store.ManifestBuilder is given, components are put in its package store instead of the
+    package (content-addressed mode); the caller writes the manifest once all entries are done.
+    """
+
+    def __init__(self, zf, store=False, manifest=None):
+        self.zf = zf
+        self.store = store
+        self.manifest = manifest
+        self._pool = ThreadPool(1)
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        try:
+            self.wait()
+        finally:
+            self._pool.close()
+            self._pool.join()
+
+    def compress_type(self, arcname):
+        if self.store or arcname.lower().endswith(_COMPRESSED_EXTENSIONS):
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+    def write_file(self, filepath, arcname, remove=True):
+        """Adds a file to the package, deleting it once written if `remove` is True."""
+        def task():
+            if self._in_store(arcname):
+                self.manifest.add_file(arcname, filepath)
+            else:
+                self.zf.write(filepath, arcname=arcname, compress_type=self.compress_type(arcname))
+            if remove:
+                os.remove(filepath)
+        self._submit(task)
+
+    def write_str(self, arcname, data):
+        """Adds an entry from a string, or from a callable returning one (called on the writer thread)."""
+        def task():
+            content = data() if callable(data) else data
+            if self._in_store(arcname):
+                self.manifest.add_bytes(arcname, content)
+            else:
+                self.zf.writestr(arcname, content, compress_type=self.compress_type(arcname))
+        self._submit(task)
+
+    def wait(self):
+        pending, self._pending = self._pending, []
+        for result in pending:
+            result.get()  # Re-raises any error from the writer thread
+
+    def _in_store(self, arcname):
+        return self.manifest is not None and arcname not in _PACKAGE_ENTRIES
+
+    def _submit(self, task):
+        self._pending.append(self._pool.apply_async(task))
+
 
 class ExportNetworkPackage(m.Tool()):
-    version = '1.2.3'
+    version = '1.4.0'
     tool_run_msg = ""
     number_of_tasks = 11  # For progress reporting, enter the integer number of tasks here
 
@@ -57,6 +134,8 @@ class ExportNetworkPackage(m.Tool()):
     AttributeIdsToExport = m.Attribute(m.ListType)
     ExportMetadata = m.Attribute(str)
     ExportToEmmeOldVersion = m.Attribute(bool)
+    CompressionMode = m.Attribute(str)
+    PackageStoreFolder = m.Attribute(str)
 
     export_attributes = m.Attribute(str)
     scenario_number = m.Attribute(int)
@@ -67,6 +146,8 @@ class ExportNetworkPackage(m.Tool()):
         self.Scenario = mm.scenario  # Default is primary scenario
         self.ExportMetadata = ''
         self.ExportToEmmeOldVersion = False
+        self.CompressionMode = 'DEFLATE'
+        self.PackageStoreFolder = ''
 
     def page(self):
         pb = _tmg_tpb.TmgToolPageBuilder(
@@ -88,6 +169,15 @@ class ExportNetworkPackage(m.Tool()):
         pb.add_checkbox('ExportToEmmeOldVersion', label='Export it to be compatible with Emme 4.3?',
                         note='Descriptions longer than 20 characters will be trimmed.')
 
+        pb.add_select('CompressionMode', keyvalues=[('DEFLATE', 'Compress (deflate)'), ('STORE', 'Store')],
+                      title='Compression', note='Store writes the package uncompressed, which is faster but larger.')
+
+        pb.add_select_file('PackageStoreFolder', window_type='directory', title='Package store',
+                           note='Optional. If given, each component is saved once in this shared folder, named by a '
+                                'hash of its contents, and the package only references it. Packages of scenarios '
+                                'which share components are then much faster to export and smaller. The store must '
+                                'be kept with the packages.')
+
         pb.add_checkbox('ExportAllFlag', label='Export all extra attributes?')
 
         pb.add_select('AttributeIdsToExport', keyvalues=self._get_select_attribute_options_json(),
@@ -142,12 +232,15 @@ class ExportNetworkPackage(m.Tool()):
     def check_all_flag(self):
         return self.ExportAllFlag
 
-    def __call__(self, scenario_number, ExportFile, export_attributes):
+    def __call__(self, scenario_number, ExportFile, export_attributes, CompressionMode='DEFLATE',
+                 PackageStoreFolder=None):
         self.Scenario = mm.emmebank.scenario(scenario_number)
         if self.Scenario is None:
             raise Exception('Scenario %s was not found!' % scenario_number)
 
         self.ExportFile = ExportFile
+        self.CompressionMode = CompressionMode
+        self.PackageStoreFolder = PackageStoreFolder
         if export_attributes.lower() == 'all':
             self.ExportAllFlag = True  # if true, self.AttributeIdsToExport gets set in execute
         else:
@@ -174,7 +267,9 @@ class ExportNetworkPackage(m.Tool()):
                 "ExportToEmmeOldVersion": self.ExportToEmmeOldVersion,
                 "ExportAllFlag": self.ExportAllFlag,
                 "AttributeIdsToExport": self.AttributeIdsToExport,
-                "ExportMetadata": self.ExportMetadata
+                "ExportMetadata": self.ExportMetadata,
+                "CompressionMode": self.CompressionMode,
+                "PackageStoreFolder": self.PackageStoreFolder
             }
             m.logbook_snapshot(name=logbook_entry_name, comment='', namespace=str(self), value=json.dumps(snapshot))
 
@@ -190,72 +285,82 @@ class ExportNetworkPackage(m.Tool()):
                     raise IOError('Attributes [%s] not defined in scenario %s' % (', '.join(missing_attributes),
                                                                                   self.Scenario.number))
 
-            with zipfile.ZipFile(self.ExportFile, 'w', zipfile.ZIP_DEFLATED) as zf, self._temp_file() as temp_folder:
-                version_file = path.join(temp_folder, 'version.txt')
-                with open(version_file, 'w') as writer:
-                    writer.write("%s\n%s" % (str(5.0), _util.getEmmeVersion(returnType=str)))
-                zf.write(version_file, arcname='version.txt')
-
-                info_path = path.join(temp_folder, 'info.txt')
-                self._write_info_file(info_path)
-                zf.write(info_path, arcname='info.txt')
-
-                self._batchout_modes(temp_folder, zf)
-                self._batchout_vehicles(temp_folder, zf)
-                self._batchout_base(temp_folder, zf)
-                self._batchout_shapes(temp_folder, zf)
-                self._batchout_lines(temp_folder, zf)
-                self._batchout_turns(temp_folder, zf)
-                self._batchout_functions(temp_folder, zf)
-                self._batchout_network_fields(temp_folder, zf)
+            compression_mode = (self.CompressionMode or 'DEFLATE').upper()
+            if compression_mode not in COMPRESSION_MODES:
+                raise ValueError("Unknown compression mode '%s'" % self.CompressionMode)
+
+            # The Emme export tools can only write to files, so their output goes through a temporary folder. Each
+            # file is deleted once it has been added to the package. Everything else is written straight into the
+            # package.
+            manifest = None
+            if self.PackageStoreFolder:
+                manifest = _store.ManifestBuilder(_store.ComponentStore(self.PackageStoreFolder))
+                m.logbook_write("Storing components in package store '%s'" % manifest.store.folder)
+
+            with self._temp_file() as temp_folder, zipfile.ZipFile(self.ExportFile, 'w', zipfile.ZIP_DEFLATED) as zf, \
+                    PackageWriter(zf, store=compression_mode == 'STORE', manifest=manifest) as writer:
+                writer.write_str('version.txt', "%s\n%s" % (str(5.0), _util.getEmmeVersion(returnType=str)))
+                writer.write_str('info.txt', self._get_info_text())
+
+                self._batchout_modes(temp_folder, writer)
+                self._batchout_vehicles(temp_folder, writer)
+                self._batchout_base(temp_folder, writer)
+                self._batchout_shapes(temp_folder, writer)
+                self._batchout_lines(temp_folder, writer)
+                self._batchout_turns(temp_folder, writer)
+                self._batchout_functions(temp_folder, writer)
+                self._batchout_network_fields(temp_folder, writer)
 
                 if len(self.AttributeIdsToExport) > 0:
-                    self._batchout_extra_attributes(temp_folder, zf)
+                    self._batchout_extra_attributes(temp_folder, writer)
                 else:
                     self.TRACKER.completeTask()
 
                 if self.Scenario.has_traffic_results:
-                    self._batchout_traffic_results(temp_folder, zf)
+                    self._batchout_traffic_results(writer)
                 self.TRACKER.completeTask()
 
                 if self.Scenario.has_transit_results:
-                    self._batchout_transit_results(temp_folder, zf)
+                    self._batchout_transit_results(writer)
                 self.TRACKER.completeTask()
 
+                if manifest is not None:
+                    writer.wait()
+                    zf.writestr(_store.MANIFEST_NAME, manifest.to_json(self.ExportFile))
+
     @m.logbook_trace('Exporting modes')
-    def _batchout_modes(self, temp_folder, zf):
+    def _batchout_modes(self, temp_folder, writer):
         export_file = path.join(temp_folder, 'modes.201')
         self.TRACKER.runTool(_export_modes, export_file=export_file, scenario=self.Scenario)
-        zf.write(export_file, arcname='modes.201')
+        writer.write_file(export_file, 'modes.201')
 
     @m.logbook_trace('Exporting vehicles')
-    def _batchout_vehicles(self, temp_folder, zf):
-        export_file = path.join(temp_folder, 'vehicles.202')
+    def _batchout_vehicles(self, temp_folder, writer):
         if self.Scenario.element_totals['transit_vehicles'] == 0:
-            self._export_blank_batch_file(export_file, 'vehicles')
+            writer.write_str('vehicles.202', self._get_blank_batch_file('vehicles'))
             self.TRACKER.completeTask()
         else:
+            export_file = path.join(temp_folder, 'vehicles.202')
             self.TRACKER.runTool(_export_vehicles, export_file=export_file, scenario=self.Scenario)
-        zf.write(export_file, arcname='vehicles.202')
+            writer.write_file(export_file, 'vehicles.202')
 
     @m.logbook_trace('Exporting base network')
-    def _batchout_base(self, temp_folder, zf):
+    def _batchout_base(self, temp_folder, writer):
         export_file = path.join(temp_folder, 'base.211')
         self.TRACKER.runTool(_export_base_network, export_file=export_file, scenario=self.Scenario,
                              export_format='ENG_DATA_FORMAT')
-        zf.write(export_file, arcname='base.211')
+        writer.write_file(export_file, 'base.211')
 
     @m.logbook_trace('Exporting link shapes')
-    def _batchout_shapes(self, temp_folder, zf):
+    def _batchout_shapes(self, temp_folder, writer):
         export_file = path.join(temp_folder, 'shapes.251')
         self.TRACKER.runTool(_export_link_shapes, export_file=export_file, scenario=self.Scenario)
-        zf.write(export_file, arcname='shapes.251')
+        writer.write_file(export_file, 'shapes.251')
 
     @m.logbook_trace('Exporting transit lines')
-    def _batchout_lines(self, temp_folder, zf):
-        export_file = path.join(temp_folder, 'transit.221')
+    def _batchout_lines(self, temp_folder, writer):
         if self.Scenario.element_totals['transit_lines'] == 0:
-            self._export_blank_batch_file(export_file, 'lines')
+            writer.write_str('transit.221', self._get_blank_batch_file('lines'))
             self.TRACKER.completeTask()
         else:
             # check if the description is empty or has single quote
@@ -269,28 +374,29 @@ class ExportNetworkPackage(m.Tool()):
                         line.description = line.description[0:19]
             self.Scenario.publish_network(network)
 
+            export_file = path.join(temp_folder, 'transit.221')
             self.TRACKER.runTool(_export_transit_lines, export_file=export_file, scenario=self.Scenario,
                                  export_format='ENG_DATA_FORMAT')
-        zf.write(export_file, arcname='transit.221')
+            writer.write_file(export_file, 'transit.221')
 
     @m.logbook_trace('Exporting turns')
-    def _batchout_turns(self, temp_folder, zf):
+    def _batchout_turns(self, temp_folder, writer):
         export_file = path.join(temp_folder, 'turns.231')
         if self.Scenario.element_totals['turns'] == 0:
             self.TRACKER.completeTask()
         else:
             self.TRACKER.runTool(_export_turns, export_file=export_file, scenario=self.Scenario,
                                  export_format='ENG_DATA_FORMAT')
-            zf.write(export_file, arcname='turns.231')
+            writer.write_file(export_file, 'turns.231')
 
     @m.logbook_trace('Exporting Functions')
-    def _batchout_functions(self, temp_folder, zf):
+    def _batchout_functions(self, temp_folder, writer):
         export_file = path.join(temp_folder, 'functions.411')
         self.TRACKER.runTool(_export_functions, export_file=export_file)
-        zf.write(export_file, arcname='functions.411')
+        writer.write_file(export_file, 'functions.411')
 
     @m.logbook_trace('Exporting Network Fields')
-    def _batchout_network_fields(self, temp_folder, zf):
+    def _batchout_network_fields(self, temp_folder, writer):
         version = _util.getEmmeVersion(returnType=tuple)
         # we only can try to export fields if the EMME version is over 4.3
         if version >= (4, 4, 0) and len(self.Scenario.network_fields()) > 0:
@@ -301,25 +407,25 @@ class ExportNetworkPackage(m.Tool()):
                 scenario=self.Scenario,
                 export_definitions=True
                 )
-            def write_if_exists(zf, directory_name, local_name, scenario_number):
+            def write_if_exists(writer, directory_name, local_name, scenario_number):
                 # The scenario number is appended as X_1.csv for scenario 1
                 exported_file = path.join(directory_name, local_name + "_" + str(scenario_number) + ".csv")
                 if path.isfile(exported_file):
-                    zf.write(exported_file, arcname=local_name + ".csv")
+                    writer.write_file(exported_file, local_name + ".csv")
                 return
             scenario = self.Scenario.number
-            write_if_exists(zf, temp_folder, "netfield_links", scenario)
-            write_if_exists(zf, temp_folder, "netfield_modes", scenario)
-            write_if_exists(zf, temp_folder, "netfield_nodes", scenario)
-            write_if_exists(zf, temp_folder, "netfield_segments", scenario)
-            write_if_exists(zf, temp_folder, "netfield_transit_lines", scenario)
-            write_if_exists(zf, temp_folder, "netfield_turns", scenario)
-            write_if_exists(zf, temp_folder, "netfield_vehicles", scenario)
+            write_if_exists(writer, temp_folder, "netfield_links", scenario)
+            write_if_exists(writer, temp_folder, "netfield_modes", scenario)
+            write_if_exists(writer, temp_folder, "netfield_nodes", scenario)
+            write_if_exists(writer, temp_folder, "netfield_segments", scenario)
+            write_if_exists(writer, temp_folder, "netfield_transit_lines", scenario)
+            write_if_exists(writer, temp_folder, "netfield_turns", scenario)
+            write_if_exists(writer, temp_folder, "netfield_vehicles", scenario)
         return
 
 
     @m.logbook_trace('Exporting extra attributes')
-    def _batchout_extra_attributes(self, temp_folder, zf):
+    def _batchout_extra_attributes(self, temp_folder, writer):
         m.logbook_write('List of attributes: %s' % self.AttributeIdsToExport)
 
         extra_attributes = [self.Scenario.extra_attribute(id_) for id_ in self.AttributeIdsToExport]
@@ -331,38 +437,28 @@ class ExportNetworkPackage(m.Tool()):
             if t == 'transit_segment':
                 t = 'segment'
             filename = path.join(temp_folder, 'extra_%ss_%s.csv' % (t, self.Scenario.number))
-            zf.write(filename, arcname='exatt_%ss.241' % t)
-        summary_file = path.join(temp_folder, 'exatts.241')
-        self._export_attribute_definition_file(summary_file, extra_attributes)
-        zf.write(summary_file, arcname='exatts.241')
-
-    def _batchout_traffic_results(self, temp_folder, zf):
-        link_filepath = path.join(temp_folder, 'link_results.csv')
-        turn_filepath = path.join(temp_folder, 'turn_results.csv')
+            writer.write_file(filename, 'exatt_%ss.241' % t)
+        writer.write_str('exatts.241', self._get_attribute_definition_text(extra_attributes))
+
+    def _batchout_traffic_results(self, writer):
         traffic_result_attributes = ['auto_volume', 'additional_volume', 'auto_time']
 
-        links = _pdu.load_link_dataframe(self.Scenario)[traffic_result_attributes]
-        links.to_csv(link_filepath, index=True)
-        zf.write(link_filepath, arcname=path.basename(link_filepath))
+        # Only the result columns are read; the CSV text is formatted on the writer thread
+        links = _pdu.load_link_dataframe(self.Scenario, attributes=traffic_result_attributes)
+        writer.write_str('link_results.csv', lambda: links.to_csv(index=True))
 
-        turns = _pdu.load_turn_dataframe(self.Scenario)
+        turns = _pdu.load_turn_dataframe(self.Scenario, attributes=traffic_result_attributes)
         if not (turns is None):
-            turns = turns[traffic_result_attributes]
-            turns.to_csv(turn_filepath)
-            zf.write(turn_filepath, arcname=path.basename(turn_filepath))
+            writer.write_str('turn_results.csv', lambda: turns.to_csv())
 
-    def _batchout_transit_results(self, temp_folder, zf):
-        segment_filepath = path.join(temp_folder, 'segment_results.csv')
+    def _batchout_transit_results(self, writer):
         result_attributes = ['transit_boardings', 'transit_time', 'transit_volume']
-        segments = _pdu.load_transit_segment_dataframe(self.Scenario)[result_attributes]
-        segments.to_csv(segment_filepath)
-        zf.write(segment_filepath, arcname=path.basename(segment_filepath))
+        segments = _pdu.load_transit_segment_dataframe(self.Scenario, attributes=result_attributes)
+        writer.write_str('segment_results.csv', lambda: segments.to_csv())
 
-        aux_transit_filepath = path.join(temp_folder, 'aux_transit_results.csv')
         aux_result_attributes = ['aux_transit_volume']
-        aux_transit = _pdu.load_link_dataframe(self.Scenario)[aux_result_attributes]
-        aux_transit.to_csv(aux_transit_filepath)
-        zf.write(aux_transit_filepath, arcname=path.basename(aux_transit_filepath))
+        aux_transit = _pdu.load_link_dataframe(self.Scenario, attributes=aux_result_attributes)
+        writer.write_str('aux_transit_results.csv', lambda: aux_transit.to_csv())
 
     @contextmanager
     def _temp_file(self):
@@ -375,27 +471,25 @@ class ExportNetworkPackage(m.Tool()):
             m.logbook_write('Deleted temporary directory at `%s`' % foldername)
 
     @staticmethod
-    def _export_blank_batch_file(filename, t_record):
-        with open(filename, 'w') as file_:
-            file_.write('t %s init' % t_record)
+    def _get_blank_batch_file(t_record):
+        return 't %s init' % t_record
 
     @staticmethod
-    def _export_attribute_definition_file(filename, attribute_list):
-        with open(filename, 'w') as writer:
-            writer.write('name,type, default')
-            for att in attribute_list:
-                writer.write("\n{name},{type},{default},'{desc}'".format(
-                    name=att.name, type=att.type, default=att.default_value, desc=att.description
-                ))
-
-    def _write_info_file(self, fp):
-        with open(fp, 'w') as writer:
-            bank = mm.emmebank
-            lines = [
-                str(bank.title), str(bank.path), '%s - %s' % (self.Scenario, self.Scenario.title),
-                datetime.now().strftime('%Y-%m-%d %H:%M'), self.ExportMetadata
-            ]
-            writer.write("\n".join(lines))
+    def _get_attribute_definition_text(attribute_list):
+        lines = ['name,type, default']
+        for att in attribute_list:
+            lines.append("{name},{type},{default},'{desc}'".format(
+                name=att.name, type=att.type, default=att.default_value, desc=att.description
+            ))
+        return "\n".join(lines)
+
+    def _get_info_text(self):
+        bank = mm.emmebank
+        lines = [
+            str(bank.title), str(bank.path), '%s - %s' % (self.Scenario, self.Scenario.title),
+            datetime.now().strftime('%Y-%m-%d %H:%M'), self.ExportMetadata
+        ]
+        return "\n".join(lines)
 
     def _get_select_attribute_options_json(self):
         keyval = {}
@@ -431,7 +525,9 @@ class ExportNetworkPackage(m.Tool()):
             "ExportToEmmeOldVersion": self.ExportToEmmeOldVersion,
             "ExportAllFlag": self.ExportAllFlag,
             "AttributeIdsToExport": att_ids,
-            "ExportMetadata": self.ExportMetadata
+            "ExportMetadata": self.ExportMetadata,
+            "CompressionMode": self.CompressionMode,
+            "PackageStoreFolder": self.PackageStoreFolder
         }
         return json.dumps(snapshot)
 
@@ -446,6 +542,8 @@ class ExportNetworkPackage(m.Tool()):
         self.ExportAllFlag = bool(snapshot["ExportAllFlag"])
         self.AttributeIdsToExport = att_ids
         self.ExportMetadata = snapshot["ExportMetadata"]
+        self.CompressionMode = snapshot.get("CompressionMode", 'DEFLATE')
+        self.PackageStoreFolder = snapshot.get("PackageStoreFolder", '')
 
     def __getitem__(self, key):
         value = getattr(self, key)
@@ -461,7 +559,9 @@ class ExportNetworkPackage(m.Tool()):
             "ExportToEmmeOldVersion": self.ExportToEmmeOldVersion,
             "ExportAllFlag": self.ExportAllFlag,
             "AttributeIdsToExport": self.AttributeIdsToExport,
-            "ExportMetadata": self.ExportMetadata
+            "ExportMetadata": self.ExportMetadata,
+            "CompressionMode": self.CompressionMode,
+            "PackageStoreFolder": self.PackageStoreFolder
         }
         return state
 
@@ -25,6 +25,7 @@ import os
 _MODELLER = _m.Modeller()
 _util = _MODELLER.module("tmg.common.utilities")
 _geolib = _MODELLER.module("tmg.common.geometry")
+_partial = _MODELLER.module("tmg.common.partial_network")
 Shapely2ESRI = _geolib.Shapely2ESRI
 networkCalcTool = _MODELLER.tool("inro.emme.network_calculation.network_calculator")
 matrixCalcTool = _MODELLER.tool("inro.emme.matrix_calculation.matrix_calculator")
@@ -42,7 +43,7 @@ _util.initalizeModellerTypes(_m)
 
 
 class ExportSubareaTool(_m.Tool()):
-    version = "2.0.0"
+    version = "2.1.0"
     tool_run_msg = ""
     number_of_tasks = 4
     xtmf_ScenarioNumber = _m.Attribute(int)
@@ -259,15 +260,13 @@ class ExportSubareaTool(_m.Tool()):
             
                 if self.CreateGateAttrib:
                     self._CreateSubareaExtraAttribute(self.SubareaGateAttribute, "LINK")
-                    self._TagSubareaCentroids()
-            
+
+                subareaNodeFlags = None
                 if self.CreateNodeFlagFromShapeFile:
                     self._CreateSubareaExtraAttribute(self.SubareaNodeAttribute, "NODE")
-                    network = self.Scenario.get_network()
-                    subareaNodes = self._LoadShapeFIle(network)
-                    for node in subareaNodes:
-                        node[self.SubareaNodeAttribute] = 1
-                    self.Scenario.publish_network(network)
+                    subareaNodeFlags = self._LoadShapeFIle()
+
+                self._TagSubareaCentroids(subareaNodeFlags)
             
                 self._ClearPreviousDatabank()
                 self._RunSubarea(peakHourMatrix, appliedTollFactor, classVolumeAttributes, costAttribute, attributes)
@@ -375,7 +374,21 @@ class ExportSubareaTool(_m.Tool()):
             )
         return
 
-    def _TagSubareaCentroids(self):
+    def _TagSubareaCentroids(self, subareaNodeFlags=None):
+        """
+        Flags the subarea nodes (given as a boolean array aligned with the scenario's
+        nodes, from _LoadShapeFIle) and tags the gate links.
+        """
+        if subareaNodeFlags is not None:
+            editor = _partial.PartialNetworkEditor(
+                self.Scenario, {"NODE": [self.SubareaNodeAttribute]}, loadNetwork=False
+            )
+            values = editor.getValues("NODE", self.SubareaNodeAttribute)
+            values[subareaNodeFlags] = 1
+            editor.setValues("NODE", self.SubareaNodeAttribute, values)
+            editor.commit()
+        if not self.CreateGateAttrib:
+            return
         to_run = []
         if self.ISubareaLinkSelection:
             to_run.append({
@@ -395,26 +408,28 @@ class ExportSubareaTool(_m.Tool()):
             networkCalcTool(to_run, self.Scenario)
         return
 
-    def _LoadShapeFIle(self, network):
+    def _LoadShapeFIle(self):
+        """
+        Returns a boolean array, aligned with the scenario's nodes, of the nodes within
+        the shapefile's polygon.
+        """
         with Shapely2ESRI(self.ShapeFileLocation, mode="read") as reader:
             if int(reader._size) != 1:
                 raise Exception(
                     "Shapefile has invalid number of features. There should only be one 1 polygon in the shapefile"
                 )
-            subareaNodes = []
-            for node in network.nodes():
-                for border in reader.readThrough():
-                    if node not in subareaNodes:
-                        point = _geolib.nodeToShape(node)
-                        if border.contains(point):
-                            subareaNodes.append(node)
-            # Make sure that we read in at least one node!
-            if len(subareaNodes) == 0:
-                raise Exception(
-                    "No nodes were contained within the Shapefile's polygon to use for the subarea network!\r\n"
-                    + "Make sure that the ShapeFile is in the same projection as the EMME project!"
-                )
-        return subareaNodes
+            border = reader.readFrom(0)
+        editor = _partial.PartialNetworkEditor(self.Scenario, {"NODE": ["x", "y"]}, loadNetwork=False)
+        subareaNodeFlags = _geolib.pointsInPolygon(
+            border, editor.getValues("NODE", "x"), editor.getValues("NODE", "y")
+        )
+        # Make sure that we read in at least one node!
+        if not subareaNodeFlags.any():
+            raise Exception(
+                "No nodes were contained within the Shapefile's polygon to use for the subarea network!\r\n"
+                + "Make sure that the ShapeFile is in the same projection as the EMME project!"
+            )
+        return subareaNodeFlags
 
     def _ClearPreviousDatabank(self):
         d = _MODELLER.desktop.data_explorer()
@@ -17,6 +17,7 @@
     along with the TMG Toolbox.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import io
 import json
 import os
 import shutil as _shutil
@@ -24,9 +25,11 @@ import tempfile as _tf
 import traceback as _traceback
 import zipfile as _zipfile
 from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
 from os import path as _path
 
 import inro.modeller as m
+import numpy as np
 import six
 
 mm = m.Modeller()
@@ -39,6 +42,114 @@ import_link_shape = mm.tool('inro.emme.data.network.base.link_shape_transaction'
 import_lines = mm.tool('inro.emme.data.network.transit.transit_line_transaction')
 import_turns = mm.tool('inro.emme.data.network.turn.turn_transaction')
 import_attributes = mm.tool('inro.emme.data.network.import_attribute_values')
+_store = mm.module('tmg.common.network_package_store')
+_partial = mm.module('tmg.common.partial_network')
+
+# Components of a content-addressed package which can be re-applied to an existing scenario. If any other component
+# changed, the scenario is rebuilt from scratch. Results and extra attributes are always re-applied.
+_REAPPLICABLE_COMPONENTS = ('transit.221', 'exatts.241', 'link_results.csv', 'turn_results.csv', 'segment_results.csv',
+                            'aux_transit_results.csv', 'functions.411')
+
+
+# Header names of the index columns in attribute and result tables
+_INDEX_COLUMN_NAMES = {'i', 'j', 'k', 'inode', 'jnode', 'knode', 'i_node', 'j_node', 'k_node', 'node', 'line',
+                       'loop', 'loop_idx', 'loop_index'}
+_LOOP_COLUMN_NAMES = {'loop', 'loop_idx', 'loop_index'}
+_INDEX_COLUMN_COUNTS = {'NODE': 1, 'LINK': 2, 'TURN': 3, 'TRANSIT_LINE': 1, 'TRANSIT_SEGMENT': 3}
+
+
+def read_attribute_table(reader, domain, separator=','):
+    """Reads an attribute or result table: a header row, then the element's index columns followed by one column
+    per attribute.
+
+    Returns:
+        (attribute names, element keys, 2D array of values), with keys as in partial_network.flattenIndex. None if the
+        table's layout isn't recognized, in which case it should be read by Emme's import tool instead.
+    """
+    header = [cell.strip() for cell in reader.readline().strip().split(separator)]
+    n_index = 0
+    while n_index < len(header) and header[n_index].lower() in _INDEX_COLUMN_NAMES:
+        n_index += 1
+    has_loop = n_index > 0 and header[n_index - 1].lower() in _LOOP_COLUMN_NAMES
+    if n_index - int(has_loop) != _INDEX_COLUMN_COUNTS[domain] or (has_loop and domain != 'TRANSIT_SEGMENT'):
+        return None
+    names = header[n_index:]
+    if not names:
+        return None
+
+    keys = []
+    rows = []
+    loops = {}
+    try:
+        for line in reader:
+            cells = line.strip().split(separator)
+            if len(cells) < len(header):
+                continue  # Blank or truncated line
+            if domain == 'NODE':
+                key = int(cells[0])
+            elif domain == 'LINK':
+                key = (int(cells[0]), int(cells[1]))
+            elif domain == 'TURN':
+                key = (int(cells[0]), int(cells[1]), int(cells[2]))
+            elif domain == 'TRANSIT_LINE':
+                key = cells[0].strip().strip("'")
+            else:
+                line_id, i, j = cells[0].strip().strip("'"), int(cells[1]), int(cells[2])
+                if has_loop:
+                    loop = int(cells[3])
+                else:
+                    # Segments are listed in itinerary order, so the n-th visit of a link is loop n
+                    loop = loops.get((line_id, i, j), 0) + 1
+                    loops[(line_id, i, j)] = loop
+                key = (line_id, i, j, loop)
+            keys.append(key)
+            rows.append([float(cell) for cell in cells[n_index:len(header)]])
+    except ValueError:
+        return None
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(names))
+    return names, keys, values
+
+
+class ComponentPrefetcher(object):
+    """Extracts package components into the temporary folder on a background thread, in the order they are
+    requested. Decompressing the next component overlaps with the Emme transaction for the current one."""
+
+    def __init__(self, zf, temp_folder):
+        self.zf = zf
+        self.temp_folder = temp_folder
+        self._pool = ThreadPool(1)
+        self._results = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._pool.close()
+        self._pool.join()
+
+    def fetch(self, name, transform=None):
+        """Queues a component for extraction. If given, transform(reader, writer) rewrites it on the way (text)."""
+        if name is not None and name not in self._results:
+            self._results[name] = self._pool.apply_async(self._extract, (name, transform))
+
+    def get(self, name, transform=None):
+        """Returns the path of the extracted component, waiting for it if needed."""
+        self.fetch(name, transform)
+        return self._results[name].get()
+
+    def _extract(self, name, transform):
+        target = _path.join(self.temp_folder, name)
+        folder = _path.dirname(target)
+        if not _path.isdir(folder):
+            os.makedirs(folder)
+        with self.zf.open(name) as reader:
+            if transform is None:
+                with open(target, 'wb') as writer:
+                    _shutil.copyfileobj(reader, writer, 1 << 20)
+            else:
+                with open(target, 'w') as writer:
+                    transform(io.TextIOWrapper(reader), writer)
+        return target
 
 
 class ComponentContainer(object):
@@ -76,7 +187,7 @@ class ComponentContainer(object):
 
 
 class ImportNetworkPackage(m.Tool()):
-    version = '1.2.3'
+    version = '1.4.0'
     tool_run_msg = ""
     number_of_tasks = 9  # For progress reporting, enter the integer number of tasks here
 
@@ -88,6 +199,8 @@ class ImportNetworkPackage(m.Tool()):
     AddFunction = m.Attribute(bool)
     ScenarioName = m.Attribute(str)
     SkipMergingFunctions = m.Attribute(bool)
+    SkipUnchangedComponents = m.Attribute(bool)
+    PackageStoreFolder = m.Attribute(str)
 
     def __init__(self):
         self.TRACKER = _util.ProgressTracker(self.number_of_tasks)  # init the ProgressTracker
@@ -100,6 +213,9 @@ class ImportNetworkPackage(m.Tool()):
         self.merge_functions = None
         self.has_exception = False
         self.SkipMergingFunctions = False
+        self._prefetcher = None
+        self.SkipUnchangedComponents = False
+        self.PackageStoreFolder = ''
 
     def page(self):
         merge_functions = mm.tool('tmg.input_output.merge_functions')
@@ -127,6 +243,18 @@ class ImportNetworkPackage(m.Tool()):
 
         pb.add_text_box(tool_attribute_name='ScenarioDescription', size=60, title="Scenario description")
 
+        pb.add_checkbox(
+            tool_attribute_name='SkipUnchangedComponents', label="Skip unchanged components?",
+            note="Only for packages exported to a package store. If the scenario exists, was last imported from a "
+                 "package sharing its network components and has not been modified since, the unchanged network "
+                 "components are skipped. Attributes and results are always re-imported."
+        )
+
+        pb.add_select_file(
+            tool_attribute_name='PackageStoreFolder', window_type='directory', title="(Optional) Package store",
+            note="Only needed if the package store has moved since the package was exported."
+        )
+
         pb.add_checkbox(
             tool_attribute_name='SkipMergingFunctions', label="Skip the merging of functions?",
             note="Set as TRUE to unchange the functional definitions in current Emmebank."
@@ -391,12 +519,15 @@ class ImportNetworkPackage(m.Tool()):
 
         self.tool_run_msg = m.PageBuilder.format_info("Done. Scenario %s created." % self.ScenarioId)
 
-    def __call__(self, NetworkPackageFile, ScenarioId, ConflictOption, AddFunction = True, ScenarioName = " "):
+    def __call__(self, NetworkPackageFile, ScenarioId, ConflictOption, AddFunction = True, ScenarioName = " ",
+                 SkipUnchangedComponents=False, PackageStoreFolder=None):
         self.NetworkPackageFile = NetworkPackageFile
         self.ScenarioId = ScenarioId
         self.OverwriteScenarioFlag = True
         self.ConflictOption = ConflictOption
         self.AddFunction = AddFunction
+        self.SkipUnchangedComponents = SkipUnchangedComponents
+        self.PackageStoreFolder = PackageStoreFolder
 
         if ScenarioName == " ":
             self.ScenarioDescription = ""
@@ -426,43 +557,143 @@ class ImportNetworkPackage(m.Tool()):
 
             self._components.reset()  # Clear any held-over contents from previous run
 
-            with _zipfile.ZipFile(self.NetworkPackageFile) as zf, self._temp_file() as temp_folder:
+            registry = _store.ImportRegistry(emmebank)
+            with _zipfile.ZipFile(self.NetworkPackageFile) as package, self._temp_file() as temp_folder:
+                zf = _store.open_package(package, self.NetworkPackageFile, self.PackageStoreFolder)
                 self._check_network_package(zf)  # Check the file format.
 
-                if emmebank.scenario(self.ScenarioId) is not None:
-                    if not self.OverwriteScenarioFlag:
-                        raise IOError("Scenario %s already exists." % self.ScenarioId)
-                    sc = emmebank.scenario(self.ScenarioId)
-                    if sc.modify_protected or sc.delete_protected:
-                        raise IOError("Scenario %s is protected against modifications" % self.ScenarioId)
-                    emmebank.delete_scenario(self.ScenarioId)
-                scenario = emmebank.create_scenario(self.ScenarioId)
-                scenario.title = self.ScenarioDescription
-
-                m.logbook_write("Created new scenario %s" % self.ScenarioId)
-                self.TRACKER.completeTask()
-
-                self._batchin_modes(scenario, temp_folder, zf)
-                self._batchin_vehicles(scenario, temp_folder, zf)
-                self._batchin_base(scenario, temp_folder, zf)
-                self._batchin_link_shapes(scenario, temp_folder, zf)
-                self._batchin_lines(scenario, temp_folder, zf)
-                self._batchin_turns(scenario, temp_folder, zf)
-                self._batchin_network_fields(scenario, temp_folder, zf)
-
-                if self._components.traffic_results_files is not None:
-                    self._batchin_traffic_results(scenario, temp_folder, zf)
-
-                if self._components.transit_results_files is not None:
-                    self._batchin_transit_results(scenario, temp_folder, zf)
-
-                if self._components.attribute_header_file is not None:
-                    self._batchin_extra_attributes(scenario, temp_folder, zf)
-                self.TRACKER.completeTask()
-
-                if self._components.functions_file is not None and not self.SkipMergingFunctions:
-                    self._batchin_functions(temp_folder, zf)
-                self.TRACKER.completeTask()
+                unchanged, signature = self._get_unchanged_components(zf, registry)
+                registry.forget(self.ScenarioId)  # The scenario is about to change
+                with ComponentPrefetcher(zf, temp_folder) as self._prefetcher:
+                    try:
+                        if unchanged is not None:
+                            scenario = self._import_changed_components(zf, temp_folder, unchanged)
+                        else:
+                            scenario = self._import_all_components(zf, temp_folder)
+
+                        if self._components.functions_file is not None and not self.SkipMergingFunctions:
+                            self._batchin_functions(temp_folder, zf)
+                        self.TRACKER.completeTask()
+                    finally:
+                        self._prefetcher = None
+
+                # The record is only read when skipping, so the signature is not computed otherwise. A scenario
+                # re-imported from the same components has the same values, so it keeps the signature verified above.
+                if isinstance(zf, _store.ManifestPackage) and self.SkipUnchangedComponents:
+                    if unchanged is None or unchanged != set(zf.components):
+                        signature = None
+                    registry.record(scenario, dict((name, zf.digest(name)) for name in zf.components), signature)
+
+    def _import_all_components(self, zf, temp_folder):
+        emmebank = mm.emmebank
+        if emmebank.scenario(self.ScenarioId) is not None:
+            if not self.OverwriteScenarioFlag:
+                raise IOError("Scenario %s already exists." % self.ScenarioId)
+            sc = emmebank.scenario(self.ScenarioId)
+            if sc.modify_protected or sc.delete_protected:
+                raise IOError("Scenario %s is protected against modifications" % self.ScenarioId)
+            emmebank.delete_scenario(self.ScenarioId)
+        scenario = emmebank.create_scenario(self.ScenarioId)
+        scenario.title = self.ScenarioDescription
+
+        m.logbook_write("Created new scenario %s" % self.ScenarioId)
+        self.TRACKER.completeTask()
+
+        # Extraction runs ahead of the transactions, in the order they are needed
+        components = self._components
+        for name in [components.mode_file, components.vehicles_file, components.base_file, components.shape_file]:
+            self._prefetcher.fetch(name)
+        self._prefetcher.fetch(components.lines_file, self._get_lines_transform())
+        if components.turns_file in zf.namelist():
+            self._prefetcher.fetch(components.turns_file)
+        if not self.SkipMergingFunctions:
+            self._prefetcher.fetch(components.functions_file)
+
+        self._batchin_modes(scenario, temp_folder, zf)
+        self._batchin_vehicles(scenario, temp_folder, zf)
+        self._batchin_base(scenario, temp_folder, zf)
+        self._batchin_link_shapes(scenario, temp_folder, zf)
+        self._batchin_lines(scenario, temp_folder, zf)
+        self._batchin_turns(scenario, temp_folder, zf)
+        self._batchin_network_fields(scenario, temp_folder, zf)
+
+        if self._components.traffic_results_files is not None:
+            self._batchin_traffic_results(scenario, temp_folder, zf)
+
+        if self._components.transit_results_files is not None:
+            self._batchin_transit_results(scenario, temp_folder, zf)
+
+        if self._components.attribute_header_file is not None:
+            self._batchin_extra_attributes(scenario, temp_folder, zf)
+        self.TRACKER.completeTask()
+        return scenario
+
+    def _get_unchanged_components(self, zf, registry):
+        """For a content-addressed package, returns the set of components unchanged since the last import into the
+        target scenario, if only re-applicable components changed and the scenario was not modified since that import.
+        Otherwise the set is None (a full import is needed). Also returns the scenario signature which was verified,
+        or None."""
+        if not (isinstance(zf, _store.ManifestPackage) and self.SkipUnchangedComponents and self.OverwriteScenarioFlag):
+            return None, None
+        scenario = mm.emmebank.scenario(self.ScenarioId)
+        if scenario is None or scenario.modify_protected:
+            return None, None
+        previous, signature = registry.verify(scenario)
+        if previous is None or set(previous) != set(zf.components):
+            return None, None
+        unchanged = set(name for name in zf.components if previous[name] == zf.digest(name))
+        for name in zf.components:
+            if name not in unchanged and not self._is_reapplicable(name):
+                return None, None
+        return unchanged, signature
+
+    @staticmethod
+    def _is_reapplicable(name):
+        return name in _REAPPLICABLE_COMPONENTS or (name.startswith('exatt_') and name.endswith('.241'))
+
+    @staticmethod
+    def _is_always_applied(name):
+        return name.endswith('_results.csv') or name.startswith('exat')
+
+    def _import_changed_components(self, zf, temp_folder, unchanged):
+        """Updates the existing scenario with the re-applicable components which changed since its last import."""
+        scenario = mm.emmebank.scenario(self.ScenarioId)
+        scenario.title = self.ScenarioDescription
+        skipped = [name for name in sorted(unchanged) if not self._is_always_applied(name)]
+        m.logbook_write("Scenario %s shares its network with the package. Skipped unchanged components: %s"
+                        % (self.ScenarioId, ', '.join(skipped)))
+        self.TRACKER.completeTask()
+
+        # Modes, vehicles, base network, link shapes and turns are unchanged
+        for i in range(5):
+            self.TRACKER.completeTask()
+
+        lines_changed = self._components.lines_file is not None and self._components.lines_file not in unchanged
+        if lines_changed:
+            self._prefetcher.fetch(self._components.lines_file, self._get_lines_transform())
+            # Removing the lines also removes the segment attributes and results, so those are re-applied too
+            self._delete_transit_lines(scenario, temp_folder)
+            self._batchin_lines(scenario, temp_folder, zf)
+
+        # Results and extra attributes are always re-applied, whether or not their components changed
+        if self._components.traffic_results_files is not None:
+            self._batchin_traffic_results(scenario, temp_folder, zf)
+
+        if self._components.transit_results_files is not None:
+            self._batchin_transit_results(scenario, temp_folder, zf)
+
+        if self._components.attribute_header_file is not None:
+            for attribute in scenario.extra_attributes():
+                scenario.delete_extra_attribute(attribute.id)
+            self._batchin_extra_attributes(scenario, temp_folder, zf)
+        self.TRACKER.completeTask()
+        return scenario
+
+    def _delete_transit_lines(self, scenario, temp_folder):
+        init_file = _path.join(temp_folder, 'lines_init.221')
+        with open(init_file, 'w') as writer:
+            writer.write('t lines init')
+        import_lines(transaction_file=init_file, scenario=scenario)
 
     @m.method(return_type=bool)
     def tool_exit_test(self):
@@ -475,25 +706,22 @@ class ImportNetworkPackage(m.Tool()):
 
     @m.logbook_trace("Reading modes")
     def _batchin_modes(self, scenario, temp_folder, zf):
-        fileName = zf.extract(self._components.mode_file, temp_folder)
+        fileName = self._prefetcher.get(self._components.mode_file)
         self.TRACKER.runTool(import_modes, transaction_file=fileName, scenario=scenario)
 
     @m.logbook_trace("Reading vehicles")
     def _batchin_vehicles(self, scenario, temp_folder, zf):
-        zf.extract(self._components.vehicles_file, temp_folder)
-        self.TRACKER.runTool(import_vehicles, transaction_file=_path.join(temp_folder, self._components.vehicles_file),
+        self.TRACKER.runTool(import_vehicles, transaction_file=self._prefetcher.get(self._components.vehicles_file),
                              scenario=scenario)
 
     @m.logbook_trace("Reading base network")
     def _batchin_base(self, scenario, temp_folder, zf):
-        zf.extract(self._components.base_file, temp_folder)
-        self.TRACKER.runTool(import_base, transaction_file=_path.join(temp_folder, self._components.base_file),
+        self.TRACKER.runTool(import_base, transaction_file=self._prefetcher.get(self._components.base_file),
                                 scenario=scenario)
 
     @m.logbook_trace("Reading link shapes")
     def _batchin_link_shapes(self, scenario, temp_folder, zf):
-        zf.extract(self._components.shape_file, temp_folder)
-        self.TRACKER.runTool(import_link_shape, transaction_file=_path.join(temp_folder, self._components.shape_file),
+        self.TRACKER.runTool(import_link_shape, transaction_file=self._prefetcher.get(self._components.shape_file),
                              scenario=scenario)
 
     @m.logbook_trace("Reading transit lines")
@@ -501,17 +729,13 @@ class ImportNetworkPackage(m.Tool()):
         # Check to see if there are any transit vehicles before loading the transit lines otherwise it will crash
         partial_network = scenario.get_partial_network(['TRANSIT_VEHICLE'], False)
         if partial_network.transit_vehicles().__length_hint__() > 0:
-            zf.extract(self._components.lines_file, temp_folder)
-            if self.transit_file_change is True:
-                self._transit_line_file_update(temp_folder)
-            self.TRACKER.runTool(import_lines, transaction_file=_path.join(temp_folder, self._components.lines_file),
-                                 scenario=scenario)
+            lines_file = self._prefetcher.get(self._components.lines_file, self._get_lines_transform())
+            self.TRACKER.runTool(import_lines, transaction_file=lines_file, scenario=scenario)
 
     @m.logbook_trace("Reading turns")
     def _batchin_turns(self, scenario, temp_folder, zf):
         if self._components.turns_file is not None and (self._components.turns_file in zf.namelist()):
-            zf.extract(self._components.turns_file, temp_folder)
-            self.TRACKER.runTool(import_turns, transaction_file=_path.join(temp_folder, self._components.turns_file),
+            self.TRACKER.runTool(import_turns, transaction_file=self._prefetcher.get(self._components.turns_file),
                                  scenario=scenario)
 
     @m.logbook_trace("Reading Network Fields")
@@ -549,22 +773,58 @@ class ImportNetworkPackage(m.Tool()):
                 filename = "exatt_%ss.241" % t.lower()
             newfilename = self._getZipOriginalString(processed, contents, filename)
             if newfilename is not None:
-                try:
-                    import_attributes(
-                        file_path=_path.join(temp_folder, zf.extract(newfilename, temp_folder)), field_separator=",",
-                        scenario=scenario
-                    )
-                except:
-                    import_attributes(
-                        file_path=_path.join(temp_folder, zf.extract(newfilename, temp_folder)), field_separator=" ",
-                        scenario=scenario
-                    )
+                if not self._import_attribute_table(scenario, t, zf, newfilename):
+                    try:
+                        import_attributes(
+                            file_path=_path.join(temp_folder, zf.extract(newfilename, temp_folder)),
+                            field_separator=",", scenario=scenario
+                        )
+                    except:
+                        import_attributes(
+                            file_path=_path.join(temp_folder, zf.extract(newfilename, temp_folder)),
+                            field_separator=" ", scenario=scenario
+                        )
                 self.TRACKER.completeSubtask()
 
+    def _import_attribute_table(self, scenario, domain, zf, filename, attribute_names=None):
+        """Reads an attribute or result table straight from the package and applies it with set_attribute_values.
+
+        Args:
+            attribute_names: The attributes to set, in column order. Defaults to the names in the table's header.
+
+        Returns:
+            False if the table couldn't be read or refers to elements not in the scenario. Nothing is changed then.
+        """
+        with zf.open(filename) as raw:
+            table = read_attribute_table(io.TextIOWrapper(raw), domain)
+        if table is None:
+            return False
+        names, keys, values = table
+        if attribute_names is not None:
+            if len(attribute_names) > len(names):
+                return False
+            names = list(attribute_names)
+
+        package = scenario.get_attribute_values(domain, names)
+        index_keys, positions = _partial.flattenIndex(domain, package[0])
+        lookup = dict(six.moves.zip(index_keys, positions.tolist()))
+        try:
+            rows = np.array([lookup[key] for key in keys], dtype=np.int64)
+        except KeyError:
+            return False
+
+        tables = []
+        for column, current in enumerate(package[1:]):
+            data = np.array(current, dtype=np.float64)
+            if len(rows) > 0:
+                data[rows] = values[:, column]
+            tables.append(data)
+        scenario.set_attribute_values(domain, names, [package[0]] + tables)
+        return True
+
     @m.logbook_trace("Reading functions")
     def _batchin_functions(self, temp_folder, zf):
-        zf.extract(self._components.functions_file, temp_folder)
-        extracted_function_file_name = _path.join(temp_folder, self._components.functions_file)
+        extracted_function_file_name = self._prefetcher.get(self._components.functions_file)
 
         if self.ConflictOption == 'OVERWRITE':
             # Replicate Overwrite here so that consoles won't crash with references to a GUI
@@ -636,84 +896,52 @@ class ImportNetworkPackage(m.Tool()):
         scenario.has_traffic_results = True
 
         links_filename, turns_filename = self._components.traffic_results_files
-        zf.extract(links_filename, temp_folder)
-        zf.extract(turns_filename, temp_folder)
-
-        links_filepath = _path.join(temp_folder, links_filename)
-        turns_filepath = _path.join(temp_folder, turns_filename)
-
-        attribute_names = 'auto_volume', 'additional_volume', 'auto_time'
-
-        index, _ = scenario.get_attribute_values('LINK', ['data1'])
-        tables = []
-        with _util.tempExtraAttributeMANAGER(scenario, 'LINK', returnId=True) as temp_attribute:
-            column_labels = {0: 'i_node', 1: 'j_node'}
-            for i, attribute_name in enumerate(attribute_names):
-                column_labels[i + 2] = temp_attribute
-                import_attributes(links_filepath, ',', column_labels, scenario=scenario)
-                del column_labels[i + 2]
-
-                _, table = scenario.get_attribute_values('LINK', [temp_attribute])
-                tables.append(table)
-        scenario.set_attribute_values('LINK', attribute_names, [index] + tables)
-
-        index, _ = scenario.get_attribute_values('TURN', ['data1'])
+        attribute_names = ['auto_volume', 'additional_volume', 'auto_time']
+
+        if not self._import_attribute_table(scenario, 'LINK', zf, links_filename, attribute_names):
+            links_filepath = _path.join(temp_folder, zf.extract(links_filename, temp_folder))
+            self._import_results_with_tool(scenario, 'LINK', links_filepath, ['i_node', 'j_node'], attribute_names)
+        if not self._import_attribute_table(scenario, 'TURN', zf, turns_filename, attribute_names):
+            turns_filepath = _path.join(temp_folder, zf.extract(turns_filename, temp_folder))
+            self._import_results_with_tool(scenario, 'TURN', turns_filepath, ['i_node', 'j_node', 'k_node'],
+                                           attribute_names)
+
+    def _import_results_with_tool(self, scenario, domain, filepath, index_labels, attribute_names):
+        # Emme's import tool, one column at a time through a temporary attribute
+        index, _ = scenario.get_attribute_values(domain, ['data1'])
         tables = []
-        with _util.tempExtraAttributeMANAGER(scenario, 'TURN', returnId=True) as temp_attribute:
-            column_labels = {0: 'i_node', 1: 'j_node', 2: 'k_node'}
+        with _util.tempExtraAttributeMANAGER(scenario, domain, returnId=True) as temp_attribute:
+            column_labels = dict(enumerate(index_labels))
             for i, attribute_name in enumerate(attribute_names):
-                column_labels[i + 3] = temp_attribute
-                import_attributes(turns_filepath, ',', column_labels, scenario=scenario)
-                del column_labels[i + 3]
+                column_labels[i + len(index_labels)] = temp_attribute
+                import_attributes(filepath, ',', column_labels, scenario=scenario)
+                del column_labels[i + len(index_labels)]
 
-                _, table = scenario.get_attribute_values('TURN', [temp_attribute])
+                _, table = scenario.get_attribute_values(domain, [temp_attribute])
                 tables.append(table)
-        scenario.set_attribute_values('TURN', attribute_names, [index] + tables)
+        scenario.set_attribute_values(domain, attribute_names, [index] + tables)
 
     @m.logbook_trace("Importing transit results")
     def _batchin_transit_results(self, scenario, temp_folder, zf):
         scenario.has_transit_results = True
 
         segments_filename = self._components.transit_results_files
-        zf.extract(segments_filename, temp_folder)
-        segments_filepath = _path.join(temp_folder, segments_filename)
-
         attribute_names = ['transit_boardings', 'transit_time', 'transit_volume']
-        index, _ = scenario.get_attribute_values('TRANSIT_SEGMENT', ['data1'])
-        tables = []
-        with _util.tempExtraAttributeMANAGER(scenario, 'TRANSIT_SEGMENT', returnId=True) as temp_attribute:
-            column_labels= {0: 'line', 1: 'i_node', 2: 'j_node', 3: 'loop_idx'}
-            for i, attribute_name in enumerate(attribute_names):
-                column_labels[i + 4] = temp_attribute
-                import_attributes(segments_filepath, ',', column_labels, scenario=scenario)
-                del column_labels[i + 4]
-
-                _, table = scenario.get_attribute_values('TRANSIT_SEGMENT', [temp_attribute])
-                tables.append(table)
-        scenario.set_attribute_values('TRANSIT_SEGMENT', attribute_names, [index] + tables)
+        if not self._import_attribute_table(scenario, 'TRANSIT_SEGMENT', zf, segments_filename, attribute_names):
+            segments_filepath = _path.join(temp_folder, zf.extract(segments_filename, temp_folder))
+            self._import_results_with_tool(scenario, 'TRANSIT_SEGMENT', segments_filepath,
+                                           ['line', 'i_node', 'j_node', 'loop_idx'], attribute_names)
 
         # Technically, a file generated by 'export_network_package.py' should already have this file so long as there
         # are transit results. However, some older versions of the tool do NOT have this feature, but can actually have
         # transit results. So this conditional exists for backwards-compatibility.
         if self._components.aux_transit_results_file is not None:
             aux_transit_filename = self._components.aux_transit_results_file
-            zf.extract(aux_transit_filename,temp_folder)
-            aux_transit_filepath = _path.join(temp_folder, aux_transit_filename)
-
             aux_attribute_names = ['aux_transit_volume']
-            index, _ = scenario.get_attribute_values('LINK', ['data1'])
-
-            tables = []
-            with _util.tempExtraAttributeMANAGER(scenario, 'LINK', returnId=True) as temp_attribute:
-                column_labels = {0:  'i_node', 1: 'j_node'}
-                for i, attribute_name in enumerate(aux_attribute_names):
-                    column_labels[i + 2] = temp_attribute
-                    import_attributes(aux_transit_filepath, ',', column_labels, scenario=scenario)
-                    del column_labels[i + 2]
-
-                    _, table = scenario.get_attribute_values('LINK', [temp_attribute])
-                    tables.append(table)
-            scenario.set_attribute_values('LINK', aux_attribute_names, [index] + tables)
+            if not self._import_attribute_table(scenario, 'LINK', zf, aux_transit_filename, aux_attribute_names):
+                aux_transit_filepath = _path.join(temp_folder, zf.extract(aux_transit_filename, temp_folder))
+                self._import_results_with_tool(scenario, 'LINK', aux_transit_filepath, ['i_node', 'j_node'],
+                                               aux_attribute_names)
 
     @contextmanager
     def _temp_file(self):
@@ -789,9 +1017,9 @@ class ImportNetworkPackage(m.Tool()):
         return 1.0
 
     def _load_extra_attributes(self, zf, temp_folder, scenario):
-        zf.extract(self._components.attribute_header_file, temp_folder)
         types = set()
-        with open(_path.join(temp_folder, self._components.attribute_header_file)) as reader:
+        with zf.open(self._components.attribute_header_file) as raw:
+            reader = io.TextIOWrapper(raw)
             reader.readline()  # toss first line
             for line in reader.readlines():
                 cells = line.split(',', 3)
@@ -802,108 +1030,107 @@ class ImportNetworkPackage(m.Tool()):
                     types.add(att.type)
         return types
 
-    def _transit_line_file_update(self, temp_folder):
-        lines = []
-        with open(_path.join(temp_folder, self._components.lines_file),"r") as infile, open(_path.join(temp_folder, 'temp.221'),"w") as outfile:
-            for line in infile:
-                line_length = len(line)
-                if line_length < 3:
-                    continue
-                if line[0] == 'c':
-                    outfile.write(line.replace("'",""))
-                elif line[0] == 'a':
-                    # Load Line Name, Skip the initial comma to get the name
-                    pos = 1
-                    has_quote = False
-                    if line[pos] == '\'':
-                        pos = 2
-                        has_quote = True
-
-                    # Find the end of the line's name
-                    line_name = None
-                    if has_quote:
-                        end_pos = line.find("'", 2)
-                        if end_pos < 0:
-                            raise IOError("Incorrect transit line file format: Line Mod Veh Headwy Speed Description Data1 Data2 Data3")
-                        line_name = line[pos:end_pos]
-                        pos = end_pos + 1
-                    else:
-                        while pos < line_length:
-                            pos += 1
-                            if line[pos] == '\'':
-                                line_name = line[2:pos]
-                                break
-                        if line_name is None:
-                            raise IOError("Incorrect transit line file format: Line Mod Veh Headwy Speed Description Data1 Data2 Data3")
-
-                    # Find the start of the description and store the inner portion the way it is
-                    start = pos
-                    whitespace_state = True
-                    inner_text = None
-                    count = 0
+    def _get_lines_transform(self):
+        return self._transit_line_file_update if self.transit_file_change is True else None
+
+    def _transit_line_file_update(self, infile, outfile):
+        """Rewrites the transit line file (read from infile) in a format that all versions of EMME can read."""
+        for line in infile:
+            line_length = len(line)
+            if line_length < 3:
+                continue
+            if line[0] == 'c':
+                outfile.write(line.replace("'",""))
+            elif line[0] == 'a':
+                # Load Line Name, Skip the initial comma to get the name
+                pos = 1
+                has_quote = False
+                if line[pos] == '\'':
+                    pos = 2
+                    has_quote = True
+
+                # Find the end of the line's name
+                line_name = None
+                if has_quote:
+                    end_pos = line.find("'", 2)
+                    if end_pos < 0:
+                        raise IOError("Incorrect transit line file format: Line Mod Veh Headwy Speed Description Data1 Data2 Data3")
+                    line_name = line[pos:end_pos]
+                    pos = end_pos + 1
+                else:
                     while pos < line_length:
-                        if whitespace_state:
-                            if line[pos] != ' ':
-                                count += 1
-                                whitespace_state = False
-                                # If we found the first character of the description (might be a quote)
-                                if count >= 5:
-                                    inner_text = line[start:pos]
-                                    break
-                        else:
-                            if line[pos] == ' ' or line[pos] == "'":
-                                whitespace_state = True
                         pos += 1
-
-                    if inner_text is None:
+                        if line[pos] == '\'':
+                            line_name = line[2:pos]
+                            break
+                    if line_name is None:
                         raise IOError("Incorrect transit line file format: Line Mod Veh Headwy Speed Description Data1 Data2 Data3")
 
-                    # Parse the description string
-                    description = None
-                    if line[pos] == '\'':
-                        # Just find the next ' for the end of the description
-                        end = line.find("'", pos + 1)
-                        if end < 0:
-                            raise IOError("Incorrect transit line file format: Line Mod Veh Headwy Speed Description Data1 Data2 Data3")
-                        description = line[pos + 1:end]
-                        pos = end + 1
-                    else:
-                        # Then the description is the next 20 characters, replacing quotes with `
-                        description = line[pos:pos + 20].replace("'","`")
-                        pos += 21 # 19 for the end of description + 1 for ' and + 1 for the start of the next entry
-
-                    # Skip until we find the start of the next non-whitespace
-                    while pos < line_length:
+                # Find the start of the description and store the inner portion the way it is
+                start = pos
+                whitespace_state = True
+                inner_text = None
+                count = 0
+                while pos < line_length:
+                    if whitespace_state:
                         if line[pos] != ' ':
+                            count += 1
+                            whitespace_state = False
+                            # If we found the first character of the description (might be a quote)
+                            if count >= 5:
+                                inner_text = line[start:pos]
+                                break
+                    else:
+                        if line[pos] == ' ' or line[pos] == "'":
+                            whitespace_state = True
+                    pos += 1
+
+                if inner_text is None:
+                    raise IOError("Incorrect transit line file format: Line Mod Veh Headwy Speed Description Data1 Data2 Data3")
+
+                # Parse the description string
+                description = None
+                if line[pos] == '\'':
+                    # Just find the next ' for the end of the description
+                    end = line.find("'", pos + 1)
+                    if end < 0:
+                        raise IOError("Incorrect transit line file format: Line Mod Veh Headwy Speed Description Data1 Data2 Data3")
+                    description = line[pos + 1:end]
+                    pos = end + 1
+                else:
+                    # Then the description is the next 20 characters, replacing quotes with `
+                    description = line[pos:pos + 20].replace("'","`")
+                    pos += 21 # 19 for the end of description + 1 for ' and + 1 for the start of the next entry
+
+                # Skip until we find the start of the next non-whitespace
+                while pos < line_length:
+                    if line[pos] != ' ':
+                        break
+                    pos += 1
+
+                # Write out the final formatted string in a format that all versions of EMME can read
+                outfile.write('a\'{0}\' {1} \'{2}\' {3}\n'.format(line_name.ljust(6, ' '), inner_text, description.ljust(20, ' '),  line[pos:line_length - 1]))
+            else:
+                # try to parse out the individual segments
+                # j-node, dwell time, ttf, us1, us2, us3 (and ignore the rest)
+                column_count = 0
+                last_whitespace = False
+                pos = 0
+                while pos < line_length:
+                    if not last_whitespace and line[pos] == ' ':
+                        last_whitespace = True
+                        column_count += 1
+                        if column_count == 7:
                             break
-                        pos += 1
+                    elif line[pos] != ' ':
+                        last_whitespace = False
+                    pos += 1
 
-                    # Write out the final formatted string in a format that all versions of EMME can read
-                    outfile.write('a\'{0}\' {1} \'{2}\' {3}\n'.format(line_name.ljust(6, ' '), inner_text, description.ljust(20, ' '),  line[pos:line_length - 1]))
+                if column_count == 7:
+                    # then there is some extra data so we need to clip it out
+                    outfile.write(line[0:pos])
                 else:
-                    # try to parse out the individual segments
-                    # j-node, dwell time, ttf, us1, us2, us3 (and ignore the rest)
-                    column_count = 0
-                    last_whitespace = False
-                    pos = 0
-                    while pos < line_length:
-                        if not last_whitespace and line[pos] == ' ':
-                            last_whitespace = True
-                            column_count += 1
-                            if column_count == 7:
-                                break
-                        elif line[pos] != ' ':
-                            last_whitespace = False
-                        pos += 1
-
-                    if column_count == 7:
-                        # then there is some extra data so we need to clip it out
-                        outfile.write(line[0:pos])
-                    else:
-                        outfile.write(line)
-        outfile.close()
-        os.remove(_path.join(temp_folder, self._components.lines_file))
-        os.renames(_path.join(temp_folder, 'temp.221'),_path.join(temp_folder, self._components.lines_file))
+                    outfile.write(line)
         return None
 
     #@m.method(return_type=m.TupleType)
@@ -999,7 +1226,9 @@ class ImportNetworkPackage(m.Tool()):
             "ScenarioDescription": self.ScenarioDescription,
             "SkipMergingFunctions": bool(self.SkipMergingFunctions),
             "ConflictOption": self.ConflictOption,
-            "OverwriteScenarioFlag": bool(self.OverwriteScenarioFlag)
+            "OverwriteScenarioFlag": bool(self.OverwriteScenarioFlag),
+            "SkipUnchangedComponents": bool(self.SkipUnchangedComponents),
+            "PackageStoreFolder": self.PackageStoreFolder
         }
         return json.dumps(snapshot)
 
@@ -1012,6 +1241,8 @@ class ImportNetworkPackage(m.Tool()):
         self.SkipMergingFunctions = bool(snapshot["SkipMergingFunctions"])
         self.ConflictOption = snapshot["ConflictOption"]
         self.OverwriteScenarioFlag = bool(snapshot["OverwriteScenarioFlag"])
+        self.SkipUnchangedComponents = bool(snapshot.get("SkipUnchangedComponents", False))
+        self.PackageStoreFolder = snapshot.get("PackageStoreFolder", '')
 
     def __getitem__(self, key):
         value = getattr(self, key)
@@ -1027,7 +1258,9 @@ class ImportNetworkPackage(m.Tool()):
             "ScenarioDescription": self.ScenarioDescription,
             "SkipMergingFunctions": bool(self.SkipMergingFunctions),
             "ConflictOption": self.ConflictOption,
-            "OverwriteScenarioFlag": bool(self.OverwriteScenarioFlag)
+            "OverwriteScenarioFlag": bool(self.OverwriteScenarioFlag),
+            "SkipUnchangedComponents": bool(self.SkipUnchangedComponents),
+            "PackageStoreFolder": self.PackageStoreFolder
         }
         return state
 
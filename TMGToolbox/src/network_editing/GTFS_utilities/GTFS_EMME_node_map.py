@@ -37,7 +37,7 @@ _util.initalizeModellerTypes(_m)
 import re
 
 class GTFStoEmmeMap(_m.Tool()):
-    version = '0.0.2'
+    version = '0.0.3'
     tool_run_msg = ""
     number_of_tasks = 1 
 
@@ -238,10 +238,10 @@ class GTFStoEmmeMap(_m.Tool()):
 
     def _FindNearest(self, extents, convertedStops, nodes):
         map = []
-        spatialIndex = _spindex.GridIndex(extents, 1000, 1000)
         network = _MODELLER.scenario.get_network()
-        for node in network.regular_nodes():
-            spatialIndex.insertPoint(node)
+        regularNodes = list(network.regular_nodes())
+        spatialIndex = _spindex.GridIndex.fromFeatureCount(extents, len(regularNodes))
+        spatialIndex.insertNodes(regularNodes)
         for stop in convertedStops:
             nearestNode = spatialIndex.nearestToPoint(convertedStops[stop][0], convertedStops[stop][1])
             if nearestNode[0] == "Nothing Found":
@@ -20,6 +20,7 @@
 import inro.modeller as _m
 import traceback as _traceback
 _util = _m.Modeller().module('tmg.common.utilities')
+_transform = _m.Modeller().module('tmg.common.network_transform')
 # import six library for python2 to python3 conversion
 import six 
 # initalize python3 types
@@ -54,25 +55,8 @@ class MoveNetowrks(_m.Tool()):
             with _m.logbook_trace(name="Move Networks",
                                      attributes=self._getAtts()):
                 
-                calculator = None
-                try:
-                    calculator = _m.Modeller().tool("inro.emme.network_calculation.network_calculator")
-                except Exception as e:
-                    calculator = _m.Modeller().tool("inro.emme.standard.network_calculation.network_calculator")
-                
-                spec = {
-                        "result": "yi",
-                        "expression": "yi + 4000000",
-                        "aggregation": None,
-                        "selections": {
-                                       "node": "all"
-                                       },
-                        "type": "NETWORK_CALCULATION"
-                        }
-                
-                for scenario in self.Scenarios:
-                    _m.logbook_write("Changing scenario %s" %scenario.id)
-                    calculator(spec, scenario=scenario)
+                transform = _transform.AffineTransform.translation(0.0, 4000000.0)
+                _transform.transformScenarios(self.Scenarios, transform)
                 
                 self.tool_run_msg = _m.PageBuilder.format_info("Tool complete.")
            
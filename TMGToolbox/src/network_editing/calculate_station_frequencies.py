@@ -22,6 +22,7 @@ import traceback as _traceback
 _MODELLER = _m.Modeller()
 _util = _MODELLER.module('tmg.common.utilities')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
+_partial = _MODELLER.module('tmg.common.partial_network')
 # import six library for python2 to python3 conversion
 import six 
 # initalize python3 types
@@ -84,7 +85,9 @@ class CalculateStationFrequency(_m.Tool()):
         if (Scenario is None):
             raise Exception("Could not find scenario %s" %ScenarioId)
         
-        Network = Scenario.get_network()
+        Network = _partial.PartialNetworkEditor(Scenario, {'NODE': ['@pkcap', '@freq'],
+                                                           'TRANSIT_LINE': ['headway']},
+                                                extraDomains=['LINK', 'TRANSIT_SEGMENT']).network
         
         #---Primary logic
         _i = 0 #Selected lines
@@ -68,10 +68,19 @@ Kucirek-Vaughan Automated Centroid Connector Generator (CCGen)
         loading properly after a run. Also fixed a bug where the tool would crash if
         no zones were selected to be connected.  
     
+    1.0.2 Added the missing math, numpy and itertools imports used by the utility
+        terms, and fixed the radial distribution term for Python 3.
+    
+    1.0.3 The boundary and feasible node grids are sized from their feature counts,
+        and filled with bulk insertions.
+    
 '''
 
 import inro.modeller as _m
 import traceback as _traceback
+import math
+import numpy
+from itertools import combinations
 _MODELLER = _m.Modeller()
 _g = _MODELLER.module('tmg.common.geometry')
 _util = _MODELLER.module('tmg.common.utilities')
@@ -92,7 +101,7 @@ def _manhattanDist(x1, y1, x2, y2):
 
 class CCGEN(_m.Tool()):
     
-    version = '1.0.1'
+    version = '1.0.3'
     tool_run_msg = ""
     report_html = ""
     
@@ -536,9 +545,9 @@ class CCGEN(_m.Tool()):
                 boundaries.append(boundary)
             
             extents = minx - 1.0, miny - 1.0, maxx + 1.0, maxy + 1.0
-            spatialIndex = _spindex.GridIndex(extents, 200, 200)
-            for ls in boundaries:
-                spatialIndex.insertLineString(ls)
+            nSegments = sum(len(boundary.coords) - 1 for boundary in boundaries)
+            spatialIndex = _spindex.GridIndex.fromFeatureCount(extents, nSegments)
+            spatialIndex.insertLineStrings(boundaries)
             
             self._Boundaries = spatialIndex
             
@@ -925,13 +934,12 @@ class CCGEN(_m.Tool()):
         if self.SplitLinks:
             minx, miny, maxx, maxy, feasibleNodes = self.add_virtual_nodes(network,attributeId, feasibleNodes,minx,miny,maxx,maxy)
         extents = minx - 1.0, miny - 1.0, maxx + 1.0, maxy + 1.0
-        index = _spindex.GridIndex(extents)
+        index = _spindex.GridIndex.fromFeatureCount(extents, len(feasibleNodes))
         
         for node in feasibleNodes:
             p = _g.Point(node.x, node.y)
             node._geometry = p
-            
-            index.insertPoint(node)
+        index.insertNodes(feasibleNodes)
 
         return index, len(feasibleNodes)
         
@@ -968,13 +976,12 @@ class CCGEN(_m.Tool()):
             minx, miny, maxx, maxy, feasibleNodes = self.add_virtual_nodes(network,attributeId, feasibleNodes,minx,miny,maxx,maxy)
 
         extents = minx - 1.0, miny - 1.0, maxx + 1.0, maxy + 1.0
-        index = _spindex.GridIndex(extents)
+        index = _spindex.GridIndex.fromFeatureCount(extents, len(feasibleNodes))
         
         for node in feasibleNodes:
             p = _g.Point(node.x, node.y)
             node._geometry = p
-            
-            index.insertPoint(node)
+        index.insertNodes(feasibleNodes)
         
         return index, len(feasibleNodes)
 
@@ -1141,7 +1148,7 @@ class CCGEN(_m.Tool()):
         idealAngle = 2 * math.pi / len(configuration)
         
         iter = bearings.__iter__()
-        prevB = iter.next()
+        prevB = next(iter)
         for B in iter:
             a = B - prevB
             if a < 0:
@@ -59,6 +59,8 @@ Copy Zone System V2
     
     1.0.1 Re-factored to use the more general-purpose Spatial Index module
     
+    1.0.2 The node grid for matching by geometry is sized from the number of nodes.
+    
 '''
 
 import inro.modeller as _m
@@ -81,7 +83,7 @@ _util.initalizeModellerTypes(_m)
 
 class CopyZoneSystem2(_m.Tool()):
     
-    version = '1.0.1'
+    version = '1.0.2'
     tool_run_msg = ""
     number_of_tasks = 4 # For progress reporting, enter the integer number of tasks here
     
@@ -459,10 +461,9 @@ class CopyZoneSystem2(_m.Tool()):
     
     def _GetMatchByGeometryLambda(self, targetNetwork):
         extents = _spindex.get_network_extents(targetNetwork)
-        grid = _spindex.GridIndex(extents, marginSize= 1.0)
-        
-        for node in targetNetwork.regular_nodes():
-            grid.insertPoint(node)
+        nodes = list(targetNetwork.regular_nodes())
+        grid = _spindex.GridIndex.fromFeatureCount(extents, len(nodes), marginSize= 1.0)
+        grid.insertNodes(nodes)
         
         def func(connector, flagAtt, uncopiedConnectors):
             zone = connector.i_node
@@ -41,6 +41,9 @@ Line Set Conjoiner
 '''
     0.0.1 Created on 2015-01-29 by mattaustin222
     
+    0.1.0 Trips are chained with a binary search over each line's departure-sorted
+        schedule, instead of scanning and deleting from trip lists.
+    
 '''
 
 import inro.modeller as _m
@@ -48,6 +51,7 @@ import traceback as _traceback
 from contextlib import contextmanager
 import csv
 from operator import itemgetter
+from bisect import bisect_left as _bisect_left
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _netedit = _MODELLER.module('tmg.common.network_editing')
@@ -61,7 +65,7 @@ _util.initalizeModellerTypes(_m)
 
 class LineSetConjoiner(_m.Tool()):
     
-    version = '0.0.1'
+    version = '0.1.0'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
     
@@ -299,6 +303,7 @@ class LineSetConjoiner(_m.Tool()):
             departureCol = cells.index('trip_depart')
             arrivalCol = cells.index('trip_arrive')
 
+            lineSet = set(lineList)
             unchangedSched = {}
             changedSched = {}
 
@@ -310,7 +315,7 @@ class LineSetConjoiner(_m.Tool()):
                 arrival = cells[arrivalCol]                                
                 trip = (self._ParseStringTime(departure), self._ParseStringTime(arrival))
 
-                if id in lineList:
+                if id in lineSet:
                     if id in changedSched:
                         changedSched[id].append(trip)
                     else:
@@ -333,81 +338,64 @@ class LineSetConjoiner(_m.Tool()):
         '''
         This function allows us to chain together acceptable trips.
         These are returned in the modSched dictionary, which is carried forward
-        to the new Service Table. Trips used to make the modSched are removed
-        from changedSched, which is essentially the choice set. removedSched
-        allows easy reporting later of those trips not chosen for use.
-        In one type of case (an unsuccessful attempt to create a modified trip,
-        followed by no more successful trips in that lineset), skipped trips
-        cannot be added to removedSched. Therefore, the full list of trips
+        to the new Service Table. Each trip of the first line in a set is chained
+        to the first departure of the next line at or after its arrival (found by
+        binary search over the departure-sorted schedule), if that departure is
+        within the buffer. The chosen trip and any earlier trips skipped over are
+        consumed; since they always form the start of the line's schedule, the
+        consumed trips of each line are tracked by the position of its first
+        unconsumed trip. removedSched allows easy reporting later of skipped trips
+        and of first-line trips which could not be chained. The full list of trips
         not utilized in the modified schedule is the combination of removedSched
-        and changedSched.
+        and the returned leftover trips.
         '''
         with _m.logbook_trace("Attempting to modify schedule and concatenate lines"):
             modSched = {}
             removedSched = {}
+            departures = dict((id, [trip[0] for trip in tripList]) for id, tripList in six.iteritems(changedSched))
+            firstUnused = dict((id, 0) for id in changedSched)
             for lineSet in lineIds:
                 newId = self._ConcatenateLines(network, lineSet)
                 if not newId:
                     continue # if the concatenation fails, skip schedule modification for that line set
                 modSched[newId] = []
-                for tripNum, trips in enumerate(changedSched[lineSet[0]]):#loop through trips of first line        
-                    for num, line in enumerate(lineSet):
-                        if num == 0:
-                            currentArrival = trips[1] #set first arrival to check
-                        elif num == (len(lineSet) - 1):
-                            # when we get to the final line in the set, set new trip in the modded schedule
-                            # that corresponds to the departure of the first line and the final value
-                            # for arrival (ie. the last line's arrival time)
-                            modSched[newId].append((trips[0], newArrival))
-                            break 
-                        nextLine = lineSet[num + 1]
-                        check = self._CheckSched(currentArrival, changedSched[nextLine])
-                        if check:
-                            newArrival = check
-                            # looping through trips in the next line
-                            # removes the trip with the newArrival
-                            # and removes all trips up to that
-                            toDelete = []
-                            for items in changedSched[nextLine]:
-                                if items[1] == newArrival:
-                                    toDelete.append(items)
-                                    break
-                                else:
-                                    # keep track of all ignored trips
-                                    if nextLine in removedSched:
-                                        removedSched[nextLine].append(items)
-                                    else:
-                                        removedSched[nextLine] = [items]
-                                    toDelete.append(items)
-                            for m in toDelete:
-                                # remove ignored and chosen trips from choice set
-                                changedSched[nextLine].remove(m)
-                            currentArrival = newArrival # move the current arrival forward in time
-
-                        else:
+                firstLine = lineSet[0]
+                for trips in changedSched[firstLine][firstUnused[firstLine]:]: #loop through trips of first line
+                    currentArrival = trips[1] #set first arrival to check
+                    for nextLine in lineSet[1:]:
+                        position = self._CheckSched(currentArrival, departures[nextLine], firstUnused[nextLine])
+                        if position is None:
                             _m.logbook_write("In line set %s, departure %s not valid" %(lineSet, self._RevertToString(trips[0])))
                             # keep track of the removed invalid trip
-                            if lineSet[0] in removedSched:
-                                removedSched[lineSet[0]].append(trips)
-                            else:
-                                removedSched[lineSet[0]] = [trips]                            
+                            removedSched.setdefault(firstLine, []).append(trips)
                             break
-                del changedSched[lineSet[0]] #remove trips from choice set
+                        # keep track of all ignored trips, then remove them and the chosen trip from the choice set
+                        skipped = changedSched[nextLine][firstUnused[nextLine]:position]
+                        if skipped:
+                            removedSched.setdefault(nextLine, []).extend(skipped)
+                        firstUnused[nextLine] = position + 1
+                        currentArrival = changedSched[nextLine][position][1] # move the current arrival forward in time
+                    else:
+                        # set new trip in the modded schedule that corresponds to the departure of the
+                        # first line and the final value for arrival (ie. the last line's arrival time)
+                        modSched[newId].append((trips[0], currentArrival))
+                del changedSched[firstLine] #remove trips from choice set
+
+            leftoverSched = dict((id, tripList[firstUnused[id]:]) for id, tripList in six.iteritems(changedSched))
 
-        return modSched, removedSched, changedSched
+        return modSched, removedSched, leftoverSched
             
-    def _CheckSched(self, arrival, sched):
-        newArrival = ''
+    def _CheckSched(self, arrival, departures, start):
+        '''
+        Returns the position in the (sorted) departures of the next line of the first
+        departure at or after the arrival of line n, ignoring the consumed trips before
+        start, or None if there is no such departure within the buffer.
+        '''
         buffer = 60 * self.GlobalBuffer
-        for items in sched: # loop through schedule for next line in set
-            # check if arrival of line n is within buffer for departures of line n+1
-            if 0 <= items[0] - arrival <= buffer:
-                newArrival = items[1] # if successfully finds a departure, sets next arrival to use
-                break
-            elif items[0] - arrival >= buffer:
-                # doesn't cause a failure, but does report the issue in _ModifySched
-                break
-        return newArrival #will return an empty string if it completes the loop or exits due to exceeding buffer
+        position = _bisect_left(departures, arrival, start)
+        if position < len(departures) and departures[position] - arrival <= buffer:
+            return position
+        return None
 
 
     def _WriteNewServiceTable(self, unchangedSched, modSched, sched, leftover):
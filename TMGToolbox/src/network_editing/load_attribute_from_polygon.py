@@ -34,6 +34,9 @@ Load Attribute From Shapefile
     
     1.0.0 Tested and published on 2014-07-04
     
+    1.0.1 The spatial index grid is sized from the number of network elements,
+        instead of a fixed 200 x 200 grid.
+    
 '''
 
 
@@ -94,7 +97,7 @@ def _insertsegment(segment, grid):
 
 class LoadAttributeFromPolygon(_m.Tool()):
     
-    version = '1.0.0'
+    version = '1.0.1'
     tool_run_msg = ""
     number_of_tasks = 5 # For progress reporting, enter the integer number of tasks here
     
@@ -341,7 +344,7 @@ class LoadAttributeFromPolygon(_m.Tool()):
         extents = _spindex.get_network_extents(network)
         print("Determined network extents")
         
-        grid = _spindex.GridIndex(extents, 200, 200)
+        grid = _spindex.GridIndex.fromFeatureCount(extents, len(elements))
         
         self.TRACKER.startProcess(len(elements))
         for element in elements:
@@ -43,6 +43,15 @@ Copy Transit Lines
     
     1.2.1 Fixed sorting of closest nodes.
     
+    1.3.0 Links excluded for each transit mode are found in one pass over the links. Lines
+        are re-routed across a pool of workers, then copied to the target network in
+        one batch.
+    
+    1.3.1 The node grids are sized from the number of nodes, and filled with bulk insertions.
+    
+    1.3.2 Lines are re-routed one at a time by default: routing is pure Python, so more
+        threads do not make it faster. Progress is reported from the main thread only.
+    
 '''
 
 import inro.modeller as _m
@@ -51,6 +60,9 @@ from inro.emme.database.emmebank import Emmebank
 import traceback as _traceback
 from math import pow, sqrt
 from collections import namedtuple
+from multiprocessing.pool import ThreadPool as _ThreadPool
+import threading as _threading
+import numpy as _np
 
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _building = _MODELLER.module('inro.emme.utility.transit_line_build_utilities')
@@ -59,6 +71,7 @@ _util = _MODELLER.module('tmg.common.utilities')
 _geolib = _MODELLER.module('tmg.common.geometry')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
 _spindex = _MODELLER.module('tmg.common.spatial_index')
+_graph = _MODELLER.module('tmg.common.network_graph')
 
 ShapefileWriter = _geolib.Shapely2ESRI
 NullPointerException = _util.NullPointerException
@@ -75,7 +88,7 @@ ItineraryData = namedtuple('ItineraryData', "succeeded path_data skipped_stops e
 
 class CopyTransitLines(_m.Tool()):
     
-    version = '1.2.1'
+    version = '1.3.2'
     tool_run_msg = ""
     number_of_tasks = 2 # For progress reporting, enter the integer number of tasks here
     
@@ -102,6 +115,7 @@ class CopyTransitLines(_m.Tool()):
     MaxTotalSkippedStops = _m.Attribute(int)
     MaxTotalNewNodes = _m.Attribute(int)
     MaxSymmetricDifferece = _m.Attribute(float)
+    NumberOfProcessors = _m.Attribute(int)
     
     ErrorShapefileReport = _m.Attribute(str)
     NodeCorrespondenceReportFile = _m.Attribute(str)
@@ -129,6 +143,7 @@ class CopyTransitLines(_m.Tool()):
         self.MaxTotalSkippedStops = 20
         self.MaxTotalNewNodes = 9999999
         self.MaxSymmetricDifferece = 9999999
+        self.NumberOfProcessors = 1
     
     ##########################################################################################################
     #---
@@ -262,7 +277,11 @@ class CopyTransitLines(_m.Tool()):
                     "The maximum number of new nodes permitted in a line's itinerary"),
                    ('MaxSymmetricDifferece', "Max area of difference", \
                     "The maximum permitted area (in squared coordinate units) of non-\
-                    overlap between the source line shape and the target line shape.")]
+                    overlap between the source line shape and the target line shape."),
+                   ('NumberOfProcessors', "Number of processors", \
+                    "The number of lines to re-route at the same time. Routing is \
+                    pure Python, so more than 1 rarely helps. Lines are re-routed \
+                    one at a time if links are allowed for modification.")]
         
         with pb.add_table(False) as t:
             first = True
@@ -384,6 +403,8 @@ class CopyTransitLines(_m.Tool()):
             raise NullPointerException("Maximum number of total skipped stops not specified.")
         if self.MaxSymmetricDifferece is None:
             raise NullPointerException("Maximum area of symmetric difference not specified.")
+        if self.NumberOfProcessors is None:
+            self.NumberOfProcessors = 1
         
         try:
             self._Execute()
@@ -525,8 +546,8 @@ class CopyTransitLines(_m.Tool()):
                     for lineId in lineIds: targetNetwork.delete_transit_line(lineId)
                     print("Cleared all transit lines in the target scenario")
             
-                pathBuilders = self._GetShortestPathCalculators(targetNetwork)
-                print("Prepared path builders")
+                excludedLinks = self._GetExcludedLinks(targetNetwork)
+                print("Found links excluded for each transit mode")
             
                 vehicleTable = self._LoadVehicleCorrespondenceFile(sourceNetwork, targetNetwork)
                 print("Loaded vehicle correspondence table")
@@ -547,7 +568,7 @@ class CopyTransitLines(_m.Tool()):
                     writer.addField('Err_detail', length= 200)
             
                     errorTable = self._ProcessTransitLines(linesToProcess, targetNetwork, vehicleTable, \
-                                              pathBuilders, writer, self.LinksAllowedForModification, linkModAttrID)
+                                              excludedLinks, writer, self.LinksAllowedForModification, linkModAttrID)
                 
                     print("Done processing lines")
                     print("Encountered %s errors" %len(errorTable))
@@ -627,16 +648,31 @@ class CopyTransitLines(_m.Tool()):
                     resultDictionary[sourceVehicleId] = targetVehicleId
             return resultDictionary
 
-    def _GetShortestPathCalculators(self, network):
-        pathBuilders = {}
-        for transitMode in network.modes():
-            if transitMode.type != 'TRANSIT': continue
-            
-            excludedLinks = [link for link in network.links() if not transitMode in link.modes]
-            pathBuilder = _building.ShortestPath(network, self.TargetLinkCostAttributeId, excludedLinks)
-            
-            pathBuilders[transitMode.id] = pathBuilder
-        return pathBuilders
+    def _GetExcludedLinks(self, network):
+        '''
+        Returns a dictionary of transit mode id : list of the links which do not
+        allow that mode, from the link modes read in one pass.
+        '''
+        transitModeIds = [mode.id for mode in network.modes() if mode.type == 'TRANSIT']
+        links, modeMasks = _graph.getLinkModeMasks(network, transitModeIds)
+        excludedLinks = {}
+        for modeId, mask in six.iteritems(modeMasks):
+            excludedLinks[modeId] = [links[index] for index in _np.flatnonzero(~mask)]
+        return excludedLinks
+    
+    def _GetShortestPathCalculators(self, network, excludedLinks):
+        '''
+        Returns a function of transit mode id : ShortestPath calculator. Calculators
+        are created on first use, separately for each worker thread.
+        '''
+        workerState = _threading.local()
+        def getPathBuilder(modeId):
+            pathBuilders = workerState.__dict__.setdefault('pathBuilders', {})
+            if modeId not in pathBuilders:
+                pathBuilders[modeId] = _building.ShortestPath(network, self.TargetLinkCostAttributeId,
+                                                              excludedLinks[modeId])
+            return pathBuilders[modeId]
+        return getPathBuilder
     
     #---
     #---Network Correspondence
@@ -652,12 +688,14 @@ class CopyTransitLines(_m.Tool()):
 
         #Build spatial indexing objects
         sourceExtents = _spindex.get_network_extents(sourceNetwork)
-        sourceIndex = _spindex.GridIndex(sourceExtents, xSize= 1000, ySize= 1000, marginSize= 1.0)
-        for node in sourceNetwork.regular_nodes(): sourceIndex.insertPoint(node)
+        sourceNodes = list(sourceNetwork.regular_nodes())
+        sourceIndex = _spindex.GridIndex.fromFeatureCount(sourceExtents, len(sourceNodes), marginSize= 1.0)
+        sourceIndex.insertNodes(sourceNodes)
         
         targetExtents = _spindex.get_network_extents(targetNetwork)
-        targetIndex = _spindex.GridIndex(targetExtents, xSize= 1000, ySize= 1000, marginSize= 1.0)
-        for node in targetNetwork.regular_nodes(): targetIndex.insertPoint(node)
+        targetNodes = list(targetNetwork.regular_nodes())
+        targetIndex = _spindex.GridIndex.fromFeatureCount(targetExtents, len(targetNodes), marginSize= 1.0)
+        targetIndex.insertNodes(targetNodes)
         
         print("Built spatial index")
         
@@ -772,7 +810,7 @@ class CopyTransitLines(_m.Tool()):
         msg = "Found %s lines to copy over from the source scenario" %len(linesToProcess)
         return linesToProcess
     
-    def _ProcessTransitLines(self, linesToProcess, targetNetwork, vehicleTable, pathBuilders, shapefileWriter, LinksforMode, linkModAttributeID):
+    def _ProcessTransitLines(self, linesToProcess, targetNetwork, vehicleTable, excludedLinks, shapefileWriter, LinksforMode, linkModAttributeID):
         
         #Setup lambdas for assigning stops to nodes
         if self.TargetNewStopOptionId == '0':
@@ -796,11 +834,6 @@ class CopyTransitLines(_m.Tool()):
         def logError(lineId, errorMsg, errorDetail):
             errorTable.append((lineId, errorMsg, errorDetail))
         
-        def logException(lineId, e):
-            errorMsg = e.__class__.__name__
-            errorDetail = str(e)
-            logError(lineId, errorMsg, errorDetail)
-        
         def logErrorWithGeometry(lineId, geometry, errorMsg, errorDetail):
             logError(lineId, errorMsg, errorDetail)
             geometry['Line_ID'] = lineId
@@ -808,58 +841,97 @@ class CopyTransitLines(_m.Tool()):
             geometry['Err_detail'] = errorDetail
             shapefileWriter.writeNext(geometry)
         
-        self.TRACKER.startProcess(len(linesToProcess))
-        
+        #Find the lines which can be copied, and their target vehicles
+        lineVehicles = []
         for sourceLine in linesToProcess:
-            
-            if targetNetwork.transit_line(sourceLine.id) is not None:
-                if not self.OverwriteLinesFlag:
-                    logException(sourceLine.id, "Line with ID already exists.", "")
-                    continue
-                else:
-                    targetNetwork.delete_transit_line(sourceLine.id)
+            if targetNetwork.transit_line(sourceLine.id) is not None and not self.OverwriteLinesFlag:
+                lineVehicles.append(None)
+                continue
             try:
                 targetVehicle = targetNetwork.transit_vehicle(vehicleTable[sourceLine.vehicle.id])
             except:
                 raise Exception("The vehicle id " + sourceLine.vehicle.id + " was either not found in the translation table or " + 
                                 "the vehicle it was to be transformed to does not exist in the destination network scenario.")
-            pathBuilder = pathBuilders[targetVehicle.mode.id]
-            
-            lineId = sourceLine.id
-            
-            #Try to construct the line's itinerary in the target network
-            try:
-                itineraryData = self._ConstructTargetItinerary(sourceLine, pathBuilder, targetNetwork, \
-                                                               targetVehicle.mode, LinksforMode, linkModAttributeID)
-                
-                if itineraryData.succeeded == False: #Could not construct a path
-                    logError(lineId, itineraryData.error_msg, itineraryData.error_detail)
-                    self.TRACKER.completeSubtask()
-                    continue
-            except Exception as e: #Some unexpected error
-                logException(lineId, e)
+            lineVehicles.append(targetVehicle)
+        linesToRoute = [(sourceLine, targetVehicle) for sourceLine, targetVehicle
+                        in _util.itersync(linesToProcess, lineVehicles) if targetVehicle is not None]
+        
+        getPathBuilder = self._GetShortestPathCalculators(targetNetwork, excludedLinks)
+        def routeLine(item):
+            sourceLine, targetVehicle = item
+            return self._RouteTransitLine(sourceLine, getPathBuilder(targetVehicle.mode.id), targetNetwork, \
+                                          targetVehicle.mode, LinksforMode, linkModAttributeID)
+        
+        #Lines only read the target network while being re-routed, except when modes can be
+        #added to links (which changes the paths of later lines), so they can be re-routed in parallel
+        self.TRACKER.startProcess(len(linesToRoute))
+        nWorkers = max(1, min(len(linesToRoute), self.NumberOfProcessors))
+        pool = None
+        if nWorkers > 1 and ((LinksforMode is None) or (LinksforMode.isspace())):
+            pool = _ThreadPool(nWorkers)
+        try:
+            results = pool.imap(routeLine, linesToRoute) if pool is not None else six.moves.map(routeLine, linesToRoute)
+            #Progress is only reported from this thread, since the tracker is not thread-safe
+            routes = []
+            for result in results:
+                routes.append(result)
                 self.TRACKER.completeSubtask()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        
+        #Apply the changes to the target network in one batch, in the original line order
+        routes = iter(routes)
+        for sourceLine, targetVehicle in _util.itersync(linesToProcess, lineVehicles):
+            lineId = sourceLine.id
+            if targetVehicle is None:
+                logError(lineId, "Line with ID already exists.", "")
                 continue
+            itineraryData, errorShape, errorMsg, errorDetail = next(routes)
+            if targetNetwork.transit_line(lineId) is not None:
+                targetNetwork.delete_transit_line(lineId)
             
-            #Create the geometry to write to the final shapefile report
-            errorShape = self._BuildTargetLineGeometry(targetNetwork, itineraryData.path_data, True)
-            
-            #Validate the created line itinerary
-            success, errorMsg, errorDetail = self._ValidateItinerary(sourceLine, itineraryData.skipped_stops, \
-                                                                     itineraryData.path_data, targetNetwork)
-            if success == False:
+            if errorShape is not None:
                 logErrorWithGeometry(lineId, errorShape, errorMsg, errorDetail)
-                self.TRACKER.completeSubtask()
-                continue
-            
-            #Copy over the transit line
-            self._CopyTransitLine(sourceLine, itineraryData.path_data, targetNetwork, \
-                                  targetVehicle.id, segmentIsStop, itineraryData.dwt_ttf)
-
-            self.TRACKER.completeSubtask()
+            elif errorMsg is not None:
+                logError(lineId, errorMsg, errorDetail)
+            else:
+                #Copy over the transit line
+                self._CopyTransitLine(sourceLine, itineraryData.path_data, targetNetwork, \
+                                      targetVehicle.id, segmentIsStop, itineraryData.dwt_ttf)
         self.TRACKER.completeTask()
         return errorTable
     
+    def _RouteTransitLine(self, sourceLine, pathBuilder, targetNetwork, targetMode, LinksforMode, linkModAttributeID):
+        '''
+        Constructs and validates the itinerary of a source line in the target network,
+        without copying it.
+        
+        Returns: itineraryData, errorShape, errorMsg, errorDetail. The error message is
+        None if the line can be copied, and the error shape is None if the error has
+        no geometry to report.
+        '''
+        #Try to construct the line's itinerary in the target network
+        try:
+            itineraryData = self._ConstructTargetItinerary(sourceLine, pathBuilder, targetNetwork, \
+                                                           targetMode, LinksforMode, linkModAttributeID)
+            
+            if itineraryData.succeeded == False: #Could not construct a path
+                return itineraryData, None, itineraryData.error_msg, itineraryData.error_detail
+        except Exception as e: #Some unexpected error
+            return None, None, e.__class__.__name__, str(e)
+        
+        #Create the geometry to write to the final shapefile report
+        errorShape = self._BuildTargetLineGeometry(targetNetwork, itineraryData.path_data, True)
+        
+        #Validate the created line itinerary
+        success, errorMsg, errorDetail = self._ValidateItinerary(sourceLine, itineraryData.skipped_stops, \
+                                                                 itineraryData.path_data, targetNetwork)
+        if success == False:
+            return itineraryData, errorShape, errorMsg, errorDetail
+        return itineraryData, None, None, None
+    
     def _ConstructTargetItinerary(self, line, pathBuilder, targetNetwork, targetMode, LinksforMode, linkModAttributeID):
 
         sourceNetwork = line.network
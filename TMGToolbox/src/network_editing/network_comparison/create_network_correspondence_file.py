@@ -38,6 +38,9 @@ Create Network Correspondence File
     
     0.1.2 Added CorrespondenceFileReader class for easy loading in of correspondence file data
     
+    0.1.3 The node grid is sized from the number of nodes. Searching for node twins no
+        longer calls a non-existent GridIndex method or an undefined sqrt function.
+    
 '''
 
 import inro.modeller as _m
@@ -62,7 +65,7 @@ _util.initalizeModellerTypes(_m)
 
 class CreateNetworkCorrespondenceFile(_m.Tool()):
     
-    version = '0.1.2'
+    version = '0.1.3'
     tool_run_msg = ""
     number_of_tasks = 7 # For progress reporting, enter the integer number of tasks here
     
@@ -236,20 +239,18 @@ class CreateNetworkCorrespondenceFile(_m.Tool()):
         secondaryNetwork.create_attribute('NODE', "twin_node", default_value=None)
         
         extents = _spindex.get_network_extents(secondaryNetwork)
-        grid = _spindex.GridIndex(extents, marginSize= 1.0)
-        for node in secondaryNetwork.regular_nodes():
-            grid.insertPoint(node)
+        nodes = list(secondaryNetwork.regular_nodes())
+        grid = _spindex.GridIndex.fromFeatureCount(extents, len(nodes), marginSize= 1.0)
+        grid.insertNodes(nodes)
         
         for primaryNode in primaryNetwork.regular_nodes():
-            twin = grid.getNearestNode(primaryNode.x, primaryNode.y, self.SearchBuffer)
-            
             candidates = grid.queryCircle(primaryNode.x, primaryNode.y, self.SearchBuffer)
             twin = None
             minDistance = float('inf')
             for node in candidates:
                 dx = node.x - primaryNode.x
                 dy = node.y - primaryNode.y
-                d = sqrt(dx * dx + dy * dy)
+                d = _math.sqrt(dx * dx + dy * dy)
                 if d < minDistance:
                     twin = node
                     minDistance = d
@@ -33,6 +33,9 @@ Pro-rate Segment Speeds for Select Lines
 '''
     0.0.1 Created on 2014-01-30 by pkucirek
     
+    0.0.2 Only the link, line and segment attributes used are loaded, and only
+        the segment speeds are written back (instead of publishing the full network).
+    
 '''
 
 import inro.modeller as _m
@@ -41,6 +44,7 @@ from contextlib import contextmanager
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
+_partial = _MODELLER.module('tmg.common.partial_network')
 # import six library for python2 to python3 conversion
 import six 
 # initalize python3 types
@@ -50,7 +54,7 @@ _util.initalizeModellerTypes(_m)
 
 class ProrateSegmentSpeedsByLine(_m.Tool()):
     
-    version = '0.0.1'
+    version = '0.0.2'
     tool_run_msg = ""
     number_of_tasks = 2 # For progress reporting, enter the integer number of tasks here
     
@@ -143,17 +147,19 @@ class ProrateSegmentSpeedsByLine(_m.Tool()):
                     self.TRACKER.runTool(networkCalculationTool, 
                                          self._GetNetCalcSpec(flagAttributeId), self.Scenario)
                 
-                network = self.Scenario.get_network()
-                flaggedLines = [line for line in network.transit_lines() if line[flagAttributeId] == 1]
-                if len(flaggedLines) == 0:
-                    return 0
-                self.TRACKER.startProcess(len(flaggedLines))
-                for line in flaggedLines:
-                    self._ProcessLine(line)
-                    self.TRACKER.completeSubtask()
-                self.TRACKER.completeTask()
-                    
-                self.Scenario.publish_network(network)
+                attributes = {'LINK': ['length', 'data2'],
+                              'TRANSIT_LINE': ['speed', flagAttributeId],
+                              'TRANSIT_SEGMENT': ['data1']}
+                with _partial.editNetworkAttributes(self.Scenario, attributes) as editor:
+                    network = editor.network
+                    flaggedLines = [line for line in network.transit_lines() if line[flagAttributeId] == 1]
+                    if len(flaggedLines) == 0:
+                        return 0
+                    self.TRACKER.startProcess(len(flaggedLines))
+                    for line in flaggedLines:
+                        self._ProcessLine(line)
+                        self.TRACKER.completeSubtask()
+                    self.TRACKER.completeTask()
             
             return len(flaggedLines)
 
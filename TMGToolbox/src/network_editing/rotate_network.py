@@ -35,6 +35,11 @@ Rotate Network
     
     0.1.1 Fixed a bug where link vertices are left in-place.
     
+    0.2.0 Node coordinates and link vertices are transformed as arrays with a single
+        affine matrix and written back with bulk attribute updates, instead of
+        publishing the full network. The same transform can be applied to
+        additional scenarios in one run.
+    
 '''
 
 import inro.modeller as _m
@@ -43,7 +48,7 @@ import math
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
-_geom = _MODELLER.module('tmg.common.geometry')
+_transform = _MODELLER.module('tmg.common.network_transform')
 # import six library for python2 to python3 conversion
 import six 
 # initalize python3 types
@@ -53,9 +58,9 @@ _util.initalizeModellerTypes(_m)
 
 class RotateNetwork(_m.Tool()):
     
-    version = '0.1.0'
+    version = '0.2.0'
     tool_run_msg = ""
-    number_of_tasks = 6 # For progress reporting, enter the integer number of tasks here
+    number_of_tasks = 3 # For progress reporting, enter the integer number of tasks here
     
     # Tool Input Parameters
     #    Only those parameters neccessary for Modeller and/or XTMF to dock with
@@ -69,6 +74,7 @@ class RotateNetwork(_m.Tool()):
     CorrespondingX1 = _m.Attribute(float)
     CorrespondingY0 = _m.Attribute(float)
     CorrespondingY1 = _m.Attribute(float)
+    AdditionalScenarios = _m.Attribute(_m.ListType)
     
     def __init__(self):
         #---Init internal variables
@@ -134,6 +140,12 @@ class RotateNetwork(_m.Tool()):
                 
             with t.table_cell():
                 pb.add_text_box(tool_attribute_name='CorrespondingY1', size=10)
+        
+        pb.add_select_scenario(tool_attribute_name='AdditionalScenarios',
+                               title='Additional scenarios:',
+                               allow_none=True,
+                               note="Optional. The same rotation & translation (computed from \
+                                   the first scenario) is applied to these scenarios.")
             
         
         
@@ -161,60 +173,19 @@ class RotateNetwork(_m.Tool()):
         with _m.logbook_trace(name="{classname} v{version}".format(classname=(self.__class__.__name__), version=self.version),
                                      attributes=self._GetAtts()):
             
-            network = self.Scenario.get_network()
-            self.TRACKER.completeTask()
-            
             anchorVecotr = ((self.CorrespondingX0, self.CorrespondingY0),
                              (self.CorrespondingX1, self.CorrespondingY1))
             
-            refLink = self._GetRefLink(network)
-            referenceVector = self._GetLinkVector(refLink)
+            referenceVector = self._GetLinkVector(self.Scenario)
             _m.logbook_write("Found reference link '%s-%s'" %(self.ReferenceLinkINode, self.ReferenceLinkJNode))
-            
-            angle = self._GetRotationAngle(anchorVecotr, referenceVector)# + math.pi / 2
-            _m.logbook_write("Rotation: %s degrees" %math.degrees(angle))
-            cosTheta = math.cos(angle)
-            sinTheta = math.sin(angle)
-            
-            self.TRACKER.startProcess(network.element_totals['centroids'] + network.element_totals['regular_nodes'])
-            for node in network.nodes():
-                self._RotateNode(node, cosTheta, sinTheta)
-                self.TRACKER.completeSubtask()
-            self.TRACKER.completeTask()
-            _m.logbook_write("Finished rotating nodes.")
-            
-            self.TRACKER.startProcess(network.element_totals['links'])
-            count = 0
-            for link in network.links():
-                if len(link.vertices) > 0:
-                    self._RotateLinkVertices(link, cosTheta, sinTheta)
-                    count += 1
-                self.TRACKER.completeSubtask()
-            self.TRACKER.completeTask()
-            _m.logbook_write("Rotated %s links with vertices." %count)
-            
-            referenceVector = self._GetLinkVector(refLink) # Reset the reference vector
-            delta = self._GetTranslation(referenceVector, anchorVecotr)
-            _m.logbook_write("Translation: %s" %str(delta))
-            
-            self.TRACKER.startProcess(network.element_totals['centroids'] + network.element_totals['regular_nodes'])
-            for node in network.nodes():
-                self._TranslateNode(node, delta)
-                self.TRACKER.completeSubtask()
             self.TRACKER.completeTask()
-            _m.logbook_write("Finished translating nodes.")
             
-            self.TRACKER.startProcess(network.element_totals['links'])
-            count = 0
-            for link in network.links():
-                if len(link.vertices) > 0:
-                    self._TranslateLink(link, delta)
-                    count += 1
-                self.TRACKER.completeSubtask()
+            transform = _transform.AffineTransform.fromReferenceVectors(referenceVector, anchorVecotr)
+            _m.logbook_write("Rotation: %s degrees" %math.degrees(transform.getRotationAngle()))
+            _m.logbook_write("Translation: %s" %str(transform.getTranslation()))
             self.TRACKER.completeTask()
-            _m.logbook_write("Translated %s links with vertices." %count)
             
-            self.Scenario.publish_network(network, resolve_attributes=True)
+            _transform.transformScenarios(self._GetScenarios(), transform)
             self.TRACKER.completeTask()
 
     #########################################################################################################    
@@ -229,62 +200,14 @@ class RotateNetwork(_m.Tool()):
             
         return atts 
     
-    def _GetRefLink(self, network):
-        link = network.link(self.ReferenceLinkINode, self.ReferenceLinkJNode)
-        
-        if link is None:
-            raise Exception("Reference link '%s-%s' does not exist in the network!" 
-                            %(self.ReferenceLinkINode, self.ReferenceLinkJNode))
-        return link
-        
-    def _GetLinkVector(self, link):
-        return ((link.i_node.x, link.i_node.y), (link.j_node.x, link.j_node.y))
-    
-    def _GetVectorBearing(self, vector):
-        return math.atan2(vector[1][0] - vector[0][0], vector[1][1] - vector[0][1])
-    
-    def _GetRotationAngle(self, vector1, vector2):
-        
-        bearing1 = self._GetVectorBearing(vector1)
-        bearing2 = self._GetVectorBearing(vector2)
-        
-        return bearing2 - bearing1
-        
-    def _GetTranslation(self, vector1, vector2):
-        return (vector2[0][0] - vector1[0][0], vector2[0][1] - vector1[0][1])
-
-    def _RotateNode(self, node, cosTheta, sinTheta):
-        # Make copies of the coordinates
-        x = node.x
-        y = node.y
-        
-        node.x = (cosTheta * x) + (-sinTheta * y)
-        node.y = (sinTheta * x) + (cosTheta * y)
-    
-    def _TranslateNode(self, node, delta):
-        node.x += delta[0]
-        node.y += delta[1]
-    
-    def _RotateLinkVertices(self, link,  cosTheta, sinTheta):
-        vertices = [link.vertices.pop() for i in range(0, len(link.vertices))]
-        vertices.reverse()
-        # Link's vertices have been removed and copied in-order to
-        #this new list
-        
-        for vertex in vertices:
-            tup = (cosTheta * vertex[0] - sinTheta * vertex[1],
-                   sinTheta * vertex[0] + cosTheta * vertex[1])
-            link.vertices.append(tup)
-            
-    def _TranslateLink(self, link, delta):
-        vertices = [link.vertices.pop() for i in range(0, len(link.vertices))]
-        vertices.reverse()
-        # Link's vertices have been removed and copied in-order to
-        #this new list
+    def _GetScenarios(self):
+        scenarios = [self.Scenario]
+        if self.AdditionalScenarios:
+            scenarios += [sc for sc in self.AdditionalScenarios if sc.id != self.Scenario.id]
+        return scenarios
         
-        for vertex in vertices:
-            tup = (vertex[0] + delta[0], vertex[1] + delta[1])
-            link.vertices.append(tup)
+    def _GetLinkVector(self, scenario):
+        return _transform.getLinkVector(scenario, self.ReferenceLinkINode, self.ReferenceLinkJNode)
     
     @_m.method(return_type=_m.TupleType)
     def percent_completed(self):
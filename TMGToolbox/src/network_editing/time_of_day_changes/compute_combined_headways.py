@@ -36,15 +36,20 @@ Compute Combined Headways
 '''
     0.0.1 Created on 2015-01-19 by mattaustin222
     
+    0.0.2 Line headways and pattern indices are read as attribute arrays instead
+        of loading the full network.
+    
 '''
 
 import inro.modeller as _m
 import traceback as _traceback
 import csv
+import numpy as np
 from inro.emme.core.exception import ModuleError
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
+_partial = _MODELLER.module('tmg.common.partial_network')
 # import six library for python2 to python3 conversion
 import six 
 # initalize python3 types
@@ -54,7 +59,7 @@ _util.initalizeModellerTypes(_m)
 
 class ComputeCombinedHeadways(_m.Tool()):
     
-    version = '0.0.1'
+    version = '0.0.2'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
     
@@ -134,10 +139,12 @@ class ComputeCombinedHeadways(_m.Tool()):
             
             with _util.tempExtraAttributeMANAGER(self.BaseScenario, 'TRANSIT_LINE', default = 999, description = "Pattern Index") as pattIndex:
                 self._PatternMatching(patternList, pattIndex.id)
-                network = self.BaseScenario.get_network()
+                editor = _partial.PartialNetworkEditor(self.BaseScenario,
+                                                       {'TRANSIT_LINE': ['headway', pattIndex.id]},
+                                                       loadNetwork=False)
                 self.TRACKER.completeTask()
-                print("Loaded network")
-                self._CalcHeadways(patternList, pattIndex.id, network)
+                print("Loaded line attributes")
+                self._CalcHeadways(patternList, pattIndex.id, editor)
                             
 
     ##########################################################################################################    
@@ -189,19 +196,15 @@ class ComputeCombinedHeadways(_m.Tool()):
             print(msg)
             _m.logbook_write(msg)
 
-    def _CalcHeadways(self, patternList, pattId, network):
-        totalHeadway = [0] * len(patternList)
-        for line in network.transit_lines():
-            if line[pattId] < 999:
-                _m.logbook_write(int(line[pattId]))
-                _m.logbook_write(totalHeadway[int(line[pattId])])
-                totalHeadway[int(line[pattId])] += (60 / line.headway) #adds freqs of individual branches
-                
-                _m.logbook_write(line.headway)
-                _m.logbook_write(totalHeadway[int(line[pattId])])
-        for i in range(len(totalHeadway)):
-            if totalHeadway[i] != 0:
-                totalHeadway[i] = 60 / totalHeadway[i] #converts total freq into combined headway
+    def _CalcHeadways(self, patternList, pattId, editor):
+        patterns = editor.getValues('TRANSIT_LINE', pattId)
+        headways = editor.getValues('TRANSIT_LINE', 'headway')
+        matched = patterns < 999
+        #adds freqs of individual branches
+        totalFrequency = np.bincount(patterns[matched].astype(np.int64), weights=60.0 / headways[matched],
+                                     minlength=len(patternList))
+        #converts total freq into combined headway
+        totalHeadway = [60 / freq if freq != 0 else 0 for freq in totalFrequency[:len(patternList)]]
         
         with _util.open_csv_writer(self.ExportFile) as hdwWrite:
             hdwWrite.writerow(['line', 'comb_hdw'])
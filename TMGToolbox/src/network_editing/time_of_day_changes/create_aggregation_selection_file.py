@@ -34,6 +34,9 @@ Create Aggregation Selection File
 '''
     0.0.1 Created on 2015-01-19 by mattaustin222
     
+    0.0.2 Aggregation types are read as a line attribute array instead of
+        loading the full network.
+    
 '''
 
 import inro.modeller as _m
@@ -43,6 +46,7 @@ from inro.emme.core.exception import ModuleError
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
+_partial = _MODELLER.module('tmg.common.partial_network')
 # import six library for python2 to python3 conversion
 import six 
 # initalize python3 types
@@ -52,7 +56,7 @@ _util.initalizeModellerTypes(_m)
 
 class CreateAggregationSelectionFile(_m.Tool()):
     
-    version = '0.0.1'
+    version = '0.0.2'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
     
@@ -191,10 +195,11 @@ class CreateAggregationSelectionFile(_m.Tool()):
             
             with _util.tempExtraAttributeMANAGER(self.BaseScenario, 'TRANSIT_LINE', default = 1, description = "Agg Type") as aggType:
                 self._AssignAggType(groups, aggType.id)
-                network = self.BaseScenario.get_network()
+                editor = _partial.PartialNetworkEditor(self.BaseScenario, {'TRANSIT_LINE': [aggType.id]},
+                                                       loadNetwork=False)
                 self.TRACKER.completeTask()
-                print("Loaded network")
-                self._WriteAggSelections(network, aggType.id)
+                print("Loaded line attributes")
+                self._WriteAggSelections(editor, aggType.id)
 
             
 
@@ -259,12 +264,13 @@ class CreateAggregationSelectionFile(_m.Tool()):
             print(msg)
             _m.logbook_write(msg)
 
-    def _WriteAggSelections(self, network, aggTypeId):
+    def _WriteAggSelections(self, editor, aggTypeId):
+        lineIds = editor.keys('TRANSIT_LINE')
+        aggTypes = editor.getValues('TRANSIT_LINE', aggTypeId)
         with _util.open_csv_writer(self.ExportFile) as aggWrite:
             aggWrite.writerow(['emme_id', 'agg_type'])
-            for line in network.transit_lines():
-                if line[aggTypeId] == 1: aggWrite.writerow([line.id, 'naive'])                    
-                else : aggWrite.writerow([line.id, 'average'])                    
+            aggWrite.writerows([lineId, 'naive' if aggType == 1 else 'average']
+                               for lineId, aggType in _util.itersync(lineIds, aggTypes))
                 
     @_m.method(return_type=_m.TupleType)
     def percent_completed(self):
@@ -43,16 +43,24 @@ ESTIMATE NETWORK SIZE
     1.0.2 Fixed a bug in checking the references of the fare schema file. Allows to read other files
         in the same folder as called by the fare schema file.
     
+    1.1.0 The size is now projected from attribute arrays by the common hypernetwork_size module
+        (shared with the FBTN generators as a pre-flight), instead of loading and walking the
+        whole network. Node, link and segment counts are exact, and are reported against the
+        emmebank dimensions. Line groups are evaluated directly from the schema's selections
+        where possible. Added the IgnoreSameGroupsForStations option of the generator.
+    
 '''
 
 import inro.modeller as _m
+from inro.emme.core.exception import ModuleError
 import traceback as _traceback
-from math import factorial
 from xml.etree import ElementTree as _ET
 from os import path as _PATH
 _MODELLER = _m.Modeller() #Instantiate Modeller once.
 _util = _MODELLER.module('tmg.common.utilities')
 _tmgTPB = _MODELLER.module('tmg.common.TMG_tool_page_builder')
+_hyperSize = _MODELLER.module('tmg.common.hypernetwork_size')
+_lineSelection = _MODELLER.module('tmg.common.line_selection')
 # import six library for python2 to python3 conversion
 import six 
 # initalize python3 types
@@ -60,16 +68,12 @@ _util.initalizeModellerTypes(_m)
 
 ##########################################################################################################
 
-def choose(setSize, n):
-    if n > setSize: return 0
-    return factorial(setSize) / (factorial(n) * factorial(setSize - n)) 
-
 class XmlValidationError(Exception):
     pass
 
 class EstimateHyperNetworkSize(_m.Tool()):
     
-    version = '1.0.2'
+    version = '1.1.0'
     tool_run_msg = ""
     number_of_tasks = 1 # For progress reporting, enter the integer number of tasks here
     
@@ -82,6 +86,7 @@ class EstimateHyperNetworkSize(_m.Tool()):
     BaseScenario = _m.Attribute(_m.InstanceType) # common variable or parameter
     
     XMLSchemaFile = _m.Attribute(str)
+    IgnoreSameGroupsForStations = _m.Attribute(bool)
     
     __ZONE_TYPES = ['node_selection', 'from_shapefile']
     __RULE_TYPES = ['initial_boarding', 
@@ -97,16 +102,17 @@ class EstimateHyperNetworkSize(_m.Tool()):
         
         #---Set the defaults of parameters used by Modeller
         self.BaseScenario = _MODELLER.scenario #Default is primary scenario
+        self.IgnoreSameGroupsForStations = True
         
     def page(self):
         pb = _tmgTPB.TmgToolPageBuilder(self, title="Estimate FBTNetwork Size v%s" %self.version,
-                     description="Without actually editing the network, this tool estimates \
-                         the required total link and nodes in a fare-based transit network \
+                     description="Without actually editing the network, this tool calculates \
+                         the total nodes, links and transit segments in a fare-based transit network \
                          (FBTN). This can be important, as the FBTN is quite large and in \
                          some cases can exceed the current size of the databank.\
-                         <br><br>The number of nodes reported is calculated accurately, however \
-                         the number of links is estimated. Trial runs indicate that the \
-                         number of links is over-estimated by less than 1%.",
+                         <br><br>The totals are reported in the logbook against the dimensions \
+                         of the databank. The FBTN generators run the same check before \
+                         transforming the network.",
                      branding_text="- TMG Toolbox")
         
         if self.tool_run_msg != "": # to display messages in the page
@@ -119,6 +125,9 @@ class EstimateHyperNetworkSize(_m.Tool()):
         pb.add_select_file(tool_attribute_name='XMLSchemaFile', window_type='file',
                            file_filter="*.xml", title="Fare Schema File")
         
+        pb.add_checkbox(tool_attribute_name= 'IgnoreSameGroupsForStations',
+                        label= "Set false to allow transfers in the hyper-network from an agency to a station for the same agency.")
+        
         return pb.render()
     
     ##########################################################################################################
@@ -128,8 +137,12 @@ class EstimateHyperNetworkSize(_m.Tool()):
         self.TRACKER.reset()
         
         try:
-            retval = self._Execute()
-            msg = "The hyper network will contain exactly %s nodes and approximately %s links." %retval
+            size = self._Execute()
+            msg = "The hyper network will contain %s nodes, %s links and %s transit segments." \
+                    %(size.nodes, size.links, size.segments)
+            exceeded = size.exceededDimensions(_MODELLER.emmebank)
+            if exceeded:
+                msg += " This exceeds the databank dimensions for %s." %", ".join(element for element, total, limit in exceeded)
             self.tool_run_msg = _m.PageBuilder.format_info(msg)
         except Exception as e:
             self.tool_run_msg = _m.PageBuilder.format_exception(
@@ -149,19 +162,22 @@ class EstimateHyperNetworkSize(_m.Tool()):
             root = _ET.parse(self.XMLSchemaFile).getroot() 
             self._ValidateSchemaFile(root)
             
-            with _util.tempExtraAttributeMANAGER(self.BaseScenario, 'TRANSIT_LINE', description= "Line group") \
-                    as lineGroupAtt:
-                
-                with _m.logbook_trace("Line groups"):
-                    groupsElement = root.find('groups')
-                    self._LoadGroups(groupsElement, lineGroupAtt.id)
-                
-                network = self.BaseScenario.get_network()
-            _MODELLER.desktop.refresh_needed(False)
-            
-            self._PrepareNetwork(network, lineGroupAtt.id)
-            
-            return self._CalcNetworkSize(network)
+            with _m.logbook_trace("Line groups"):
+                groupsElement = root.find('groups')
+                try:
+                    lineIds, lineGroups = _hyperSize.selectLineGroups(self.BaseScenario, groupsElement)
+                except _lineSelection.UnsupportedSelectionError as e:
+                    _m.logbook_write("Loading line groups with the network calculator: %s" %e)
+                    with _util.tempExtraAttributeMANAGER(self.BaseScenario, 'TRANSIT_LINE', description= "Line group") \
+                            as lineGroupAtt:
+                        self._LoadGroups(groupsElement, lineGroupAtt.id)
+                        lineIds, lineGroups = _hyperSize.loadLineGroups(self.BaseScenario, lineGroupAtt.id)
+                    _MODELLER.desktop.refresh_needed(False)
+            
+            size = _hyperSize.projectSize(self.BaseScenario, lineIds, lineGroups,
+                                          self.IgnoreSameGroupsForStations)
+            size.report(_MODELLER.emmebank)
+            return size
                 
 
     ##########################################################################################################
@@ -386,302 +402,6 @@ class EstimateHyperNetworkSize(_m.Tool()):
         
         return groupIds2Int, int2groupIds
     
-    def _PrepareNetwork(self, network, lineGroupAttId):
-        '''
-        Prepares network attributes for transformation
-        '''
-        
-        network.create_attribute('TRANSIT_LINE', 'group', 0)
-        network.create_attribute('NODE', 'passing_groups', None) #Set of groups passing through but not stopping at the node
-        network.create_attribute('NODE', 'stopping_groups', None) #Set of groups stopping at the node
-        network.create_attribute('LINK', 'role', 0) #Link topological role
-        network.create_attribute('NODE', 'role', 0) #Node topological role
-        
-        #Initialize node attributes (incl. copying node zone)
-        #Also, copy the zones loaded into the proxies
-        for node in network.regular_nodes():
-            node.passing_groups = set()
-            node.stopping_groups = set()
-        
-        #Determine stops & assign operators to nodes
-        for line in network.transit_lines():
-            group = int(line[lineGroupAttId])
-            line.group = group
-            
-            for segment in line.segments(True):
-                iNode = segment.i_node
-                if segment.allow_boardings or segment.allow_alightings:
-                    iNode.stopping_groups.add(group)
-                    if group in iNode.passing_groups: iNode.passing_groups.remove(group)
-                else:
-                    if not group in iNode.stopping_groups: iNode.passing_groups.add(group)
-        
-        #Put this into a function to be able to break from deep loops using return
-        def applyNodeRole(node):
-            if not node.stopping_groups and not node.passing_groups: 
-                return #Skip nodes without an incident transit segment
-            
-            for link in node.outgoing_links():
-                if link.i_node.is_centroid or link.j_node.is_centroid: continue
-                for mode in link.modes:
-                    if mode.type == 'AUTO':
-                        node.role = 1 #Surface node
-                        return
-            for link in node.incoming_links():
-                if link.i_node.is_centroid or link.j_node.is_centroid: continue
-                for mode in link.modes:
-                    if mode.type == 'AUTO':
-                        node.role = 1 #Surface node
-                        return
-            node.role = 2 #Station node is a transit stop, but does NOT connect to any auto links
-        
-        #Determine node role. This needs to be done AFTER stops have been identified
-        for node in network.regular_nodes(): applyNodeRole(node)
-            
-        #Determine link role. Needs to happen after node role's have been identified
-        for link in network.links():
-            i, j = link.i_node, link.j_node
-            if i.is_centroid or j.is_centroid: continue #Link is a centroid connector    
-            
-            permitsWalk = False
-            for mode in link.modes:
-                if mode.type == 'AUX_TRANSIT': 
-                    permitsWalk = True
-                    break
-            
-            if i.role == 1 and j.role == 2 and permitsWalk: link.role = 1 #Station connector (access)
-            elif i.role == 2 and j.role == 1 and permitsWalk: link.role = 1 #Station connector (egress)
-            elif i.role == 2 and j.role == 2:
-                if permitsWalk: link.role = 2 #Station transfer
-                else: link.role = 3 #Existing hyper link
-    
-    def _CalcNetworkSize(self, network):
-        baseSurfaceNodes = []
-        baseStationNodes = []
-        for node in network.regular_nodes():
-            if node.role == 1: baseSurfaceNodes.append(node)
-            elif node.role == 2: baseStationNodes.append(node)
-        
-        baseNodes = network.element_totals['regular_nodes']
-        baseLinks = network.element_totals['links']
-        
-        nVirtualSurfaceNodes, nBaseConnectorLinks = 0, 0
-        self.TRACKER.startProcess(len(baseSurfaceNodes) + len(baseStationNodes))
-        for node in baseSurfaceNodes:
-            addNodes, addLinks = self._CalcSurfaceNode(node)
-            nVirtualSurfaceNodes += addNodes
-            nBaseConnectorLinks += addLinks
-            self.TRACKER.completeSubtask()
-        print("%s virtual road nodes" %nVirtualSurfaceNodes)
-        print("%s access links to virtual road nodes" %nBaseConnectorLinks)
-        
-        nVirtualStationNodes, nStationConnectorLinks = 0, 0
-        for node in baseStationNodes:
-            addNodes, addLinks = self._CalcStationNode(node)
-            nVirtualStationNodes += addNodes
-            nStationConnectorLinks += addLinks
-            self.TRACKER.completeSubtask()
-        self.TRACKER.completeTask()
-        print("%s virtual station nodes" %nVirtualStationNodes)
-        print("%s access links to virtual station nodes" %nStationConnectorLinks)
-        
-        nConnectorLinks = 0
-        for node in baseStationNodes + baseSurfaceNodes:
-            nConnectorLinks += self._CalcStationToSurfaceConnectors(node)
-        print("%s road-to-transit connector links." %nConnectorLinks)
-        
-        inVehicleLinks = 0
-        network.create_attribute('LINK', 'copies', None)
-        for link in network.links():
-            link.copies = set()
-        
-        for line in network.transit_lines():
-            group = line.group
-            for segment in line.segments():
-                segment.link.copies.add(group)
-        for link in network.links():
-            if link.role == 3: #Is existing hyper link
-                inVehicleLinks += max(len(link.copies) - 1, 0)
-            else:
-                inVehicleLinks += len(link.copies)
-        print("%s in-vehicle links" %inVehicleLinks)
-        
-        totalNodes = baseNodes + nVirtualStationNodes + nVirtualSurfaceNodes
-        totalLinks = baseLinks + nBaseConnectorLinks + nConnectorLinks + nStationConnectorLinks + inVehicleLinks
-        
-        _m.logbook_write("The hyper network will contain exactly %s total nodes and approximately %s links" %(totalNodes, totalLinks))
-        
-        return totalNodes, totalLinks
-    
-    def _CalcSurfaceNode(self, node):
-        nStoppingGroups = len(node.stopping_groups)
-        nPassingGroups = len(node.passing_groups)
-        
-        nVirtualNodes = nStoppingGroups + nPassingGroups
-        
-        nBaseConnectorLinks = 2 * nStoppingGroups
-        nVirtualTransferLinks = 2 * choose(nStoppingGroups, 2)
-        
-        '''
-        nSurfaceToStationLinks = 0
-        for link in node.outgoing_links():
-            if link.j_node.role != 2: continue
-            
-            nStationStoppingGroups = len(link.j_node.stopping_groups)
-            nSurfaceToStationLinks += 2 * nStationStoppingGroups * nStoppingGroups
-            #By multiplying by 2, this accounts for both directions
-        
-        nVirtualLinks = nBaseConnectorLinks + nVirtualTransferLinks + nSurfaceToStationLinks
-        '''
-        
-        nVirtualLinks = nBaseConnectorLinks + nVirtualTransferLinks
-        
-        return nVirtualNodes, nVirtualLinks
-    
-    def _CalcStationNode(self, node):
-        nStoppingGroups = len(node.stopping_groups)
-        nPassingGroups = len(node.passing_groups)
-        
-        if nStoppingGroups == 0:
-            return nPassingGroups, 0
-        
-        nVirtualNodes = nStoppingGroups + nPassingGroups - 1
-        
-        if nVirtualNodes > 0:
-            interStationConnectorLinks = choose(nVirtualNodes + 1, 2)
-            
-            nIncomingRole1Links = 0
-            for link in node.incoming_links():
-                if link.role == 1: nIncomingRole1Links += 1
-                elif link.i_node.is_centroid: nIncomingRole1Links += 1
-            nOutgoingRole1Links = 0
-            for link in node.outgoing_links():
-                if link.role == 1: nOutgoingRole1Links += 1
-                elif link.j_node.is_centroid: nOutgoingRole1Links += 1
-            
-            nRole1LinkCopies = nVirtualNodes * (nIncomingRole1Links + nOutgoingRole1Links)
-        else: 
-            interStationConnectorLinks = 0
-            nRole1LinkCopies = 0
-        
-        return nVirtualNodes, interStationConnectorLinks + nRole1LinkCopies
-    
-    def _CalcStationToSurfaceConnectors(self, node):
-        nStoppingGroups = len(node.stopping_groups)
-        nPassingGroups = len(node.passing_groups)
-        
-        '''
-        if node.role == 2:
-            if nStoppingGroups == 0: return 0
-            nVirtualNodes = nStoppingGroups - 1
-        else:
-            nVirtualNodes = nStoppingGroups
-        '''
-        nVirtualNodes = nStoppingGroups
-        
-        nConnectorLinks = 0
-        for link in node.outgoing_links():
-            if link.role == 0 or link.role == 3: continue
-            
-            otherNode = link.j_node
-            '''
-            if otherNode.role == 2:
-                if len(otherNode.stopping_groups) == 0: nOtherVirtualNodes = 0
-                else: nOtherVirtualNodes = len(otherNode.stopping_groups) - 1
-            elif otherNode.role == 1:
-                nOtherVirtualNodes = len(otherNode.stopping_groups)
-            '''
-            nOtherVirtualNodes = len(otherNode.stopping_groups)
-            
-            nConnectorLinks += nOtherVirtualNodes * nVirtualNodes
-        return nConnectorLinks
-    
-    def _CalcTransitLine(self, line, groupLinks):
-        group = line.group
-        if group in groupLinks:
-            linkSet = groupLinks[group]
-        else:
-            linkSet = set()
-            groupLinks[group] = linkSet
-        
-        for segment in line.segments():
-            OD = segment.i_node.number, segment.link.j_node.number
-            linkSet.add(OD)
-    
-    '''
-    DEPRECATED
-    '''
-    def _OldCalculateNetworkSize(self, network):        
-        baseSurfaceNodes = []
-        baseStationNodes = []
-        for node in network.regular_nodes():
-            if node.role == 1: baseSurfaceNodes.append(node)
-            elif node.role == 2: baseStationNodes.append(node)
-        
-        totalStops = 0
-        numberOfVirtualRole1Nodes = 0
-        numberOfVirtualRole2Nodes = 0
-        numberOfVirtualRole1Links = 0
-        numberOfVirtualRole2Links = 0
-        virtualRole3Links = set()
-        
-        for node in baseSurfaceNodes:
-            numberOfStoppingGroups = len(node.stopping_groups)
-            numberOfPassingGroups = len(node.passing_groups)
-            totalStops += numberOfStoppingGroups
-            
-            numberOfVirtualRole1Nodes += numberOfPassingGroups + numberOfStoppingGroups
-            numberOfVirtualRole1Links += 2 * numberOfStoppingGroups
-            numberOfVirtualRole2Links += permute(numberOfStoppingGroups, 2)
-        
-        for node in baseStationNodes:
-            numberOfStoppingGroups = len(node.stopping_groups)
-            numberOfPassingGroups = len(node.passing_groups)
-            totalStops += numberOfStoppingGroups
-            
-            numberOfOutboundRole1Links = 0
-            connectedNodes = []
-            for link in node.outgoing_links():
-                if link.role == 1: numberOfOutboundRole1Links += 1
-                if link.role != 0: connectedNodes.append(link.j_node)
-            
-            if numberOfStoppingGroups == 0:
-                print("Found no stopping groups for station node %s %s" %(node, node.passing_groups))
-                numberOfVirtualRole2Nodes += numberOfPassingGroups - 1
-            else:
-                numberOfVirtualRole2Nodes += numberOfPassingGroups + numberOfStoppingGroups - 1
-                
-                numberOfVirtualRole1Links += (numberOfStoppingGroups - 1) * numberOfOutboundRole1Links
-                numberOfVirtualRole2Links += permute(numberOfStoppingGroups - 1, 2)
-                
-                for otherNode in connectedNodes:
-                    otherStoppingGroups = len(otherNode.stopping_groups)
-                    
-                    numberOfVirtualRole2Links += otherStoppingGroups * numberOfStoppingGroups
-        
-        for line in network.transit_lines():
-            group = line.group
-            
-            first = True
-            for segment in line.segments(True):
-                if first:
-                    prevNode = segment.i_node.number
-                    first = False
-                else:
-                    node = segment.i_node.number
-                    linkTuple = (group, prevNode, node)
-                    virtualRole3Links.add(linkTuple)
-                    prevNode = node
-                        
-        print("Average groups per node: %s" %(float(totalStops) / len(baseSurfaceNodes)))
-        print("Number of new virtual role 1 nodes: %s" %numberOfVirtualRole1Nodes)
-        print("Number of new virtual role 2 nodes: %s" %numberOfVirtualRole2Nodes)
-        print("Number of new virtual role 1 links: %s" %numberOfVirtualRole1Links)
-        print("Number of new virtual role 2 links: %s" %numberOfVirtualRole2Links)
-        print("Number of new virtual role 3 links: %s" %len(virtualRole3Links))
-        print("Estimated total nodes: %s" %(network.element_totals['regular_nodes'] + numberOfVirtualRole1Nodes + numberOfVirtualRole2Nodes))
-        print("Estimated total links: %s" %(network.element_totals['links'] + numberOfVirtualRole1Links + numberOfVirtualRole2Links + len(virtualRole3Links)))
-    
     @_m.method(return_type=_m.TupleType)
     def percent_completed(self):
         return self.TRACKER.getProgress()
@@ -70,6 +70,11 @@ Fare-Based Transit Network (FBTN) From Schema
         method allows for finer control of centroids, but cannot handle multiple operators at 
         a station. 
     
+    0.1.0 Added a pre-flight check of the hypernetwork size. Once the line groups are loaded, the
+        node, link and segment totals are projected from attribute arrays (using the common
+        hypernetwork_size module) and reported against the emmebank dimensions. The tool stops
+        before the network is loaded if the hypernetwork would not fit.
+
 """
 from copy import copy
 from contextlib import contextmanager
@@ -89,6 +94,7 @@ _tmgTPB = _MODELLER.module("tmg.common.TMG_tool_page_builder")
 _geolib = _MODELLER.module("tmg.common.geometry")
 _editing = _MODELLER.module("tmg.common.network_editing")
 _spindex = _MODELLER.module("tmg.common.spatial_index")
+_hyperSize = _MODELLER.module("tmg.common.hypernetwork_size")
 Shapely2ESRI = _geolib.Shapely2ESRI
 GridIndex = _spindex.GridIndex
 TransitLineProxy = _editing.TransitLineProxy
@@ -158,7 +164,7 @@ class NodeSpatialProxy:
 
 class FBTNFromSchemaMulticlass(_m.Tool()):
 
-    version = "0.0.1"
+    version = "0.1.0"
     tool_run_msg = ""
     number_of_tasks = 5  # For progress reporting, enter the integer number of tasks here
 
@@ -427,6 +433,9 @@ class FBTNFromSchemaMulticlass(_m.Tool()):
                     groupsElement = rootBase.find("groups")
                     groupIds2Int, int2groupIds = self._LoadGroups(groupsElement, lineGroupAtt.id)
                     print("Loaded groups.")
+                with _m.logbook_trace("Hypernetwork size"):
+                    self._CheckHypernetworkSize(lineGroupAtt.id)
+                    print("Checked hypernetwork size.")
                 stationGroupsElement = rootBase.find("station_groups")
                 if stationGroupsElement is not None:
                     with _m.logbook_trace("Station Groups"):
@@ -681,6 +690,18 @@ class FBTNFromSchemaMulticlass(_m.Tool()):
 
         return len(fareElements)
 
+    def _CheckHypernetworkSize(self, lineGroupAttId):
+        """
+        Projects the size of the hypernetwork from the loaded line groups, and raises an
+        error if it exceeds the emmebank dimensions (before the network gets transformed).
+        """
+        lineIds, lineGroups = _hyperSize.loadLineGroups(self.BaseScenario, lineGroupAttId)
+        size = _hyperSize.projectSize(self.BaseScenario, lineIds, lineGroups)
+
+        bank = _MODELLER.emmebank
+        size.report(bank)
+        size.checkDimensions(bank)
+
     def _LoadGroups(self, groupsElement, lineGroupAttId):
         groupIds2Int = {}
         int2groupIds = {}